@@ -13,3 +13,4 @@
 # limitations under the License.
 
 from .appflow import Appflow
+from .pipelined_executor import PipelinedExecutor
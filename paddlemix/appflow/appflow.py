@@ -18,6 +18,7 @@ import paddle
 from paddlemix.utils.tools import get_env_device
 
 from .configuration import APPLICATIONS
+from .pipelined_executor import PipelinedExecutor
 
 
 class Appflow(object):
@@ -86,6 +87,34 @@ class Appflow(object):
             results = task_instance(results)
         return results
 
+    def stream(self, inputs, batch_size=1, num_workers=1, queue_size=16, max_wait_time=0.0, ordered=True):
+        """
+        The pipelined work function in the appflow, it yields the results of a stream of inputs. The
+        preprocessing, models and postprocessing of the tasks run concurrently and the models take micro batches
+        of up to `batch_size` inputs, see `PipelinedExecutor` for the arguments. The stage statistics of the last
+        stream are returned by `stream_stats`.
+
+        Args:
+            inputs (Iterable[dict] or queue.Queue): The keyword inputs of `__call__` for every request, a queue is
+                terminated with `None`.
+        """
+        self._executor = PipelinedExecutor(
+            self.task_instances,
+            batch_size=batch_size,
+            num_workers=num_workers,
+            queue_size=queue_size,
+            max_wait_time=max_wait_time,
+            ordered=ordered,
+        )
+        return self._executor.run(inputs)
+
+    def stream_stats(self):
+        """
+        Return the per-stage latency and throughput statistics of the last `stream`.
+        """
+        executor = getattr(self, "_executor", None)
+        return executor.stats() if executor is not None else {}
+
     def help(self):
         """
         Return the task usage message.
@@ -231,6 +231,13 @@ class AppTask(object):
         else:
             self._prepare_onnx_mode()
 
+    def _run_model_batch(self, batch_inputs, **kwargs):
+        """
+        Run the model over a micro batch of `_preprocess` outputs, used by the pipelined execution of Appflow.
+        Tasks whose model can stack the inputs override it, the default runs `_run_model` on every input.
+        """
+        return [self._run_model(inputs, **kwargs) for inputs in batch_inputs]
+
     def __call__(self, *args, **kwargs):
         inputs = self._preprocess(*args)
         outputs = self._run_model(inputs, **kwargs)
@@ -18,6 +18,7 @@ import paddle.nn.functional as F
 from paddlemix.models.groundingdino.modeling import GroundingDinoModel
 from paddlemix.models.sam.modeling import SamModel
 from paddlemix.processors.groundingdino_processing import GroudingDinoProcessor
+from paddlemix.processors.image_utils import get_preprocess_shape
 from paddlemix.processors.sam_processing import SamProcessor
 
 from .apptask import AppTask
@@ -107,7 +108,8 @@ class OpenSetDetTask(AppTask):
         prompt = inputs.get("prompt", None)
         assert prompt is not None, "The prompt is None"
 
-        self._size = image.size
+        # kept with the inputs, so that pipelined inputs do not share it
+        inputs["image_size"] = image.size
         image_tensor, mask, tokenized_out = self._processor(images=image, text=prompt)
 
         inputs["image_tensor"] = image_tensor
@@ -144,6 +146,43 @@ class OpenSetDetTask(AppTask):
 
         return inputs
 
+    def _run_model_batch(self, batch_inputs):
+        """
+        Run the inputs whose image and text tensors have the same shapes as one batch of the dygraph model.
+        """
+        if self._static_mode or len(batch_inputs) == 1:
+            return super()._run_model_batch(batch_inputs)
+
+        def shapes(inputs):
+            return (tuple(inputs["image_tensor"].shape),) + tuple(
+                (key, tuple(value.shape)) for key, value in sorted(inputs["tokenized_out"].items())
+            )
+
+        groups = {}
+        for inputs in batch_inputs:
+            groups.setdefault(shapes(inputs), []).append(inputs)
+        for group in groups.values():
+            if len(group) == 1:
+                self._run_model(group[0])
+                continue
+            tokenized_out = {
+                key: paddle.concat([inputs["tokenized_out"][key] for inputs in group])
+                for key in group[0]["tokenized_out"].keys()
+            }
+            result = self._model(
+                paddle.concat([inputs["image_tensor"] for inputs in group]),
+                paddle.concat([inputs["mask"] for inputs in group]),
+                input_ids=tokenized_out["input_ids"],
+                attention_mask=tokenized_out["attention_mask"],
+                text_self_attention_masks=tokenized_out["text_self_attention_masks"],
+                position_ids=tokenized_out["position_ids"],
+            )
+            for i, inputs in enumerate(group):
+                for key in ("image_tensor", "mask", "tokenized_out"):
+                    inputs.pop(key, None)
+                inputs["result"] = {key: value[i : i + 1] for key, value in result.items()}
+        return batch_inputs
+
     def _postprocess(self, inputs):
         """
         The model output is tag ids, this function will convert the model output to raw text.
@@ -169,7 +208,7 @@ class OpenSetDetTask(AppTask):
             pred_phrase = self._processor.decode(logit > self._text_threshold)
             pred_phrases.append(pred_phrase + f"({str(logit.max().item())[:4]})")
 
-        H, W = self._size[1], self._size[0]
+        W, H = inputs.pop("image_size")
         boxes = []
         for box in zip(boxes_filt):
             box = box[0] * paddle.to_tensor([W, H, W, H])
@@ -283,6 +322,10 @@ class OpenSetSegTask(AppTask):
             point_coords=points_prompt,
         )
 
+        # kept with the inputs, so that pipelined inputs do not share the sizes stored on the processor
+        original_size = np.array(image).shape[:2]
+        inputs["original_size"] = original_size
+        inputs["input_size"] = get_preprocess_shape(original_size[0], original_size[1], self._processor.encode_size)
         inputs["image_seg"] = image_seg
         inputs["prompt"] = prompt
 
@@ -316,7 +359,11 @@ class OpenSetSegTask(AppTask):
         The model output is tag ids, this function will convert the model output to raw text.
         """
 
-        seg_masks = self._processor.postprocess_masks(inputs["result"])
+        seg_masks = self._processor.postprocess_masks(
+            inputs["result"],
+            original_size=inputs.pop("original_size"),
+            input_size=inputs.pop("input_size"),
+        )
         inputs["seg_masks"] = seg_masks
         inputs.pop("result", None)
         return inputs
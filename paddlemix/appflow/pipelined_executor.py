@@ -0,0 +1,281 @@
+# coding:utf-8
+# Copyright (c) 2023  PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+import threading
+import time
+from collections import Counter
+
+from paddlemix.utils.log import logger
+
+_STOP = object()
+
+
+class _Item(object):
+    def __init__(self, index, inputs):
+        self.index = index
+        self.inputs = inputs
+        self.error = None
+
+
+class _Stage(object):
+    """
+    One step of an `AppTask`, run by `num_workers` threads that take micro batches of up to `batch_size` items from
+    `in_queue` and put the results into `out_queue`.
+    """
+
+    def __init__(self, name, fn, in_queue, out_queue, executor, num_workers=1, batch_size=1, max_wait_time=0.0):
+        self.name = name
+        self.fn = fn
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.executor = executor
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.max_wait_time = max_wait_time
+
+        self._lock = threading.Lock()
+        self._running_workers = num_workers
+        self.num_items = 0
+        self.num_batches = 0
+        self.busy_time = 0.0
+        self.first_start = None
+        self.last_end = None
+        self.batch_size_histogram = Counter()
+
+    def start(self):
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+
+    def _next_batch(self):
+        item = self.executor._get(self.in_queue)
+        if item is _STOP:
+            return None, True
+        batch = [item]
+        deadline = time.perf_counter() + self.max_wait_time
+        while len(batch) < self.batch_size:
+            try:
+                timeout = deadline - time.perf_counter()
+                item = self.in_queue.get(timeout=timeout) if timeout > 0 else self.in_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _work(self):
+        stopped = False
+        while not stopped and not self.executor._stopped.is_set():
+            batch, stopped = self._next_batch()
+            if batch is None:
+                break
+            self._run(batch)
+            for item in batch:
+                self.executor._put(self.out_queue, item)
+        with self._lock:
+            self._running_workers -= 1
+            last_worker = self._running_workers == 0
+        if last_worker:
+            self.executor._put(self.out_queue, _STOP, self.executor._num_consumers(self.out_queue))
+
+    def _run(self, batch):
+        # items that failed in an earlier stage are passed through to the caller
+        items = [item for item in batch if item.error is None]
+        if len(items) == 0:
+            return
+        start = time.perf_counter()
+        try:
+            outputs = self.fn([item.inputs for item in items])
+            for item, output in zip(items, outputs):
+                item.inputs = output
+        except Exception as e:
+            logger.warning(f"Appflow stage {self.name} failed: {e}")
+            for item in items:
+                item.error = e
+        end = time.perf_counter()
+        with self._lock:
+            self.num_items += len(items)
+            self.num_batches += 1
+            self.busy_time += end - start
+            self.first_start = start if self.first_start is None else min(self.first_start, start)
+            self.last_end = end if self.last_end is None else max(self.last_end, end)
+            self.batch_size_histogram[len(items)] += 1
+
+    def stats(self):
+        with self._lock:
+            active_time = self.last_end - self.first_start if self.num_batches > 0 else 0.0
+            return {
+                "num_items": self.num_items,
+                "num_batches": self.num_batches,
+                "mean_batch_size": self.num_items / self.num_batches if self.num_batches else 0.0,
+                "batch_size_histogram": dict(self.batch_size_histogram),
+                "busy_time": self.busy_time,
+                "mean_latency": self.busy_time / self.num_batches if self.num_batches else 0.0,
+                "throughput": self.num_items / active_time if active_time > 0 else 0.0,
+                "utilization": self.busy_time / (active_time * self.num_workers) if active_time > 0 else 0.0,
+            }
+
+
+class PipelinedExecutor(object):
+    """
+    Run the tasks of an Appflow as a pipeline over a stream of inputs. Every task is split into a preprocess, a model
+    and a postprocess stage connected by bounded queues, so that the CPU side pre/post-processing of one input
+    overlaps with the models of the other ones. The model stage takes micro batches of up to `batch_size` inputs and
+    runs them with `AppTask._run_model_batch`.
+
+    Args:
+        task_instances (list[AppTask]): The tasks of the flow, in order.
+        batch_size (int, optional): The maximum micro batch of the model stages. Default to 1.
+        num_workers (int, optional): The threads of every preprocess and postprocess stage, more than one requires
+            thread safe `_preprocess` and `_postprocess` functions. Default to 1.
+        queue_size (int, optional): The capacity of the queues between the stages. Default to 16.
+        max_wait_time (float, optional): The seconds a model stage waits for a micro batch to fill up. Default to 0.
+        ordered (bool, optional): Whether to return the results in the order of the inputs. Default to True.
+    """
+
+    def __init__(self, task_instances, batch_size=1, num_workers=1, queue_size=16, max_wait_time=0.0, ordered=True):
+        self.task_instances = task_instances
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.queue_size = queue_size
+        self.max_wait_time = max_wait_time
+        self.ordered = ordered
+        self._stopped = threading.Event()
+        self._stages = []
+        self._consumers = {}
+        self._start_time = None
+        self._end_time = None
+        self._num_results = 0
+
+    def _num_consumers(self, q):
+        return self._consumers.get(id(q), 1)
+
+    def _put(self, q, item, times=1):
+        for _ in range(times):
+            while not self._stopped.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def _get(self, q):
+        while not self._stopped.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def _build(self):
+        self._stages = []
+        self._consumers = {}
+        in_queue = queue.Queue(self.queue_size)
+        first_queue = in_queue
+        for i, task in enumerate(self.task_instances):
+            name = f"{i}:{task.model}"
+            steps = [
+                ("preprocess", lambda batch, task=task: [task._preprocess(inputs) for inputs in batch], 1),
+                ("run_model", lambda batch, task=task: task._run_model_batch(batch), self.batch_size),
+                ("postprocess", lambda batch, task=task: [task._postprocess(inputs) for inputs in batch], 1),
+            ]
+            for step, fn, batch_size in steps:
+                # the models run on one thread, the pre/post-processing may use several
+                num_workers = 1 if step == "run_model" else self.num_workers
+                out_queue = queue.Queue(self.queue_size)
+                self._consumers[id(in_queue)] = num_workers
+                self._stages.append(
+                    _Stage(
+                        f"{name}:{step}",
+                        fn,
+                        in_queue,
+                        out_queue,
+                        self,
+                        num_workers=num_workers,
+                        batch_size=batch_size,
+                        max_wait_time=self.max_wait_time if step == "run_model" else 0.0,
+                    )
+                )
+                in_queue = out_queue
+        return first_queue, in_queue
+
+    def _feed(self, inputs, q):
+        if isinstance(inputs, queue.Queue):
+            inputs = iter(inputs.get, None)
+        try:
+            for index, item in enumerate(inputs):
+                if self._stopped.is_set():
+                    return
+                self._put(q, _Item(index, dict(item)))
+        finally:
+            self._put(q, _STOP, self._num_consumers(q))
+
+    def run(self, inputs):
+        """
+        Process `inputs`, an iterable of input dicts or a `queue.Queue` of them terminated with `None`, and yield the
+        result dict of every input. The exception of a failed input is raised when its result is due.
+        """
+        self._stopped.clear()
+        first_queue, last_queue = self._build()
+        self._start_time = time.perf_counter()
+        self._end_time = None
+        self._num_results = 0
+        for stage in self._stages:
+            stage.start()
+        feeder = threading.Thread(target=self._feed, args=(inputs, first_queue), name="appflow-feeder", daemon=True)
+        feeder.start()
+
+        pending = {}
+        next_index = 0
+        try:
+            while True:
+                item = self._get(last_queue)
+                if item is _STOP:
+                    break
+                if not self.ordered:
+                    yield self._result(item)
+                    continue
+                pending[item.index] = item
+                while next_index in pending:
+                    yield self._result(pending.pop(next_index))
+                    next_index += 1
+            for index in sorted(pending):
+                yield self._result(pending.pop(index))
+        finally:
+            # also stops the workers when the caller does not consume all results
+            self._stopped.set()
+            self._end_time = time.perf_counter()
+
+    def _result(self, item):
+        self._num_results += 1
+        if item.error is not None:
+            raise item.error
+        return item.inputs
+
+    def stats(self):
+        """
+        Return the number of results, the wall time and throughput of the last `run`, and for every stage its items,
+        micro batch sizes, busy time, mean latency per batch, throughput and utilization.
+        """
+        end_time = self._end_time if self._end_time is not None else time.perf_counter()
+        wall_time = end_time - self._start_time if self._start_time is not None else 0.0
+        return {
+            "num_results": self._num_results,
+            "wall_time": wall_time,
+            "throughput": self._num_results / wall_time if wall_time > 0 else 0.0,
+            "stages": {stage.name: stage.stats() for stage in self._stages},
+        }
@@ -26,7 +26,6 @@ class StableDiffusionInpaintTask(AppTask):
 
         # Default to static mode
         self._static_mode = False
-        self._org_size = None
         self._resize = kwargs.get("inpainting_resize", (512, 512))
 
         self._construct_model(model)
@@ -50,7 +49,7 @@ class StableDiffusionInpaintTask(AppTask):
         inpaint_prompt = inputs.get("inpaint_prompt", None)
         assert inpaint_prompt is not None, "The inpaint_prompt is None"
 
-        self._org_size = image.size
+        inputs["org_size"] = image.size
         if isinstance(seg_masks, paddle.Tensor):
             merge_mask = paddle.sum(seg_masks, axis=0).unsqueeze(0)
             merge_mask = merge_mask > 0
@@ -89,7 +88,7 @@ class StableDiffusionInpaintTask(AppTask):
         The model output is tag ids, this function will convert the model output to raw text.
         """
 
-        image = inputs["result"].resize(self._org_size)
+        image = inputs["result"].resize(inputs.pop("org_size"))
         inputs["result"] = image
 
         return inputs
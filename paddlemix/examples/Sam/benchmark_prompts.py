@@ -0,0 +1,91 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from dataclasses import dataclass, field
+
+import paddle
+from paddlenlp.trainer import PdArgumentParser
+
+from paddlemix.models.sam.modeling import SamModel
+from paddlemix.utils.log import logger
+
+
+@dataclass
+class BenchmarkArguments:
+    """
+    Compare `SamModel.predict_prompts` with one `prompt_forward_point` / `prompt_forward_box` call per prompt.
+    """
+
+    model_name_or_path: str = field(
+        default="Sam/SamVitH-1024",
+        metadata={"help": "Path to pretrained model or model identifier"},
+    )
+    num_points: int = field(default=32, metadata={"help": "Number of single point prompts."})
+    num_boxes: int = field(default=32, metadata={"help": "Number of box prompts."})
+    max_batch_size: int = field(default=64, metadata={"help": "Max prompts per mask decoder pass."})
+    repeats: int = field(default=10, metadata={"help": "Number of timed iterations."})
+    warmup: int = field(default=2, metadata={"help": "Number of untimed warmup iterations."})
+
+
+def _synchronize():
+    if paddle.is_compiled_with_cuda():
+        paddle.device.cuda.synchronize()
+
+
+def _timeit(fn, repeats, warmup):
+    for _ in range(warmup):
+        fn()
+    _synchronize()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    _synchronize()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = PdArgumentParser((BenchmarkArguments,))
+    (args,) = parser.parse_args_into_dataclasses()
+
+    sam_model = SamModel.from_pretrained(args.model_name_or_path, input_type="boxs")
+    image_size = sam_model.config.image_size
+
+    image = paddle.randn([1, 3, image_size, image_size])
+    point_coords = paddle.randint(0, image_size, [args.num_points, 1, 2]).cast("float32")
+    top_left = paddle.randint(0, image_size // 2, [args.num_boxes, 2])
+    boxes = paddle.concat([top_left, top_left + image_size // 4], axis=1).cast("float32")
+
+    # encode the image once, both paths reuse the embedding
+    sam_model.set_image_features(image)
+
+    def loop():
+        for i in range(args.num_points):
+            sam_model.prompt_forward_point(coords_paddle=point_coords[i : i + 1])
+        for i in range(args.num_boxes):
+            sam_model.prompt_forward_box(box_paddle=boxes[i : i + 1])
+
+    def batched():
+        sam_model.predict_prompts(point_coords=point_coords, boxes=boxes, max_batch_size=args.max_batch_size)
+
+    loop_time = _timeit(loop, args.repeats, args.warmup)
+    batched_time = _timeit(batched, args.repeats, args.warmup)
+    num_prompts = args.num_points + args.num_boxes
+    logger.info(f"per-prompt loop: {loop_time * 1000:.2f} ms for {num_prompts} prompts")
+    logger.info(f"predict_prompts: {batched_time * 1000:.2f} ms for {num_prompts} prompts")
+    logger.info(f"speedup: {loop_time / batched_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
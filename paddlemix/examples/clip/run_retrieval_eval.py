@@ -0,0 +1,113 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+
+parent_path = os.path.abspath(os.path.join(__file__, *([".."] * 4)))
+sys.path.insert(0, parent_path)
+import json
+import pprint
+from dataclasses import dataclass, field
+
+import paddle
+from PIL import Image
+from tqdm import tqdm
+
+from paddlemix.metrics.clip_retrieval import ClipRetrievalRecall
+from paddlemix.models.clip.clip_model import CLIP
+from paddlemix.processors.clip_processing import CLIPImageProcessor
+from paddlemix.processors.tokenizer import tokenize
+from paddlenlp.trainer import PdArgumentParser
+
+
+@dataclass
+class DataArguments:
+    """
+    Arguments pertaining to the retrieval benchmark, a Karpathy split annotation file of COCO or Flickr30k with the
+    captions of every image.
+    """
+
+    retrieval_annotations: str = field(
+        default="",
+        metadata={"help": "Path to the annotations, e.g. coco_karpathy_test.json."},
+    )
+    retrieval_image_root: str = field(
+        default="",
+        metadata={"help": "The directory the image paths of the annotations are relative to."},
+    )
+
+
+@dataclass
+class ModelArguments:
+    """
+    Arguments pertaining to which model we are going to evaluate.
+    """
+
+    model: str = field(
+        default="paddlemix/CLIP/Vit_L-14",
+        metadata={"help": "model name to create, for example paddlemix/CLIP/Vit_L-14"},
+    )
+
+
+@dataclass
+class EvalArguments:
+    batch_size: int = field(default=64, metadata={"help": "The batch size of the image and text encoders."})
+    chunk_size: int = field(default=1024, metadata={"help": "The number of captions scored together."})
+
+
+@paddle.no_grad()
+def main_worker(model_args, data_args, eval_args):
+    if paddle.distributed.get_world_size() > 1:
+        paddle.distributed.init_parallel_env()
+    rank, world_size = paddle.distributed.get_rank(), paddle.distributed.get_world_size()
+
+    model = CLIP.from_pretrained(model_args.model, ignore_mismatched_sizes=False)
+    model.eval()
+    image_processor = CLIPImageProcessor.from_pretrained(os.path.join(model_args.model, "processor", "eval"))
+    annotations = json.load(open(data_args.retrieval_annotations, "r"))
+    metric = ClipRetrievalRecall(chunk_size=eval_args.chunk_size)
+
+    # every rank encodes a shard of the images and of the captions, the shards need not be even
+    images = list(enumerate(annotations))[rank::world_size]
+    for start in tqdm(range(0, len(images), eval_args.batch_size)):
+        batch = images[start : start + eval_args.batch_size]
+        pixel_values = image_processor(
+            [
+                Image.open(os.path.join(data_args.retrieval_image_root, ann["image"])).convert("RGB")
+                for _, ann in batch
+            ],
+            return_tensors="pd",
+            mode="eval",
+            do_resize=True,
+            do_crop=True,
+        )["image"]
+        metric.add_images(model.encode_image(pixel_values, normalize=True), paddle.to_tensor([i for i, _ in batch]))
+
+    captions = [(i, caption) for i, ann in enumerate(annotations) for caption in ann["caption"]][rank::world_size]
+    for start in tqdm(range(0, len(captions), eval_args.batch_size)):
+        batch = captions[start : start + eval_args.batch_size]
+        text_features = model.encode_text(tokenize([caption for _, caption in batch]), normalize=True)
+        metric.add_texts(text_features, paddle.to_tensor([i for i, _ in batch]))
+
+    results = metric.compute()
+    if rank == 0:
+        pprint.pprint(results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = PdArgumentParser((ModelArguments, DataArguments, EvalArguments))
+    model_args, data_args, eval_args = parser.parse_args_into_dataclasses()
+    main_worker(model_args, data_args, eval_args)
@@ -115,9 +115,7 @@ def main_worker(training_args, model_args, data_args):
 
     zeroshot = ClipZeroShot(model, training_args)
 
-    trainer = SelfTrainer(
-        model=model, args=training_args, data_collator=collator, compute_metrics=zeroshot.zero_shot_eval
-    )
+    trainer = SelfTrainer(model=model, args=training_args, data_collator=collator, streaming_metrics=zeroshot)
     trainer.evaluate(eval_dataset=eval_dataset)
 
 
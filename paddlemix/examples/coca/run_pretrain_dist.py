@@ -110,10 +110,24 @@ class PreTrainingArguments(TrainingArguments):
         default=False,
         metadata={"help": "Whether to use local loss in loss."},
     )
+    loss_chunk_size: int = field(
+        default=None,
+        metadata={"help": "If set, compute the contrastive loss this many rows at a time without the full logits."},
+    )
+    ring_exchange: bool = field(
+        default=False,
+        metadata={"help": "Whether to exchange the features between ranks ring-style in loss, requires local_loss."},
+    )
     tensorboard: bool = field(
         default=False,
         metadata={"help": "Whether to use tensorboard to record loss."},
     )
+    grad_cache_chunk_size: int = field(
+        default=None,
+        metadata={
+            "help": "If set, compute the contrastive loss over the whole batch with micro batches of this size."
+        },
+    )
     pretrained_text_model: str = field(default="openclip", metadata={"help": "the model to pre-extract text feats"})
     coca_caption_loss_weight: float = field(
         default=1.0,
@@ -207,6 +221,8 @@ def main_worker(training_args, model_args, data_args):
         gather_with_grad=training_args.gather_with_grad,
         data_world_rank=training_args.data_world_rank,
         data_world_size=training_args.data_world_size,
+        loss_chunk_size=training_args.loss_chunk_size,
+        ring_exchange=training_args.ring_exchange,
     )
     if training_args.pretrained:
         model.load_pretrained(model_args.model)
@@ -232,6 +248,7 @@ def main_worker(training_args, model_args, data_args):
         eval_dataset=eval_dataset,
         data_collator=collator,
         compute_metrics=zeroshot.zero_shot_eval,
+        grad_cache_chunk_size=training_args.grad_cache_chunk_size,
     )
 
     # Training
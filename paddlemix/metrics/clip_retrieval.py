@@ -0,0 +1,133 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import paddle
+import paddle.nn.functional as F
+
+
+def _all_gather_concat(tensor):
+    """All-gather `tensor` along the first axis, which may have a different size on every rank."""
+    if paddle.distributed.get_world_size() <= 1:
+        return tensor
+    counts = []
+    paddle.distributed.all_gather(counts, paddle.to_tensor([tensor.shape[0]], dtype="int64"))
+    counts = [int(count) for count in paddle.concat(counts).numpy()]
+    # all_gather needs the same shape on every rank, so the tensors are padded to the largest one and trimmed after
+    max_count = max(counts)
+    if tensor.shape[0] < max_count:
+        padding = paddle.zeros([max_count - tensor.shape[0]] + tensor.shape[1:], dtype=tensor.dtype)
+        tensor = paddle.concat([tensor, padding], axis=0)
+    tensor_list = []
+    paddle.distributed.all_gather(tensor_list, tensor)
+    return paddle.concat([t[:count] for t, count in zip(tensor_list, counts)], axis=0)
+
+
+class ClipRetrievalRecall:
+    """
+    Image <-> text recall@K for retrieval benchmarks such as COCO and Flickr30k.
+
+    All images are added first and form the gallery. The captions are then added batch by batch as they come out of
+    the model and are not kept: every batch is scored against the gallery `chunk_size` captions at a time, the
+    text-to-image hits are counted on device right away and the best captions of every image are merged into a
+    running top-k. The memory is the gallery plus `[num_images, max(ks)]` scores, whatever the number of captions, and
+    `compute` syncs to the host once.
+
+    Args:
+        ks (tuple(int)): The K values to report recall for.
+        chunk_size (int): The number of captions scored together.
+    """
+
+    def __init__(self, ks=(1, 5, 10), chunk_size=1024):
+        self.ks = ks
+        self.chunk_size = chunk_size
+        self.reset()
+
+    def reset(self):
+        self.image_features, self.image_ids = [], []
+        self.gallery_features, self.gallery_ids = None, None
+        self.topk_scores, self.topk_image_ids = None, None
+        self.text_hits = paddle.zeros([len(self.ks)], dtype="int64")
+        self.num_texts = paddle.zeros([1], dtype="int64")
+
+    def add_images(self, image_features, image_ids):
+        """Add a batch of image features with their ids, each image should be added once and before any caption."""
+        if self.gallery_features is not None:
+            raise ValueError("All images must be added before the captions.")
+        self.image_features.append(F.normalize(image_features.astype("float32"), axis=-1))
+        self.image_ids.append(image_ids.reshape([-1]).astype("int64"))
+
+    def _build_gallery(self):
+        # every rank scores its captions against the images of all ranks
+        self.gallery_features = _all_gather_concat(paddle.concat(self.image_features, axis=0))
+        self.gallery_ids = _all_gather_concat(paddle.concat(self.image_ids, axis=0))
+        self.image_features, self.image_ids = [], []
+        self.maxk = min(max(self.ks), self.gallery_features.shape[0])
+        num_images = self.gallery_features.shape[0]
+        # the scores of the best captions of every image and the ids of the images these captions describe
+        self.topk_scores = paddle.full([num_images, max(self.ks)], float("-inf"), dtype="float32")
+        self.topk_image_ids = paddle.full([num_images, max(self.ks)], -1, dtype="int64")
+
+    def _hits(self, topk_ids, ids):
+        correct = topk_ids == ids.unsqueeze(1)
+        return paddle.stack([correct[:, :k].any(axis=1).astype("int64").sum() for k in self.ks])
+
+    def _merge_topk(self, scores, image_ids):
+        scores = paddle.concat([self.topk_scores, scores], axis=1)
+        image_ids = paddle.concat([self.topk_image_ids, image_ids], axis=1)
+        self.topk_scores, indices = scores.topk(self.topk_scores.shape[1], axis=1)
+        self.topk_image_ids = paddle.take_along_axis(image_ids, indices, axis=1)
+
+    @paddle.no_grad()
+    def add_texts(self, text_features, image_ids):
+        """Score a batch of caption features, with the ids of the images they describe, against the gallery."""
+        if self.gallery_features is None:
+            self._build_gallery()
+        text_features = F.normalize(text_features.astype("float32"), axis=-1)
+        image_ids = image_ids.reshape([-1]).astype("int64")
+        for start in range(0, text_features.shape[0], self.chunk_size):
+            ids = image_ids[start : start + self.chunk_size]
+            similarity = text_features[start : start + self.chunk_size] @ self.gallery_features.t()
+            # a caption is retrieved correctly if its image is in the top k
+            topk_ids = paddle.gather(self.gallery_ids, similarity.topk(self.maxk, axis=1)[1].flatten())
+            self.text_hits += self._hits(topk_ids.reshape([-1, self.maxk]), ids)
+            self._merge_topk(similarity.t(), ids.unsqueeze(0).expand([similarity.shape[1], ids.shape[0]]))
+        self.num_texts += text_features.shape[0]
+
+    @paddle.no_grad()
+    def compute(self):
+        if self.gallery_features is None:
+            self._build_gallery()
+        text_hits, num_texts = self.text_hits.clone(), self.num_texts.clone()
+        if paddle.distributed.get_world_size() > 1:
+            paddle.distributed.all_reduce(text_hits)
+            paddle.distributed.all_reduce(num_texts)
+            # the running top-k of every rank covers the same gallery, merging them gives the top-k over all captions
+            scores, image_ids = [], []
+            paddle.distributed.all_gather(scores, self.topk_scores)
+            paddle.distributed.all_gather(image_ids, self.topk_image_ids)
+            scores, indices = paddle.concat(scores, axis=1).topk(self.topk_scores.shape[1], axis=1)
+            topk_image_ids = paddle.take_along_axis(paddle.concat(image_ids, axis=1), indices, axis=1)
+        else:
+            topk_image_ids = self.topk_image_ids
+        # an image is retrieved correctly if any of its captions is in the top k
+        image_hits = self._hits(topk_image_ids, self.gallery_ids)
+        values = paddle.concat([image_hits, text_hits, num_texts]).numpy()
+        image_hits, text_hits, num_texts = values[: len(self.ks)], values[len(self.ks) : -1], int(values[-1])
+
+        results = {}
+        for i, k in enumerate(self.ks):
+            results[f"image_to_text_R@{k}"] = float(image_hits[i]) * 100.0 / self.gallery_features.shape[0]
+            results[f"text_to_image_R@{k}"] = float(text_hits[i]) * 100.0 / max(num_texts, 1)
+        results["mean_recall"] = sum(results.values()) / len(results)
+        return results
@@ -12,8 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
 import os
 
+import numpy as np
 import paddle
 import paddle.nn.functional as F
 from tqdm import tqdm
@@ -21,7 +23,11 @@ from tqdm import tqdm
 from paddlemix.processors.tokenizer import tokenize
 
 
-def zero_shot_classifier(model, classnames_filename, templates_filename, args, text_tower=None):
+def zero_shot_classifier(model, classnames_filename, templates_filename, args, text_tower=None, batch_size=1024):
+    """
+    Builds the [embed_dim, num_classes] zero-shot classifier. All classname x template prompts are tokenized at once
+    and encoded in batches of `batch_size`, then each class embedding is the normalized mean over its templates.
+    """
     classnames = [i.strip() for i in open(classnames_filename).readlines()]
     templates = [i.strip() for i in open(templates_filename).readlines()]
 
@@ -30,20 +36,55 @@ def zero_shot_classifier(model, classnames_filename, templates_filename, args, t
             text_tower = model._layers.encode_text
         else:
             text_tower = model.encode_text
+    texts = [template.format(classname) for classname in classnames for template in templates]
     tokenizer = tokenize
+    input_ids = tokenizer(texts)
     with paddle.no_grad():
-        zeroshot_weights = []
-        for classname in tqdm(classnames):
-            texts = [template.format(classname) for template in templates]  # format with class
-            texts = tokenizer(texts)  # tokenize
-            class_embeddings = text_tower(texts)
-            class_embedding = F.normalize(class_embeddings, axis=-1).mean(0)
-            class_embedding /= class_embedding.norm()
-            zeroshot_weights.append(class_embedding)
-        zeroshot_weights = paddle.stack(zeroshot_weights, axis=1)
+        embeddings = []
+        for start in tqdm(range(0, len(texts), batch_size)):
+            text_embeddings = text_tower(input_ids[start : start + batch_size])
+            embeddings.append(F.normalize(text_embeddings, axis=-1))
+        embeddings = paddle.concat(embeddings, axis=0)
+        # prompts are grouped by class, so the per class segment mean is a mean over the template axis
+        class_embeddings = embeddings.reshape([len(classnames), len(templates), -1]).mean(1)
+        class_embeddings = F.normalize(class_embeddings, axis=-1)
+        zeroshot_weights = class_embeddings.t()
     return zeroshot_weights
 
 
+# the parameters `encode_text` reads, the towers of EVA-CLIP, CoCa and CLIP with a custom text model are under `text.`
+TEXT_PARAM_PREFIXES = (
+    "text.",
+    "token_embedding.",
+    "positional_embedding",
+    "transformer.",
+    "ln_final.",
+    "text_projection",
+)
+
+
+def classifier_cache_key(model, classnames_filename, templates_filename):
+    """
+    Hash of the text tower weights of `model` and the contents of the label and template files, used to name the
+    cached classifier so it is rebuilt whenever any of them changes.
+    """
+    if hasattr(model, "_layers"):
+        model = model._layers
+    hasher = hashlib.sha1()
+    for filename in [classnames_filename, templates_filename]:
+        with open(filename, "rb") as f:
+            hasher.update(f.read())
+    state_dict = model.state_dict()
+    for name in sorted(state_dict.keys()):
+        # the image tower, the logit scale and bias and the CoCa text decoder do not change the classifier
+        if not name.startswith(TEXT_PARAM_PREFIXES):
+            continue
+        value = state_dict[name].numpy()
+        hasher.update(f"{name}:{value.dtype}:{value.shape}".encode("utf-8"))
+        hasher.update(np.ascontiguousarray(value).tobytes())
+    return hasher.hexdigest()
+
+
 def accuracy(output, target, topk=(1,)):
     """Computes the accuracy over the k top predictions for the specified values of k"""
     maxk = min(max(topk), output.shape[1])
@@ -91,8 +132,10 @@ class ClipZeroShot:
         template_filename = f"{data_path}/templates.txt"
 
         self.data_name = os.path.basename(args.classification_eval)
+        cache_key = classifier_cache_key(model, classname_filename, template_filename)
         classifier_filename = (
-            f"{os.path.dirname(classname_filename)}/{args.pretrained_text_model}_{self.data_name}_classifier.pdparams"
+            f"{os.path.dirname(classname_filename)}/"
+            f"{args.pretrained_text_model}_{self.data_name}_{cache_key[:16]}_classifier.pdparams"
         )
         if os.path.exists(classifier_filename):
             print("load classifier from disk")
@@ -110,37 +153,58 @@ class ClipZeroShot:
             self.classifier = classifier
         self.batch_size = args.per_device_eval_batch_size
         self.cast_dtype = get_cast_dtype(args)
-
-    def zero_shot_eval(self, evalres):
-        results = {}
-        print("Extract features done, starting zero-shot classification evaluation.")
-        predictions, labels = evalres.predictions, evalres.label_ids.cast("int32")
-        n = predictions.shape[0]
-        top1, top5 = 0.0, 0.0
-
+        self.reset()
+
+    def reset(self):
+        """Clear the running top-1/top-5 counters."""
+        self.correct = paddle.zeros([2], dtype="int64")
+        self.count = paddle.zeros([1], dtype="int64")
+
+    def update(self, image_features, labels):
+        """
+        Accumulate top-1/top-5 hits of one batch of image features. The counters stay on device, nothing is copied to
+        the host until `compute`.
+        """
+        if isinstance(image_features, (tuple, list)):
+            image_features = image_features[0]
         autocast = get_autocast(self.cast_dtype)
         with paddle.no_grad():
-            for step in tqdm(range((predictions.shape[0] + self.batch_size - 1) // self.batch_size)):
-                with autocast():
-                    image_features = paddle.to_tensor(
-                        predictions[step * self.batch_size : (step + 1) * self.batch_size]
-                    )
-                    target = paddle.to_tensor(labels[step * self.batch_size : (step + 1) * self.batch_size])
-                    logits = 100.0 * image_features @ self.classifier
-                if logits.shape[-1] < 5:
-                    (acc1,) = accuracy(logits, target, topk=(1,))
-                    acc5 = -1
-                else:
-                    acc1, acc5 = accuracy(logits, target, topk=(1, 5))
-                top1 += acc1
-                top5 += acc5
-        top1 = top1 / n
-        top5 = top5 / n
+            with autocast():
+                logits = 100.0 * image_features @ self.classifier
+            maxk = min(5, logits.shape[-1])
+            pred = logits.topk(maxk, axis=1)[1]
+            correct = pred == labels.reshape([-1, 1]).astype(pred.dtype)
+            top1 = correct[:, 0].astype("int64").sum()
+            top5 = correct.any(axis=1).astype("int64").sum()
+            self.correct += paddle.stack([top1, top5])
+            self.count += pred.shape[0]
+
+    def compute(self):
+        """Reduce the counters across ranks and return the accuracies in percent, with one host sync."""
+        correct, count = self.correct.clone(), self.count.clone()
+        if paddle.distributed.get_world_size() > 1:
+            paddle.distributed.all_reduce(correct)
+            paddle.distributed.all_reduce(count)
+        correct, n = correct.numpy(), max(int(count.numpy()[0]), 1)
+        top1 = float(correct[0]) * 100.0 / n
+        top5 = float(correct[1]) * 100.0 / n if self.classifier.shape[-1] >= 5 else -1
+
+        results = {}
         results["val/imagenet-zeroshot-val-top1"] = top1
         results["val/imagenet-zeroshot-val-top5"] = top5
-
         results["top1"] = top1
         print(f"zero-shot classification task: {self.data_name}: top1: {top1}, top5: {top5}")
+        return results
+
+    def zero_shot_eval(self, evalres):
+        print("Extract features done, starting zero-shot classification evaluation.")
+        predictions, labels = evalres.predictions, evalres.label_ids
+        self.reset()
+        for step in tqdm(range((predictions.shape[0] + self.batch_size - 1) // self.batch_size)):
+            image_features = paddle.to_tensor(predictions[step * self.batch_size : (step + 1) * self.batch_size])
+            target = paddle.to_tensor(labels[step * self.batch_size : (step + 1) * self.batch_size])
+            self.update(image_features, target)
+        results = self.compute()
         print("Finished zero-shot evaluation.")
 
         return results
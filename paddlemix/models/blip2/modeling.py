@@ -13,7 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """ Paddle BLIP2 model."""
-from typing import Optional, Tuple, Union
+import functools
+from typing import Dict, Optional, Tuple, Union
 
 import paddle
 import paddle.distributed as dist
@@ -34,6 +35,7 @@ from paddlemix.models.blip2.modeling_utils import (
     disabled_train,
     masked_fill,
 )
+from paddlemix.models.blip2.prefix_cache import Blip2PrefixCache
 from paddlemix.models.blip2.Qformer import BertLMHeadModel
 from paddlemix.utils.log import logger
 
@@ -82,6 +84,7 @@ class Blip2ForConditionalGeneration(Blip2PretrainedModel):
         self.visual_encoder = VisionTransformer(config=config.vision_config)
         self.freeze_vit = config.freeze_vit
         self.train_stage1 = False
+        self.prefix_cache = None
         if self.freeze_vit:
             # freeze vit except the post layer norm layer.
             for name, param in self.visual_encoder.named_parameters():
@@ -461,40 +464,91 @@ class Blip2ForConditionalGeneration(Blip2PretrainedModel):
         captions = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
         return captions
 
+    def enable_prefix_cache(self, max_entries: int = 64):
+        """
+        Cache the vision prefix returned by `encode_image` keyed by the hash of the image, so asking several
+        questions about the same image runs the vision encoder and the Q-Former only once. See `Blip2PrefixCache`.
+        """
+        self.prefix_cache = Blip2PrefixCache(max_entries=max_entries)
+        return self.prefix_cache
+
+    def disable_prefix_cache(self):
+        if self.prefix_cache is not None:
+            self.prefix_cache.clear()
+        self.prefix_cache = None
+
+    def prefix_cache_stats(self) -> Dict[str, float]:
+        if self.prefix_cache is None:
+            return {}
+        return self.prefix_cache.stats()
+
+    def _encode_prefix(self, pixel_values: paddle.Tensor, cast_to_float32: bool = False) -> paddle.Tensor:
+        image_embeds = self.Qformer.ln_vision(self.visual_encoder(pixel_values))
+        if cast_to_float32:
+            image_embeds = image_embeds.astype("float32")
+
+        image_attention_mask = paddle.ones(image_embeds.shape[:-1], dtype="int64")
+
+        query_tokens = self.Qformer.query_tokens.expand([image_embeds.shape[0], -1, -1])
+        query_outputs = self.Qformer.bert(
+            query_embeds=query_tokens,
+            encoder_hidden_states=image_embeds,
+            encoder_attention_mask=image_attention_mask,
+            return_dict=True,
+        )
+        query_output = query_outputs[0]
+        return self.Qformer.language_projection(query_output)
+
+    def _get_prefix(
+        self,
+        pixel_values: Optional[paddle.Tensor],
+        language_model_inputs: Optional[paddle.Tensor],
+        batch_size: Optional[int] = None,
+    ) -> paddle.Tensor:
+        """
+        Returns the vision prefix of a batch of `batch_size` prompts, computed from `pixel_values` unless it is given.
+        A single image is broadcast to all the prompts of the batch.
+        """
+        if language_model_inputs is None:
+            if pixel_values is None:
+                raise ValueError("Either `pixel_values` or `language_model_inputs` has to be given.")
+            language_model_inputs = self.encode_image(pixel_values, cast_to_float16=False)
+        num_images = language_model_inputs.shape[0]
+        if batch_size is not None and num_images != batch_size:
+            if num_images != 1:
+                raise ValueError(
+                    f"Got {num_images} images for a batch of {batch_size} prompts, expected one image or one image "
+                    "per prompt."
+                )
+            language_model_inputs = language_model_inputs.expand([batch_size, -1, -1])
+        return language_model_inputs
+
     @paddle.no_grad()
     def generate(
         self,
-        pixel_values: paddle.Tensor,
+        pixel_values: Optional[paddle.Tensor] = None,
         input_ids: Optional[paddle.Tensor] = None,
         attention_mask: Optional[paddle.Tensor] = None,
+        language_model_inputs: Optional[paddle.Tensor] = None,
         **generate_kwargs,
     ) -> paddle.Tensor:
         """
         Overrides `generate` function to be able to use the model as a conditional generator.
         Args:
             pixel_values (`paddle.Tensor` of shape (batch_size, num_channels, height, width)):
-                Input images to be processed.
+                Input images to be processed. A single image is shared by all the prompts of `input_ids`.
             input_ids (`paddle.Tensor` of shape (batch_size, sequence_length), *optional*):
                 The sequence used as a prompt for the generation.
             attention_mask (`paddle.Tensor` of shape (batch_size, sequence_length), *optional*):
                 Mask to avoid performing attention on padding token indices
+            language_model_inputs (`paddle.Tensor` of shape (batch_size, num_query_tokens, hidden_size), *optional*):
+                The vision prefix returned by `encode_image`, used instead of `pixel_values`.
         Returns:
             captions (list): A list of ids of length batch_size * num_captions.
         """
-        batch_size = pixel_values.shape[0]
-        image_embeds = self.Qformer.ln_vision(self.visual_encoder(pixel_values))
-        image_attention_mask = paddle.ones(image_embeds.shape[:-1], dtype="int64")
-
-        query_tokens = self.Qformer.query_tokens.expand([image_embeds.shape[0], -1, -1])
-        query_outputs = self.Qformer.bert(
-            query_embeds=query_tokens,
-            encoder_hidden_states=image_embeds,
-            encoder_attention_mask=image_attention_mask,
-            return_dict=True,
-        )
-        query_output = query_outputs.last_hidden_state
-
-        language_model_inputs = self.Qformer.language_projection(query_output)
+        batch_size = input_ids.shape[0] if input_ids is not None else None
+        language_model_inputs = self._get_prefix(pixel_values, language_model_inputs, batch_size)
+        batch_size = language_model_inputs.shape[0]
         language_attention_mask = paddle.ones(language_model_inputs.shape[:-1], dtype="int64")
         if input_ids is None:
             input_ids = paddle.to_tensor([[self.config.text_config.bos_token_id]]).tile([batch_size, 1])
@@ -527,62 +581,57 @@ class Blip2ForConditionalGeneration(Blip2PretrainedModel):
     def encode_image(
         self,
         pixel_values: paddle.Tensor,
+        cast_to_float16: bool = True,
         **kwargs,
     ):
-        image_embeds = self.Qformer.ln_vision(self.visual_encoder(pixel_values.astype("float16")))
-        image_embeds = image_embeds.astype("float32")
-
-        image_attention_mask = paddle.ones(image_embeds.shape[:-1], dtype="int64")
+        """
+        Returns the vision prefix of the language model, the query embeddings after `language_projection` of shape
+        `(batch_size, num_query_tokens, hidden_size)`. It can be passed to `generate` and `predict_answers` as
+        `language_model_inputs` to answer several prompts about the same images. With the prefix cache enabled,
+        only the images that are not in the cache are encoded.
 
-        query_tokens = self.Qformer.query_tokens.expand([image_embeds.shape[0], -1, -1])
-        query_outputs = self.Qformer.bert(
-            query_embeds=query_tokens,
-            encoder_hidden_states=image_embeds,
-            encoder_attention_mask=image_attention_mask,
-            return_dict=True,
-        )
-        query_output = query_outputs[0]
-        language_model_inputs = self.Qformer.language_projection(query_output)
-        return language_model_inputs
+        With `cast_to_float16` the vision encoder runs in float16 and the Q-Former in float32, otherwise both run in
+        the dtype of the model like in `generate` and `predict_answers`.
+        """
+        if cast_to_float16:
+            pixel_values = pixel_values.astype("float16")
+        encode_fn = functools.partial(self._encode_prefix, cast_to_float32=cast_to_float16)
+        if self.prefix_cache is not None and paddle.in_dynamic_mode():
+            # the two precisions of the same float16 image get different entries
+            key_prefix = "float32" if cast_to_float16 else ""
+            return self.prefix_cache.get_or_compute(pixel_values, encode_fn, key_prefix=key_prefix)
+        return encode_fn(pixel_values)
 
     @paddle.no_grad()
     def predict_answers(
         self,
-        pixel_values: paddle.Tensor,
+        pixel_values: Optional[paddle.Tensor] = None,
         input_ids: Optional[paddle.Tensor] = None,
         attention_mask: Optional[paddle.Tensor] = None,
         max_len=10,
         min_len=1,
+        language_model_inputs: Optional[paddle.Tensor] = None,
         **kwargs
     ):
         """
         Args:
             pixel_values (`paddle.Tensor` of shape (batch_size, num_channels, height, width)):
-                Input images to be processed.
+                Input images to be processed. A single image is shared by all the questions of `input_ids`.
             input_ids (`paddle.Tensor` of shape (batch_size, sequence_length), *optional*):
                 The sequence used as a prompt for the generation.
             attention_mask (`paddle.Tensor` of shape (batch_size, sequence_length), *optional*):
                 Mask to avoid performing attention on padding token indices
             max_length (int): The maximum length of the sequence to be generated.
             min_length (int): The minimum length of the sequence to be generated.
+            language_model_inputs (`paddle.Tensor` of shape (batch_size, num_query_tokens, hidden_size), *optional*):
+                The vision prefix returned by `encode_image`, used instead of `pixel_values`.
         Returns:
             captions (list): A list of ids of length batch_size * num_captions.
         """
-        # batch_size = pixel_values.shape[0]
-        image_embeds = self.Qformer.ln_vision(self.visual_encoder(pixel_values))
-        image_attention_mask = paddle.ones(image_embeds.shape[:-1], dtype="int64")
-
-        query_tokens = self.Qformer.query_tokens.expand([image_embeds.shape[0], -1, -1])
-        query_outputs = self.Qformer.bert(
-            query_embeds=query_tokens,
-            encoder_hidden_states=image_embeds,
-            encoder_attention_mask=image_attention_mask,
-            return_dict=True,
-        )
-        query_output = query_outputs.last_hidden_state
-
-        language_model_inputs = self.Qformer.language_projection(query_output)
+        language_model_inputs = self._get_prefix(pixel_values, language_model_inputs, input_ids.shape[0])
         language_attention_mask = paddle.ones(language_model_inputs.shape[:-1], dtype="int64")
+        if attention_mask is None:
+            attention_mask = paddle.ones_like(input_ids)
 
         attention_mask = paddle.concat([language_attention_mask, attention_mask], axis=1)
         # concatenate query embeddings with prompt embeddings
@@ -0,0 +1,115 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import paddle
+
+__all__ = ["Blip2PrefixCache", "image_digest"]
+
+
+def image_digest(image: paddle.Tensor) -> str:
+    """Content hash of one preprocessed image, used as the cache key."""
+    array = image.numpy() if isinstance(image, paddle.Tensor) else np.asarray(image)
+    hasher = hashlib.sha1()
+    hasher.update(str(array.shape).encode("utf-8"))
+    hasher.update(str(array.dtype).encode("utf-8"))
+    hasher.update(np.ascontiguousarray(array).tobytes())
+    return hasher.hexdigest()
+
+
+class Blip2PrefixCache:
+    """
+    LRU cache of the vision prefix of BLIP-2, the query embeddings after `language_projection`, with one entry of
+    shape `(1, num_query_tokens, hidden_size)` per image.
+
+    Args:
+        max_entries (int): The number of images kept, the least recently used one is evicted first.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key: str) -> Optional[paddle.Tensor]:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, prefix: paddle.Tensor):
+        self._entries[key] = prefix
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(
+        self,
+        pixel_values: paddle.Tensor,
+        encode_fn: Callable[[paddle.Tensor], paddle.Tensor],
+        key_prefix: str = "",
+    ) -> paddle.Tensor:
+        """
+        Returns the prefix of every image of the batch `pixel_values`. The images that miss, each distinct one only
+        once, are encoded together in a single `encode_fn` call. `key_prefix` separates the entries of different
+        `encode_fn` of the same images.
+        """
+        keys = [key_prefix + image_digest(image) for image in pixel_values]
+        prefixes = {}
+        missing = []
+        for i, key in enumerate(keys):
+            if key in prefixes or key in missing:
+                continue
+            prefix = self.get(key)
+            if prefix is None:
+                missing.append(key)
+            else:
+                prefixes[key] = prefix
+
+        if len(missing) > 0:
+            indices = [keys.index(key) for key in missing]
+            outputs = encode_fn(paddle.gather(pixel_values, paddle.to_tensor(indices), axis=0))
+            for i, key in enumerate(missing):
+                prefixes[key] = outputs[i : i + 1]
+                self.put(key, prefixes[key])
+
+        return paddle.concat([prefixes[key] for key in keys], axis=0)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+        }
@@ -0,0 +1,209 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, List, Optional, Union
+
+import paddle
+import paddle.nn.functional as F
+
+__all__ = ["ChatSession"]
+
+
+class ChatSession:
+    """
+    A multi-turn conversation about one image that keeps the key/value cache of the language model between the turns.
+    The image prefix is encoded once when the session is created, and every turn only runs the language model over
+    its new prompt tokens and the generated reply.
+
+    When a turn would exceed `max_context_length`, the oldest turns are evicted: the cache is cut back to the image
+    prefix, which is always kept, and the remaining turns are encoded again.
+
+    Subclasses implement `_embed` and `_forward` for their language model. Language models whose prefix attends to the
+    prompt after it set `encode_prefix_with_prompt`, then the prefix is encoded together with the first prompt and
+    again with the first remaining one after an eviction.
+
+    Args:
+        language_model (paddle.nn.Layer): The language model of the multimodal model.
+        prefix_embeds (paddle.Tensor): The input embeddings of the image prefix, of shape
+            `(1, prefix_length, hidden_size)`.
+        max_context_length (int, optional): The budget of cached tokens, unbounded if None.
+    """
+
+    # the axis of the sequence in the cached keys and values
+    cache_seq_axis = 1
+    # whether the prefix is encoded together with the first prompt rather than when the session is created
+    encode_prefix_with_prompt = False
+
+    def __init__(
+        self,
+        language_model: paddle.nn.Layer,
+        prefix_embeds: paddle.Tensor,
+        max_context_length: Optional[int] = None,
+    ):
+        if prefix_embeds.shape[0] != 1:
+            raise ValueError(f"A chat session holds one conversation, got a batch of {prefix_embeds.shape[0]} images.")
+        self.language_model = language_model
+        self.prefix_embeds = prefix_embeds
+        self.prefix_length = prefix_embeds.shape[1]
+        self.max_context_length = max_context_length
+        if max_context_length is not None and self.prefix_length >= max_context_length:
+            raise ValueError(
+                f"The image prefix of {self.prefix_length} tokens does not fit into `max_context_length` "
+                f"{max_context_length}."
+            )
+
+        # the prompt and reply ids of every turn whose keys and values are cached
+        self.turns = []
+        self.cache = None
+        self.num_prefill_tokens = 0
+        self.num_evicted_turns = 0
+        if not self.encode_prefix_with_prompt:
+            with paddle.no_grad():
+                self._forward(prefix_embeds)
+
+    @property
+    def cache_length(self) -> int:
+        if self.cache is None:
+            return 0
+        return self.cache[0][0].shape[self.cache_seq_axis]
+
+    def _embed(self, input_ids: paddle.Tensor) -> paddle.Tensor:
+        raise NotImplementedError
+
+    def _forward(
+        self, inputs_embeds: paddle.Tensor, input_ids: Optional[paddle.Tensor] = None, generation: bool = False
+    ) -> paddle.Tensor:
+        """
+        Run the language model over `inputs_embeds` after the cached tokens, update `self.cache` and return the logits.
+        `input_ids` are the ids of the embeddings, None for the image prefix and -1 where the prefix is encoded with the
+        first prompt, and `generation` tells whether they are generated tokens rather than a prompt.
+        """
+        raise NotImplementedError
+
+    def _append(self, input_ids: List[int], generation: bool = False) -> paddle.Tensor:
+        input_ids = paddle.to_tensor([input_ids], dtype="int64")
+        self.num_prefill_tokens += input_ids.shape[1]
+        inputs_embeds = self._embed(input_ids)
+        if self.cache is None:
+            inputs_embeds = paddle.concat([self.prefix_embeds, inputs_embeds], axis=1)
+            input_ids = paddle.concat([paddle.full([1, self.prefix_length], -1, dtype="int64"), input_ids], axis=1)
+        return self._forward(inputs_embeds, input_ids=input_ids, generation=generation)
+
+    def _truncate_cache(self, length: int):
+        self.cache = [
+            tuple(paddle.slice(x, axes=[self.cache_seq_axis], starts=[0], ends=[length]) for x in layer_cache)
+            for layer_cache in self.cache
+        ]
+
+    def _fit(self, num_tokens: int):
+        """Evict the oldest turns until `num_tokens` more tokens fit into `max_context_length`."""
+        # the prefix takes its place in the context even before it is encoded
+        length = max(self.cache_length, self.prefix_length)
+        if self.max_context_length is None or length + num_tokens <= self.max_context_length:
+            return
+        if self.prefix_length + num_tokens > self.max_context_length:
+            raise ValueError(
+                f"A turn of up to {num_tokens} tokens does not fit into `max_context_length` "
+                f"{self.max_context_length} after the image prefix of {self.prefix_length} tokens."
+            )
+
+        turns = list(self.turns)
+        while length + num_tokens > self.max_context_length:
+            prompt_ids, reply_ids = turns.pop(0)
+            length -= len(prompt_ids) + len(reply_ids)
+            self.num_evicted_turns += 1
+        self.reset()
+        for prompt_ids, reply_ids in turns:
+            self._append(prompt_ids)
+            self._append(reply_ids, generation=True)
+            self.turns.append((prompt_ids, reply_ids))
+
+    def _select(self, logits: paddle.Tensor, decode_strategy: str, top_p: float, temperature: float) -> int:
+        logits = logits[0, -1].astype("float32")
+        if decode_strategy == "greedy_search":
+            return int(paddle.argmax(logits))
+        if decode_strategy != "sampling":
+            raise ValueError(f"`decode_strategy` must be 'greedy_search' or 'sampling', got {decode_strategy}.")
+        probs = F.softmax(logits / temperature)
+        if top_p < 1.0:
+            sorted_probs = paddle.sort(probs, descending=True)
+            cumulative_probs = paddle.cumsum(sorted_probs)
+            # keep the smallest set of tokens whose probability reaches top_p
+            threshold = sorted_probs[int(paddle.sum(cumulative_probs - sorted_probs < top_p)) - 1]
+            probs = paddle.where(probs >= threshold, probs, paddle.zeros_like(probs))
+            probs = probs / probs.sum()
+        return int(paddle.multinomial(probs.unsqueeze(0), 1)[0, 0])
+
+    @paddle.no_grad()
+    def chat(
+        self,
+        input_ids: Union[paddle.Tensor, List[int]],
+        max_length: int = 64,
+        eos_token_id: Optional[Union[int, List[int]]] = None,
+        decode_strategy: str = "greedy_search",
+        top_p: float = 1.0,
+        temperature: float = 1.0,
+    ) -> paddle.Tensor:
+        """
+        Append the prompt `input_ids` of a new turn to the conversation and generate the reply.
+
+        Args:
+            input_ids (paddle.Tensor or list[int]): The ids of the new prompt, of shape `(1, sequence_length)`.
+            max_length (int, optional): The maximum number of generated tokens. Default to 64.
+            eos_token_id (int or list[int], optional): The ids that end the reply, which are included in it.
+            decode_strategy (str, optional): "greedy_search" or "sampling". Default to "greedy_search".
+            top_p (float, optional): The cumulative probability of the tokens kept for sampling. Default to 1.0.
+            temperature (float, optional): The temperature of sampling. Default to 1.0.
+        Returns:
+            paddle.Tensor: The ids of the reply, of shape `(1, reply_length)`.
+        """
+        if isinstance(input_ids, paddle.Tensor):
+            if input_ids.ndim == 2 and input_ids.shape[0] != 1:
+                raise ValueError(
+                    f"A chat session holds one conversation, got a batch of {input_ids.shape[0]} prompts."
+                )
+            input_ids = input_ids.flatten().tolist()
+        if eos_token_id is None:
+            eos_token_id = []
+        elif isinstance(eos_token_id, int):
+            eos_token_id = [eos_token_id]
+
+        self._fit(len(input_ids) + max_length)
+        logits = self._append(input_ids)
+        reply_ids = []
+        while len(reply_ids) < max_length:
+            token_id = self._select(logits, decode_strategy, top_p, temperature)
+            reply_ids.append(token_id)
+            # the last token is appended too, so the cache always holds the whole conversation
+            logits = self._append([token_id], generation=True)
+            if token_id in eos_token_id:
+                break
+        self.turns.append((input_ids, reply_ids))
+        return paddle.to_tensor([reply_ids], dtype="int64")
+
+    def reset(self):
+        """Forget all turns and keep the image prefix."""
+        if self.encode_prefix_with_prompt:
+            self.cache = None
+        else:
+            self._truncate_cache(self.prefix_length)
+        self.turns = []
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "turns": len(self.turns),
+            "cache_length": self.cache_length,
+            "prefill_tokens": self.num_prefill_tokens,
+            "evicted_turns": self.num_evicted_turns,
+        }
@@ -117,6 +117,8 @@ class CoCa(CoCaPretrainedModel):
         cache_labels=True,
         data_world_rank=0,
         data_world_size=1,
+        loss_chunk_size=None,
+        ring_exchange=False,
     ):
         super().__init__(config)
 
@@ -142,6 +144,8 @@ class CoCa(CoCaPretrainedModel):
             text_loss=True,
             rank=data_world_rank,
             world_size=data_world_size,
+            chunk_size=loss_chunk_size,
+            ring_exchange=ring_exchange,
         )
 
     # @paddle.jit.ignore
@@ -170,7 +174,15 @@ class CoCa(CoCaPretrainedModel):
         return text_latent
 
     def forward(
-        self, image, input_ids=None, embed_cls=True, image_latent=None, image_embs=None, type_ids=None, **kwargs
+        self,
+        image,
+        input_ids=None,
+        embed_cls=True,
+        image_latent=None,
+        image_embs=None,
+        type_ids=None,
+        skiploss=False,
+        **kwargs
     ):
         text = input_ids
         if image_latent is None or image_embs is None:
@@ -184,6 +196,13 @@ class CoCa(CoCaPretrainedModel):
 
         logits = self.text_decoder(image_embs, token_embs)
 
+        if skiploss:
+            # the caption loss does not depend on the other samples of the batch, unlike the contrastive loss. It is
+            # the mean over the non-pad tokens, which are counted so that micro batches can be weighted by them
+            caption_loss = self.loss.caption_loss(logits, labels) * self.loss.caption_loss_weight
+            num_caption_tokens = (labels != self.loss.caption_loss.ignore_index).astype("int64").sum()
+            return image_latent, text_latent, self.logit_scale.exp(), caption_loss, num_caption_tokens
+
         loss_itc, logits_per_image, logits_per_text, labels = self.loss(
             (image_latent, text_latent, self.logit_scale.exp(), logits, labels)
         )
@@ -29,7 +29,7 @@ from paddlemix.models.model_utils import MixPretrainedModel
 from paddlemix.utils.log import logger
 from paddlenlp.transformers.configuration_utils import PretrainedConfig
 
-from .loss import ClipLoss
+from .loss import ClipLoss, SigLipLoss
 from .text_model import TextTransformer, TextTransformerConfig
 from .vit_model import EVAVisionTransformer, EVAVisionTransformerConfig
 
@@ -185,6 +185,9 @@ class EVACLIP(EVACLIPPretrainedModel):
         data_world_rank=0,
         data_world_size=1,
         enable_recompute=False,
+        loss_chunk_size=None,
+        ring_exchange=False,
+        loss_type="clip",
     ):
         super().__init__(config)
         if isinstance(config.vision_config, str):
@@ -197,18 +200,31 @@ class EVACLIP(EVACLIPPretrainedModel):
             self.visual = EVAVisionTransformer(vision_config)
             if not disable_text:
                 self.text = TextTransformer(text_config)
-        init_data = paddle.ones(shape=[1]) * np.log(1 / 0.07)
+        if loss_type not in ["clip", "siglip"]:
+            raise ValueError(f"`loss_type` must be 'clip' or 'siglip', got {loss_type}.")
+        # SigLIP starts from a logit scale of 10 and a bias of -10, so that the many negative pairs do not dominate
+        init_data = paddle.ones(shape=[1]) * (np.log(10) if loss_type == "siglip" else np.log(1 / 0.07))
         self.logit_scale = self.create_parameter(
             shape=[1], default_initializer=paddle.nn.initializer.Assign(init_data)
         )
+        self.logit_bias = None
+        if loss_type == "siglip":
+            self.logit_bias = self.create_parameter(
+                shape=[1], default_initializer=paddle.nn.initializer.Constant(value=-10.0)
+            )
 
-        self.loss = ClipLoss(
-            local_loss=local_loss,
-            gather_with_grad=gather_with_grad,
-            cache_labels=cache_labels,
-            rank=data_world_rank,
-            world_size=data_world_size,
-        )
+        if loss_type == "siglip":
+            self.loss = SigLipLoss(chunk_size=loss_chunk_size, rank=data_world_rank, world_size=data_world_size)
+        else:
+            self.loss = ClipLoss(
+                local_loss=local_loss,
+                gather_with_grad=gather_with_grad,
+                cache_labels=cache_labels,
+                rank=data_world_rank,
+                world_size=data_world_size,
+                chunk_size=loss_chunk_size,
+                ring_exchange=ring_exchange,
+            )
 
         if enable_recompute:
             self.visual.set_grad_checkpointing(True)
@@ -255,10 +271,11 @@ class EVACLIP(EVACLIPPretrainedModel):
         else:
             return paddle.to_tensor(0), image_features
 
+        preds = (image_features, text_features, self.logit_scale.exp())
+        if self.logit_bias is not None:
+            preds += (self.logit_bias,)
         if skiploss:
-            return image_features, text_features, self.logit_scale.exp()
+            return preds
 
-        loss_itc, logits_per_image, logits_per_text, labels = self.loss(
-            (image_features, text_features, self.logit_scale.exp())
-        )
+        loss_itc, logits_per_image, logits_per_text, labels = self.loss(preds)
         return loss_itc, image_features, text_features, self.logit_scale.exp()
@@ -131,6 +131,298 @@ def gather_features_bk(
     return all_image_features, all_text_features
 
 
+_DATA_SHARDING_GROUP = None
+
+
+def data_parallel_group():
+    """
+    The group of the ranks whose features `gather_features` gathers, the data parallel and sharding peers of this
+    rank. Unlike the default group, it leaves out the tensor and pipeline parallel peers, which see the same samples.
+    """
+    global _DATA_SHARDING_GROUP
+    hcg = paddle.distributed.fleet.get_hybrid_communicate_group()
+    shardinggroup = hcg.get_sharding_parallel_group()
+    dpgroup = hcg.get_data_parallel_group()
+    if shardinggroup.nranks == 1:
+        return dpgroup
+    if dpgroup.nranks == 1:
+        return shardinggroup
+    if _DATA_SHARDING_GROUP is None:
+        # every rank creates every group, in the same order, and keeps its own
+        topo = hcg.topology()
+        groups = {}
+        for rank in range(topo.world_size()):
+            coord = topo.get_coord(rank)._asdict()
+            key = tuple(value for axis, value in coord.items() if axis not in ("data", "sharding"))
+            groups.setdefault(key, []).append(rank)
+        for ranks in sorted(groups.values()):
+            group = dist.new_group(ranks)
+            if dist.get_rank() in ranks:
+                _DATA_SHARDING_GROUP = group
+    return _DATA_SHARDING_GROUP
+
+
+def _ring_exchange(tensors, group=None):
+    """Send `tensors` to the next rank of the ring and return the ones received from the previous rank."""
+    rank = dist.get_rank(group)
+    world_size = dist.get_world_size(group)
+    ranks = group.ranks if group is not None else list(range(world_size))
+    send_to = ranks[(rank + 1) % world_size]
+    recv_from = ranks[(rank - 1) % world_size]
+    if not tensors[0].place.is_gpu_place():
+        # the P2P of gloo only matches the operations of the ranks in order, which a ring of more than two ranks cannot
+        # do, so on CPU every tensor is all-gathered and only the one of the previous rank is kept
+        received = []
+        for tensor in tensors:
+            gathered = []
+            dist.all_gather(gathered, tensor, group=group)
+            received.append(gathered[(rank - 1) % world_size])
+        return received
+    received = [paddle.empty_like(tensor) for tensor in tensors]
+    ops = [dist.P2POp(dist.isend, tensor, send_to, group) for tensor in tensors]
+    ops += [dist.P2POp(dist.irecv, tensor, recv_from, group) for tensor in received]
+    for task in dist.batch_isend_irecv(ops):
+        task.wait()
+    return received
+
+
+def _chunked_logsumexp(rows, cols, logit_scale, chunk_size):
+    """Log-sum-exp of every row of `logit_scale * rows @ cols.T`, computed `chunk_size` rows at a time."""
+    lse = []
+    for start in range(0, rows.shape[0], chunk_size):
+        logits = logit_scale * paddle.matmul(rows[start : start + chunk_size], cols, transpose_y=True)
+        lse.append(paddle.logsumexp(logits.astype("float32"), axis=-1))
+    return paddle.concat(lse, axis=0)
+
+
+def _chunked_softmax_grads(rows, cols, logit_scale, lse, grad, chunk_size):
+    """
+    Gradients of `grad * sum(lse)` with respect to `rows`, `cols` and `logit_scale`, recomputing the softmax of the
+    logits `chunk_size` rows at a time.
+    """
+    grad_rows = []
+    grad_cols = paddle.zeros(cols.shape, dtype="float32")
+    grad_scale = paddle.zeros([1], dtype="float32")
+    cols_fp32 = cols.astype("float32")
+    for start in range(0, rows.shape[0], chunk_size):
+        rows_chunk = rows[start : start + chunk_size].astype("float32")
+        dot = paddle.matmul(rows_chunk, cols_fp32, transpose_y=True)
+        probs = paddle.exp(logit_scale * dot - lse[start : start + chunk_size].unsqueeze(-1)) * grad
+        grad_rows.append(logit_scale * paddle.matmul(probs, cols_fp32))
+        grad_cols += logit_scale * paddle.matmul(probs, rows_chunk, transpose_x=True)
+        grad_scale += (probs * dot).sum()
+    return paddle.concat(grad_rows, axis=0), grad_cols, grad_scale
+
+
+def _chunked_sigmoid_loss(rows, cols, logit_scale, logit_bias, positives, chunk_size):
+    """The sum of the sigmoid losses of `logit_scale * rows @ cols.T + logit_bias`, `chunk_size` rows at a time."""
+    loss = paddle.zeros([1], dtype="float32")
+    for start in range(0, rows.shape[0], chunk_size):
+        logits = logit_scale * paddle.matmul(rows[start : start + chunk_size], cols, transpose_y=True) + logit_bias
+        signs = _sigmoid_signs(start, logits.shape, positives)
+        loss -= F.log_sigmoid(signs * logits.astype("float32")).sum()
+    return loss
+
+
+def _sigmoid_signs(start, shape, positives):
+    # the pairs on the diagonal of the local block are positives, all the others are negatives
+    if not positives:
+        return -paddle.ones(shape, dtype="float32")
+    return 2 * F.one_hot(paddle.arange(start, start + shape[0]), shape[1]) - 1
+
+
+def _chunked_sigmoid_grads(rows, cols, logit_scale, logit_bias, positives, grad, chunk_size):
+    """Gradients of `grad` times `_chunked_sigmoid_loss` with respect to `rows`, `cols`, `logit_scale` and `logit_bias`."""
+    grad_rows = []
+    grad_cols = paddle.zeros(cols.shape, dtype="float32")
+    grad_scale = paddle.zeros([1], dtype="float32")
+    grad_bias = paddle.zeros([1], dtype="float32")
+    cols_fp32 = cols.astype("float32")
+    for start in range(0, rows.shape[0], chunk_size):
+        rows_chunk = rows[start : start + chunk_size].astype("float32")
+        dot = paddle.matmul(rows_chunk, cols_fp32, transpose_y=True)
+        signs = _sigmoid_signs(start, dot.shape, positives)
+        grad_logits = -signs * F.sigmoid(-signs * (logit_scale * dot + logit_bias)) * grad
+        grad_rows.append(logit_scale * paddle.matmul(grad_logits, cols_fp32))
+        grad_cols += logit_scale * paddle.matmul(grad_logits, rows_chunk, transpose_x=True)
+        grad_scale += (grad_logits * dot).sum()
+        grad_bias += grad_logits.sum()
+    return paddle.concat(grad_rows, axis=0), grad_cols, grad_scale, grad_bias
+
+
+def _grad_or_none(tensor, grad):
+    return None if tensor.stop_gradient else grad.astype(tensor.dtype)
+
+
+class ChunkedContrastiveLoss(paddle.autograd.PyLayer):
+    """
+    The symmetric InfoNCE loss of `logit_scale * image_rows @ text_cols.T` and `logit_scale * text_rows @ image_cols.T`
+    with the labels `label_offset + arange(len(rows))`, without materializing the logits. The forward keeps only the
+    log-sum-exp of every row, the backward recomputes the softmax, and both work on `chunk_size` rows at a time.
+
+    With a `world_size` of more than one, the columns are the local features of every rank of `group` (the default
+    group if None), exchanged ring-style instead of all-gathered, and the labels are the local ones (`label_offset`
+    must be 0).
+    """
+
+    @staticmethod
+    def forward(
+        ctx,
+        image_rows,
+        text_rows,
+        image_cols,
+        text_cols,
+        logit_scale,
+        label_offset=0,
+        chunk_size=1024,
+        visual_weight=0.5,
+        text_weight=0.5,
+        world_size=1,
+        group=None,
+    ):
+        num_rows = image_rows.shape[0]
+        scale = logit_scale.astype("float32")
+        positive_text_cols = text_cols[label_offset : label_offset + num_rows].astype("float32")
+        positive_image_cols = image_cols[label_offset : label_offset + num_rows].astype("float32")
+        image_positives = scale * (image_rows.astype("float32") * positive_text_cols).sum(axis=-1)
+        text_positives = scale * (text_rows.astype("float32") * positive_image_cols).sum(axis=-1)
+
+        image_lse, text_lse = [], []
+        cols = [image_cols, text_cols]
+        for step in range(world_size):
+            if step > 0:
+                cols = _ring_exchange(cols, group)
+            image_lse.append(_chunked_logsumexp(image_rows, cols[1], scale, chunk_size))
+            text_lse.append(_chunked_logsumexp(text_rows, cols[0], scale, chunk_size))
+        image_lse = paddle.logsumexp(paddle.stack(image_lse), axis=0)
+        text_lse = paddle.logsumexp(paddle.stack(text_lse), axis=0)
+
+        ctx.save_for_backward(image_rows, text_rows, image_cols, text_cols, logit_scale, image_lse, text_lse)
+        ctx.config = (label_offset, chunk_size, visual_weight, text_weight, group, world_size)
+        loss = visual_weight * (image_lse - image_positives).mean() + text_weight * (text_lse - text_positives).mean()
+        return loss.astype(image_rows.dtype)
+
+    @staticmethod
+    def backward(ctx, grad):
+        image_rows, text_rows, image_cols, text_cols, logit_scale, image_lse, text_lse = ctx.saved_tensor()
+        label_offset, chunk_size, visual_weight, text_weight, group, world_size = ctx.config
+        num_rows = image_rows.shape[0]
+        scale = logit_scale.astype("float32")
+        grad = grad.astype("float32")
+        image_grad = grad * visual_weight / num_rows
+        text_grad = grad * text_weight / num_rows
+
+        grad_image_rows = paddle.zeros(image_rows.shape, dtype="float32")
+        grad_text_rows = paddle.zeros(text_rows.shape, dtype="float32")
+        grad_scale = paddle.zeros([1], dtype="float32")
+        # the gradients of the columns travel around the ring with them and arrive back home after a full cycle
+        cols = [image_cols, text_cols]
+        grad_cols = [paddle.zeros(image_cols.shape, dtype="float32"), paddle.zeros(text_cols.shape, dtype="float32")]
+        for step in range(world_size):
+            if step > 0:
+                cols = _ring_exchange(cols, group)
+                grad_cols = _ring_exchange(grad_cols, group)
+            g_rows, g_cols, g_scale = _chunked_softmax_grads(
+                image_rows, cols[1], scale, image_lse, image_grad, chunk_size
+            )
+            grad_image_rows += g_rows
+            grad_cols[1] += g_cols
+            grad_scale += g_scale
+            g_rows, g_cols, g_scale = _chunked_softmax_grads(
+                text_rows, cols[0], scale, text_lse, text_grad, chunk_size
+            )
+            grad_text_rows += g_rows
+            grad_cols[0] += g_cols
+            grad_scale += g_scale
+        if world_size > 1:
+            grad_cols = _ring_exchange(grad_cols, group)
+        grad_image_cols, grad_text_cols = grad_cols
+
+        # the positive logits, whose labels are in the local columns
+        end = label_offset + num_rows
+        positive_text_cols = text_cols[label_offset:end].astype("float32")
+        positive_image_cols = image_cols[label_offset:end].astype("float32")
+        grad_image_rows -= image_grad * scale * positive_text_cols
+        grad_text_cols[label_offset:end] = grad_text_cols[label_offset:end] - image_grad * scale * image_rows.astype(
+            "float32"
+        )
+        grad_text_rows -= text_grad * scale * positive_image_cols
+        grad_image_cols[label_offset:end] = grad_image_cols[label_offset:end] - text_grad * scale * text_rows.astype(
+            "float32"
+        )
+        grad_scale -= image_grad * (image_rows.astype("float32") * positive_text_cols).sum()
+        grad_scale -= text_grad * (text_rows.astype("float32") * positive_image_cols).sum()
+        grad_scale = grad_scale.reshape(logit_scale.shape)
+
+        return (
+            _grad_or_none(image_rows, grad_image_rows),
+            _grad_or_none(text_rows, grad_text_rows),
+            _grad_or_none(image_cols, grad_image_cols),
+            _grad_or_none(text_cols, grad_text_cols),
+            _grad_or_none(logit_scale, grad_scale),
+        )
+
+
+class ChunkedSigmoidLoss(paddle.autograd.PyLayer):
+    """
+    The pairwise sigmoid loss of SigLIP over `logit_scale * image_features @ text_features.T + logit_bias`, where only
+    the matching pairs are positives. It needs no normalization over the batch, so the text features of the other
+    ranks are exchanged ring-style when `world_size` is more than one, and like `ChunkedContrastiveLoss` the logits are
+    computed `chunk_size` rows at a time and recomputed in the backward.
+    """
+
+    @staticmethod
+    def forward(
+        ctx, image_features, text_features, logit_scale, logit_bias, chunk_size=1024, world_size=1, group=None
+    ):
+        scale = logit_scale.astype("float32")
+        bias = logit_bias.astype("float32")
+        loss = paddle.zeros([1], dtype="float32")
+        cols = [text_features]
+        for step in range(world_size):
+            if step > 0:
+                cols = _ring_exchange(cols, group)
+            loss += _chunked_sigmoid_loss(image_features, cols[0], scale, bias, step == 0, chunk_size)
+
+        ctx.save_for_backward(image_features, text_features, logit_scale, logit_bias)
+        ctx.config = (chunk_size, world_size, group)
+        return (loss / image_features.shape[0]).reshape([]).astype(image_features.dtype)
+
+    @staticmethod
+    def backward(ctx, grad):
+        image_features, text_features, logit_scale, logit_bias = ctx.saved_tensor()
+        chunk_size, world_size, group = ctx.config
+        scale = logit_scale.astype("float32")
+        bias = logit_bias.astype("float32")
+        grad = grad.astype("float32") / image_features.shape[0]
+
+        grad_image = paddle.zeros(image_features.shape, dtype="float32")
+        grad_scale = paddle.zeros([1], dtype="float32")
+        grad_bias = paddle.zeros([1], dtype="float32")
+        cols = [text_features]
+        grad_cols = [paddle.zeros(text_features.shape, dtype="float32")]
+        for step in range(world_size):
+            if step > 0:
+                cols = _ring_exchange(cols, group)
+                grad_cols = _ring_exchange(grad_cols, group)
+            g_rows, g_cols, g_scale, g_bias = _chunked_sigmoid_grads(
+                image_features, cols[0], scale, bias, step == 0, grad, chunk_size
+            )
+            grad_image += g_rows
+            grad_cols[0] += g_cols
+            grad_scale += g_scale
+            grad_bias += g_bias
+        if world_size > 1:
+            grad_cols = _ring_exchange(grad_cols, group)
+
+        return (
+            _grad_or_none(image_features, grad_image),
+            _grad_or_none(text_features, grad_cols[0]),
+            _grad_or_none(logit_scale, grad_scale.reshape(logit_scale.shape)),
+            _grad_or_none(logit_bias, grad_bias.reshape(logit_bias.shape)),
+        )
+
+
 class ClipLoss(nn.Layer):
     def __init__(
         self,
@@ -141,8 +433,19 @@ class ClipLoss(nn.Layer):
         text_loss=True,
         rank=0,
         world_size=1,
+        chunk_size=None,
+        ring_exchange=False,
     ):
+        """
+        chunk_size (int, optional): If set, compute the loss `chunk_size` rows at a time with `ChunkedContrastiveLoss`
+            instead of materializing the logits, which are then not returned.
+        ring_exchange (bool, optional): Exchange the features ring-style between the ranks of `data_parallel_group`
+            instead of all-gathering them, which implies `chunk_size` and requires `local_loss`. Unlike
+            `gather_with_grad`, the features of every rank receive the gradients of the losses of all ranks.
+        """
         super().__init__()
+        if ring_exchange and not local_loss:
+            raise ValueError("`ring_exchange` computes the local loss of every rank, it requires `local_loss=True`.")
         self.local_loss = local_loss
         self.gather_with_grad = gather_with_grad
         self.cache_labels = cache_labels
@@ -150,9 +453,62 @@ class ClipLoss(nn.Layer):
         self.world_size = world_size
         self.visual_loss = visual_loss
         self.text_loss = text_loss
+        self.chunk_size = chunk_size
+        self.ring_exchange = ring_exchange
+
+    def chunked_forward(self, image_features, text_features, logit_scale):
+        num_logits = image_features.shape[0]
+        chunk_size = self.chunk_size or num_logits
+        visual_weight = float(self.visual_loss) / max(int(self.visual_loss) + int(self.text_loss), 1)
+        text_weight = float(self.text_loss) / max(int(self.visual_loss) + int(self.text_loss), 1)
+        labels = paddle.arange(num_logits, dtype=paddle.int64)
+        if self.world_size > 1 and self.local_loss:
+            labels = labels + num_logits * self.rank
+
+        if self.world_size > 1 and self.ring_exchange:
+            image_rows = image_cols = image_features
+            text_rows = text_cols = text_features
+            label_offset = 0
+        elif self.world_size > 1:
+            image_cols, text_cols = gather_features(
+                image_features,
+                text_features,
+                self.local_loss,
+                self.gather_with_grad,
+                self.rank,
+                self.world_size,
+            )
+            if self.local_loss:
+                image_rows, text_rows = image_features, text_features
+                label_offset = num_logits * self.rank
+            else:
+                image_rows, text_rows = image_cols, text_cols
+                labels = paddle.arange(image_cols.shape[0], dtype=paddle.int64)
+                label_offset = 0
+        else:
+            image_rows = image_cols = image_features
+            text_rows = text_cols = text_features
+            label_offset = 0
+
+        total_loss = ChunkedContrastiveLoss.apply(
+            image_rows,
+            text_rows,
+            image_cols,
+            text_cols,
+            logit_scale,
+            label_offset,
+            chunk_size,
+            visual_weight,
+            text_weight,
+            self.world_size if self.ring_exchange else 1,
+            data_parallel_group() if self.world_size > 1 and self.ring_exchange else None,
+        )
+        return total_loss, None, None, labels
 
     def forward(self, preds):
         image_features, text_features, logit_scale = preds
+        if self.chunk_size is not None or self.ring_exchange:
+            return self.chunked_forward(image_features, text_features, logit_scale)
         if self.world_size > 1:
             all_image_features, all_text_features = gather_features(
                 image_features,
@@ -204,6 +560,8 @@ class CoCaLoss(ClipLoss):
         text_loss=True,
         rank=0,
         world_size=1,
+        chunk_size=None,
+        ring_exchange=False,
     ):
         super().__init__(
             local_loss=local_loss,
@@ -212,6 +570,8 @@ class CoCaLoss(ClipLoss):
             text_loss=text_loss,
             rank=rank,
             world_size=world_size,
+            chunk_size=chunk_size,
+            ring_exchange=ring_exchange,
         )
 
         self.clip_loss_weight = clip_loss_weight
@@ -239,5 +599,35 @@ class CoCaLoss(ClipLoss):
         return clip_loss + caption_loss, logits_per_image, logits_per_text, labels
 
 
+class SigLipLoss(nn.Layer):
+    """
+    The pairwise sigmoid loss of SigLIP, see `ChunkedSigmoidLoss`. Its memory does not grow with the world size: the
+    text features of the other ranks are exchanged ring-style and the logits are computed `chunk_size` rows at a time,
+    or all at once if None. The predictions are `(image_features, text_features, logit_scale, logit_bias)`, where the
+    learnable `logit_bias` is a parameter of the model like `logit_scale`.
+    """
+
+    def __init__(self, chunk_size=None, rank=0, world_size=1):
+        super().__init__()
+        self.chunk_size = chunk_size
+        self.rank = rank
+        self.world_size = world_size
+
+    def forward(self, preds):
+        image_features, text_features, logit_scale, logit_bias = preds
+        num_logits = image_features.shape[0]
+        total_loss = ChunkedSigmoidLoss.apply(
+            image_features,
+            text_features,
+            logit_scale,
+            logit_bias,
+            self.chunk_size or num_logits,
+            self.world_size,
+            data_parallel_group() if self.world_size > 1 else None,
+        )
+        labels = paddle.arange(num_logits, dtype=paddle.int64) + num_logits * self.rank
+        return total_loss, None, None, labels
+
+
 if __name__ == "__main__":
     pass
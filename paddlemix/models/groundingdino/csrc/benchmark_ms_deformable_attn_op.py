@@ -0,0 +1,116 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import sys
+import time
+
+import paddle
+
+# add python path of PaddleMIX to sys.path
+parent_path = os.path.abspath(os.path.join(__file__, *([".."] * 5)))
+if parent_path not in sys.path:
+    sys.path.append(parent_path)
+
+from paddlemix.models.groundingdino.ms_deform_attn import (
+    deformable_attention_core_func,
+    deformable_attention_core_func_gather,
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the multi-scale deformable attention core functions.")
+    parser.add_argument("--device", type=str, default="gpu" if paddle.is_compiled_with_cuda() else "cpu")
+    parser.add_argument("--batch_size", type=int, default=2)
+    parser.add_argument("--num_heads", type=int, default=8)
+    parser.add_argument("--head_dim", type=int, default=32)
+    parser.add_argument("--num_points", type=int, default=4)
+    # the four feature levels of an 800x1200 input with the swin backbone
+    parser.add_argument("--spatial_shapes", type=str, default="100x150,50x75,25x38,13x19")
+    parser.add_argument(
+        "--query_length", type=int, default=900, help="900 for the decoder, value length for the encoder."
+    )
+    parser.add_argument("--backward", action="store_true", help="Time forward and backward.")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    return parser.parse_args()
+
+
+def _synchronize():
+    if paddle.is_compiled_with_cuda():
+        paddle.device.cuda.synchronize()
+
+
+def _timeit(fn, repeats, warmup):
+    for _ in range(warmup):
+        fn()
+    _synchronize()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    _synchronize()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    args = parse_args()
+    paddle.set_device(args.device)
+
+    shapes = [[int(size) for size in shape.split("x")] for shape in args.spatial_shapes.split(",")]
+    spatial_shapes = paddle.to_tensor(shapes, dtype="int64")
+    level_start_index = paddle.concat([paddle.zeros([1], dtype="int64"), spatial_shapes.prod(1).cumsum(0)[:-1]])
+    value_length = sum(h * w for h, w in shapes)
+    n_levels = len(shapes)
+
+    value = paddle.rand([args.batch_size, value_length, args.num_heads, args.head_dim])
+    sampling_locations = paddle.rand(
+        [args.batch_size, args.query_length, args.num_heads, n_levels, args.num_points, 2]
+    )
+    attention_weights = paddle.rand([args.batch_size, args.query_length, args.num_heads, n_levels, args.num_points])
+    attention_weights /= attention_weights.sum([-1, -2], keepdim=True)
+    for tensor in [value, sampling_locations, attention_weights]:
+        tensor.stop_gradient = not args.backward
+
+    impls = {
+        "grid_sample": deformable_attention_core_func,
+        "gather": deformable_attention_core_func_gather,
+    }
+    try:
+        from deformable_detr_ops import ms_deformable_attn
+
+        impls["cuda"] = ms_deformable_attn
+    except Exception as e:
+        print("Skip the custom op, import deformable_detr_ops error", e)
+
+    reference = None
+    for name, func in impls.items():
+
+        def step():
+            output = func(value, spatial_shapes, level_start_index, sampling_locations, attention_weights)
+            if args.backward:
+                output.sum().backward()
+            return output
+
+        with paddle.set_grad_enabled(args.backward):
+            output = step().detach()
+            cost = _timeit(step, args.repeats, args.warmup)
+        if reference is None:
+            reference = output
+        max_abs_err = (output - reference).abs().max().item()
+        print(f"{name:>12}: {cost * 1000:.3f} ms, max_abs_err vs grid_sample {max_abs_err:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,14 +21,20 @@ import sys
 import numpy as np
 import paddle
 
-# add python path of PaddleDetection to sys.path
+# add python path of PaddleMIX to sys.path
 parent_path = os.path.abspath(os.path.join(__file__, *([".."] * 5)))
 if parent_path not in sys.path:
     sys.path.append(parent_path)
 
-from ppdet.modeling.transformers.utils import deformable_attention_core_func
+from paddlemix.models.groundingdino.ms_deform_attn import (
+    deformable_attention_core_func,
+    deformable_attention_core_func_gather,
+)
 
-ms_deform_attn_core_paddle = deformable_attention_core_func
+ms_deform_attn_core_paddle_impls = {
+    "grid_sample": deformable_attention_core_func,
+    "gather": deformable_attention_core_func_gather,
+}
 
 try:
     gpu_index = int(sys.argv[1])
@@ -64,7 +70,7 @@ def get_test_tensors(channels):
 
 
 @paddle.no_grad()
-def check_forward_equal_with_paddle_float():
+def check_forward_equal_with_paddle_float(ms_deform_attn_core_paddle):
     value, sampling_locations, attention_weights = get_test_tensors(c)
 
     output_paddle = (
@@ -98,7 +104,7 @@ def check_forward_equal_with_paddle_float():
     )
 
 
-def check_gradient_numerical(channels=4):
+def check_gradient_numerical(ms_deform_attn_core_paddle, channels=4):
     (
         value_paddle,
         sampling_locations_paddle,
@@ -149,7 +155,9 @@ def check_gradient_numerical(channels=4):
 
 
 if __name__ == "__main__":
-    check_forward_equal_with_paddle_float()
+    for name, ms_deform_attn_core_paddle in ms_deform_attn_core_paddle_impls.items():
+        print(f"Compare with the paddle {name} implementation...")
+        check_forward_equal_with_paddle_float(ms_deform_attn_core_paddle)
 
-    for channels in [30, 32, 64, 71, 128, 1024, 1025, 2048, 3096]:
-        check_gradient_numerical(channels)
+        for channels in [30, 32, 64, 71, 128, 1024, 1025, 2048, 3096]:
+            check_gradient_numerical(ms_deform_attn_core_paddle, channels)
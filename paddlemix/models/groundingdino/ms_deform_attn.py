@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import math
+import os
 
 import paddle
 import paddle.nn as nn
@@ -79,6 +80,102 @@ def deformable_attention_core_func(
     return output.transpose([0, 2, 1])
 
 
+def deformable_attention_core_func_gather(
+    value,
+    value_spatial_shapes,
+    value_level_start_index,
+    sampling_locations,
+    attention_weights,
+):
+    """
+    Single pass version of `deformable_attention_core_func`. The bilinear corners of all levels are turned into indices
+    of the flattened value with one index computation, and each corner is fetched with one gather, so the number of
+    kernels does not grow with n_levels. Out of bound corners read a zero row, which matches `F.grid_sample` with
+    padding_mode="zeros" and align_corners=False.
+
+    Args:
+        value (Tensor): [bs, value_length, n_head, c]
+        value_spatial_shapes (Tensor): [n_levels, 2]
+        value_level_start_index (Tensor): [n_levels]
+        sampling_locations (Tensor): [bs, query_length, n_head, n_levels, n_points, 2]
+        attention_weights (Tensor): [bs, query_length, n_head, n_levels, n_points]
+
+    Returns:
+        output (Tensor): [bs, Length_{query}, C]
+    """
+    bs, Len_v, n_head, c = value.shape
+    _, Len_q, _, n_levels, n_points, _ = sampling_locations.shape
+
+    # N_, Len_v, M_, D_ -> N_*M_*Len_v, D_, plus a zero row for the out of bound corners
+    value = value.transpose([0, 2, 1, 3]).reshape([bs * n_head * Len_v, c])
+    value = paddle.concat([value, paddle.zeros([1, c], dtype=value.dtype)])
+    padding_index = bs * n_head * Len_v
+
+    # N_, Lq_, M_, L_, P_ -> N_, M_, Lq_, L_, P_
+    sampling_locations = sampling_locations.transpose([0, 2, 1, 3, 4, 5])
+    attention_weights = attention_weights.transpose([0, 2, 1, 3, 4])
+
+    spatial_shapes = value_spatial_shapes.astype(sampling_locations.dtype)
+    h = spatial_shapes[:, 0].reshape([n_levels, 1])
+    w = spatial_shapes[:, 1].reshape([n_levels, 1])
+    # align_corners=False maps [0, 1] to [-0.5, size - 0.5] in pixels
+    x = sampling_locations[..., 0] * w - 0.5
+    y = sampling_locations[..., 1] * h - 0.5
+    x0, y0 = x.floor(), y.floor()
+    lx, ly = x - x0, y - y0
+    hx, hy = 1 - lx, 1 - ly
+
+    # offset of each (batch, head, level) block in the flattened value
+    base = paddle.arange(bs * n_head, dtype="int64").reshape([bs, n_head, 1, 1, 1]) * Len_v
+    base = base + value_level_start_index.astype("int64").reshape([n_levels, 1])
+
+    output = 0
+    for dx, dy, weight in [(0, 0, hx * hy), (1, 0, lx * hy), (0, 1, hx * ly), (1, 1, lx * ly)]:
+        xi, yi = x0 + dx, y0 + dy
+        valid = (xi >= 0) & (xi <= w - 1) & (yi >= 0) & (yi <= h - 1)
+        index = paddle.where(valid, base + (yi * w + xi).astype("int64"), paddle.full_like(base, padding_index))
+        # N_*M_*Lq_*L_*P_, D_ -> N_*M_, Lq_, L_*P_, D_
+        corner_value = paddle.gather(value, index.flatten()).reshape([bs * n_head, Len_q, n_levels * n_points, c])
+        # N_*M_, Lq_, 1, L_*P_ @ N_*M_, Lq_, L_*P_, D_ -> N_*M_, Lq_, 1, D_
+        corner_weight = (weight * attention_weights).reshape([bs * n_head, Len_q, 1, n_levels * n_points])
+        output = output + paddle.matmul(corner_weight, corner_value)
+
+    # N_*M_, Lq_, 1, D_ -> N_, Lq_, M_*D_
+    output = output.reshape([bs, n_head, Len_q, c]).transpose([0, 2, 1, 3])
+    return output.reshape([bs, Len_q, n_head * c])
+
+
+MS_DEFORMABLE_ATTN_IMPLS = ("auto", "cuda", "grid_sample", "gather")
+
+
+def get_ms_deformable_attn_core(impl=None):
+    """
+    Returns the multi-scale deformable attention core function.
+
+    Args:
+        impl (str, optional): One of "cuda" (the custom op in csrc), "grid_sample" (one `F.grid_sample` per level),
+            "gather" (`deformable_attention_core_func_gather`) or "auto", which uses the custom op when it is installed
+            and "gather" otherwise. Defaults to the `PPMIX_MS_DEFORM_ATTN_IMPL` environment variable, or "auto".
+    """
+    if impl is None:
+        impl = os.getenv("PPMIX_MS_DEFORM_ATTN_IMPL", "auto")
+    if impl not in MS_DEFORMABLE_ATTN_IMPLS:
+        raise ValueError(f"impl should be one of {MS_DEFORMABLE_ATTN_IMPLS}, but got {impl}.")
+
+    if impl in ["auto", "cuda"]:
+        try:
+            # use cuda op
+            from deformable_detr_ops import ms_deformable_attn
+
+            return ms_deformable_attn
+        except Exception:
+            if impl == "cuda":
+                raise
+    if impl == "grid_sample":
+        return deformable_attention_core_func
+    return deformable_attention_core_func_gather
+
+
 class MSDeformableAttention(nn.Layer):
     def __init__(
         self,
@@ -88,9 +185,11 @@ class MSDeformableAttention(nn.Layer):
         num_points=4,
         lr_mult=0.1,
         batch_first=False,
+        attn_impl=None,
     ):
         """
-        Multi-Scale Deformable Attention Module
+        Multi-Scale Deformable Attention Module, `attn_impl` selects the core function, see
+        `get_ms_deformable_attn_core`.
         """
         super(MSDeformableAttention, self).__init__()
         self.embed_dim = embed_dim
@@ -112,17 +211,14 @@ class MSDeformableAttention(nn.Layer):
         self.attention_weights = nn.Linear(embed_dim, self.total_points)
         self.value_proj = nn.Linear(embed_dim, embed_dim)
         self.output_proj = nn.Linear(embed_dim, embed_dim)
-        try:
-            # use cuda op
-            from deformable_detr_ops import ms_deformable_attn
-        except:
-            # use paddle func
-            ms_deformable_attn = deformable_attention_core_func
-        self.ms_deformable_attn_core = ms_deformable_attn
+        self.set_attn_impl(attn_impl)
         self.batch_first = batch_first
 
         self._reset_parameters()
 
+    def set_attn_impl(self, attn_impl=None):
+        self.ms_deformable_attn_core = get_ms_deformable_attn_core(attn_impl)
+
     def _reset_parameters(self):
         # sampling_offsets
         constant_(self.sampling_offsets.weight)
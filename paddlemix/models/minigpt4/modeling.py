@@ -34,6 +34,7 @@ from paddlenlp.transformers.model_utils import (
     prune_linear_layer,
 )
 
+from paddlemix.models.chat_session import ChatSession
 from paddlemix.models.model_utils import MixPretrainedModel
 
 from ...activations import ACT2FN
@@ -51,6 +52,7 @@ __all__ = [
     "MiniGPT4QFormerModel",
     "MiniGPT4VisionModel",
     "MiniGPT4ForConditionalGeneration",
+    "MiniGPT4ChatSession",
 ]
 
 
@@ -1492,6 +1494,33 @@ class MiniGPT4Model(MiniGPT4PretrainedModel):
         )
 
 
+class MiniGPT4ChatSession(ChatSession):
+    """
+    A multi-turn chat about one image with MiniGPT4, created by `MiniGPT4ForConditionalGeneration.start_chat`. The
+    LLaMA cache holds the keys and values of shape `(1, sequence_length, num_heads, head_dim)`.
+    """
+
+    cache_seq_axis = 1
+
+    def _embed(self, input_ids: paddle.Tensor) -> paddle.Tensor:
+        return self.language_model.llama.embed_tokens(input_ids)
+
+    def _forward(
+        self, inputs_embeds: paddle.Tensor, input_ids: Optional[paddle.Tensor] = None, generation: bool = False
+    ) -> paddle.Tensor:
+        start = self.cache_length
+        position_ids = paddle.arange(start, start + inputs_embeds.shape[1], dtype="int64").unsqueeze(0)
+        outputs = self.language_model(
+            inputs_embeds=inputs_embeds,
+            position_ids=position_ids,
+            past_key_values=self.cache,
+            use_cache=True,
+            return_dict=True,
+        )
+        self.cache = outputs.past_key_values
+        return outputs.logits
+
+
 class MiniGPT4ForConditionalGeneration(MiniGPT4PretrainedModel):
     config_class = MiniGPT4Config
     main_input_name = "pixel_values"
@@ -1838,3 +1867,41 @@ class MiniGPT4ForConditionalGeneration(MiniGPT4PretrainedModel):
         )
 
         return outputs
+
+    @paddle.no_grad()
+    def start_chat(
+        self,
+        first_input_ids: paddle.Tensor,
+        pixel_values: Optional[paddle.Tensor] = None,
+        image_features: Optional[paddle.Tensor] = None,
+        max_context_length: Optional[int] = None,
+    ) -> MiniGPT4ChatSession:
+        """
+        Start a multi-turn chat about one image. The image and the prompt before it are encoded once, and every
+        `chat` call of the returned session only runs the language model over the new prompt and the reply.
+        Args:
+            first_input_ids (`paddle.Tensor` of shape (1, sequence_length)):
+                The prompt before the tag `<ImageHere>`.
+            pixel_values (`paddle.Tensor` of shape (1, num_channels, height, width), *optional*):
+                The image to chat about.
+            image_features (`paddle.Tensor` of shape (1, num_query_tokens, hidden_size), *optional*):
+                The image features returned by `encode_images`, used instead of `pixel_values`.
+            max_context_length (int, *optional*):
+                The budget of tokens kept in the cache, the oldest turns are evicted to stay within it.
+        Returns:
+            MiniGPT4ChatSession: The chat session.
+
+        Examples:
+        ```python
+        >>> session = model.start_chat(first_input_ids, pixel_values=pixel_values, max_context_length=2048)
+        >>> # the prompt after `<ImageHere>`, e.g. "</Img> describe this image###Assistant:"
+        >>> reply_ids = session.chat(second_input_ids, max_length=64, eos_token_id=stop_token_ids)
+        >>> # the next turns, e.g. "###Human: what is the dog doing?###Assistant:"
+        >>> reply_ids = session.chat(next_input_ids, max_length=64, eos_token_id=stop_token_ids)
+        """
+        if image_features is None:
+            image_features, _ = self.encode_images(pixel_values)
+        first_embeds = self.language_model.llama.embed_tokens(first_input_ids)
+        image_features = paddle.cast(image_features, dtype=first_embeds.dtype)
+        prefix_embeds = paddle.concat([first_embeds, image_features], axis=1)
+        return MiniGPT4ChatSession(self.language_model, prefix_embeds, max_context_length=max_context_length)
@@ -0,0 +1,220 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This implementation refers to: https://github.com/facebookresearch/segment-anything
+
+import math
+from itertools import product
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import paddle
+
+__all__ = [
+    "build_point_grid",
+    "build_all_layer_point_grids",
+    "generate_crop_boxes",
+    "calculate_stability_score",
+    "batched_mask_to_box",
+    "is_box_near_crop_edge",
+    "uncrop_boxes_xyxy",
+    "uncrop_points",
+    "uncrop_masks",
+    "mask_to_rle",
+    "rle_to_mask",
+    "area_from_rle",
+    "box_xyxy_to_xywh",
+]
+
+
+def build_point_grid(n_per_side: int) -> np.ndarray:
+    """Generates a 2D grid of points evenly spaced in [0,1]x[0,1]."""
+    offset = 1 / (2 * n_per_side)
+    points_one_side = np.linspace(offset, 1 - offset, n_per_side)
+    points_x = np.tile(points_one_side[None, :], (n_per_side, 1))
+    points_y = np.tile(points_one_side[:, None], (1, n_per_side))
+    points = np.stack([points_x, points_y], axis=-1).reshape(-1, 2)
+    return points
+
+
+def build_all_layer_point_grids(n_per_side: int, n_layers: int, scale_per_layer: int) -> List[np.ndarray]:
+    """Generates point grids for all crop layers."""
+    points_by_layer = []
+    for i in range(n_layers + 1):
+        n_points = int(n_per_side / (scale_per_layer**i))
+        points_by_layer.append(build_point_grid(n_points))
+    return points_by_layer
+
+
+def generate_crop_boxes(
+    im_size: Tuple[int, ...], n_layers: int, overlap_ratio: float
+) -> Tuple[List[List[int]], List[int]]:
+    """
+    Generates a list of crop boxes of different sizes. Each layer has (2**i)**2 boxes for the ith layer.
+    """
+    crop_boxes, layer_idxs = [], []
+    im_h, im_w = im_size
+    short_side = min(im_h, im_w)
+
+    # Original image
+    crop_boxes.append([0, 0, im_w, im_h])
+    layer_idxs.append(0)
+
+    def crop_len(orig_len, n_crops, overlap):
+        return int(math.ceil((overlap * (n_crops - 1) + orig_len) / n_crops))
+
+    for i_layer in range(n_layers):
+        n_crops_per_side = 2 ** (i_layer + 1)
+        overlap = int(overlap_ratio * short_side * (2 / n_crops_per_side))
+
+        crop_w = crop_len(im_w, n_crops_per_side, overlap)
+        crop_h = crop_len(im_h, n_crops_per_side, overlap)
+
+        crop_box_x0 = [int((crop_w - overlap) * i) for i in range(n_crops_per_side)]
+        crop_box_y0 = [int((crop_h - overlap) * i) for i in range(n_crops_per_side)]
+
+        # Crops in XYXY format
+        for x0, y0 in product(crop_box_x0, crop_box_y0):
+            box = [x0, y0, min(x0 + crop_w, im_w), min(y0 + crop_h, im_h)]
+            crop_boxes.append(box)
+            layer_idxs.append(i_layer + 1)
+
+    return crop_boxes, layer_idxs
+
+
+def calculate_stability_score(masks: paddle.Tensor, mask_threshold: float, threshold_offset: float) -> paddle.Tensor:
+    """
+    Computes the stability score for a batch of masks. The stability score is the IoU between the binary masks
+    obtained by thresholding the predicted mask logits at high and low values.
+    """
+    # The high threshold mask is a subset of the low threshold one, so the IoU is a ratio of areas
+    intersections = (masks > (mask_threshold + threshold_offset)).astype("int32").sum(axis=[-1, -2])
+    unions = (masks > (mask_threshold - threshold_offset)).astype("int32").sum(axis=[-1, -2])
+    return intersections.astype("float32") / unions.astype("float32").clip(min=1)
+
+
+def batched_mask_to_box(masks: paddle.Tensor) -> paddle.Tensor:
+    """
+    Calculates boxes in XYXY format around masks. Return [0,0,0,0] for an empty mask. For input shape C1xC2x...xHxW,
+    the output shape is C1xC2x...x4.
+    """
+    if masks.numel() == 0:
+        return paddle.zeros(list(masks.shape[:-2]) + [4], dtype="int64")
+
+    shape = masks.shape
+    h, w = shape[-2:]
+    masks = masks.reshape([-1, h, w]).astype("int64")
+
+    # Get top and bottom edges
+    in_height = masks.max(axis=-1)
+    in_height_coords = in_height * paddle.arange(h, dtype="int64")[None, :]
+    bottom_edges = in_height_coords.max(axis=-1)
+    in_height_coords = in_height_coords + h * (1 - in_height)
+    top_edges = in_height_coords.min(axis=-1)
+
+    # Get left and right edges
+    in_width = masks.max(axis=-2)
+    in_width_coords = in_width * paddle.arange(w, dtype="int64")[None, :]
+    right_edges = in_width_coords.max(axis=-1)
+    in_width_coords = in_width_coords + w * (1 - in_width)
+    left_edges = in_width_coords.min(axis=-1)
+
+    # If the mask is empty the right edge will be to the left of the left edge.
+    empty_filter = paddle.logical_or(right_edges < left_edges, bottom_edges < top_edges)
+    out = paddle.stack([left_edges, top_edges, right_edges, bottom_edges], axis=-1)
+    out = out * (~empty_filter).astype("int64").unsqueeze(-1)
+
+    return out.reshape(list(shape[:-2]) + [4])
+
+
+def is_box_near_crop_edge(
+    boxes: paddle.Tensor, crop_box: List[int], orig_box: List[int], atol: float = 20.0
+) -> paddle.Tensor:
+    """Filter masks at the edge of a crop, but not at the edge of the original image."""
+    boxes = uncrop_boxes_xyxy(boxes, crop_box).astype("float32")
+    crop_box_paddle = paddle.to_tensor([crop_box], dtype="float32")
+    orig_box_paddle = paddle.to_tensor([orig_box], dtype="float32")
+    near_crop_edge = (boxes - crop_box_paddle).abs() <= atol
+    near_image_edge = (boxes - orig_box_paddle).abs() <= atol
+    near_crop_edge = paddle.logical_and(near_crop_edge, ~near_image_edge)
+    return paddle.any(near_crop_edge, axis=1)
+
+
+def uncrop_boxes_xyxy(boxes: paddle.Tensor, crop_box: List[int]) -> paddle.Tensor:
+    x0, y0, _, _ = crop_box
+    offset = paddle.to_tensor([[x0, y0, x0, y0]], dtype=boxes.dtype)
+    return boxes + offset
+
+
+def uncrop_points(points: paddle.Tensor, crop_box: List[int]) -> paddle.Tensor:
+    x0, y0, _, _ = crop_box
+    offset = paddle.to_tensor([[x0, y0]], dtype=points.dtype)
+    return points + offset
+
+
+def uncrop_masks(masks: paddle.Tensor, crop_box: List[int], orig_h: int, orig_w: int) -> paddle.Tensor:
+    x0, y0, x1, y1 = crop_box
+    if x0 == 0 and y0 == 0 and x1 == orig_w and y1 == orig_h:
+        return masks
+    # Coordinate transform masks
+    pad_x, pad_y = orig_w - (x1 - x0), orig_h - (y1 - y0)
+    pad = [x0, pad_x - x0, y0, pad_y - y0]
+    masks_padded = paddle.nn.functional.pad(masks.astype("int32").unsqueeze(1), pad, value=0, data_format="NCHW")
+    return masks_padded.squeeze(1).astype(masks.dtype)
+
+
+def mask_to_rle(masks: paddle.Tensor) -> List[Dict[str, Any]]:
+    """
+    Encodes a batch of binary masks (BxHxW) to the uncompressed RLE format used by pycocotools, in column-major order.
+    """
+    b, h, w = masks.shape
+    masks = masks.transpose([0, 2, 1]).reshape([b, h * w]).astype("int32")
+
+    # Compute change indices
+    diff = masks[:, 1:] != masks[:, :-1]
+    change_indices = paddle.nonzero(diff).numpy()
+    first_values = masks[:, 0].numpy()
+
+    out = []
+    for i in range(b):
+        cur_idxs = change_indices[change_indices[:, 0] == i, 1]
+        cur_idxs = np.concatenate([[0], cur_idxs + 1, [h * w]])
+        btw_idxs = (cur_idxs[1:] - cur_idxs[:-1]).tolist()
+        counts = [] if first_values[i] == 0 else [0]
+        counts.extend(btw_idxs)
+        out.append({"size": [h, w], "counts": counts})
+    return out
+
+
+def rle_to_mask(rle: Dict[str, Any]) -> np.ndarray:
+    """Compute a binary mask from an uncompressed RLE."""
+    h, w = rle["size"]
+    mask = np.empty(h * w, dtype=bool)
+    idx = 0
+    parity = False
+    for count in rle["counts"]:
+        mask[idx : idx + count] = parity
+        idx += count
+        parity ^= True
+    mask = mask.reshape(w, h)
+    return mask.transpose()  # Put in C order
+
+
+def area_from_rle(rle: Dict[str, Any]) -> int:
+    return sum(rle["counts"][1::2])
+
+
+def box_xyxy_to_xywh(box_xyxy: List[float]) -> List[float]:
+    x0, y0, x1, y1 = box_xyxy
+    return [x0, y0, x1 - x0, y1 - y0]
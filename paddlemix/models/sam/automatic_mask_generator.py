@@ -0,0 +1,302 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# This implementation refers to: https://github.com/facebookresearch/segment-anything
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import paddle
+import paddle.nn.functional as F
+
+from paddlemix.processors.sam_processing import SamProcessor
+
+from .amg import (
+    area_from_rle,
+    batched_mask_to_box,
+    box_xyxy_to_xywh,
+    build_all_layer_point_grids,
+    calculate_stability_score,
+    generate_crop_boxes,
+    is_box_near_crop_edge,
+    mask_to_rle,
+    rle_to_mask,
+    uncrop_boxes_xyxy,
+    uncrop_masks,
+    uncrop_points,
+)
+from .modeling import SamModel
+
+__all__ = ["SamAutomaticMaskGenerator"]
+
+
+def _filter(data: Dict[str, Any], keep: paddle.Tensor) -> Dict[str, Any]:
+    keep_np = keep.numpy()
+    out = {}
+    for key, value in data.items():
+        if isinstance(value, paddle.Tensor):
+            out[key] = paddle.gather(value, keep) if keep.shape[0] > 0 else value[:0]
+        else:
+            out[key] = [value[i] for i in keep_np]
+    return out
+
+
+def _cat(data_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    out = {}
+    for key in data_list[0].keys():
+        values = [data[key] for data in data_list]
+        if isinstance(values[0], paddle.Tensor):
+            out[key] = paddle.concat(values, axis=0)
+        else:
+            out[key] = sum(values, [])
+    return out
+
+
+class SamAutomaticMaskGenerator:
+    """
+    Generates masks for a whole image by prompting `SamModel` with a grid of points, the `points_grid` input type
+    with filtering done in the model instead of by the caller.
+
+    The grid is decoded in chunks of `points_per_batch` points. Each chunk is filtered by predicted IoU before the low
+    resolution masks are upsampled, then by stability score, and the surviving masks are kept as RLE, so memory stays
+    bounded by one chunk of full resolution masks. Duplicates are removed with box NMS, per crop and across crops.
+
+    Args:
+        model (SamModel): The model used for mask prediction.
+        processor (SamProcessor): The processor of the model, used to resize images and prompts.
+        points_per_side (int, optional): The number of points sampled along one side of the image. Exclusive with
+            `point_grids`.
+        points_per_batch (int): The number of points decoded together. Higher numbers are faster but use more memory.
+        pred_iou_thresh (float): Threshold on the model's predicted mask quality.
+        stability_score_thresh (float): Threshold on the stability of a mask under changes of the binarization cutoff.
+        stability_score_offset (float): The amount the cutoff is shifted by when computing the stability score.
+        box_nms_thresh (float): The box IoU cutoff used by NMS to filter duplicate masks.
+        crop_n_layers (int): If > 0, the mask prediction is run again on crops of the image. Layer i has (2**i)**2
+            crops.
+        crop_nms_thresh (float): The box IoU cutoff used by NMS to filter duplicate masks between different crops.
+        crop_overlap_ratio (float): The fraction of the short side by which crops of the first layer overlap.
+        crop_n_points_downscale_factor (int): The number of points per side sampled in layer n is scaled down by
+            crop_n_points_downscale_factor**n.
+        point_grids (list(np.ndarray), optional): Explicit grids of points in [0, 1] used for sampling, one per crop
+            layer.
+        output_mode (str): The form masks are returned in, "binary_mask" or "uncompressed_rle".
+    """
+
+    def __init__(
+        self,
+        model: SamModel,
+        processor: SamProcessor,
+        points_per_side: Optional[int] = 32,
+        points_per_batch: int = 64,
+        pred_iou_thresh: float = 0.88,
+        stability_score_thresh: float = 0.95,
+        stability_score_offset: float = 1.0,
+        box_nms_thresh: float = 0.7,
+        crop_n_layers: int = 0,
+        crop_nms_thresh: float = 0.7,
+        crop_overlap_ratio: float = 512 / 1500,
+        crop_n_points_downscale_factor: int = 1,
+        point_grids: Optional[List[np.ndarray]] = None,
+        output_mode: str = "binary_mask",
+    ) -> None:
+        assert (points_per_side is None) != (
+            point_grids is None
+        ), "Exactly one of points_per_side or point_grid must be provided."
+        assert output_mode in [
+            "binary_mask",
+            "uncompressed_rle",
+        ], f"output_mode must be in ['binary_mask', 'uncompressed_rle'], is {output_mode}."
+
+        if points_per_side is not None:
+            self.point_grids = build_all_layer_point_grids(
+                points_per_side,
+                crop_n_layers,
+                crop_n_points_downscale_factor,
+            )
+        else:
+            self.point_grids = point_grids
+
+        self.model = model
+        self.image_processor = processor.image_processor
+        self.prompt_processor = processor.prompt_processor
+        self.points_per_batch = points_per_batch
+        self.pred_iou_thresh = pred_iou_thresh
+        self.stability_score_thresh = stability_score_thresh
+        self.stability_score_offset = stability_score_offset
+        self.box_nms_thresh = box_nms_thresh
+        self.crop_n_layers = crop_n_layers
+        self.crop_nms_thresh = crop_nms_thresh
+        self.crop_overlap_ratio = crop_overlap_ratio
+        self.output_mode = output_mode
+
+    @paddle.no_grad()
+    def generate(self, image: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Generates masks for the given image.
+
+        Args:
+            image (np.ndarray): The image to generate masks for, in HWC uint8 format.
+
+        Returns:
+            list(dict(str, any)): A list over records for masks. Each record is a dict containing the following keys:
+                segmentation (dict(str, any) or np.ndarray): The mask. If output_mode='binary_mask', is an array of
+                    shape HW. Otherwise, is a dictionary containing the RLE.
+                bbox (list(float)): The box around the mask, in XYWH format.
+                area (int): The area in pixels of the mask.
+                predicted_iou (float): The model's own prediction of the mask's quality.
+                point_coords (list(list(float))): The point coordinates input to the model to generate this mask.
+                stability_score (float): A measure of the mask's quality.
+                crop_box (list(float)): The crop of the image used to generate the mask, given in XYWH format.
+        """
+        image = np.asarray(image)
+        orig_size = image.shape[:2]
+        crop_boxes, layer_idxs = generate_crop_boxes(orig_size, self.crop_n_layers, self.crop_overlap_ratio)
+
+        data_list = []
+        for crop_box, layer_idx in zip(crop_boxes, layer_idxs):
+            crop_data = self._process_crop(image, crop_box, layer_idx, orig_size)
+            if crop_data is not None:
+                data_list.append(crop_data)
+        if len(data_list) == 0:
+            return []
+        data = _cat(data_list)
+
+        # Remove duplicate masks between crops, preferring masks from smaller crops
+        if len(crop_boxes) > 1:
+            crop_boxes_paddle = data["crop_boxes"].astype("float32")
+            areas = (crop_boxes_paddle[:, 2] - crop_boxes_paddle[:, 0]) * (
+                crop_boxes_paddle[:, 3] - crop_boxes_paddle[:, 1]
+            )
+            keep = paddle.vision.ops.nms(
+                data["boxes"].astype("float32"), iou_threshold=self.crop_nms_thresh, scores=1.0 / areas
+            )
+            data = _filter(data, keep)
+
+        boxes = data["boxes"].numpy().tolist()
+        iou_preds = data["iou_preds"].numpy().tolist()
+        points = data["points"].numpy().tolist()
+        stability_scores = data["stability_score"].numpy().tolist()
+        crop_boxes = data["crop_boxes"].numpy().tolist()
+
+        mask_data = []
+        for idx, rle in enumerate(data["rles"]):
+            mask_data.append(
+                {
+                    "segmentation": rle_to_mask(rle) if self.output_mode == "binary_mask" else rle,
+                    "area": area_from_rle(rle),
+                    "bbox": box_xyxy_to_xywh(boxes[idx]),
+                    "predicted_iou": iou_preds[idx],
+                    "point_coords": [points[idx]],
+                    "stability_score": stability_scores[idx],
+                    "crop_box": box_xyxy_to_xywh(crop_boxes[idx]),
+                }
+            )
+        return mask_data
+
+    def _process_crop(
+        self, image: np.ndarray, crop_box: List[int], crop_layer_idx: int, orig_size: Tuple[int, ...]
+    ) -> Optional[Dict[str, Any]]:
+        x0, y0, x1, y1 = crop_box
+        cropped_im = np.ascontiguousarray(image[y0:y1, x0:x1, :])
+        cropped_im_size = cropped_im.shape[:2]
+        image_seg = self.image_processor(cropped_im)
+        input_size = self.image_processor.input_size
+        self.model.set_image_features(image_seg)
+
+        # Get points for this crop
+        points_scale = np.array(cropped_im_size)[None, ::-1]
+        points_for_image = self.point_grids[crop_layer_idx] * points_scale
+
+        data_list = []
+        for start in range(0, len(points_for_image), self.points_per_batch):
+            points = points_for_image[start : start + self.points_per_batch]
+            batch_data = self._process_batch(points, cropped_im_size, input_size, crop_box, orig_size)
+            if batch_data is not None:
+                data_list.append(batch_data)
+        self.model.reset_img()
+        if len(data_list) == 0:
+            return None
+        data = _cat(data_list)
+
+        # Remove duplicates within this crop
+        keep = paddle.vision.ops.nms(
+            data["boxes"].astype("float32"), iou_threshold=self.box_nms_thresh, scores=data["iou_preds"]
+        )
+        data = _filter(data, keep)
+
+        data["boxes"] = uncrop_boxes_xyxy(data["boxes"], crop_box)
+        data["points"] = uncrop_points(data["points"], crop_box)
+        data["crop_boxes"] = paddle.to_tensor([crop_box] * len(data["rles"]), dtype="int64")
+        return data
+
+    def _process_batch(
+        self,
+        points: np.ndarray,
+        im_size: Tuple[int, ...],
+        input_size: Tuple[int, ...],
+        crop_box: List[int],
+        orig_size: Tuple[int, ...],
+    ) -> Optional[Dict[str, Any]]:
+        orig_h, orig_w = orig_size
+
+        # Run the model on this batch
+        coords = self.prompt_processor.apply_coords(points, im_size)
+        coords_paddle = paddle.to_tensor(coords[:, None, :]).cast("float32")
+        low_res_masks, iou_preds = self.model.predict_prompts(
+            point_coords=coords_paddle, multimask_output=True, max_batch_size=len(points)
+        )
+        num_multimask = iou_preds.shape[1]
+        low_res_masks = low_res_masks.flatten(0, 1).unsqueeze(1)
+        iou_preds = iou_preds.flatten(0, 1)
+        points_paddle = paddle.to_tensor(points, dtype="float32").repeat_interleave(num_multimask, axis=0)
+
+        # Filter by predicted IoU before upsampling, so only promising masks reach full resolution
+        keep = paddle.nonzero(iou_preds > self.pred_iou_thresh).flatten()
+        if keep.shape[0] == 0:
+            return None
+        low_res_masks = paddle.gather(low_res_masks, keep)
+        iou_preds = paddle.gather(iou_preds, keep)
+        points_paddle = paddle.gather(points_paddle, keep)
+
+        encode_size = self.image_processor.size
+        masks = F.interpolate(low_res_masks, (encode_size, encode_size), mode="bilinear", align_corners=False)
+        masks = masks[..., : input_size[0], : input_size[1]]
+        masks = F.interpolate(masks, im_size, mode="bilinear", align_corners=False).squeeze(1)
+
+        # Calculate stability score and filter on it
+        stability_score = calculate_stability_score(masks, self.model.mask_threshold, self.stability_score_offset)
+        keep = paddle.nonzero(stability_score >= self.stability_score_thresh).flatten()
+        if keep.shape[0] == 0:
+            return None
+        masks = paddle.gather(masks, keep) > self.model.mask_threshold
+        iou_preds = paddle.gather(iou_preds, keep)
+        points_paddle = paddle.gather(points_paddle, keep)
+        stability_score = paddle.gather(stability_score, keep)
+        boxes = batched_mask_to_box(masks)
+
+        # Filter boxes that touch crop boundaries
+        keep = paddle.nonzero(~is_box_near_crop_edge(boxes, crop_box, [0, 0, orig_w, orig_h])).flatten()
+        if keep.shape[0] == 0:
+            return None
+        masks = paddle.gather(masks, keep)
+
+        # Compress to RLE
+        masks = uncrop_masks(masks, crop_box, orig_h, orig_w)
+        return {
+            "rles": mask_to_rle(masks),
+            "boxes": paddle.gather(boxes, keep),
+            "iou_preds": paddle.gather(iou_preds, keep),
+            "points": paddle.gather(points_paddle, keep),
+            "stability_score": paddle.gather(stability_score, keep),
+        }
@@ -0,0 +1,147 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import paddle
+
+__all__ = ["SamEmbeddingCache", "image_digest"]
+
+
+def image_digest(image: paddle.Tensor) -> str:
+    """Content hash of a preprocessed image tensor, used as the cache key."""
+    array = image.numpy() if isinstance(image, paddle.Tensor) else np.asarray(image)
+    hasher = hashlib.sha1()
+    hasher.update(str(array.shape).encode("utf-8"))
+    hasher.update(str(array.dtype).encode("utf-8"))
+    hasher.update(np.ascontiguousarray(array).tobytes())
+    return hasher.hexdigest()
+
+
+def _nbytes(tensor: paddle.Tensor) -> int:
+    return int(np.prod(tensor.shape)) * tensor.element_size()
+
+
+class SamEmbeddingCache:
+    """
+    Content-addressed LRU cache of `image_encoder` outputs.
+
+    Args:
+        max_bytes (int): Memory budget for the embeddings kept on device. The least recently used entries are evicted
+            once the budget is exceeded.
+        spill_dir (str, optional): If set, evicted embeddings are written to `<spill_dir>/<digest>.npy` and read back as
+            memmaps on a later hit instead of being recomputed.
+        max_spill_bytes (int, optional): Budget for the spilled files, oldest files are deleted first. Unbounded if None.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024**2, spill_dir: Optional[str] = None, max_spill_bytes: int = None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._spilled = OrderedDict()
+        self.current_bytes = 0
+        self.spill_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries or key in self._spilled
+
+    def get(self, key: str) -> Optional[paddle.Tensor]:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        if key in self._spilled:
+            path = self._spilled.pop(key)
+            self.spill_bytes -= os.path.getsize(path)
+            features = paddle.to_tensor(np.load(path, mmap_mode="r"))
+            os.remove(path)
+            self.disk_hits += 1
+            self.put(key, features)
+            return features
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, features: paddle.Tensor):
+        if key in self._entries:
+            self.current_bytes -= _nbytes(self._entries.pop(key))
+        self._entries[key] = features
+        self.current_bytes += _nbytes(features)
+
+        # always keep the newest entry, even if it alone exceeds the budget
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            old_key, old_features = self._entries.popitem(last=False)
+            self.current_bytes -= _nbytes(old_features)
+            self.evictions += 1
+            if self.spill_dir is not None:
+                self._spill(old_key, old_features)
+
+    def _spill(self, key: str, features: paddle.Tensor):
+        path = os.path.join(self.spill_dir, f"{key}.npy")
+        np.save(path, features.numpy())
+        self._spilled[key] = path
+        self.spill_bytes += os.path.getsize(path)
+
+        while self.max_spill_bytes is not None and self.spill_bytes > self.max_spill_bytes and self._spilled:
+            _, old_path = self._spilled.popitem(last=False)
+            self.spill_bytes -= os.path.getsize(old_path)
+            os.remove(old_path)
+
+    def get_or_compute(self, image: paddle.Tensor, encode_fn: Callable[[paddle.Tensor], paddle.Tensor]):
+        key = image_digest(image)
+        features = self.get(key)
+        if features is None:
+            features = encode_fn(image)
+            self.put(key, features)
+        return features
+
+    def clear(self):
+        for path in self._spilled.values():
+            if os.path.exists(path):
+                os.remove(path)
+        self._entries.clear()
+        self._spilled.clear()
+        self.current_bytes = 0
+        self.spill_bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.disk_hits + self.misses
+        stats = {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "spilled_entries": len(self._spilled),
+            "bytes": self.current_bytes,
+            "spill_bytes": self.spill_bytes,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups > 0 else 0.0,
+        }
+        return stats
@@ -13,7 +13,7 @@
 # limitations under the License.
 
 from functools import partial
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 import paddle
@@ -22,6 +22,7 @@ from paddlenlp.transformers.model_utils import register_base_model
 from paddlemix.models.model_utils import MixPretrainedModel
 
 from .configuration import SamConfig
+from .embedding_cache import SamEmbeddingCache
 from .image_encoder import ImageEncoderViT
 from .mask_decoder import MaskDecoder
 from .prompt_encoder import PromptEncoder
@@ -59,6 +60,7 @@ class SamModel(SamPretrainedModel):
         assert config.input_type is not None, "input_type is None, but it is required."
         self.input_type = config.input_type
         self.set_image = False
+        self.embedding_cache = None
         self.image_encoder = ImageEncoderViT(
             depth=config.encoder_depth,
             embed_dim=config.encoder_embed_dim,
@@ -114,6 +116,42 @@ class SamModel(SamPretrainedModel):
         self.features = None
         self.set_image = False
 
+    def enable_embedding_cache(
+        self, max_bytes: int = 256 * 1024**2, spill_dir: Optional[str] = None, max_spill_bytes: Optional[int] = None
+    ):
+        """
+        Cache `image_encoder` outputs keyed by the hash of the input image, so switching back to an image that was
+        already encoded skips the ViT. See `SamEmbeddingCache` for the arguments.
+        """
+        self.embedding_cache = SamEmbeddingCache(
+            max_bytes=max_bytes, spill_dir=spill_dir, max_spill_bytes=max_spill_bytes
+        )
+        return self.embedding_cache
+
+    def disable_embedding_cache(self):
+        if self.embedding_cache is not None:
+            self.embedding_cache.clear()
+        self.embedding_cache = None
+
+    def embedding_cache_stats(self) -> Dict[str, float]:
+        if self.embedding_cache is None:
+            return {}
+        return self.embedding_cache.stats()
+
+    def set_image_features(self, x=None):
+        """
+        Encode `x` and keep the embedding in `self.features`. Without the embedding cache, a new embedding is only
+        computed when `x` is given or no image has been set yet.
+        """
+        if self.embedding_cache is not None and x is not None:
+            self.features = self.embedding_cache.get_or_compute(x, self.image_encoder)
+            self.set_image = True
+        elif self.set_image is False or x is not None:
+            self.reset_img()
+            self.features = self.image_encoder(x)
+            self.set_image = True
+        return self.features
+
     def after_forward(self):
         # masks = masks[0].detach().cpu().numpy()
         # iou_predictions = iou_predictions[0].detach().cpu().numpy()
@@ -127,10 +165,7 @@ class SamModel(SamPretrainedModel):
         labels_paddle = labels_paddle[None, :]
         points = (coords_paddle, labels_paddle)
 
-        if self.set_image is False or x is not None:
-            self.reset_img()
-            self.features = self.image_encoder(x)  # [1, 3, 1024, 1024]
-            self.set_image = True
+        self.set_image_features(x)  # [1, 3, 1024, 1024]
 
         # Embed prompts
 
@@ -153,10 +188,7 @@ class SamModel(SamPretrainedModel):
 
     @paddle.no_grad()
     def prompt_forward_box(self, x=None, box_paddle=None):
-        if self.set_image is False or x is not None:
-            self.reset_img()
-            self.features = self.image_encoder(x)
-            self.set_image = True
+        self.set_image_features(x)
 
         # Embed prompts
         sparse_embeddings, dense_embeddings = self.prompt_encoder(
@@ -176,6 +208,81 @@ class SamModel(SamPretrainedModel):
 
         return low_res_masks  # , iou_predictions, low_res_masks
 
+    @paddle.no_grad()
+    def predict_prompts(
+        self,
+        x=None,
+        point_coords: Optional[paddle.Tensor] = None,
+        point_labels: Optional[paddle.Tensor] = None,
+        boxes: Optional[paddle.Tensor] = None,
+        multimask_output: bool = False,
+        max_batch_size: int = 64,
+    ) -> Tuple[paddle.Tensor, paddle.Tensor]:
+        """
+        Decode many prompts for one image in batched passes instead of one `prompt_forward_*` call per prompt.
+
+        Args:
+            x (paddle.Tensor, optional): The preprocessed image. If None, the embedding of the last image is reused.
+            point_coords (paddle.Tensor, optional): N point sets with shape [N, P, 2], each set is one prompt.
+            point_labels (paddle.Tensor, optional): Labels with shape [N, P], 1 for foreground and 0 for background.
+                Defaults to all foreground.
+            boxes (paddle.Tensor, optional): M boxes with shape [M, 4] in xyxy format, each box is one prompt.
+            multimask_output (bool): Whether to return the three multimask outputs per prompt.
+            max_batch_size (int): Maximum number of prompts sent through the mask decoder at once.
+
+        Returns:
+            Tuple of low resolution masks with shape [N + M, C, H, W] and iou predictions with shape [N + M, C],
+            point prompts first, then box prompts.
+        """
+        if point_coords is None and boxes is None:
+            raise ValueError("At least one of `point_coords` and `boxes` should be given.")
+        self.set_image_features(x)
+
+        sparse_embeddings_list = []
+        if point_coords is not None:
+            if point_labels is None:
+                point_labels = paddle.ones(shape=point_coords.shape[:2], dtype="int32")
+            point_sparse_embeddings, _ = self.prompt_encoder(
+                points=(point_coords, point_labels),
+                boxes=None,
+                masks=None,
+            )
+            sparse_embeddings_list.append(point_sparse_embeddings)
+        if boxes is not None:
+            box_sparse_embeddings, _ = self.prompt_encoder(
+                points=None,
+                boxes=boxes.reshape([-1, 4]),
+                masks=None,
+            )
+            sparse_embeddings_list.append(box_sparse_embeddings)
+
+        # single points (+ padding point) and boxes both give two tokens, so they share one decoder batch
+        if (
+            len(sparse_embeddings_list) == 2
+            and sparse_embeddings_list[0].shape[1] == sparse_embeddings_list[1].shape[1]
+        ):
+            sparse_embeddings_list = [paddle.concat(sparse_embeddings_list, axis=0)]
+
+        image_pe = self.prompt_encoder.get_dense_pe()
+        low_res_masks, iou_predictions = [], []
+        for sparse_embeddings in sparse_embeddings_list:
+            for start in range(0, sparse_embeddings.shape[0], max_batch_size):
+                batch_sparse_embeddings = sparse_embeddings[start : start + max_batch_size]
+                dense_embeddings = self.prompt_encoder.no_mask_embed.weight.reshape([1, -1, 1, 1]).expand(
+                    shape=[batch_sparse_embeddings.shape[0], -1, *self.prompt_encoder.image_embedding_size]
+                )
+                batch_masks, batch_iou_predictions = self.mask_decoder(
+                    image_embeddings=self.features,
+                    image_pe=image_pe,
+                    sparse_prompt_embeddings=batch_sparse_embeddings,
+                    dense_prompt_embeddings=dense_embeddings,
+                    multimask_output=multimask_output,
+                )
+                low_res_masks.append(batch_masks)
+                iou_predictions.append(batch_iou_predictions)
+
+        return paddle.concat(low_res_masks, axis=0), paddle.concat(iou_predictions, axis=0)
+
     @paddle.no_grad()
     def full_mask_forward(self, img: List[Dict[str, Any]], coords_paddle):
         labels_paddle = paddle.ones(
@@ -187,7 +294,9 @@ class SamModel(SamPretrainedModel):
         labels_paddle = paddle.to_tensor(labels_paddle).cast("int32")[:, None]
 
         points = (coords_paddle, labels_paddle)
-        if self.set_image is False:
+        if self.embedding_cache is not None:
+            self.set_image_features(img)
+        elif self.set_image is False:
             self.features = self.image_encoder(img)
             self.set_image = True
 
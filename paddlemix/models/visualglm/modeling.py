@@ -36,6 +36,7 @@ from paddlenlp.transformers.model_utils import (
     prune_linear_layer,
 )
 
+from paddlemix.models.chat_session import ChatSession
 from paddlemix.models.model_utils import MixPretrainedModel
 
 from ...activations import ACT2FN
@@ -55,6 +56,7 @@ __all__ = [
     "VisualGLMQFormerModel",
     "VisualGLMVisionModel",
     "VisualGLMForConditionalGeneration",
+    "VisualGLMChatSession",
 ]
 
 
@@ -1479,6 +1481,75 @@ class ChatGLMForConditionalGenerationWithImage(ChatGLMForCausalLM):
 
         return outputs
 
+    def prepare_inputs_for_generation(self, input_ids, image_features=None, pre_image_length=None, **kwargs):
+        # the image features are only embedded into the prompt, the later steps read them from the cache
+        model_inputs = super().prepare_inputs_for_generation(input_ids, **kwargs)
+        model_inputs.update(image_features=image_features, pre_image_length=pre_image_length)
+        return model_inputs
+
+
+class VisualGLMChatSession(ChatSession):
+    """
+    A multi-turn chat about one image with VisualGLM, created by `VisualGLMForConditionalGeneration.start_chat`. The
+    ChatGLM cache holds the keys and values of shape `(sequence_length, 1, num_heads, head_dim)`.
+
+    Every prompt ends with the mask and bos tokens like the prompts of `generate`. Its tokens continue the positions of
+    the conversation and attend to each other and to the cached tokens, the reply takes the position of the mask token
+    and counts up the block position. The image prefix attends to the first prompt, so it is encoded together with it.
+    """
+
+    cache_seq_axis = 0
+    encode_prefix_with_prompt = True
+
+    def _embed(self, input_ids: paddle.Tensor) -> paddle.Tensor:
+        return self.language_model.chatglm.transformer.word_embeddings(input_ids)
+
+    def _forward(
+        self, inputs_embeds: paddle.Tensor, input_ids: Optional[paddle.Tensor] = None, generation: bool = False
+    ) -> paddle.Tensor:
+        start = self.cache_length
+        length = inputs_embeds.shape[1]
+        if generation:
+            context_length = 0
+            position_ids = paddle.full([length], self._mask_position, dtype="int64")
+            block_position_ids = paddle.arange(self._block_position + 1, self._block_position + length + 1)
+            self._block_position += length
+        else:
+            config = self.language_model.config
+            ids = input_ids[0].tolist()
+            context_length = ids.index(config.bos_token_id) if config.bos_token_id in ids else length
+            mask_token_id = config.gmask_token_id if config.gmask_token_id in ids else config.mask_token_id
+            if mask_token_id in ids[:context_length]:
+                mask_position = start + ids.index(mask_token_id)
+            else:
+                mask_position = start + context_length - 1
+            position_ids = paddle.arange(start, start + length)
+            position_ids[context_length:] = mask_position
+            block_position_ids = paddle.concat(
+                [paddle.zeros([context_length], dtype="int64"), paddle.arange(1, length - context_length + 1)]
+            )
+            self._mask_position = mask_position
+            self._block_position = length - context_length
+        position_ids = paddle.stack([position_ids, block_position_ids]).unsqueeze(0)
+
+        # the context attends to itself in both directions, the rest is causal
+        attention_mask = paddle.tril(paddle.ones([length, length], dtype="int64"))
+        attention_mask[:, :context_length] = 1
+        attention_mask = paddle.concat([paddle.ones([length, start], dtype="int64"), attention_mask], axis=1)
+
+        outputs = self.language_model(
+            image_features=None,
+            input_ids=None,
+            inputs_embeds=inputs_embeds,
+            position_ids=position_ids,
+            attention_mask=attention_mask[None, None],
+            cache=self.cache,
+            use_cache=True,
+            return_dict=True,
+        )
+        self.cache = outputs.past_key_values
+        return outputs.logits
+
 
 class VisualGLMForConditionalGeneration(VisualGLMPretrainedModel):
     config_class = VisualGLMConfig
@@ -1576,3 +1647,46 @@ class VisualGLMForConditionalGeneration(VisualGLMPretrainedModel):
         )
 
         return outputs
+
+    @paddle.no_grad()
+    def start_chat(
+        self,
+        pre_image_ids: paddle.Tensor,
+        pixel_values: Optional[paddle.Tensor] = None,
+        image_features: Optional[paddle.Tensor] = None,
+        max_context_length: Optional[int] = None,
+    ) -> VisualGLMChatSession:
+        """
+        Start a multi-turn chat about one image. The image and the prompt before it are encoded once, and every
+        `chat` call of the returned session only runs the language model over the new prompt and the reply.
+
+        The first turn generates the same reply as `generate` with the same prompt. The later turns differ from
+        `generate` with a prompt that holds the whole history: the gMASK and bos tokens of the earlier turns stay in the
+        cache, and the cached turns attend causally, so they do not see the later turns, while `generate` has the
+        history attend to itself in both directions before a single gMASK.
+        Args:
+            pre_image_ids (`paddle.Tensor` of shape (1, pre_image_length)):
+                The prompt before the image, `input_ids[:, :pre_image_length]` of the processor outputs.
+            pixel_values (`paddle.Tensor` of shape (1, num_channels, height, width), *optional*):
+                The image to chat about.
+            image_features (`paddle.Tensor` of shape (1, num_query_tokens, hidden_size), *optional*):
+                The image features returned by `encode_images`, used instead of `pixel_values`.
+            max_context_length (int, *optional*):
+                The budget of tokens kept in the cache, the oldest turns are evicted to stay within it.
+        Returns:
+            VisualGLMChatSession: The chat session.
+
+        Examples:
+        ```python
+        >>> inputs = processor(image=image, query=query)
+        >>> pre_image_length = inputs["pre_image_length"]
+        >>> session = model.start_chat(inputs["input_ids"][:, :pre_image_length], pixel_values=inputs["pixel_values"])
+        >>> # the prompt after the image, ending with the mask and bos tokens
+        >>> reply_ids = session.chat(inputs["input_ids"][:, pre_image_length + 32 :], eos_token_id=eos_token_id)
+        """
+        if image_features is None:
+            image_features = self.encode_images(pixel_values)
+        pre_image_embeds = self.language_model.chatglm.transformer.word_embeddings(pre_image_ids)
+        image_features = paddle.cast(image_features, dtype=pre_image_embeds.dtype)
+        prefix_embeds = paddle.concat([pre_image_embeds, image_features], axis=1)
+        return VisualGLMChatSession(self.language_model, prefix_embeds, max_context_length=max_context_length)
@@ -74,10 +74,12 @@ class SamProcessor(ProcessorMixin):
 
         image_pil_numpy = np.array(images)
         image_seg = self.image_processor(image_pil_numpy)
-        self.original_size = self.image_processor.original_size
-        self.input_size = self.image_processor.input_size
+        # computed from the image instead of read back from the image processor, which other calls may overwrite
+        original_size = image_pil_numpy.shape[:2]
+        self.original_size = original_size
+        self.input_size = get_preprocess_shape(original_size[0], original_size[1], self.encode_size)
         prompt = self.prompt_processor(
-            self.original_size,
+            original_size,
             point_coords=point_coords,
             point_labels=point_labels,
             box=box,
@@ -85,7 +87,19 @@ class SamProcessor(ProcessorMixin):
 
         return image_seg, prompt
 
-    def postprocess_masks(self, low_res_masks, mask_threshold: float = 0.0):
+    def postprocess_masks(
+        self,
+        low_res_masks,
+        mask_threshold: float = 0.0,
+        original_size: Optional[Tuple[int, int]] = None,
+        input_size: Optional[Tuple[int, int]] = None,
+    ):
+        """
+        Resize the low resolution masks to the image. `original_size` and `input_size` default to the sizes of the
+        last image passed to the processor, pass them when several images are in flight.
+        """
+        original_size = original_size if original_size is not None else self.original_size
+        input_size = input_size if input_size is not None else self.input_size
 
         masks = F.interpolate(
             paddle.to_tensor(low_res_masks),
@@ -93,8 +107,8 @@ class SamProcessor(ProcessorMixin):
             mode="bilinear",
             align_corners=False,
         )
-        masks = masks[..., : self.input_size[0], : self.input_size[1]]
-        masks = F.interpolate(masks, self.original_size, mode="bilinear", align_corners=False)
+        masks = masks[..., : input_size[0], : input_size[1]]
+        masks = F.interpolate(masks, original_size, mode="bilinear", align_corners=False)
         masks = masks > mask_threshold
 
         return masks
@@ -243,7 +257,7 @@ class SamImageProcessor(BaseImageProcessor):
 
         input_image = [self.apply_image(image) for image in images]
 
-        input_image_paddle = paddle.to_tensor(input_image).cast("int32")
+        input_image_paddle = paddle.to_tensor(input_image).cast("float32")
 
         input_image_paddle = input_image_paddle.transpose([0, 3, 1, 2])
 
@@ -20,11 +20,14 @@ Copied from https://github.com/openai/CLIP. Originally MIT License, Copyright (c
 """
 import gzip
 import html
+import multiprocessing
 import os
+from collections import OrderedDict
 from functools import lru_cache
 from typing import List, Union
 
 import ftfy
+import numpy as np
 import regex as re
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -85,8 +88,51 @@ def whitespace_clean(text):
     return text
 
 
+class _LRUCache(object):
+    """Pre-token -> token ids cache that keeps at most `maxsize` entries, dropping the least recently used one."""
+
+    def __init__(self, maxsize: int = 65536):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+_worker_tokenizer = None
+
+
+def _init_worker(bpe_path, special_tokens, cache_size):
+    global _worker_tokenizer
+    _worker_tokenizer = SimpleTokenizer(bpe_path, special_tokens=special_tokens, cache_size=cache_size)
+
+
+def _encode_in_worker(texts):
+    return [_worker_tokenizer.encode(text) for text in texts]
+
+
 class SimpleTokenizer(object):
-    def __init__(self, bpe_path: str = default_bpe(), special_tokens=None):
+    def __init__(self, bpe_path: str = default_bpe(), special_tokens=None, cache_size: int = 65536):
+        self.bpe_path = bpe_path
+        self.extra_special_tokens = special_tokens
         self.byte_encoder = bytes_to_unicode()
         self.byte_decoder = {v: k for k, v in self.byte_encoder.items()}
         merges = gzip.open(bpe_path).read().decode("utf-8").split("\n")
@@ -105,7 +151,8 @@ class SimpleTokenizer(object):
         self.encoder = dict(zip(vocab, range(len(vocab))))
         self.decoder = {v: k for k, v in self.encoder.items()}
         self.bpe_ranks = dict(zip(merges, range(len(merges))))
-        self.cache = {t: t for t in special_tokens}
+        self.special_tokens = {t: t for t in special_tokens}
+        self.cache = _LRUCache(cache_size)
         special = "|".join(special_tokens)
         self.pat = re.compile(
             special + "|'s|'t|'re|'ve|'m|'ll|'d|[\\p{L}]+|[\\p{N}]|[^\\s\\p{L}\\p{N}]+",
@@ -113,52 +160,51 @@ class SimpleTokenizer(object):
         )
         self.vocab_size = len(self.encoder)
         self.all_special_ids = [self.encoder[t] for t in special_tokens]
+        self._pool = None
+        self._pool_workers = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state["_pool_workers"] = 0
+        return state
 
     def bpe(self, token):
-        if token in self.cache:
-            return self.cache[token]
-        word = tuple(token[:-1]) + (token[-1] + "</w>",)
-        pairs = get_pairs(word)
-        if not pairs:
-            return token + "</w>"
-        while True:
-            bigram = min(pairs, key=lambda pair: self.bpe_ranks.get(pair, float("inf")))
-            if bigram not in self.bpe_ranks:
+        if token in self.special_tokens:
+            return token
+
+        word = list(token[:-1]) + [token[-1] + "</w>"]
+        bpe_ranks = self.bpe_ranks
+        while len(word) > 1:
+            # pick the lowest ranked adjacent pair, then merge all its occurrences in one left to right pass
+            ranks = [bpe_ranks.get(pair) for pair in zip(word[:-1], word[1:])]
+            best_rank = min((rank for rank in ranks if rank is not None), default=None)
+            if best_rank is None:
                 break
-            first, second = bigram
+            first, second = word[ranks.index(best_rank)], word[ranks.index(best_rank) + 1]
             new_word = []
             i = 0
             while i < len(word):
-                try:
-                    j = word.index(first, i)
-                    new_word.extend(word[i:j])
-                    i = j
-                except:
-                    new_word.extend(word[i:])
-                    break
-                if word[i] == first and i < len(word) - 1 and word[i + 1] == second:
+                if i < len(word) - 1 and word[i] == first and word[i + 1] == second:
                     new_word.append(first + second)
                     i += 2
                 else:
                     new_word.append(word[i])
                     i += 1
-            new_word = tuple(new_word)
             word = new_word
-            if len(word) == 1:
-                break
-            else:
-                pairs = get_pairs(word)
-        word = " ".join(word)
-        self.cache[token] = word
-        return word
+        return " ".join(word)
 
     def encode(self, text1):
         bpe_tokens = []
         text = whitespace_clean(basic_clean(text1)).lower()
         for token in re.findall(self.pat, text):
-            token = "".join(self.byte_encoder[b] for b in token.encode("utf-8"))
-            """Class Method: *.split, not convert, please check whether it is torch.Tensor.*/Optimizer.*/nn.Module.*, and convert manually"""
-            bpe_tokens.extend(self.encoder[bpe_token] for bpe_token in self.bpe(token).split(" "))
+            # the cache maps a pre-token straight to its ids, skipping byte encoding, bpe and vocab lookups on a hit
+            token_ids = self.cache.get(token)
+            if token_ids is None:
+                bpe_token = "".join(self.byte_encoder[b] for b in token.encode("utf-8"))
+                token_ids = [self.encoder[t] for t in self.bpe(bpe_token).split(" ")]
+                self.cache.put(token, token_ids)
+            bpe_tokens.extend(token_ids)
         return bpe_tokens
 
     def decode(self, tokens):
@@ -166,22 +212,68 @@ class SimpleTokenizer(object):
         text = bytearray([self.byte_decoder[c] for c in text]).decode("utf-8", errors="replace").replace("</w>", " ")
         return text
 
-    def __call__(self, text, max_length=77, return_tensors=True, **kwargs):
-        texts = text
+    def _get_pool(self, num_workers):
+        if self._pool is None or self._pool_workers != num_workers:
+            self.close()
+            self._pool = multiprocessing.Pool(
+                num_workers,
+                initializer=_init_worker,
+                initargs=(self.bpe_path, self.extra_special_tokens, self.cache.maxsize),
+            )
+            self._pool_workers = num_workers
+        return self._pool
+
+    def close(self):
+        """Shut down the worker pool started by `encode_batch(..., num_workers > 0)`."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+            self._pool_workers = 0
+
+    def encode_batch(self, texts: Union[str, List[str]], max_length: int = 77, num_workers: int = 0) -> np.ndarray:
+        """
+        Tokenize a list of texts into one preallocated int64 array of shape [len(texts), max_length], padded with 0
+        and truncated to `max_length` with the last token replaced by `<end_of_text>`.
+
+        Args:
+            texts (str or list(str)): The texts to encode.
+            max_length (int): The context length, all CLIP models use 77.
+            num_workers (int): If > 0, texts are split into chunks and encoded by a pool of this many processes. The
+                pool is kept alive between calls, call `close()` to release it.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
         sot_token = self.encoder["<start_of_text>"]
         eot_token = self.encoder["<end_of_text>"]
-        all_tokens = [([sot_token] + _tokenizer.encode(text) + [eot_token]) for text in texts]
+
+        if num_workers > 0 and len(texts) > 1:
+            chunk_size = (len(texts) + num_workers - 1) // num_workers
+            chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+            all_tokens = [
+                tokens for chunk in self._get_pool(num_workers).map(_encode_in_worker, chunks) for tokens in chunk
+            ]
+        else:
+            all_tokens = [self.encode(text) for text in texts]
+
+        result = np.zeros([len(texts), max_length], dtype="int64")
+        for i, tokens in enumerate(all_tokens):
+            tokens = [sot_token] + tokens[: max_length - 2] + [eot_token]
+            result[i, : len(tokens)] = tokens
+        return result
+
+    def __call__(self, text, max_length=77, return_tensors=True, num_workers=0, **kwargs):
+        texts = [text] if isinstance(text, str) else text
         if return_tensors:
-            result = paddle.zeros(shape=[len(all_tokens), max_length], dtype="int64")
-            for i, tokens in enumerate(all_tokens):
-                if len(tokens) > max_length:
-                    tokens = tokens[:max_length]
-                    tokens[-1] = eot_token
-                result[(i), : len(tokens)] = paddle.to_tensor(data=tokens)
+            result = self.encode_batch(texts, max_length=max_length, num_workers=num_workers)
+            if return_tensors != "np":
+                result = paddle.to_tensor(result)
             return {"input_ids": result}
         else:
+            sot_token = self.encoder["<start_of_text>"]
+            eot_token = self.encoder["<end_of_text>"]
             result = []
-            for i, tokens in enumerate(all_tokens):
+            for text in texts:
+                tokens = [sot_token] + self.encode(text) + [eot_token]
                 if len(tokens) > max_length:
                     tokens = tokens[:max_length]
                     tokens[-1] = eot_token
@@ -211,18 +303,7 @@ def tokenize(texts: Union[str, List[str]], context_length: int = 77) -> paddle.T
     -------
     A two-dimensional tensor containing the resulting tokens, shape = [number of input strings, context_length]
     """
-    if isinstance(texts, str):
-        texts = [texts]
-    sot_token = _tokenizer.encoder["<start_of_text>"]
-    eot_token = _tokenizer.encoder["<end_of_text>"]
-    all_tokens = [([sot_token] + _tokenizer.encode(text) + [eot_token]) for text in texts]
-    result = paddle.zeros(shape=[len(all_tokens), context_length], dtype="int64")
-    for i, tokens in enumerate(all_tokens):
-        if len(tokens) > context_length:
-            tokens = tokens[:context_length]
-            tokens[-1] = eot_token
-        result[(i), : len(tokens)] = paddle.to_tensor(data=tokens)
-    return result
+    return paddle.to_tensor(_tokenizer.encode_batch(texts, max_length=context_length))
 
 
 class HFTokenizer:
@@ -12,27 +12,43 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+import copy
+
+import numpy as np
 import paddle
-from paddle.io import DataLoader
+from paddle.io import DataLoader, DistributedBatchSampler
+from paddlenlp.trainer.trainer import Trainer
 from tensorboardX import SummaryWriter
 
+from paddlemix.models.clip.loss import ClipLoss, CoCaLoss
 from paddlemix.models.clip.utils import clip_grad_norm
-from paddlenlp.trainer.trainer import Trainer
 
 
 class CLIPTrainer(Trainer):
-    def __init__(self, **kwargs):
+    def __init__(self, streaming_metrics=None, grad_cache_chunk_size=None, **kwargs):
         """
         Implementation of an `Trainer` suitable for EVA-CLIP
         1、selfdefine optimizer for sharding which can't create by passing by args
+        2、optional streaming evaluation, see `streaming_metrics`
+        3、optional gradient cached training, see `grad_cache_chunk_size`
 
         Args:
+            streaming_metrics (optional): An object with `reset()`, `update(logits, labels)` and `compute()`, such as
+                `ClipZeroShot`. If given, it is updated with every prediction step during evaluation instead of
+                collecting all predictions in host memory for `compute_metrics`.
+            grad_cache_chunk_size (int, optional): If given, every training step runs the model over micro batches of
+                this size, see `grad_cache_step`, so that the contrastive batch is no longer bounded by the memory of
+                the activations.
             kwargs (dict): any arugments to pass to `Trainer`
 
         Returns:
             None
         """
         super().__init__(**kwargs)
+        self.streaming_metrics = streaming_metrics
+        self._eval_sample_masks = None
+        self.grad_cache_chunk_size = grad_cache_chunk_size
         self.rank = paddle.distributed.get_rank()
         if self.rank == 0 and self.args.tensorboard:
             self.writer = SummaryWriter("output/tensorboard")
@@ -63,17 +79,20 @@ class CLIPTrainer(Trainer):
         model.train()
         inputs = self._prepare_inputs(inputs)
 
-        with self.autocast_smart_context_manager():
-            loss, outputs = self.compute_loss(model, inputs, return_outputs=1)
-        loss_itc, image_features, text_features, logit_scale = outputs
+        if self.grad_cache_chunk_size is not None:
+            loss, logit_scale = self.grad_cache_step(model, inputs)
+        else:
+            with self.autocast_smart_context_manager():
+                loss, outputs = self.compute_loss(model, inputs, return_outputs=1)
+            loss_itc, image_features, text_features, logit_scale = outputs
 
-        if self.args.gradient_accumulation_steps > 1:
-            loss = loss / self.args.gradient_accumulation_steps
+            if self.args.gradient_accumulation_steps > 1:
+                loss = loss / self.args.gradient_accumulation_steps
 
-        if self.do_grad_scaling:
-            self.scaler.scale(loss).backward()
-        else:
-            loss.backward()
+            if self.do_grad_scaling:
+                self.scaler.scale(loss).backward()
+            else:
+                loss.backward()
 
         if self.args.max_grad_norm > 0.0:
             grad_norms = clip_grad_norm(model, self.args.max_grad_norm)
@@ -86,6 +105,161 @@ class CLIPTrainer(Trainer):
 
         return loss.detach()
 
+    def _split_inputs(self, inputs):
+        batch_size = inputs["image"].shape[0]
+        chunks = []
+        for start in range(0, batch_size, self.grad_cache_chunk_size):
+            end = min(start + self.grad_cache_chunk_size, batch_size)
+            chunks.append(
+                {k: v[start:end] if isinstance(v, paddle.Tensor) and v.ndim > 0 else v for k, v in inputs.items()}
+            )
+        return chunks
+
+    def grad_cache_step(self, model, inputs):
+        """
+        Gradient cached training step (GradCache, Gao et al. 2021) for contrastive batches larger than the activations
+        fit into memory:
+
+        1. run the model without grad over micro batches of `grad_cache_chunk_size` and collect the features
+        2. compute the contrastive loss over all features and its gradients with respect to them
+        3. run every micro batch again with grad, with the same random state, and backpropagate the cached gradients
+
+        The losses of a micro batch alone, such as the caption loss of CoCa, are backpropagated in the third pass. The
+        caption loss is a mean over the non-pad tokens, so every micro batch is weighted by its share of them.
+
+        Returns:
+            `(loss, logit_scale)`: The detached loss and logit scale of the step.
+        """
+        layer = model._layers if isinstance(model, paddle.DataParallel) else model
+        chunks = self._split_inputs(inputs)
+        # with `skiploss` the models return the features, the logit scale, and either the logit bias of SigLIP or the
+        # caption loss of CoCa and its number of non-pad tokens
+        is_coca = isinstance(layer.loss, CoCaLoss)
+
+        rng_states = []
+        image_features, text_features, caption_tokens = [], [], []
+        with paddle.no_grad():
+            for chunk in chunks:
+                rng_states.append(paddle.get_rng_state())
+                with self.autocast_smart_context_manager():
+                    outputs = model(**chunk, skiploss=True)
+                image_features.append(outputs[0])
+                text_features.append(outputs[1])
+                if is_coca:
+                    caption_tokens.append(outputs[4].astype("float32"))
+        num_preds = 3 if is_coca else len(outputs)
+        if is_coca:
+            total_caption_tokens = paddle.clip(paddle.add_n(caption_tokens), min=1.0)
+
+        preds = [paddle.concat(image_features, axis=0), paddle.concat(text_features, axis=0)]
+        preds += [tensor.detach() for tensor in outputs[2:num_preds]]
+        for tensor in preds:
+            tensor.stop_gradient = False
+        with self.autocast_smart_context_manager():
+            if is_coca:
+                # only the contrastive part of the loss, the caption loss is computed per micro batch
+                loss = ClipLoss.forward(layer.loss, preds)[0] * layer.loss.clip_loss_weight
+            else:
+                loss = layer.loss(preds)[0]
+        grads = paddle.grad(loss, preds)
+        loss = loss.detach()
+        logit_scale = preds[2].detach()
+
+        scale = 1.0 / self.args.gradient_accumulation_steps
+        start = 0
+        for i, (chunk, rng_state) in enumerate(zip(chunks, rng_states)):
+            end = start + chunk["image"].shape[0]
+            paddle.set_rng_state(rng_state)
+            # the gradients are synchronized once, in the backward of the last micro batch
+            sync_context = (
+                model.no_sync() if i < len(chunks) - 1 and hasattr(model, "no_sync") else contextlib.nullcontext()
+            )
+            with sync_context:
+                with self.autocast_smart_context_manager():
+                    outputs = model(**chunk, skiploss=True)
+                surrogate = (outputs[0] * grads[0][start:end]).sum() + (outputs[1] * grads[1][start:end]).sum()
+                if i == 0:
+                    # the logit scale and bias are shared by all micro batches
+                    for output, grad in zip(outputs[2:num_preds], grads[2:]):
+                        surrogate = surrogate + (output * grad).sum()
+                if is_coca:
+                    chunk_loss = outputs[3] * (caption_tokens[i] / total_caption_tokens).astype(outputs[3].dtype)
+                    surrogate = surrogate + chunk_loss
+                    loss = loss + chunk_loss.detach()
+                surrogate = surrogate * scale
+                if self.do_grad_scaling:
+                    self.scaler.scale(surrogate).backward()
+                else:
+                    surrogate.backward()
+            start = end
+
+        return loss * scale, logit_scale
+
+    def _sample_masks(self, dataloader):
+        """
+        The masks of the samples of every batch that are not padding. `DistributedBatchSampler` repeats samples so that
+        every rank gets the same number of them, which the regular evaluation loop removes with `nested_truncate` after
+        gathering the predictions. Returns None if no sample is repeated.
+        """
+        batch_sampler = getattr(dataloader, "batch_sampler", None)
+        if not isinstance(batch_sampler, DistributedBatchSampler) or batch_sampler.nranks == 1:
+            return None
+        num_samples = len(batch_sampler.dataset)
+        if batch_sampler.total_size == num_samples:
+            return None
+        # the same sampler over as many positions as the padded indices yields the global position of every sample
+        position_sampler = copy.copy(batch_sampler)
+        position_sampler.dataset = range(batch_sampler.total_size)
+        return [np.array(positions) < num_samples for positions in position_sampler]
+
+    def _drop_padding(self, tensors, mask):
+        if isinstance(tensors, (tuple, list)):
+            return type(tensors)(self._drop_padding(tensor, mask) for tensor in tensors)
+        return paddle.gather(tensors, paddle.to_tensor(np.nonzero(mask)[0]))
+
+    def prediction_step(self, model, inputs, prediction_loss_only, ignore_keys=None):
+        loss, logits, labels = super().prediction_step(model, inputs, prediction_loss_only, ignore_keys=ignore_keys)
+        if self.streaming_metrics is not None and logits is not None and labels is not None:
+            mask = next(self._eval_sample_masks, None) if self._eval_sample_masks is not None else None
+            if mask is None or mask.all():
+                self.streaming_metrics.update(logits, labels)
+            elif mask.any():
+                self.streaming_metrics.update(self._drop_padding(logits, mask), self._drop_padding(labels, mask))
+            return loss, None, None
+        return loss, logits, labels
+
+    def evaluation_loop(
+        self,
+        dataloader,
+        description,
+        prediction_loss_only=None,
+        ignore_keys=None,
+        metric_key_prefix="eval",
+        max_eval_iters=-1,
+    ):
+        if self.streaming_metrics is not None:
+            self.streaming_metrics.reset()
+            # `evaluate` asks for the loss only when there is no `compute_metrics`, but the predictions are needed here
+            prediction_loss_only = False
+            # the streaming metrics never see the gathered predictions, so the padded samples are dropped per batch
+            sample_masks = self._sample_masks(dataloader)
+            self._eval_sample_masks = iter(sample_masks) if sample_masks is not None else None
+        try:
+            output = super().evaluation_loop(
+                dataloader,
+                description,
+                prediction_loss_only=prediction_loss_only,
+                ignore_keys=ignore_keys,
+                metric_key_prefix=metric_key_prefix,
+                max_eval_iters=max_eval_iters,
+            )
+        finally:
+            self._eval_sample_masks = None
+        if self.streaming_metrics is not None:
+            for key, value in self.streaming_metrics.compute().items():
+                output.metrics[f"{metric_key_prefix}_{key}"] = value
+        return output
+
     def get_train_dataloader(self):
         """
         Returns the training [`~paddle.io.DataLoader`].
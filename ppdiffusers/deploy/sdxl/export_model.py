@@ -32,6 +32,8 @@ def convert_ppdiffusers_pipeline_to_fastdeploy_pipeline(
     sample: bool = False,
     height: int = None,
     width: int = None,
+    lora_weights_path: str = None,
+    lora_scale: float = 1.0,
 ):
     # specify unet model with unet pre_temb_act opt enabled.
     unet_model = UNet2DConditionModelSDXLHousing.from_pretrained(
@@ -40,6 +42,11 @@ def convert_ppdiffusers_pipeline_to_fastdeploy_pipeline(
     pipeline = StableDiffusionXLPipeline.from_pretrained(
         model_path, unet=unet_model, safety_checker=None, feature_extractor=None
     )
+    if lora_weights_path is not None:
+        # bake the LoRA into the base weights, so that the exported model runs at the speed of the base model
+        pipeline.load_lora_weights(lora_weights_path)
+        pipeline.fuse_lora(lora_scale=lora_scale)
+        pipeline.unload_lora_weights()
     # make sure we disable xformers
     pipeline.unet.set_default_attn_processor()
     pipeline.vae.set_default_attn_processor()
@@ -185,8 +192,23 @@ if __name__ == "__main__":
     )
     parser.add_argument("--height", type=int, default=None, help="The height of output images. Default: None")
     parser.add_argument("--width", type=int, default=None, help="The width of output images. Default: None")
+    parser.add_argument(
+        "--lora_weights_path",
+        type=str,
+        default=None,
+        help="Path or id of LoRA weights that are fused into the exported model. Default: None",
+    )
+    parser.add_argument(
+        "--lora_scale", type=float, default=1.0, help="The scale of the fused LoRA weights. Default: 1.0"
+    )
     args = parser.parse_args()
 
     convert_ppdiffusers_pipeline_to_fastdeploy_pipeline(
-        args.pretrained_model_name_or_path, args.output_path, args.sample, args.height, args.width
+        args.pretrained_model_name_or_path,
+        args.output_path,
+        args.sample,
+        args.height,
+        args.width,
+        args.lora_weights_path,
+        args.lora_scale,
     )
@@ -0,0 +1,51 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+
+from paddlenlp.transformers import AutoTokenizer
+from sd import pack_text_image_shards
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pack the laion TSV parts into shards for PackedTextImagePair.")
+    parser.add_argument("--file_list", type=str, default="./data/filelist/train.filelist.list")
+    parser.add_argument("--output_dir", type=str, required=True)
+    parser.add_argument(
+        "--tokenizer_name",
+        type=str,
+        default="./CompVis-stable-diffusion-v1-4-paddle-init/tokenizer",
+        help="The tokenizer used in training, the captions are stored as its input_ids.",
+    )
+    parser.add_argument("--model_max_length", type=int, default=77)
+    parser.add_argument("--min_size", type=int, default=512, help="Images smaller than this are dropped.")
+    parser.add_argument("--samples_per_shard", type=int, default=10000)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer_name, model_max_length=args.model_max_length)
+    num_samples = pack_text_image_shards(
+        args.file_list,
+        args.output_dir,
+        tokenizer,
+        min_size=args.min_size,
+        samples_per_shard=args.samples_per_shard,
+    )
+    print(f"packed {num_samples} samples into {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from dataclasses import dataclass, field
+
+import paddle
+from paddlenlp.trainer import PdArgumentParser
+from paddlenlp.transformers import AutoTokenizer, CLIPTextModel
+from paddlenlp.utils.log import logger
+from sd import PackedTextImagePair, SDModelArguments, precompute_latent_cache
+
+from ppdiffusers import AutoencoderKL
+
+
+@dataclass
+class LatentCacheArguments:
+    """
+    Arguments of the pre-pass that encodes a packed dataset with the frozen vae and text encoder.
+    """
+
+    packed_data_dir: str = field(metadata={"help": "The output_dir of pack_text_image_shards.py."})
+    latent_cache_dir: str = field(metadata={"help": "Where to write the cache, pass it to training as well."})
+    resolution: int = field(default=512, metadata={"help": "The resolution of the cached images."})
+    batch_size: int = field(default=16, metadata={"help": "Batch size of the pre-pass."})
+    num_workers: int = field(default=4, metadata={"help": "Number of dataloader workers decoding the images."})
+    dtype: str = field(default="float16", metadata={"help": "The dtype the moments and hidden states are stored in."})
+    seed: int = field(default=23, metadata={"help": "Random seed of the cached crops."})
+
+
+def main():
+    parser = PdArgumentParser((SDModelArguments, LatentCacheArguments))
+    model_args, cache_args = parser.parse_args_into_dataclasses()
+    paddle.seed(cache_args.seed)
+
+    def component_path(name_or_path, subfolder):
+        if name_or_path is not None:
+            return name_or_path
+        return os.path.join(model_args.pretrained_model_name_or_path, subfolder)
+
+    tokenizer_kwargs = {}
+    if model_args.model_max_length is not None:
+        tokenizer_kwargs["model_max_length"] = model_args.model_max_length
+    tokenizer = AutoTokenizer.from_pretrained(
+        component_path(model_args.tokenizer_name, "tokenizer"), **tokenizer_kwargs
+    )
+    vae = AutoencoderKL.from_pretrained(component_path(model_args.vae_name_or_path, "vae"))
+    text_encoder = CLIPTextModel.from_pretrained(component_path(model_args.text_encoder_name_or_path, "text_encoder"))
+
+    dataset = PackedTextImagePair(cache_args.packed_data_dir, size=cache_args.resolution, drop_caption_prob=0.0)
+    num_samples = precompute_latent_cache(
+        vae,
+        text_encoder,
+        tokenizer,
+        dataset,
+        cache_args.latent_cache_dir,
+        batch_size=cache_args.batch_size,
+        num_workers=cache_args.num_workers,
+        dtype=cache_args.dtype,
+    )
+    logger.info(f"Cached {num_samples} samples into {cache_args.latent_cache_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,17 @@
 # limitations under the License.
 # flake8: noqa
 
+from .latent_cache import (
+    LatentCacheDataset,
+    latent_cache_input_spec,
+    precompute_latent_cache,
+)
 from .model import StableDiffusionModel
 from .sd_args import SDDataArguments, SDModelArguments, SDTrainingArguments
 from .sd_trainer import StableDiffusionTrainer
-from .text_image_pair_dataset import TextImagePair, worker_init_fn
+from .text_image_pair_dataset import (
+    PackedTextImagePair,
+    TextImagePair,
+    pack_text_image_shards,
+    worker_init_fn,
+)
@@ -0,0 +1,156 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import random
+
+import numpy as np
+import paddle
+from paddle.io import DataLoader, Dataset, Subset
+
+LATENT_MOMENTS_NAME = "latent_moments.npy"
+ENCODER_HIDDEN_STATES_NAME = "encoder_hidden_states.npy"
+INPUT_IDS_NAME = "input_ids.npy"
+UNCOND_ENCODER_HIDDEN_STATES_NAME = "uncond_encoder_hidden_states.npy"
+
+
+@paddle.no_grad()
+def precompute_latent_cache(
+    vae, text_encoder, tokenizer, dataset, output_dir, batch_size=16, num_workers=0, dtype="float16"
+):
+    """
+    Encode every sample of `dataset` once with the frozen `vae` and `text_encoder` into `output_dir`.
+
+    The latent distribution moments (not a sample of it, so that every epoch still draws new latents), the encoder
+    hidden states and the input_ids are written into memory mapped `.npy` files, the hidden states of the empty caption
+    are stored separately for caption dropping. `dataset` has to support indexing, e.g. a
+    [`PackedTextImagePair`] with `drop_caption_prob=0.0`. Its random crops are fixed once they are cached.
+
+    Returns:
+        `int`: The number of cached samples.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    vae.eval()
+    text_encoder.eval()
+    num_samples = getattr(dataset, "num_samples", len(dataset))
+    loader = DataLoader(
+        Subset(dataset, list(range(num_samples))),
+        batch_size=batch_size,
+        num_workers=num_workers,
+        shuffle=False,
+        drop_last=False,
+    )
+
+    def open_store(name, array):
+        return np.lib.format.open_memmap(
+            os.path.join(output_dir, name), mode="w+", dtype=array.dtype, shape=(num_samples,) + array.shape[1:]
+        )
+
+    stores = None
+    start = 0
+    for batch in loader:
+        pixel_values = batch["pixel_values"].cast(vae.dtype)
+        moments = vae.encode(pixel_values).latent_dist.parameters.cast(dtype).numpy()
+        encoder_hidden_states = text_encoder(batch["input_ids"])[0].cast(dtype).numpy()
+        input_ids = batch["input_ids"].numpy()
+        if stores is None:
+            stores = (
+                open_store(LATENT_MOMENTS_NAME, moments),
+                open_store(ENCODER_HIDDEN_STATES_NAME, encoder_hidden_states),
+                open_store(INPUT_IDS_NAME, input_ids),
+            )
+        end = start + moments.shape[0]
+        for store, array in zip(stores, (moments, encoder_hidden_states, input_ids)):
+            store[start:end] = array
+        start = end
+    for store in stores or ():
+        store.flush()
+
+    uncond_input_ids = tokenizer(
+        [""], padding="max_length", truncation=True, max_length=tokenizer.model_max_length, return_tensors="pd"
+    ).input_ids
+    np.save(
+        os.path.join(output_dir, UNCOND_ENCODER_HIDDEN_STATES_NAME),
+        text_encoder(uncond_input_ids)[0][0].cast(dtype).numpy(),
+    )
+    with open(os.path.join(output_dir, "index.json"), "w") as f:
+        json.dump({"num_samples": start, "dtype": dtype}, f, indent=2)
+    return start
+
+
+def latent_cache_input_spec(model, resolution, max_length):
+    """
+    The `paddle.jit.to_static` input spec of [`StableDiffusionModel.forward`] for the batches of
+    [`LatentCacheDataset`], which carry the `latent_moments` and `encoder_hidden_states` instead of `pixel_values`.
+    """
+    latent_size = resolution // 2 ** (len(model.vae.config.block_out_channels) - 1)
+    return [
+        paddle.static.InputSpec(name="input_ids", shape=[-1, max_length], dtype="int64"),
+        None,
+        paddle.static.InputSpec(
+            name="latent_moments",
+            shape=[-1, 2 * model.vae.config.latent_channels, latent_size, latent_size],
+            dtype="float32",
+        ),
+        paddle.static.InputSpec(
+            name="encoder_hidden_states",
+            shape=[-1, max_length, model.unet.config.cross_attention_dim],
+            dtype="float32",
+        ),
+    ]
+
+
+class LatentCacheDataset(Dataset):
+    """
+    Read the cache written by [`precompute_latent_cache`], every sample gives the `latent_moments` and
+    `encoder_hidden_states` that replace `pixel_values` in [`StableDiffusionModel.forward`].
+
+    Args:
+        cache_dir (`str`): The `output_dir` of [`precompute_latent_cache`].
+        drop_caption_prob (`float`, *optional*, defaults to 0.1):
+            The probability of using the hidden states of the empty caption instead.
+    """
+
+    def __init__(self, cache_dir, drop_caption_prob=0.1):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, "index.json"), "r") as f:
+            self.num_samples = json.load(f)["num_samples"]
+        self.uncond_encoder_hidden_states = np.load(os.path.join(cache_dir, UNCOND_ENCODER_HIDDEN_STATES_NAME))
+        self.drop_caption_prob = drop_caption_prob
+        # opened lazily, so that every dataloader worker maps the files itself
+        self._stores = None
+
+    def _open(self):
+        if self._stores is None:
+            self._stores = tuple(
+                np.load(os.path.join(self.cache_dir, name), mmap_mode="r")
+                for name in (LATENT_MOMENTS_NAME, ENCODER_HIDDEN_STATES_NAME, INPUT_IDS_NAME)
+            )
+        return self._stores
+
+    def __getitem__(self, idx):
+        latent_moments, encoder_hidden_states, input_ids = self._open()
+        if random.random() < self.drop_caption_prob:
+            hidden_states = self.uncond_encoder_hidden_states
+        else:
+            hidden_states = encoder_hidden_states[idx]
+        return {
+            "latent_moments": latent_moments[idx].astype("float32"),
+            "encoder_hidden_states": hidden_states.astype("float32"),
+            "input_ids": input_ids[idx].astype("int64"),
+        }
+
+    def __len__(self):
+        return self.num_samples
@@ -33,6 +33,7 @@ from ppdiffusers.models.attention import AttentionBlock
 from ppdiffusers.models.ema import LitEma
 from ppdiffusers.models.resnet import ResnetBlock2D
 from ppdiffusers.models.transformer_2d import Transformer2DModel
+from ppdiffusers.models.vae import DiagonalGaussianDistribution
 from ppdiffusers.training_utils import freeze_params
 
 
@@ -110,6 +111,7 @@ class StableDiffusionModel(nn.Layer):
         self.eval_scheduler.set_timesteps(self.model_args.num_inference_steps)
         self.use_ema = False
         self.model_ema = None
+        self.use_latent_cache = False
 
     def compute_snr(self, timesteps):
         """
@@ -134,13 +136,16 @@ class StableDiffusionModel(nn.Layer):
         snr = (alpha / sigma) ** 2
         return snr
 
-    def forward(self, input_ids=None, pixel_values=None, **kwargs):
+    def forward(self, input_ids=None, pixel_values=None, latent_moments=None, encoder_hidden_states=None, **kwargs):
         self.vae.eval()
-        if not self.model_args.train_text_encoder:
+        if not self.model_args.train_text_encoder and self.text_encoder is not None:
             self.text_encoder.eval()
 
-        # vae encode
-        latents = self.vae.encode(pixel_values).latent_dist.sample()
+        # vae encode, or sample from the moments cached by `precompute_latent_cache`
+        if latent_moments is not None:
+            latents = DiagonalGaussianDistribution(latent_moments).sample()
+        else:
+            latents = self.vae.encode(pixel_values).latent_dist.sample()
         latents = latents * self.vae.config.scaling_factor
 
         # Sample noise that we'll add to the latents
@@ -164,7 +169,8 @@ class StableDiffusionModel(nn.Layer):
             noisy_latents = self.add_noise(latents, noise, timesteps)
 
         # text encode
-        encoder_hidden_states = self.text_encoder(input_ids)[0]
+        if encoder_hidden_states is None:
+            encoder_hidden_states = self.text_encoder(input_ids)[0]
 
         # unet
         model_pred = self.unet(
@@ -273,11 +279,12 @@ class StableDiffusionModel(nn.Layer):
             self.model_ema(self.unet)
 
     @paddle.no_grad()
-    def decode_image(self, pixel_values=None, max_batch=8, **kwargs):
+    def decode_image(self, pixel_values=None, max_batch=8, latent_moments=None, **kwargs):
         self.eval()
-        if pixel_values.shape[0] > max_batch:
-            pixel_values = pixel_values[:max_batch]
-        latents = self.vae.encode(pixel_values).latent_dist.sample()
+        if latent_moments is not None:
+            latents = DiagonalGaussianDistribution(latent_moments[:max_batch]).sample()
+        else:
+            latents = self.vae.encode(pixel_values[:max_batch]).latent_dist.sample()
         image = self.vae.decode(latents).sample
         image = (image / 2 + 0.5).clip(0, 1).transpose([0, 2, 3, 1])
         image = (image * 255.0).cast("float32").numpy().round()
@@ -367,6 +374,24 @@ class StableDiffusionModel(nn.Layer):
                         f" correctly and a GPU is available: {e}"
                     )
 
+    def set_latent_cache(self, use_latent_cache=False, release_text_encoder=False):
+        """
+        Train on the outputs of `precompute_latent_cache`, the vae encoder is released since the latents come from
+        the cached moments. The text encoder is only needed to sample images for logging, pass `release_text_encoder`
+        to release it as well when image logging is disabled.
+        """
+        self.use_latent_cache = use_latent_cache
+        if not use_latent_cache:
+            return
+        if self.train_text_encoder:
+            raise ValueError("The latent cache stores frozen encoder hidden states, it cannot train the text encoder.")
+        del self.vae.encoder
+        del self.vae.quant_conv
+        logger.info("Release the vae encoder, the latents are sampled from the cached moments!")
+        if release_text_encoder:
+            self.text_encoder = None
+            logger.info("Release the text encoder, the encoder hidden states are read from the cache!")
+
     def set_ema(self, use_ema=False):
         self.use_ema = use_ema
         if use_ema:
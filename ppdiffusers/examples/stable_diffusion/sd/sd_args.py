@@ -142,6 +142,17 @@ class SDDataArguments:
         default="./data/filelist/train.filelist.list",
         metadata={"help": "The name of the file_list."},
     )
+    packed_data_dir: Optional[str] = field(
+        default=None,
+        metadata={"help": "The output_dir of pack_text_image_shards.py, if set it is read instead of `file_list`."},
+    )
+    latent_cache_dir: Optional[str] = field(
+        default=None,
+        metadata={
+            "help": "The output_dir of precompute_latent_cache.py, if set the unet is trained on the cached vae "
+            "moments and text encoder hidden states instead of running the frozen models every step."
+        },
+    )
     num_records: int = field(default=10000000, metadata={"help": "num_records"})
     buffer_size: int = field(
         default=100,
@@ -33,7 +33,7 @@ from paddlenlp.utils.log import logger
 
 from ppdiffusers.training_utils import unwrap_model
 
-from .text_image_pair_dataset import TextImagePair, worker_init_fn
+from .text_image_pair_dataset import PackedTextImagePair, TextImagePair, worker_init_fn
 
 PADDLE_WEIGHTS_NAME = "model_state.pdparams"
 TRAINING_ARGS_NAME = "training_args.bin"
@@ -90,7 +90,9 @@ class VisualDLWithImageCallback(VisualDLCallback):
             with self.autocast_smart_context_manager(args):
                 max_batch = 4 if args.resolution > 256 else 8
                 image_logs["reconstruction"] = model.decode_image(
-                    pixel_values=inputs["pixel_values"], max_batch=max_batch
+                    pixel_values=inputs.get("pixel_values"),
+                    latent_moments=inputs.get("latent_moments"),
+                    max_batch=max_batch,
                 )
                 image_logs["ddim-samples-1.0"] = model.log_image(
                     input_ids=inputs["input_ids"],
@@ -260,6 +262,13 @@ class StableDiffusionTrainer(Trainer):
                 num_workers=self.args.dataloader_num_workers,
                 worker_init_fn=worker_init_fn,
             )
+        elif isinstance(self.train_dataset, PackedTextImagePair):
+            # the shards are assigned to the ranks and workers inside the dataset
+            return DataLoader(
+                self.train_dataset,
+                batch_size=self.args.train_batch_size,
+                num_workers=self.args.dataloader_num_workers,
+            )
         else:
             return super().get_train_dataloader()
 
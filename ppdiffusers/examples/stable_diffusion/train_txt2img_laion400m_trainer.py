@@ -18,12 +18,15 @@ import paddle
 from paddlenlp.trainer import PdArgumentParser, get_last_checkpoint, set_seed
 from paddlenlp.utils.log import logger
 from sd import (
+    LatentCacheDataset,
+    PackedTextImagePair,
     SDDataArguments,
     SDModelArguments,
     SDTrainingArguments,
     StableDiffusionModel,
     StableDiffusionTrainer,
     TextImagePair,
+    latent_cache_input_spec,
 )
 
 
@@ -56,28 +59,46 @@ def main():
     model.set_recompute(training_args.recompute)
     model.set_xformers(training_args.enable_xformers_memory_efficient_attention)
     model.set_ema(training_args.use_ema)
+    if data_args.latent_cache_dir is not None:
+        model.set_latent_cache(True, release_text_encoder=training_args.image_logging_steps <= 0)
 
     if training_args.to_static:
-        input_ids = paddle.static.InputSpec(name="input_ids", shape=[-1, model_args.model_max_length], dtype="int64")
-        pixel_values = paddle.static.InputSpec(
-            name="pixel_values",
-            shape=[-1, 3, training_args.resolution, training_args.resolution],
-            dtype="float32",
-        )
-        specs = [input_ids, pixel_values]
+        if data_args.latent_cache_dir is not None:
+            specs = latent_cache_input_spec(model, training_args.resolution, model_args.model_max_length)
+        else:
+            input_ids = paddle.static.InputSpec(
+                name="input_ids", shape=[-1, model_args.model_max_length], dtype="int64"
+            )
+            pixel_values = paddle.static.InputSpec(
+                name="pixel_values",
+                shape=[-1, 3, training_args.resolution, training_args.resolution],
+                dtype="float32",
+            )
+            specs = [input_ids, pixel_values]
         paddle.jit.ignore_module([os])
         model = paddle.jit.to_static(model, input_spec=specs)
         logger.info("Successfully to apply @to_static with specs: {}".format(specs))
 
-    train_dataset = TextImagePair(
-        file_list=data_args.file_list,
-        size=training_args.resolution,
-        num_records=data_args.num_records,
-        buffer_size=data_args.buffer_size,
-        shuffle_every_n_samples=data_args.shuffle_every_n_samples,
-        interpolation=data_args.interpolation,
-        tokenizer=model.tokenizer,
-    )
+    if data_args.latent_cache_dir is not None:
+        train_dataset = LatentCacheDataset(data_args.latent_cache_dir)
+    elif data_args.packed_data_dir is not None:
+        train_dataset = PackedTextImagePair(
+            data_args.packed_data_dir,
+            size=training_args.resolution,
+            num_records=data_args.num_records,
+            interpolation=data_args.interpolation,
+            seed=training_args.seed,
+        )
+    else:
+        train_dataset = TextImagePair(
+            file_list=data_args.file_list,
+            size=training_args.resolution,
+            num_records=data_args.num_records,
+            buffer_size=data_args.buffer_size,
+            shuffle_every_n_samples=data_args.shuffle_every_n_samples,
+            interpolation=data_args.interpolation,
+            tokenizer=model.tokenizer,
+        )
 
     trainer = StableDiffusionTrainer(
         model=model,
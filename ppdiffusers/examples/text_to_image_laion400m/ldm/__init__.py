@@ -16,4 +16,9 @@
 from .ldm_args import DataArguments, ModelArguments, NoTrainerTrainingArguments
 from .ldm_trainer import LatentDiffusionTrainer
 from .model import LatentDiffusionModel
-from .text_image_pair_dataset import TextImagePair, worker_init_fn
+from .text_image_pair_dataset import (
+    PackedTextImagePair,
+    TextImagePair,
+    pack_text_image_shards,
+    worker_init_fn,
+)
@@ -78,6 +78,10 @@ class DataArguments:
         default="./data/filelist/train.filelist.list",
         metadata={"help": "The name of the file_list."},
     )
+    packed_data_dir: Optional[str] = field(
+        default=None,
+        metadata={"help": "The output_dir of pack_text_image_shards.py, if set it is read instead of `file_list`."},
+    )
     resolution: int = field(
         default=256,
         metadata={
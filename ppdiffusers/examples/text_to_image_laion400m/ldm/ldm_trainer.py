@@ -28,7 +28,7 @@ from paddlenlp.trainer.integrations import (
 from paddlenlp.utils import profiler
 from paddlenlp.utils.log import logger
 
-from .text_image_pair_dataset import TextImagePair, worker_init_fn
+from .text_image_pair_dataset import PackedTextImagePair, TextImagePair, worker_init_fn
 
 
 class VisualDLWithImageCallback(VisualDLCallback):
@@ -224,5 +224,12 @@ class LatentDiffusionTrainer(Trainer):
                 num_workers=self.args.dataloader_num_workers,
                 worker_init_fn=worker_init_fn,
             )
+        elif isinstance(self.train_dataset, PackedTextImagePair):
+            # the shards are assigned to the ranks and workers inside the dataset
+            return DataLoader(
+                self.train_dataset,
+                batch_size=self.args.train_batch_size,
+                num_workers=self.args.dataloader_num_workers,
+            )
         else:
             return super().get_train_dataloader()
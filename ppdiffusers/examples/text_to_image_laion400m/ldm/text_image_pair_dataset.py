@@ -16,6 +16,7 @@ import base64
 import gzip
 import io
 import json
+import os
 import random
 
 import numpy as np
@@ -29,29 +30,35 @@ from PIL import Image
 Image.MAX_IMAGE_PIXELS = 2300000000
 
 
-def parse_line(line, filename):
-    def parse_src(filename):
-        if "laion_aes" in filename:
-            return "laion_aes"
-        elif "laion400m" in filename:
-            return "laion400m"
-        else:
-            raise NotImplementedError(f"Unkown data source, {filename}")
+def parse_src(filename):
+    if "laion_aes" in filename:
+        return "laion_aes"
+    elif "laion400m" in filename:
+        return "laion400m"
+    else:
+        raise NotImplementedError(f"Unkown data source, {filename}")
 
-    try:
-        vec = line.strip().split("\t")
-        data_source = parse_src(filename)
-        if data_source == "laion400m":
-            caption, _, img_b64 = vec[:3]
-        elif data_source == "laion_aes":
-            text_json = json.loads(vec[2])
-            img_b64 = vec[5]
-            caption = text_json.get("caption_en", text_json.get("blip_caption_en", ""))
-        else:
-            _, captions, _, _, _, img_b64 = vec[:6]
-            caption = random.sample(captions.split("|"), 1)[0].replace("\1", "")
 
-        image = Image.open(io.BytesIO(base64.b64decode(img_b64))).convert("RGB")
+def parse_record(line, filename):
+    """Split a TSV line into its caption and raw (base64 decoded) image bytes."""
+    vec = line.strip().split("\t")
+    data_source = parse_src(filename)
+    if data_source == "laion400m":
+        caption, _, img_b64 = vec[:3]
+    elif data_source == "laion_aes":
+        text_json = json.loads(vec[2])
+        img_b64 = vec[5]
+        caption = text_json.get("caption_en", text_json.get("blip_caption_en", ""))
+    else:
+        _, captions, _, _, _, img_b64 = vec[:6]
+        caption = random.sample(captions.split("|"), 1)[0].replace("\1", "")
+    return caption, base64.b64decode(img_b64)
+
+
+def parse_line(line, filename):
+    try:
+        caption, img_bytes = parse_record(line, filename)
+        image = Image.open(io.BytesIO(img_bytes)).convert("RGB")
         if random.random() < 0.1:
             caption = ""
         return dict(image=image, caption=caption)
@@ -61,6 +68,25 @@ def parse_line(line, filename):
         return None
 
 
+def read_lines(filename):
+    """Yield the decoded lines of a (gzipped) TSV part file, skipping the ones that are neither utf-8 nor gb18030."""
+    with gzip.open(filename, "rb") if filename.endswith(".gz") else open(filename, "rb") as f:
+        while True:
+            line = f.readline()
+
+            if line == b"":
+                break
+            try:
+                try:
+                    line = line.decode(encoding="utf-8")
+                except Exception:
+                    line = line.decode(encoding="gb18030")
+            except Exception:
+                print(f"error on file {filename}")
+                continue
+            yield line
+
+
 # donot use random.randint
 class RandomCrop(transforms.RandomCrop):
     def _get_param(self, img, output_size):
@@ -74,6 +100,27 @@ class RandomCrop(transforms.RandomCrop):
         return i, j, th, tw
 
 
+def default_image_processing(size, interpolation="lanczos"):
+    return transforms.Compose(
+        [
+            transforms.Resize(int(size / 0.9), interpolation),
+            RandomCrop(size),
+            transforms.ToTensor(),
+            transforms.Normalize(0.5, 0.5),
+        ]
+    )
+
+
+def read_file_list(file_list):
+    """Read a `file_list` of `<filelist path> [weight]` lines into the part file names of every filelist."""
+    filenames = []
+    with open(file_list, "r") as f:
+        for file_l in f.read().strip().split("\n"):
+            with open(file_l.split(" ")[0], "r") as part_f:
+                filenames.extend(part_f.read().strip().split("\n"))
+    return filenames
+
+
 class TextImagePair(IterableDataset):
     def __init__(
         self,
@@ -88,14 +135,7 @@ class TextImagePair(IterableDataset):
     ):
         self.size = size
         if image_processing is None:
-            self.image_processing = transforms.Compose(
-                [
-                    transforms.Resize(int(size / 0.9), interpolation),
-                    RandomCrop(size),
-                    transforms.ToTensor(),
-                    transforms.Normalize(0.5, 0.5),
-                ]
-            )
+            self.image_processing = default_image_processing(size, interpolation)
         else:
             self.image_processing = image_processing
         self.text_processing = lambda caption: tokenizer(
@@ -141,35 +181,18 @@ class TextImagePair(IterableDataset):
             random.shuffle(file_ids)
             for i in file_ids:
                 filename = filenames[i].strip("\n")
-                with gzip.open(filename, "rb") if filename.endswith(".gz") else open(filename, "rb") as f:
-                    # retry = 0
-                    while True:
-                        line = f.readline()
-
-                        if line == b"":
-                            break
-                        try:
-                            try:
-                                line = line.decode(encoding="utf-8")
-                            except Exception:
-                                line = line.decode(encoding="gb18030")
-                        except Exception:
-                            print(f"error on file {filename}")
-                            continue
-                        data = parse_line(line, filename)
-                        if data is None:
-                            # retry += 1
-                            # if retry > 100:
-                            #     break
+                for line in read_lines(filename):
+                    data = parse_line(line, filename)
+                    if data is None:
+                        continue
+                    else:
+                        w, h = data["image"].size
+                        if w < self.size or h < self.size:
                             continue
-                        else:
-                            w, h = data["image"].size
-                            if w < self.size or h < self.size:
-                                continue
-                            yield {
-                                "pixel_values": self.image_processing(data["image"]),
-                                "input_ids": self.text_processing(data["caption"]),
-                            }
+                        yield {
+                            "pixel_values": self.image_processing(data["image"]),
+                            "input_ids": self.text_processing(data["caption"]),
+                        }
 
     def random_load_from_multi_dataset(self):
         print(f"lengths of self.file_ids in random_load: {[len(f) for f in self.file_ids]}")
@@ -209,6 +232,177 @@ class TextImagePair(IterableDataset):
         return self.shuffle(iter(self.random_load_from_multi_dataset()))
 
 
+def _shard_paths(data_dir, name):
+    prefix = os.path.join(data_dir, name)
+    return prefix + ".bin", prefix + ".offsets.npy", prefix + ".input_ids.npy"
+
+
+def pack_text_image_shards(file_list, output_dir, tokenizer, min_size, samples_per_shard=10000, batch_size=1024):
+    """
+    Pack the TSV parts of `file_list` into binary shards for [`PackedTextImagePair`].
+
+    Each shard stores the raw image bytes back to back in `<name>.bin`, their `[start, end)` offsets in
+    `<name>.offsets.npy` and the padded `input_ids` of the captions in `<name>.input_ids.npy`. Images smaller than
+    `min_size` are dropped here, their size is read from the image header without decoding the pixels. The file
+    weights of `file_list` are ignored, pack each data source into its own directory to keep them apart.
+
+    Returns:
+        `int`: The number of packed samples.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    max_length = tokenizer.model_max_length
+
+    def tokenize(captions):
+        return tokenizer(
+            captions, padding="max_length", truncation=True, max_length=max_length, return_tensors="np"
+        ).input_ids.astype("int32")
+
+    shards = []
+    captions, images = [], []
+
+    def write_shard():
+        name = f"shard-{len(shards):05d}"
+        bin_path, offsets_path, input_ids_path = _shard_paths(output_dir, name)
+        with open(bin_path, "wb") as f:
+            for img_bytes in images:
+                f.write(img_bytes)
+        ends = np.cumsum([len(img_bytes) for img_bytes in images], dtype="int64")
+        np.save(offsets_path, np.stack([ends - np.array([len(img_bytes) for img_bytes in images]), ends], axis=1))
+        input_ids = [tokenize(captions[i : i + batch_size]) for i in range(0, len(captions), batch_size)]
+        np.save(input_ids_path, np.concatenate(input_ids))
+        shards.append({"name": name, "num_samples": len(images)})
+        print(f"packed {len(images)} samples into {bin_path}")
+        captions.clear()
+        images.clear()
+
+    for filename in read_file_list(file_list):
+        filename = filename.strip("\n")
+        for line in read_lines(filename):
+            try:
+                caption, img_bytes = parse_record(line, filename)
+                w, h = Image.open(io.BytesIO(img_bytes)).size
+            except Exception:
+                print(f"error when parse file {filename}")
+                continue
+            if w < min_size or h < min_size:
+                continue
+            captions.append(caption)
+            images.append(img_bytes)
+            if len(images) == samples_per_shard:
+                write_shard()
+    if len(images) > 0:
+        write_shard()
+
+    index = {
+        "shards": shards,
+        "min_size": min_size,
+        "max_length": max_length,
+        "uncond_input_ids": tokenize([""])[0].tolist(),
+    }
+    with open(os.path.join(output_dir, "index.json"), "w") as f:
+        json.dump(index, f, indent=2)
+    return sum(shard["num_samples"] for shard in shards)
+
+
+class PackedTextImagePair(IterableDataset):
+    """
+    Read the shards written by [`pack_text_image_shards`] through mmap.
+
+    Samples can be read by index, iterating gives an endless stream in which every shard goes to exactly one
+    (rank, dataloader worker) pair per epoch, the order only depends on `seed` and the epoch. If there are fewer
+    shards than readers, the samples are strided over the readers instead.
+
+    Args:
+        data_dir (`str`): The `output_dir` the shards were packed into.
+        size (`int`): The resolution of the training images.
+        num_records (`int`, *optional*): The reported length, defaults to the number of packed samples.
+        drop_caption_prob (`float`, *optional*, defaults to 0.1):
+            The probability of replacing a caption with the empty one while iterating.
+        seed (`int`, *optional*, defaults to 0): The seed of the shuffling and the caption dropping.
+    """
+
+    def __init__(
+        self,
+        data_dir,
+        size,
+        num_records=None,
+        image_processing=None,
+        interpolation="lanczos",
+        drop_caption_prob=0.1,
+        seed=0,
+    ):
+        self.data_dir = data_dir
+        self.size = size
+        if image_processing is None:
+            self.image_processing = default_image_processing(size, interpolation)
+        else:
+            self.image_processing = image_processing
+        with open(os.path.join(data_dir, "index.json"), "r") as f:
+            index = json.load(f)
+        self.shards = index["shards"]
+        self.uncond_input_ids = np.array(index["uncond_input_ids"], dtype="int64")
+        self.shard_ends = np.cumsum([shard["num_samples"] for shard in self.shards])
+        self.num_samples = int(self.shard_ends[-1]) if len(self.shards) > 0 else 0
+        self.num_records = num_records if num_records is not None else self.num_samples
+        self.drop_caption_prob = drop_caption_prob
+        self.seed = seed if seed is not None else 0
+        # opened lazily, so that every dataloader worker maps the files itself
+        self._opened = {}
+
+    def _open(self, shard_id):
+        if shard_id not in self._opened:
+            bin_path, offsets_path, input_ids_path = _shard_paths(self.data_dir, self.shards[shard_id]["name"])
+            self._opened[shard_id] = (
+                np.memmap(bin_path, dtype="uint8", mode="r"),
+                np.load(offsets_path, mmap_mode="r"),
+                np.load(input_ids_path, mmap_mode="r"),
+            )
+        return self._opened[shard_id]
+
+    def _load(self, shard_id, local_id, drop_caption=False):
+        data, offsets, input_ids = self._open(shard_id)
+        start, end = offsets[local_id]
+        image = Image.open(io.BytesIO(data[start:end].tobytes())).convert("RGB")
+        input_ids = self.uncond_input_ids if drop_caption else input_ids[local_id].astype("int64")
+        return {
+            "pixel_values": self.image_processing(image),
+            "input_ids": paddle.to_tensor(input_ids),
+        }
+
+    def _locate(self, idx):
+        shard_id = int(np.searchsorted(self.shard_ends, idx, side="right"))
+        return shard_id, idx - (int(self.shard_ends[shard_id - 1]) if shard_id > 0 else 0)
+
+    def __getitem__(self, idx):
+        return self._load(*self._locate(idx))
+
+    def __len__(self):
+        return self.num_records
+
+    def reader_id(self):
+        """The global id of this (rank, dataloader worker) pair and the total number of them."""
+        worker_info = get_worker_info()
+        num_workers = worker_info.num_workers if worker_info is not None else 1
+        worker_id = worker_info.id if worker_info is not None else 0
+        return dist.get_rank() * num_workers + worker_id, dist.get_world_size() * num_workers
+
+    def __iter__(self):
+        reader_id, num_readers = self.reader_id()
+        epoch = 0
+        while True:
+            # the shard order is shared by all readers, the sample order and caption dropping are per reader
+            shard_order = np.random.RandomState([self.seed, epoch]).permutation(len(self.shards))
+            rng = np.random.RandomState([self.seed, epoch, reader_id])
+            if len(self.shards) >= num_readers:
+                for shard_id in shard_order[reader_id::num_readers]:
+                    for local_id in rng.permutation(self.shards[shard_id]["num_samples"]):
+                        yield self._load(shard_id, local_id, rng.rand() < self.drop_caption_prob)
+            else:
+                for idx in rng.permutation(np.arange(reader_id, self.num_samples, num_readers)):
+                    yield self._load(*self._locate(idx), rng.rand() < self.drop_caption_prob)
+            epoch += 1
+
+
 def worker_init_fn(_):
     worker_info = get_worker_info()
     dataset = worker_info.dataset
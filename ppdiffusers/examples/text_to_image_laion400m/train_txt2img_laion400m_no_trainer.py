@@ -26,6 +26,7 @@ from ldm import (
     LatentDiffusionModel,
     ModelArguments,
     NoTrainerTrainingArguments,
+    PackedTextImagePair,
     TextImagePair,
     worker_init_fn,
 )
@@ -99,15 +100,24 @@ def main():
         if training_args.max_grad_norm is not None and training_args.max_grad_norm > 0
         else None,
     )
-    train_dataset = TextImagePair(
-        file_list=data_args.file_list,
-        size=data_args.resolution,
-        num_records=data_args.num_records,
-        buffer_size=data_args.buffer_size,
-        shuffle_every_n_samples=data_args.shuffle_every_n_samples,
-        interpolation="lanczos",
-        tokenizer=model.tokenizer,
-    )
+    if data_args.packed_data_dir is not None:
+        train_dataset = PackedTextImagePair(
+            data_args.packed_data_dir,
+            size=data_args.resolution,
+            num_records=data_args.num_records,
+            interpolation="lanczos",
+            seed=training_args.seed,
+        )
+    else:
+        train_dataset = TextImagePair(
+            file_list=data_args.file_list,
+            size=data_args.resolution,
+            num_records=data_args.num_records,
+            buffer_size=data_args.buffer_size,
+            shuffle_every_n_samples=data_args.shuffle_every_n_samples,
+            interpolation="lanczos",
+            tokenizer=model.tokenizer,
+        )
 
     if num_processes > 1:
         model = paddle.DataParallel(model)
@@ -116,7 +126,7 @@ def main():
         train_dataset,
         batch_size=training_args.per_device_train_batch_size,
         num_workers=training_args.dataloader_num_workers,
-        worker_init_fn=worker_init_fn,
+        worker_init_fn=worker_init_fn if isinstance(train_dataset, TextImagePair) else None,
     )
 
     if rank == 0:
@@ -21,6 +21,7 @@ from ldm import (
     LatentDiffusionModel,
     LatentDiffusionTrainer,
     ModelArguments,
+    PackedTextImagePair,
     TextImagePair,
 )
 from paddlenlp.trainer import PdArgumentParser, TrainingArguments, get_last_checkpoint
@@ -62,15 +63,24 @@ def main():
             )
 
     model = LatentDiffusionModel(model_args)
-    train_dataset = TextImagePair(
-        file_list=data_args.file_list,
-        size=data_args.resolution,
-        num_records=data_args.num_records,
-        buffer_size=data_args.buffer_size,
-        shuffle_every_n_samples=data_args.shuffle_every_n_samples,
-        interpolation="lanczos",
-        tokenizer=model.tokenizer,
-    )
+    if data_args.packed_data_dir is not None:
+        train_dataset = PackedTextImagePair(
+            data_args.packed_data_dir,
+            size=data_args.resolution,
+            num_records=data_args.num_records,
+            interpolation="lanczos",
+            seed=training_args.seed,
+        )
+    else:
+        train_dataset = TextImagePair(
+            file_list=data_args.file_list,
+            size=data_args.resolution,
+            num_records=data_args.num_records,
+            buffer_size=data_args.buffer_size,
+            shuffle_every_n_samples=data_args.shuffle_every_n_samples,
+            interpolation="lanczos",
+            tokenizer=model.tokenizer,
+        )
 
     if model_args.to_static:
         input_ids = paddle.static.InputSpec(name="input_ids", shape=[-1, model_args.model_max_length], dtype="int64")
@@ -196,6 +196,8 @@ else:
         ShapEPipeline,
         StableDiffusionAdapterPipeline,
         StableDiffusionAttendAndExcitePipeline,
+        StableDiffusionBatchingServer,
+        StableDiffusionContinuousBatchingServer,
         StableDiffusionControlNetImg2ImgPipeline,
         StableDiffusionControlNetInpaintPipeline,
         StableDiffusionControlNetPipeline,
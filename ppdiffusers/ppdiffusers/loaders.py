@@ -38,6 +38,7 @@ from .utils import (
     TO_DIFFUSERS,
     _get_model_file,
     deprecate,
+    invalidate_prompt_embeds_cache,
     is_omegaconf_available,
     is_paddlenlp_available,
     is_safetensors_available,
@@ -117,7 +118,29 @@ class PatchedLoraProjection(nn.Layer):
 
         self.lora_scale = lora_scale
 
+    def _fuse_lora(self, lora_scale=1.0):
+        from .models.lora import fuse_lora_weight
+
+        if self.lora_linear_layer is None:
+            return
+        self._fused_lora = (
+            self.lora_linear_layer,
+            fuse_lora_weight(self.regular_linear_layer, self.lora_linear_layer, lora_scale),
+        )
+        self.lora_linear_layer = None
+
+    def _unfuse_lora(self):
+        from .models.lora import unfuse_lora_weight
+
+        if getattr(self, "_fused_lora", None) is None:
+            return
+        self.lora_linear_layer, original_weight = self._fused_lora
+        unfuse_lora_weight(self.regular_linear_layer, original_weight)
+        self._fused_lora = None
+
     def forward(self, input):
+        if self.lora_linear_layer is None:
+            return self.regular_linear_layer(input)
         return self.regular_linear_layer(input) + self.lora_scale * self.lora_linear_layer(input)
 
 
@@ -561,6 +584,146 @@ class UNet2DConditionLoadersMixin:
             # if hasattr(target_module, "set_lora_layer"):
             #     target_module.set_lora_layer(lora_layer)
 
+    def load_lora_adapters(
+        self, adapters: Dict[str, Dict[str, paddle.Tensor]], network_alphas: Optional[Dict[str, Dict]] = None
+    ):
+        r"""
+        Load several LoRA adapters at once and keep them resident side by side, so that every image of a batch can
+        use a different one, see [`~loaders.UNet2DConditionLoadersMixin.set_lora_adapters`]. The low-rank matrices of
+        all adapters are stacked per layer and applied with one batched matmul, instead of reloading the weights
+        whenever the requested LoRA changes.
+
+        Parameters:
+            adapters (`Dict[str, Dict[str, paddle.Tensor]]`):
+                The adapter names and their LoRA state dicts in any format supported by
+                [`~loaders.UNet2DConditionLoadersMixin.load_attn_procs`].
+            network_alphas (`Dict[str, Dict[str, float]]`, *optional*):
+                The `network_alphas` of the adapters, by adapter name.
+        """
+        from .models.lora import MultiLoRAConv2dLayer, MultiLoRALinearLayer
+
+        network_alphas = network_alphas or {}
+        adapter_names = list(adapters.keys())
+        if len(adapter_names) == 0:
+            raise ValueError("`adapters` has to contain at least one LoRA state dict.")
+
+        original_processors = self.attn_processors
+        lora_modules = {name: module for name, module in self.named_sublayers() if hasattr(module, "set_lora_layer")}
+        original_lora_layers = {name: module.lora_layer for name, module in lora_modules.items()}
+
+        # load every adapter on its own and collect its LoRA layers, one list entry per adapter
+        processor_templates = {}
+        processor_layers = defaultdict(lambda: [None] * len(adapter_names))
+        module_layers = defaultdict(lambda: [None] * len(adapter_names))
+        try:
+            for i, adapter_name in enumerate(adapter_names):
+                self.load_attn_procs(dict(adapters[adapter_name]), network_alphas=network_alphas.get(adapter_name))
+                for key, processor in self.attn_processors.items():
+                    if processor is original_processors[key] or not isinstance(processor, nn.Layer):
+                        continue
+                    processor_templates.setdefault(key, processor)
+                    for layer_name, layer in processor.named_children():
+                        if layer_name.endswith("_lora"):
+                            processor_layers[(key, layer_name)][i] = layer
+                for name, module in lora_modules.items():
+                    if module.lora_layer is not original_lora_layers[name]:
+                        module_layers[name][i] = module.lora_layer
+                    module.set_lora_layer(original_lora_layers[name])
+                self.set_attn_processor(dict(original_processors))
+        finally:
+            self.set_attn_processor(dict(original_processors))
+            for name, module in lora_modules.items():
+                module.set_lora_layer(original_lora_layers[name])
+
+        # every attention without a LoRA keeps its processor, the others get one with the packed layers
+        attn_processors = dict(original_processors)
+        for (key, layer_name), layers in processor_layers.items():
+            setattr(processor_templates[key], layer_name, MultiLoRALinearLayer(layers))
+        attn_processors.update(processor_templates)
+        self.set_attn_processor(attn_processors)
+        for name, layers in module_layers.items():
+            layer = next(layer for layer in layers if layer is not None)
+            multi_lora_class = MultiLoRAConv2dLayer if isinstance(layer.down, nn.Conv2D) else MultiLoRALinearLayer
+            lora_modules[name].set_lora_layer(multi_lora_class(layers))
+
+        self._lora_adapter_names = adapter_names
+        self._lora_adapter_ids = None
+
+    def set_lora_adapters(self, adapters: Optional[List[Optional[Union[str, int]]]]):
+        r"""
+        Select the LoRA adapter of every image in the batch after
+        [`~loaders.UNet2DConditionLoadersMixin.load_lora_adapters`].
+
+        Parameters:
+            adapters (`List[Union[str, int, None]]`, *optional*):
+                One adapter name or index per image, `None` for an image without LoRA. With classifier free guidance
+                the list is repeated for the unconditional half of the batch. `None` instead of a list disables all
+                adapters.
+        """
+        from .models.lora import MultiLoRAConv2dLayer, MultiLoRALinearLayer
+
+        adapter_names = getattr(self, "_lora_adapter_names", None)
+        if adapter_names is None:
+            raise ValueError("No LoRA adapters are loaded, call `load_lora_adapters` first.")
+
+        ids = adapter_ids = None
+        if adapters is not None:
+            ids = []
+            for adapter in adapters:
+                if adapter is None:
+                    ids.append(-1)
+                elif isinstance(adapter, int):
+                    if not 0 <= adapter < len(adapter_names):
+                        raise ValueError(f"There is no LoRA adapter {adapter}, {len(adapter_names)} are loaded.")
+                    ids.append(adapter)
+                elif adapter in adapter_names:
+                    ids.append(adapter_names.index(adapter))
+                else:
+                    raise ValueError(f"Unknown LoRA adapter {adapter}, the loaded adapters are {adapter_names}.")
+            adapter_ids = paddle.to_tensor(ids, dtype="int64")
+
+        for layer in self.sublayers():
+            if isinstance(layer, (MultiLoRALinearLayer, MultiLoRAConv2dLayer)):
+                layer.adapter_ids = adapter_ids
+        # part of the key of the latent checkpoints
+        self._lora_adapter_ids = ids
+
+    def unload_lora_adapters(self):
+        r"""
+        Remove the adapters of [`~loaders.UNet2DConditionLoadersMixin.load_lora_adapters`] and restore the default
+        attention processors.
+        """
+        self.set_default_attn_processor()
+        for _, module in self.named_sublayers():
+            if hasattr(module, "set_lora_layer"):
+                module.set_lora_layer(None)
+        self._lora_adapter_names = None
+        self._lora_adapter_ids = None
+
+    def fuse_lora(self, lora_scale: float = 1.0):
+        r"""
+        Fold the loaded LoRA layers into the weights of the layers they update, so that inference runs at the speed
+        of the base model. The original weights are kept on the host and restored exactly by
+        [`~loaders.UNet2DConditionLoadersMixin.unfuse_lora`].
+
+        Parameters:
+            lora_scale (`float`, *optional*, defaults to 1.0):
+                The scale of the LoRA update, it replaces the `scale` of `cross_attention_kwargs` while fused.
+        """
+        if getattr(self, "_lora_adapter_names", None) is not None:
+            raise ValueError("Packed LoRA adapters can not be fused, call `unload_lora_adapters` first.")
+        for module in self.sublayers():
+            if hasattr(module, "_fuse_lora"):
+                module._fuse_lora(lora_scale)
+
+    def unfuse_lora(self):
+        r"""
+        Restore the weights and LoRA layers changed by [`~loaders.UNet2DConditionLoadersMixin.fuse_lora`].
+        """
+        for module in self.sublayers():
+            if hasattr(module, "_unfuse_lora"):
+                module._unfuse_lora()
+
     def save_attn_procs(
         self,
         save_directory: Union[str, os.PathLike],
@@ -991,6 +1154,7 @@ class TextualInversionLoaderMixin:
         with paddle.no_grad():
             for token_id, embedding in token_ids_and_embeddings:
                 self.text_encoder.get_input_embeddings().weight[token_id] = embedding
+        invalidate_prompt_embeds_cache(self.tokenizer, self.text_encoder)
 
 
 class LoraLoaderMixin:
@@ -1025,6 +1189,8 @@ class LoraLoaderMixin:
             text_encoder=self.text_encoder,
             lora_scale=self.lora_scale,
         )
+        if hasattr(self, "clear_latent_checkpoints"):
+            self.clear_latent_checkpoints()
 
     @classmethod
     def lora_state_dict(
@@ -1326,6 +1492,13 @@ class LoraLoaderMixin:
             unet (`UNet2DConditionModel`):
                 The UNet model to load the LoRA layers into.
         """
+        state_dict, network_alphas = cls._unet_lora_state_dict(state_dict, network_alphas)
+
+        # load loras into unet
+        unet.load_attn_procs(state_dict, network_alphas=network_alphas)
+
+    @classmethod
+    def _unet_lora_state_dict(cls, state_dict, network_alphas):
         # If the serialization format is new (introduced in https://github.com/huggingface/diffusers/pull/2918),
         # then the `state_dict` keys should have `self.unet_name` and/or `self.text_encoder_name` as
         # their prefixes.
@@ -1350,8 +1523,7 @@ class LoraLoaderMixin:
             warn_message = "You have saved the LoRA weights using the old format. To convert the old LoRA weights to the new format, you can first load them in a dictionary and then create a new dictionary like the following: `new_state_dict = {f'unet'.{module_name}: params for module_name, params in old_state_dict.items()}`."
             warnings.warn(warn_message)
 
-        # load loras into unet
-        unet.load_attn_procs(state_dict, network_alphas=network_alphas)
+        return state_dict, network_alphas
 
     @classmethod
     def load_lora_into_text_encoder(cls, state_dict, network_alphas, text_encoder, prefix=None, lora_scale=1.0):
@@ -1444,6 +1616,7 @@ class LoraLoaderMixin:
                     k: v._to(dtype=text_encoder.dtype) for k, v in text_encoder_lora_state_dict.items()
                 }
                 text_encoder.load_dict(text_encoder_lora_state_dict)
+                invalidate_prompt_embeds_cache(text_encoder)
                 # load_state_dict_results = text_encoder.load_dict(text_encoder_lora_state_dict)
                 # if len(load_state_dict_results.unexpected_keys) != 0:
                 #     raise ValueError(
@@ -1473,6 +1646,7 @@ class LoraLoaderMixin:
                 mlp_module.linear1 = mlp_module.linear1.regular_linear_layer
             if isinstance(mlp_module.linear2, PatchedLoraProjection):
                 mlp_module.linear2 = mlp_module.linear2.regular_linear_layer
+        invalidate_prompt_embeds_cache(text_encoder)
 
     # @classmethod
     # def _modify_text_encoder(
@@ -1927,6 +2101,89 @@ class LoraLoaderMixin:
         new_state_dict = {**unet_state_dict, **te_state_dict}
         return new_state_dict, network_alphas
 
+    def load_lora_adapters(self, adapters: Dict[str, Union[str, Dict[str, paddle.Tensor]]], **kwargs):
+        """
+        Load several LoRA adapters into `self.unet` that stay resident together, every image of a batch then picks
+        its adapter with [`~loaders.LoraLoaderMixin.set_lora_adapters`]. Only the UNet layers of the adapters are
+        loaded, their text encoder layers are ignored.
+        See [`~loaders.UNet2DConditionLoadersMixin.load_lora_adapters`] for more details.
+        Parameters:
+            adapters (`Dict[str, Union[str, os.PathLike, dict]]`):
+                The adapter names and anything [`~loaders.LoraLoaderMixin.lora_state_dict`] accepts.
+            kwargs (`dict`, *optional*):
+                See [`~loaders.LoraLoaderMixin.lora_state_dict`].
+        """
+        state_dicts, network_alphas = {}, {}
+        for adapter_name, pretrained_model_name_or_path_or_dict in adapters.items():
+            state_dict, alphas = self.lora_state_dict(pretrained_model_name_or_path_or_dict, **dict(kwargs))
+            state_dicts[adapter_name], network_alphas[adapter_name] = self._unet_lora_state_dict(state_dict, alphas)
+        self.unet.load_lora_adapters(state_dicts, network_alphas=network_alphas)
+        if hasattr(self, "clear_latent_checkpoints"):
+            self.clear_latent_checkpoints()
+
+    def set_lora_adapters(self, adapters: Optional[List[Optional[Union[str, int]]]]):
+        """
+        Select the adapter of [`~loaders.LoraLoaderMixin.load_lora_adapters`] for every generated image, in the order
+        of the prompts and with `num_images_per_prompt` consecutive entries per prompt. `None` disables them.
+        See [`~loaders.UNet2DConditionLoadersMixin.set_lora_adapters`] for more details.
+        """
+        self.unet.set_lora_adapters(adapters)
+
+    def unload_lora_adapters(self):
+        """
+        Unloads the adapters of [`~loaders.LoraLoaderMixin.load_lora_adapters`].
+        """
+        self.unet.unload_lora_adapters()
+        if hasattr(self, "clear_latent_checkpoints"):
+            self.clear_latent_checkpoints()
+
+    def _lora_text_encoders(self):
+        return [
+            text_encoder
+            for text_encoder in (getattr(self, "text_encoder", None), getattr(self, "text_encoder_2", None))
+            if text_encoder is not None
+        ]
+
+    def fuse_lora(self, fuse_unet: bool = True, fuse_text_encoder: bool = True, lora_scale: float = 1.0):
+        """
+        Fold the LoRA layers into the weights of `self.unet` and the text encoders, which removes the LoRA overhead
+        from every denoising step. [`~loaders.LoraLoaderMixin.unfuse_lora`] restores the original weights exactly.
+        Calling [`~loaders.LoraLoaderMixin.unload_lora_weights`] after fusing keeps the fused weights and drops the
+        LoRA layers, e.g. before exporting a single style model.
+        Parameters:
+            fuse_unet (`bool`, defaults to `True`): Whether to fuse the UNet LoRA layers.
+            fuse_text_encoder (`bool`, defaults to `True`): Whether to fuse the text encoder LoRA layers.
+            lora_scale (`float`, defaults to 1.0): The scale of the fused LoRA update.
+        """
+        if fuse_unet:
+            self.unet.fuse_lora(lora_scale)
+        if fuse_text_encoder:
+            for text_encoder in self._lora_text_encoders():
+                for module in text_encoder.sublayers():
+                    if isinstance(module, PatchedLoraProjection):
+                        module._fuse_lora(lora_scale)
+                invalidate_prompt_embeds_cache(text_encoder)
+        if hasattr(self, "clear_latent_checkpoints"):
+            self.clear_latent_checkpoints()
+
+    def unfuse_lora(self, unfuse_unet: bool = True, unfuse_text_encoder: bool = True):
+        """
+        Restore the weights changed by [`~loaders.LoraLoaderMixin.fuse_lora`].
+        Parameters:
+            unfuse_unet (`bool`, defaults to `True`): Whether to unfuse the UNet LoRA layers.
+            unfuse_text_encoder (`bool`, defaults to `True`): Whether to unfuse the text encoder LoRA layers.
+        """
+        if unfuse_unet:
+            self.unet.unfuse_lora()
+        if unfuse_text_encoder:
+            for text_encoder in self._lora_text_encoders():
+                for module in text_encoder.sublayers():
+                    if isinstance(module, PatchedLoraProjection):
+                        module._unfuse_lora()
+                invalidate_prompt_embeds_cache(text_encoder)
+        if hasattr(self, "clear_latent_checkpoints"):
+            self.clear_latent_checkpoints()
+
     def unload_lora_weights(self):
         """
         Unloads the LoRA parameters.
@@ -1968,8 +2225,15 @@ class LoraLoaderMixin:
                 if hasattr(module, "set_lora_layer"):
                     module.set_lora_layer(None)
 
+        # fused LoRA layers stay fused, only their copies of the original weights are dropped
+        for module in self.unet.sublayers():
+            if getattr(module, "_fused_lora", None) is not None:
+                module._fused_lora = None
+
         # Safe to call the following regardless of LoRA.
         self._remove_text_encoder_monkey_patch()
+        if hasattr(self, "clear_latent_checkpoints"):
+            self.clear_latent_checkpoints()
 
 
 class FromSingleFileMixin:
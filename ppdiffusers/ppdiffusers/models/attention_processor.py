@@ -19,7 +19,7 @@ import paddle.nn as nn
 import paddle.nn.functional as F
 
 from ..utils import deprecate, is_ppxformers_available, logging
-from .lora import LoRALinearLayer
+from .lora import LoRALinearLayer, fuse_lora_weight, unfuse_lora_weight
 
 logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
 
@@ -275,6 +275,35 @@ class Attention(nn.Layer):
 
         self.processor = processor
 
+    def _fuse_lora(self, lora_scale=1.0):
+        processor = self.processor
+        if not isinstance(processor, LORA_ATTENTION_PROCESSORS):
+            return
+        original_weights = {}
+        for name, lora_layer in processor.named_children():
+            if name.endswith("_lora"):
+                layer = self.to_out[0] if name == "to_out_lora" else getattr(self, name[: -len("_lora")])
+                original_weights[name] = fuse_lora_weight(layer, lora_layer, lora_scale)
+
+        if isinstance(processor, LoRAAttnAddedKVProcessor):
+            self.set_processor(AttnAddedKVProcessor())
+        elif isinstance(processor, LoRAXFormersAttnProcessor):
+            self.set_processor(XFormersAttnProcessor(attention_op=processor.attention_op))
+        else:
+            self.set_processor(AttnProcessor())
+        # a tuple, so that the LoRA processor and the original weights are not registered as sublayer or buffer
+        self._fused_lora = (processor, original_weights)
+
+    def _unfuse_lora(self):
+        if getattr(self, "_fused_lora", None) is None:
+            return
+        processor, original_weights = self._fused_lora
+        for name, original_weight in original_weights.items():
+            layer = self.to_out[0] if name == "to_out_lora" else getattr(self, name[: -len("_lora")])
+            unfuse_lora_weight(layer, original_weight)
+        self.set_processor(processor)
+        self._fused_lora = None
+
     def forward(self, hidden_states, encoder_hidden_states=None, attention_mask=None, **cross_attention_kwargs):
         # The `Attention` class can call different attention processors / attention functions
         # here we simply pass along all tensors to the selected processor class
@@ -15,6 +15,7 @@
 from dataclasses import dataclass
 from typing import Dict, Optional, Tuple, Union
 
+import numpy as np
 import paddle
 import paddle.nn as nn
 
@@ -137,18 +138,26 @@ class AutoencoderKL(ModelMixin, ConfigMixin, FromOriginalVAEMixin):
         )
         self.tile_latent_min_size = int(sample_size / (2 ** (len(_up_block_out_channels) - 1)))
         self.tile_overlap_factor = 0.25
+        self.tile_batch_size = 1
 
     def _set_gradient_checkpointing(self, module, value=False):
         if isinstance(module, (Encoder, Decoder)):
             module.gradient_checkpointing = value
 
-    def enable_tiling(self, use_tiling: bool = True):
+    def enable_tiling(self, use_tiling: bool = True, tile_batch_size: Optional[int] = None):
         r"""
         Enable tiled VAE decoding. When this option is enabled, the VAE will split the input tensor into tiles to
         compute decoding and encoding in several steps. This is useful for saving a large amount of memory and to allow
         processing larger images.
+
+        Args:
+            tile_batch_size (`int`, *optional*):
+                How many tiles of a row are run through the encoder or decoder together. Larger values keep the device
+                busier at the cost of more activation memory, leave it unset to keep the current value (1 by default).
         """
         self.use_tiling = use_tiling
+        if tile_batch_size is not None:
+            self.tile_batch_size = tile_batch_size
 
     def disable_tiling(self):
         r"""
@@ -295,7 +304,77 @@ class AutoencoderKL(ModelMixin, ConfigMixin, FromOriginalVAEMixin):
             b[:, :, :, x] = a[:, :, :, -blend_extent + x] * (1 - x / blend_extent) + b[:, :, :, x] * (x / blend_extent)
         return b
 
-    def tiled_encode(self, x: paddle.Tensor, return_dict: bool = True) -> AutoencoderKLOutput:
+    def _tiled_forward(self, x, tile_fn, tile_size, overlap_size, blend_extent, row_limit, output=None):
+        r"""
+        Run `tile_fn` over overlapping tiles of `x` and blend the results, one row of tiles at a time.
+
+        The tiles of a row are run in micro-batches of `tile_batch_size` and every finished row is cropped and emitted
+        right away, so only the current and the previous (needed for the vertical blend) rows of tiles are alive. If
+        `output` is given, rows are written into it instead of being concatenated.
+        """
+        batch_size = x.shape[0]
+        tile_batch_size = max(1, self.tile_batch_size)
+        prev_row = None
+        result_rows = []
+        offset = 0
+        for i in range(0, x.shape[2], overlap_size):
+            tiles = [x[:, :, i : i + tile_size, j : j + tile_size] for j in range(0, x.shape[3], overlap_size)]
+
+            row = []
+            start = 0
+            while start < len(tiles):
+                # tiles at the right border may be smaller, only batch the ones sharing a shape
+                end = start + 1
+                while end < len(tiles) and end - start < tile_batch_size and tiles[end].shape == tiles[start].shape:
+                    end += 1
+                if end - start == 1:
+                    row.append(tile_fn(tiles[start]))
+                else:
+                    row.extend(tile_fn(paddle.concat(tiles[start:end])).split(end - start))
+                start = end
+
+            result_row = []
+            for j, tile in enumerate(row):
+                # blend the above tile and the left tile
+                # to the current tile and add the current tile to the result row
+                if prev_row is not None:
+                    tile = self.blend_v(prev_row[j], tile, blend_extent)
+                if j > 0:
+                    tile = self.blend_h(row[j - 1], tile, blend_extent)
+                result_row.append(tile[:, :, :row_limit, :row_limit])
+            result_row = paddle.concat(result_row, axis=3)
+            prev_row = row
+
+            if output is None:
+                result_rows.append(result_row)
+                continue
+            row_height = result_row.shape[2]
+            if (
+                output.shape[0] != batch_size
+                or offset + row_height > output.shape[2]
+                or list(output.shape[1:2]) + list(output.shape[3:]) != [result_row.shape[1], result_row.shape[3]]
+            ):
+                raise ValueError(
+                    f"`output` of shape {list(output.shape)} cannot hold a tiled result row of shape "
+                    f"{result_row.shape} at height offset {offset}."
+                )
+            if isinstance(output, paddle.Tensor):
+                output[:, :, offset : offset + row_height, :] = result_row.cast(output.dtype)
+            else:
+                output[:, :, offset : offset + row_height, :] = result_row.numpy().astype(output.dtype)
+            offset += row_height
+
+        if output is None:
+            return paddle.concat(result_rows, axis=2)
+        if offset != output.shape[2]:
+            raise ValueError(
+                f"`output` of shape {list(output.shape)} has {output.shape[2] - offset} rows left unfilled."
+            )
+        return output
+
+    def tiled_encode(
+        self, x: paddle.Tensor, return_dict: bool = True, output: Optional[Union[paddle.Tensor, np.ndarray]] = None
+    ) -> AutoencoderKLOutput:
         r"""Encode a batch of images using a tiled encoder.
         When this option is enabled, the VAE will split the input tensor into tiles to compute encoding in several
         steps. This is useful to keep memory use constant regardless of image size. The end result of tiled encoding is
@@ -306,6 +385,9 @@ class AutoencoderKL(ModelMixin, ConfigMixin, FromOriginalVAEMixin):
             x (`paddle.Tensor`): Input batch of images.
             return_dict (`bool`, *optional*, defaults to `True`):
                 Whether or not to return a [`~models.autoencoder_kl.AutoencoderKLOutput`] instead of a plain tuple.
+            output (`paddle.Tensor` or `np.ndarray`, *optional*):
+                A preallocated buffer of the moments' shape, `[batch, 2 * latent_channels, height // 8, width // 8]`
+                for the default config. The blended rows are written into it as soon as they are finished.
         Returns:
             [`~models.autoencoder_kl.AutoencoderKLOutput`] or `tuple`:
                 If return_dict is True, a [`~models.autoencoder_kl.AutoencoderKLOutput`] is returned, otherwise a plain
@@ -316,29 +398,17 @@ class AutoencoderKL(ModelMixin, ConfigMixin, FromOriginalVAEMixin):
         row_limit = self.tile_latent_min_size - blend_extent
 
         # Split the image into 512x512 tiles and encode them separately.
-        rows = []
-        for i in range(0, x.shape[2], overlap_size):
-            row = []
-            for j in range(0, x.shape[3], overlap_size):
-                tile = x[:, :, i : i + self.tile_sample_min_size, j : j + self.tile_sample_min_size]
-                tile = self.encoder(tile)
-                tile = self.quant_conv(tile)
-                row.append(tile)
-            rows.append(row)
-        result_rows = []
-        for i, row in enumerate(rows):
-            result_row = []
-            for j, tile in enumerate(row):
-                # blend the above tile and the left tile
-                # to the current tile and add the current tile to the result row
-                if i > 0:
-                    tile = self.blend_v(rows[i - 1][j], tile, blend_extent)
-                if j > 0:
-                    tile = self.blend_h(row[j - 1], tile, blend_extent)
-                result_row.append(tile[:, :, :row_limit, :row_limit])
-            result_rows.append(paddle.concat(result_row, axis=3))
-
-        moments = paddle.concat(result_rows, axis=2)
+        moments = self._tiled_forward(
+            x,
+            lambda tile: self.quant_conv(self.encoder(tile)),
+            self.tile_sample_min_size,
+            overlap_size,
+            blend_extent,
+            row_limit,
+            output=output,
+        )
+        if not isinstance(moments, paddle.Tensor):
+            moments = paddle.to_tensor(moments)
         posterior = DiagonalGaussianDistribution(moments)
 
         if not return_dict:
@@ -346,13 +416,19 @@ class AutoencoderKL(ModelMixin, ConfigMixin, FromOriginalVAEMixin):
 
         return AutoencoderKLOutput(latent_dist=posterior)
 
-    def tiled_decode(self, z: paddle.Tensor, return_dict: bool = True) -> Union[DecoderOutput, paddle.Tensor]:
+    def tiled_decode(
+        self, z: paddle.Tensor, return_dict: bool = True, output: Optional[Union[paddle.Tensor, np.ndarray]] = None
+    ) -> Union[DecoderOutput, paddle.Tensor]:
         r"""
         Decode a batch of images using a tiled decoder.
         Args:
             z (`paddle.Tensor`): Input batch of latent vectors.
             return_dict (`bool`, *optional*, defaults to `True`):
                 Whether or not to return a [`~models.vae.DecoderOutput`] instead of a plain tuple.
+            output (`paddle.Tensor` or `np.ndarray`, *optional*):
+                A preallocated buffer of the decoded shape, `[batch, out_channels, height * 8, width * 8]` for the
+                default config, e.g. a `np.memmap` to decode images larger than the host memory. The blended rows are
+                written into it as soon as they are finished and the buffer itself is returned as the sample.
         Returns:
             [`~models.vae.DecoderOutput`] or `tuple`:
                 If return_dict is True, a [`~models.vae.DecoderOutput`] is returned, otherwise a plain `tuple` is
@@ -364,29 +440,15 @@ class AutoencoderKL(ModelMixin, ConfigMixin, FromOriginalVAEMixin):
 
         # Split z into overlapping 64x64 tiles and decode them separately.
         # The tiles have an overlap to avoid seams between tiles.
-        rows = []
-        for i in range(0, z.shape[2], overlap_size):
-            row = []
-            for j in range(0, z.shape[3], overlap_size):
-                tile = z[:, :, i : i + self.tile_latent_min_size, j : j + self.tile_latent_min_size]
-                tile = self.post_quant_conv(tile)
-                decoded = self.decoder(tile)
-                row.append(decoded)
-            rows.append(row)
-        result_rows = []
-        for i, row in enumerate(rows):
-            result_row = []
-            for j, tile in enumerate(row):
-                # blend the above tile and the left tile
-                # to the current tile and add the current tile to the result row
-                if i > 0:
-                    tile = self.blend_v(rows[i - 1][j], tile, blend_extent)
-                if j > 0:
-                    tile = self.blend_h(row[j - 1], tile, blend_extent)
-                result_row.append(tile[:, :, :row_limit, :row_limit])
-            result_rows.append(paddle.concat(result_row, axis=3))
-
-        dec = paddle.concat(result_rows, axis=2)
+        dec = self._tiled_forward(
+            z,
+            lambda tile: self.decoder(self.post_quant_conv(tile)),
+            self.tile_latent_min_size,
+            overlap_size,
+            blend_extent,
+            row_limit,
+            output=output,
+        )
         if not return_dict:
             return (dec,)
 
@@ -12,13 +12,42 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Optional
+from typing import List, Optional
 
+import paddle
 import paddle.nn as nn
+import paddle.nn.functional as F
 
 from ..initializer import normal_, zeros_
 
 
+def fuse_lora_weight(layer: nn.Layer, lora_layer: nn.Layer, lora_scale: float = 1.0):
+    r"""
+    Fold the low-rank update of `lora_layer`, a [`LoRALinearLayer`] or [`LoRAConv2dLayer`], into the weight of `layer`
+    in place. Returns a host copy of the original weight that [`unfuse_lora_weight`] restores exactly.
+    """
+    if isinstance(lora_layer, _MultiLoRAMixin):
+        raise ValueError("Packed LoRA adapters are selected per batch row and can not be fused.")
+    original_weight = layer.weight.detach().clone().cpu()
+    with paddle.no_grad():
+        down = lora_layer.down.weight.cast("float32")
+        up = lora_layer.up.weight.cast("float32")
+        if down.ndim == 2:
+            delta = paddle.matmul(down, up)
+        else:
+            delta = paddle.matmul(up.flatten(1), down.flatten(1)).reshape(layer.weight.shape)
+        if lora_layer.network_alpha is not None:
+            delta = delta * (lora_layer.network_alpha / lora_layer.rank)
+        layer.weight.set_value((layer.weight.cast("float32") + lora_scale * delta).cast(layer.weight.dtype))
+    return original_weight
+
+
+def unfuse_lora_weight(layer: nn.Layer, original_weight):
+    r"""Restore the weight of `layer` from the copy returned by [`fuse_lora_weight`]."""
+    with paddle.no_grad():
+        layer.weight.set_value(original_weight.to(layer.weight.place))
+
+
 class LoRALinearLayer(nn.Layer):
     def __init__(self, in_features, out_features, rank=4, network_alpha=None, device=None, dtype=None):
         super().__init__()
@@ -112,6 +141,20 @@ class LoRACompatibleConv(nn.Conv2D):
     def set_lora_layer(self, lora_layer: Optional[LoRAConv2dLayer]):
         self.lora_layer = lora_layer
 
+    def _fuse_lora(self, lora_scale=1.0):
+        if self.lora_layer is None:
+            return
+        # a tuple, so that the LoRA layer and the original weight are not registered as sublayer or buffer
+        self._fused_lora = (self.lora_layer, fuse_lora_weight(self, self.lora_layer, lora_scale))
+        self.lora_layer = None
+
+    def _unfuse_lora(self):
+        if getattr(self, "_fused_lora", None) is None:
+            return
+        self.lora_layer, original_weight = self._fused_lora
+        unfuse_lora_weight(self, original_weight)
+        self._fused_lora = None
+
     def forward(self, x):
         if self.lora_layer is None:
             # make sure to the functional Conv2D function as otherwise torch.compile's graph will break
@@ -137,6 +180,19 @@ class LoRACompatibleLinear(nn.Linear):
     def set_lora_layer(self, lora_layer: Optional[LoRAConv2dLayer]):
         self.lora_layer = lora_layer
 
+    def _fuse_lora(self, lora_scale=1.0):
+        if self.lora_layer is None:
+            return
+        self._fused_lora = (self.lora_layer, fuse_lora_weight(self, self.lora_layer, lora_scale))
+        self.lora_layer = None
+
+    def _unfuse_lora(self):
+        if getattr(self, "_fused_lora", None) is None:
+            return
+        self.lora_layer, original_weight = self._fused_lora
+        unfuse_lora_weight(self, original_weight)
+        self._fused_lora = None
+
     def forward(self, x):
         # breakpoint()
         if self.lora_layer is None:
@@ -148,3 +204,108 @@ class LoRACompatibleLinear(nn.Linear):
             )
         else:
             return super().forward(x) + self.lora_layer(x)
+
+
+class _MultiLoRAMixin:
+    def _gather_adapters(self, batch_size):
+        adapter_ids = self.adapter_ids
+        if batch_size != adapter_ids.shape[0]:
+            if batch_size % adapter_ids.shape[0] != 0:
+                raise ValueError(
+                    f"The batch size {batch_size} is not a multiple of the {adapter_ids.shape[0]} LoRA adapter ids."
+                )
+            # classifier free guidance concatenates the unconditional and the conditional batch
+            adapter_ids = adapter_ids.tile([batch_size // adapter_ids.shape[0]])
+        index = adapter_ids.clip(min=0)
+        scales = paddle.gather(self.scales, index) * (adapter_ids >= 0).cast(self.scales.dtype)
+        return paddle.gather(self.down, index), paddle.gather(self.up, index), scales
+
+
+class MultiLoRALinearLayer(_MultiLoRAMixin, nn.Layer):
+    r"""
+    The [`LoRALinearLayer`]s of several adapters stacked into `[num_adapters, in_features, rank]` and
+    `[num_adapters, rank, out_features]` tensors, every batch row is updated with the adapter of its `adapter_ids`
+    entry in a single batched matmul. Adapters of a lower rank are zero padded, an id of -1 applies no adapter.
+    """
+
+    def __init__(self, lora_layers: List[Optional[LoRALinearLayer]]):
+        super().__init__()
+        layer = next(layer for layer in lora_layers if layer is not None)
+        in_features, out_features = layer.down.weight.shape[0], layer.up.weight.shape[1]
+        rank = max(layer.rank for layer in lora_layers if layer is not None)
+        dtype = layer.down.weight.dtype
+
+        down = paddle.zeros([len(lora_layers), in_features, rank], dtype=dtype)
+        up = paddle.zeros([len(lora_layers), rank, out_features], dtype=dtype)
+        scales = paddle.zeros([len(lora_layers)], dtype=dtype)
+        for i, layer in enumerate(lora_layers):
+            if layer is None:
+                continue
+            down[i, :, : layer.rank] = layer.down.weight
+            up[i, : layer.rank] = layer.up.weight
+            scales[i] = layer.network_alpha / layer.rank if layer.network_alpha is not None else 1.0
+        self.register_buffer("down", down)
+        self.register_buffer("up", up)
+        self.register_buffer("scales", scales)
+        # the adapter of every batch row, set by `UNet2DConditionLoadersMixin.set_lora_adapters`
+        self.register_buffer("adapter_ids", None, persistable=False)
+        self.out_features = out_features
+
+    def forward(self, hidden_states):
+        if self.adapter_ids is None:
+            return 0.0
+        orig_dtype = hidden_states.dtype
+        batch_size = hidden_states.shape[0]
+        down, up, scales = self._gather_adapters(batch_size)
+        down_hidden_states = paddle.bmm(hidden_states.cast(down.dtype).reshape([batch_size, -1, down.shape[1]]), down)
+        up_hidden_states = paddle.bmm(down_hidden_states, up) * scales.reshape([-1, 1, 1])
+        return up_hidden_states.reshape(hidden_states.shape[:-1] + [self.out_features]).cast(orig_dtype)
+
+
+class MultiLoRAConv2dLayer(_MultiLoRAMixin, nn.Layer):
+    r"""
+    The [`LoRAConv2dLayer`]s of several adapters stacked like in [`MultiLoRALinearLayer`], the batch rows are folded
+    into the channels so that one grouped convolution applies every row's adapter.
+    """
+
+    def __init__(self, lora_layers: List[Optional[LoRAConv2dLayer]]):
+        super().__init__()
+        layer = next(layer for layer in lora_layers if layer is not None)
+        _, in_features, *kernel_size = layer.down.weight.shape
+        out_features = layer.up.weight.shape[0]
+        rank = max(layer.rank for layer in lora_layers if layer is not None)
+        dtype = layer.down.weight.dtype
+
+        down = paddle.zeros([len(lora_layers), rank, in_features] + kernel_size, dtype=dtype)
+        up = paddle.zeros([len(lora_layers), out_features, rank, 1, 1], dtype=dtype)
+        scales = paddle.zeros([len(lora_layers)], dtype=dtype)
+        for i, layer in enumerate(lora_layers):
+            if layer is None:
+                continue
+            down[i, : layer.rank] = layer.down.weight
+            up[i, :, : layer.rank] = layer.up.weight
+            scales[i] = layer.network_alpha / layer.rank if layer.network_alpha is not None else 1.0
+        self.register_buffer("down", down)
+        self.register_buffer("up", up)
+        self.register_buffer("scales", scales)
+        # the adapter of every batch row, set by `UNet2DConditionLoadersMixin.set_lora_adapters`
+        self.register_buffer("adapter_ids", None, persistable=False)
+        self.stride = layer.down._stride
+        self.padding = layer.down._padding
+
+    def forward(self, hidden_states):
+        if self.adapter_ids is None:
+            return 0.0
+        orig_dtype = hidden_states.dtype
+        batch_size, channels, height, width = hidden_states.shape
+        down, up, scales = self._gather_adapters(batch_size)
+        down_hidden_states = F.conv2d(
+            hidden_states.cast(down.dtype).reshape([1, batch_size * channels, height, width]),
+            down.reshape([-1] + down.shape[2:]),
+            stride=self.stride,
+            padding=self.padding,
+            groups=batch_size,
+        )
+        up_hidden_states = F.conv2d(down_hidden_states, up.reshape([-1] + up.shape[2:]), groups=batch_size)
+        up_hidden_states = up_hidden_states.reshape([batch_size, -1] + up_hidden_states.shape[2:])
+        return (up_hidden_states * scales.reshape([-1, 1, 1, 1])).cast(orig_dtype)
@@ -14,10 +14,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 import os
+import re
 from functools import partial
-from typing import Any, Callable, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
+import numpy as np
 import paddle
 import paddle.nn as nn
 
@@ -28,19 +31,24 @@ from ..utils import (
     FROM_HF_HUB,
     HF_HUB_OFFLINE,
     LOW_CPU_MEM_USAGE_DEFAULT,
+    PADDLE_WEIGHTS_INDEX_NAME,
     PADDLE_WEIGHTS_NAME,
     PPDIFFUSERS_CACHE,
     TO_DIFFUSERS,
+    TORCH_SAFETENSORS_WEIGHTS_INDEX_NAME,
     TORCH_SAFETENSORS_WEIGHTS_NAME,
+    TORCH_WEIGHTS_INDEX_NAME,
     TORCH_WEIGHTS_NAME,
     _add_variant,
     _get_model_file,
     deprecate,
+    is_lazy_tensor,
     is_paddlenlp_available,
     is_safetensors_available,
     is_torch_available,
     is_torch_file,
     logging,
+    materialize_tensor,
     smart_load,
 )
 from ..version import VERSION as __version__
@@ -111,6 +119,106 @@ def convert_state_dict(state_dict, framework="torch"):
         raise NotImplementedError(f"Not Implemented {framework} framework!")
 
 
+def convert_file_size_to_int(size: Union[int, str]):
+    """
+    Converts a size expressed as a string with digits and a unit (like `"5MB"`) to an integer (in bytes).
+    """
+    if isinstance(size, int):
+        return size
+    size = size.upper()
+    units = {"GIB": 2**30, "MIB": 2**20, "KIB": 2**10, "GB": 10**9, "MB": 10**6, "KB": 10**3}
+    for unit, multiplier in units.items():
+        if size.endswith(unit):
+            return int(float(size[: -len(unit)]) * multiplier)
+    raise ValueError("`size` is not in a valid format. Use an integer followed by the unit, e.g., '5GB'.")
+
+
+def dtype_byte_size(dtype):
+    """
+    Returns the size (in bytes) occupied by one parameter of type `dtype`, e.g. `dtype_byte_size(paddle.float32)`
+    returns 4.
+    """
+    if "bool" in str(dtype):
+        return 1 / 8
+    bit_search = re.search(r"[^\d](\d+)$", str(dtype))
+    if bit_search is None:
+        raise ValueError(f"`dtype` is not a valid dtype: {dtype}.")
+    bit_size = int(bit_search.groups()[0])
+    return bit_size // 8
+
+
+def _add_shard_suffix(weights_name: str, shard_idx: int, num_shards: int):
+    root, ext = os.path.splitext(weights_name)
+    return f"{root}-{shard_idx:05d}-of-{num_shards:05d}{ext}"
+
+
+def shard_checkpoint(
+    state_dict: Dict[str, Any], max_shard_size: Union[int, str] = "10GB", weights_name: str = PADDLE_WEIGHTS_NAME
+):
+    """
+    Splits a model state dictionary in sub-checkpoints so that the final size of each sub-checkpoint does not exceed a
+    given size. The sub-checkpoints are determined by iterating through the `state_dict` in the order of its keys, so
+    a single weight bigger than `max_shard_size` ends up in a shard of its own.
+
+    Returns a tuple `(shards, index)`. `shards` maps each shard file name to its state dict and `index` is `None` when
+    the whole `state_dict` fits in one file, otherwise it is the content of the index json (`metadata` and
+    `weight_map`).
+    """
+    max_shard_size = convert_file_size_to_int(max_shard_size)
+
+    sharded_state_dicts = [{}]
+    last_block_size = 0
+    total_size = 0
+
+    for key, weight in state_dict.items():
+        weight_size = int(np.prod(weight.shape)) * dtype_byte_size(weight.dtype)
+
+        # If this weight is going to tip up over the maximal size, we split.
+        if last_block_size + weight_size > max_shard_size and len(sharded_state_dicts[-1]) > 0:
+            sharded_state_dicts.append({})
+            last_block_size = 0
+
+        sharded_state_dicts[-1][key] = weight
+        last_block_size += weight_size
+        total_size += weight_size
+
+    # If we only have one shard, we return it
+    if len(sharded_state_dicts) == 1:
+        return {weights_name: sharded_state_dicts[0]}, None
+
+    # Otherwise, let's build the index
+    weight_map = {}
+    shards = {}
+    for idx, shard in enumerate(sharded_state_dicts):
+        shard_file = _add_shard_suffix(weights_name, idx + 1, len(sharded_state_dicts))
+        shards[shard_file] = shard
+        for key in shard.keys():
+            weight_map[key] = shard_file
+
+    # Add the metadata
+    metadata = {"total_size": int(total_size)}
+    index = {"metadata": metadata, "weight_map": weight_map}
+    return shards, index
+
+
+def _get_checkpoint_files(pretrained_model_name_or_path, *, weights_name: str, index_name: str, **kwargs) -> List[str]:
+    """
+    Resolves the weights of a model. Returns `[weights_name]` if the single file exists, otherwise falls back to the
+    index json of a sharded checkpoint and returns every shard file it references, in order.
+    """
+    try:
+        return [_get_model_file(pretrained_model_name_or_path, weights_name=weights_name, **kwargs)]
+    except Exception as single_file_error:
+        try:
+            index_file = _get_model_file(pretrained_model_name_or_path, weights_name=index_name, **kwargs)
+        except Exception:
+            raise single_file_error
+    with open(index_file, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    shard_names = sorted(set(index["weight_map"].values()))
+    return [_get_model_file(pretrained_model_name_or_path, weights_name=name, **kwargs) for name in shard_names]
+
+
 from contextlib import ExitStack
 
 
@@ -251,6 +359,7 @@ class ModelMixin(nn.Layer):
         safe_serialization: bool = False,
         variant: Optional[str] = None,
         to_diffusers: Optional[bool] = None,
+        max_shard_size: Optional[Union[int, str]] = None,
     ):
         """
         Save a model and its configuration file to a directory so that it can be reloaded using the
@@ -271,6 +380,10 @@ class ModelMixin(nn.Layer):
                 Whether to save the model using `safetensors` or the traditional PyTorch way with `pickle`.
             variant (`str`, *optional*):
                 If specified, weights are saved in the format `pytorch_model.<variant>.bin`.
+            max_shard_size (`int` or `str`, *optional*):
+                The maximum size for a checkpoint before being sharded (e.g. `"5GB"`). If set, the weights are split
+                into shards of at most this size plus an index json, which [`~ModelMixin.from_pretrained`] loads shard
+                by shard. Defaults to a single file.
         """
         if to_diffusers is None:
             to_diffusers = TO_DIFFUSERS
@@ -308,6 +421,7 @@ class ModelMixin(nn.Layer):
                         save_function = safetensors_numpy_save_file
                         state_dict = convert_state_dict(state_dict, framework="numpy")
                     weights_name = _add_variant(TORCH_SAFETENSORS_WEIGHTS_NAME, variant)
+                    index_name = _add_variant(TORCH_SAFETENSORS_WEIGHTS_INDEX_NAME, variant)
                 else:
                     if not is_torch_available():
                         raise ImportError(
@@ -315,17 +429,45 @@ class ModelMixin(nn.Layer):
                         )
                     save_function = torch.save
                     weights_name = _add_variant(TORCH_WEIGHTS_NAME, variant)
+                    index_name = _add_variant(TORCH_WEIGHTS_INDEX_NAME, variant)
                     state_dict = convert_state_dict(state_dict, framework="torch")
 
                 state_dict = convert_paddle_state_dict_to_pytorch(state_dict, model_to_save)
             else:
                 save_function = paddle.save
                 weights_name = _add_variant(PADDLE_WEIGHTS_NAME, variant)
+                index_name = _add_variant(PADDLE_WEIGHTS_INDEX_NAME, variant)
 
-        # Save the model
-        save_function(state_dict, os.path.join(save_directory, weights_name))
+        if max_shard_size is None:
+            # Save the model
+            save_function(state_dict, os.path.join(save_directory, weights_name))
+
+            logger.info(f"Model weights saved in {os.path.join(save_directory, weights_name)}")
+            return
+
+        shards, index = shard_checkpoint(state_dict, max_shard_size=max_shard_size, weights_name=weights_name)
+
+        # Clean the folder from a previous save, which may hold shards that are not overwritten now
+        root, ext = os.path.splitext(weights_name)
+        shard_pattern = re.compile(rf"^{re.escape(root)}(-\d{{5}}-of-\d{{5}})?{re.escape(ext)}$")
+        for filename in os.listdir(save_directory):
+            is_stale_file = (shard_pattern.match(filename) and filename not in shards) or filename == index_name
+            if is_main_process and is_stale_file:
+                os.remove(os.path.join(save_directory, filename))
 
-        logger.info(f"Model weights saved in {os.path.join(save_directory, weights_name)}")
+        for shard_file, shard in shards.items():
+            save_function(shard, os.path.join(save_directory, shard_file))
+
+        if index is None:
+            logger.info(f"Model weights saved in {os.path.join(save_directory, weights_name)}")
+        else:
+            with open(os.path.join(save_directory, index_name), "w", encoding="utf-8") as f:
+                f.write(json.dumps(index, indent=2, sort_keys=True) + "\n")
+            logger.info(
+                f"The model is bigger than the maximum size per checkpoint ({max_shard_size}) and is going to be "
+                f"split in {len(shards)} checkpoint shards. You can find where each parameters has been saved in the "
+                f"index located at {os.path.join(save_directory, index_name)}."
+            )
 
     @classmethod
     def from_pretrained(cls, pretrained_model_name_or_path: Optional[Union[str, os.PathLike]], **kwargs):
@@ -407,6 +549,9 @@ class ModelMixin(nn.Layer):
                 If set to `None`, the `safetensors` weights are downloaded if they're available **and** if the
                 `safetensors` library is installed. If set to `True`, the model is forcibly loaded from `safetensors`
                 weights. If set to `False`, `safetensors` weights are not loaded.
+            lazy_load (`bool`, *optional*, defaults to `low_cpu_mem_usage`):
+                Memory-map torch / safetensors weights and only read each tensor when it is assigned to the model, so
+                that peak host memory during loading stays around one copy of the model.
 
         <Tip>
 
@@ -454,6 +599,7 @@ class ModelMixin(nn.Layer):
         offload_state_dict = kwargs.pop("offload_state_dict", False)
         ignore_keys = kwargs.pop("ignore_keys", None)
         low_cpu_mem_usage = kwargs.pop("low_cpu_mem_usage", LOW_CPU_MEM_USAGE_DEFAULT)
+        lazy_load = kwargs.pop("lazy_load", low_cpu_mem_usage)
         variant = kwargs.pop("variant", None)
         use_safetensors = kwargs.pop("use_safetensors", None)
 
@@ -495,72 +641,65 @@ class ModelMixin(nn.Layer):
             **kwargs,
         )
 
-        # This variable will flag if we're loading a sharded checkpoint. In this case the archive file is just the
+        # `model_files` holds a single file, or every shard listed in the index json of a sharded checkpoint.
         # Load model
-        model_file = None
+        model_files = None
+        get_model_file_kwargs = dict(
+            cache_dir=cache_dir,
+            force_download=force_download,
+            resume_download=resume_download,
+            proxies=proxies,
+            local_files_only=local_files_only,
+            use_auth_token=use_auth_token,
+            revision=revision,
+            subfolder=subfolder,
+            user_agent=user_agent,
+            commit_hash=commit_hash,
+            from_hf_hub=from_hf_hub,
+        )
         if from_diffusers:
             if use_safetensors:
                 try:
-                    model_file = _get_model_file(
+                    model_files = _get_checkpoint_files(
                         pretrained_model_name_or_path,
                         weights_name=_add_variant(TORCH_SAFETENSORS_WEIGHTS_NAME, variant),
-                        cache_dir=cache_dir,
-                        force_download=force_download,
-                        resume_download=resume_download,
-                        proxies=proxies,
-                        local_files_only=local_files_only,
-                        use_auth_token=use_auth_token,
-                        revision=revision,
-                        subfolder=subfolder,
-                        user_agent=user_agent,
-                        commit_hash=commit_hash,
-                        from_hf_hub=from_hf_hub,
+                        index_name=_add_variant(TORCH_SAFETENSORS_WEIGHTS_INDEX_NAME, variant),
+                        **get_model_file_kwargs,
                     )
                     # try load model_file with paddle / torch / safetensor
-                    state_dict = smart_load(model_file)
+                    state_dict = smart_load(model_files[0], lazy=lazy_load)
                 except Exception:
-                    model_file = None
+                    model_files = None
                     pass
-            if model_file is None:
-                model_file = _get_model_file(
+            if model_files is None:
+                model_files = _get_checkpoint_files(
                     pretrained_model_name_or_path,
                     weights_name=_add_variant(TORCH_WEIGHTS_NAME, variant),
-                    cache_dir=cache_dir,
-                    force_download=force_download,
-                    resume_download=resume_download,
-                    proxies=proxies,
-                    local_files_only=local_files_only,
-                    use_auth_token=use_auth_token,
-                    revision=revision,
-                    subfolder=subfolder,
-                    user_agent=user_agent,
-                    commit_hash=commit_hash,
-                    from_hf_hub=from_hf_hub,
+                    index_name=_add_variant(TORCH_WEIGHTS_INDEX_NAME, variant),
+                    **get_model_file_kwargs,
                 )
                 # try load model_file with paddle / torch / safetensor
-                state_dict = smart_load(model_file)
+                state_dict = smart_load(model_files[0], lazy=lazy_load)
         else:
-            model_file = _get_model_file(
+            model_files = _get_checkpoint_files(
                 pretrained_model_name_or_path,
                 weights_name=_add_variant(PADDLE_WEIGHTS_NAME, variant),
-                cache_dir=cache_dir,
-                force_download=force_download,
-                resume_download=resume_download,
-                proxies=proxies,
-                local_files_only=local_files_only,
-                use_auth_token=use_auth_token,
-                revision=revision,
-                subfolder=subfolder,
-                user_agent=user_agent,
-                commit_hash=commit_hash,
-                from_hf_hub=from_hf_hub,
+                index_name=_add_variant(PADDLE_WEIGHTS_INDEX_NAME, variant),
+                **get_model_file_kwargs,
             )
             # try load model_file with paddle / torch / safetensor
-            state_dict = smart_load(model_file)
+            state_dict = smart_load(model_files[0], lazy=lazy_load)
+        model_file = model_files[0]
+        is_sharded = len(model_files) > 1
 
         init_contexts = []
 
-        dtype = set(v.dtype for v in state_dict.values() if paddle.is_tensor(v) and paddle.is_floating_point(v))
+        # for sharded checkpoints the dtype is taken from the first shard
+        dtype = set(
+            v.dtype
+            for v in state_dict.values()
+            if (paddle.is_tensor(v) and paddle.is_floating_point(v)) or (is_lazy_tensor(v) and v.is_floating_point())
+        )
         if len(dtype) > 1 and paddle.float32 not in dtype:
             raise ValueError(
                 f"The weights of the model file {model_file} have a mixture of incompatible dtypes {dtype}. Please"
@@ -574,8 +713,8 @@ class ModelMixin(nn.Layer):
             dtype = dtype.pop()
 
         # for
-        if "uint8" in str(dtype):
-            state_dict = {k: v.astype("float32") for k, v in state_dict.items()}
+        cast_to_float32 = "uint8" in str(dtype)
+        if cast_to_float32:
             dtype = paddle.float32
 
         init_contexts.append(paddle.dtype_guard(dtype))
@@ -589,28 +728,55 @@ class ModelMixin(nn.Layer):
         with ContextManagers(init_contexts):
             model = cls.from_config(config, **unused_kwargs)
 
-        # NOTE: convert old model state dict!
-        model._convert_deprecated_attention_blocks(state_dict)
-
-        # convert weights
-        if from_diffusers or is_torch_file(model_file):
-            state_dict = convert_pytorch_state_dict_to_paddle(state_dict, model)
+        def prepare_state_dict(state_dict):
+            if cast_to_float32:
+                state_dict = {k: v.astype("float32") for k, v in state_dict.items()}
+
+            # NOTE: convert old model state dict!
+            model._convert_deprecated_attention_blocks(state_dict)
+
+            # convert weights
+            if from_diffusers or is_torch_file(model_file):
+                state_dict = convert_pytorch_state_dict_to_paddle(state_dict, model)
+
+            # remove keys
+            if ignore_keys is not None:
+                keys = list(state_dict.keys())
+                for k in keys:
+                    for ik in ignore_keys:
+                        if k.startswith(ik):
+                            logger.warning("Deleting key {} from state_dict.".format(k))
+                            del state_dict[k]
+            return state_dict
+
+        if is_sharded:
+            pending_state_dicts = [state_dict]
+            pending_shard_files = list(model_files[1:])
+            state_dict = None
+
+            def iter_state_dict_shards():
+                # read a shard only after the previous one has been assigned and released
+                while pending_state_dicts or pending_shard_files:
+                    if pending_state_dicts:
+                        shard_state_dict = pending_state_dicts.pop()
+                    else:
+                        shard_state_dict = smart_load(pending_shard_files.pop(0), lazy=lazy_load)
+                    shard_state_dict = prepare_state_dict(shard_state_dict)
+                    yield shard_state_dict
+                    del shard_state_dict
 
-        # remove keys
-        if ignore_keys is not None:
-            keys = list(state_dict.keys())
-            for k in keys:
-                for ik in ignore_keys:
-                    if k.startswith(ik):
-                        logger.warning("Deleting key {} from state_dict.".format(k))
-                        del state_dict[k]
+            state_dict_shards = iter_state_dict_shards()
+        else:
+            state_dict = prepare_state_dict(state_dict)
+            state_dict_shards = None
 
         model, missing_keys, unexpected_keys, mismatched_keys, error_msgs = cls._load_pretrained_model(
             model,
             state_dict,
-            model_file,
+            model_files if is_sharded else model_file,
             pretrained_model_name_or_path,
             ignore_mismatched_sizes=ignore_mismatched_sizes,
+            state_dict_shards=state_dict_shards,
         )
 
         loading_info = {
@@ -644,19 +810,18 @@ class ModelMixin(nn.Layer):
         resolved_archive_file,
         pretrained_model_name_or_path,
         ignore_mismatched_sizes=False,
+        state_dict_shards=None,
     ):
+        # Sharded checkpoints pass an iterable of state dicts in `state_dict_shards`, each shard is assigned and
+        # released before the next one is read.
+        assign_per_tensor = state_dict_shards is not None
+        if state_dict_shards is None:
+            state_dict_shards = [state_dict] if state_dict is not None else []
+            state_dict = None
 
-        # Retrieve missing & unexpected_keys
         model_state_dict = model.state_dict()
-        loaded_keys = list(state_dict.keys())
-
         expected_keys = list(model_state_dict.keys())
 
-        original_loaded_keys = loaded_keys
-
-        missing_keys = list(set(expected_keys) - set(loaded_keys))
-        unexpected_keys = list(set(loaded_keys) - set(expected_keys))
-
         # Make sure we are able to load base models as well as derived models (with heads)
         model_to_load = model
 
@@ -681,20 +846,39 @@ class ModelMixin(nn.Layer):
                 mismatched_keys = []
             return mismatched_keys
 
-        if state_dict is not None:
-            # Whole checkpoint
-            mismatched_keys = _find_mismatched_keys(
-                state_dict,
-                model_state_dict,
-                original_loaded_keys,
-                ignore_mismatched_sizes,
-            )
-            error_msgs = []
-            for key_name, loaded_shape, model_shape in mismatched_keys:
-                error_msgs.append(
-                    f"Error size mismatch, {key_name} receives a shape {loaded_shape}, but the expected shape is {model_shape}."
+        loaded_keys = []
+        mismatched_keys = []
+        for shard_state_dict in state_dict_shards:
+            shard_loaded_keys = list(shard_state_dict.keys())
+            loaded_keys.extend(shard_loaded_keys)
+            mismatched_keys.extend(
+                _find_mismatched_keys(
+                    shard_state_dict,
+                    model_state_dict,
+                    shard_loaded_keys,
+                    ignore_mismatched_sizes,
                 )
-            model_to_load.load_dict(state_dict)
+            )
+            if assign_per_tensor or any(is_lazy_tensor(v) for v in shard_state_dict.values()):
+                # assign tensor by tensor, so only one materialized weight is alive besides the model itself
+                for key in list(shard_state_dict.keys()):
+                    if key not in model_state_dict:
+                        continue
+                    param = model_state_dict[key]
+                    param.set_value(materialize_tensor(shard_state_dict.pop(key), param.dtype))
+            else:
+                model_to_load.load_dict(shard_state_dict)
+            del shard_state_dict
+
+        # Retrieve missing & unexpected_keys
+        missing_keys = list(set(expected_keys) - set(loaded_keys))
+        unexpected_keys = list(set(loaded_keys) - set(expected_keys))
+
+        error_msgs = []
+        for key_name, loaded_shape, model_shape in mismatched_keys:
+            error_msgs.append(
+                f"Error size mismatch, {key_name} receives a shape {loaded_shape}, but the expected shape is {model_shape}."
+            )
 
         if len(error_msgs) > 0:
             error_msg = "\n\t".join(error_msgs)
@@ -282,46 +282,52 @@ class StableDiffusionControlNetPipeline(DiffusionPipeline, TextualInversionLoade
             batch_size = prompt_embeds.shape[0]
 
         if prompt_embeds is None:
-            # textual inversion: procecss multi-vector tokens if necessary
-            if isinstance(self, TextualInversionLoaderMixin):
-                prompt = self.maybe_convert_prompt(prompt, self.tokenizer)
-
-            text_inputs = self.tokenizer(
-                prompt,
-                padding="max_length",
-                max_length=self.tokenizer.model_max_length,
-                truncation=True,
-                return_tensors="pd",
-            )
-            text_input_ids = text_inputs.input_ids
-            untruncated_ids = self.tokenizer(prompt, padding="longest", return_tensors="pd").input_ids
 
-            if untruncated_ids.shape[-1] >= text_input_ids.shape[-1] and not paddle.equal_all(
-                text_input_ids, untruncated_ids
-            ):
-                removed_text = self.tokenizer.batch_decode(
-                    untruncated_ids[:, self.tokenizer.model_max_length - 1 : -1]
+            def encode_prompt(prompt):
+                # textual inversion: procecss multi-vector tokens if necessary
+                if isinstance(self, TextualInversionLoaderMixin):
+                    prompt = self.maybe_convert_prompt(prompt, self.tokenizer)
+
+                text_inputs = self.tokenizer(
+                    prompt,
+                    padding="max_length",
+                    max_length=self.tokenizer.model_max_length,
+                    truncation=True,
+                    return_tensors="pd",
                 )
-                logger.warning(
-                    "The following part of your input was truncated because CLIP can only handle sequences up to"
-                    f" {self.tokenizer.model_max_length} tokens: {removed_text}"
+                text_input_ids = text_inputs.input_ids
+                untruncated_ids = self.tokenizer(prompt, padding="longest", return_tensors="pd").input_ids
+
+                if untruncated_ids.shape[-1] >= text_input_ids.shape[-1] and not paddle.equal_all(
+                    text_input_ids, untruncated_ids
+                ):
+                    removed_text = self.tokenizer.batch_decode(
+                        untruncated_ids[:, self.tokenizer.model_max_length - 1 : -1]
+                    )
+                    logger.warning(
+                        "The following part of your input was truncated because CLIP can only handle sequences up to"
+                        f" {self.tokenizer.model_max_length} tokens: {removed_text}"
+                    )
+
+                config = (
+                    self.text_encoder.config
+                    if isinstance(self.text_encoder.config, dict)
+                    else self.text_encoder.config.to_dict()
                 )
+                if config.get("use_attention_mask", None) is not None and config["use_attention_mask"]:
+                    attention_mask = text_inputs.attention_mask
+                else:
+                    attention_mask = None
 
-            config = (
-                self.text_encoder.config
-                if isinstance(self.text_encoder.config, dict)
-                else self.text_encoder.config.to_dict()
-            )
-            if config.get("use_attention_mask", None) is not None and config["use_attention_mask"]:
-                attention_mask = text_inputs.attention_mask
-            else:
-                attention_mask = None
+                return self.text_encoder(
+                    text_input_ids,
+                    attention_mask=attention_mask,
+                )[0]
 
-            prompt_embeds = self.text_encoder(
-                text_input_ids,
-                attention_mask=attention_mask,
+            # repeated prompts are looked up in the prompt embeddings cache if it is enabled
+            prompt_embeds = self._encode_text_cached(
+                prompt, encode_prompt, self.tokenizer, self.text_encoder, self.tokenizer.model_max_length
             )
-            prompt_embeds = prompt_embeds[0]
 
         prompt_embeds = prompt_embeds.cast(self.text_encoder.dtype)
 
@@ -351,34 +357,39 @@ class StableDiffusionControlNetPipeline(DiffusionPipeline, TextualInversionLoade
             else:
                 uncond_tokens = negative_prompt
 
-            # textual inversion: procecss multi-vector tokens if necessary
-            if isinstance(self, TextualInversionLoaderMixin):
-                uncond_tokens = self.maybe_convert_prompt(uncond_tokens, self.tokenizer)
-
             max_length = prompt_embeds.shape[1]
-            uncond_input = self.tokenizer(
-                uncond_tokens,
-                padding="max_length",
-                max_length=max_length,
-                truncation=True,
-                return_tensors="pd",
-            )
 
-            config = (
-                self.text_encoder.config
-                if isinstance(self.text_encoder.config, dict)
-                else self.text_encoder.config.to_dict()
-            )
-            if config.get("use_attention_mask", None) is not None and config["use_attention_mask"]:
-                attention_mask = uncond_input.attention_mask
-            else:
-                attention_mask = None
+            def encode_negative_prompt(uncond_tokens):
+                # textual inversion: procecss multi-vector tokens if necessary
+                if isinstance(self, TextualInversionLoaderMixin):
+                    uncond_tokens = self.maybe_convert_prompt(uncond_tokens, self.tokenizer)
+
+                uncond_input = self.tokenizer(
+                    uncond_tokens,
+                    padding="max_length",
+                    max_length=max_length,
+                    truncation=True,
+                    return_tensors="pd",
+                )
+
+                config = (
+                    self.text_encoder.config
+                    if isinstance(self.text_encoder.config, dict)
+                    else self.text_encoder.config.to_dict()
+                )
+                if config.get("use_attention_mask", None) is not None and config["use_attention_mask"]:
+                    attention_mask = uncond_input.attention_mask
+                else:
+                    attention_mask = None
+
+                return self.text_encoder(
+                    uncond_input.input_ids,
+                    attention_mask=attention_mask,
+                )[0]
 
-            negative_prompt_embeds = self.text_encoder(
-                uncond_input.input_ids,
-                attention_mask=attention_mask,
+            negative_prompt_embeds = self._encode_text_cached(
+                uncond_tokens, encode_negative_prompt, self.tokenizer, self.text_encoder, max_length
             )
-            negative_prompt_embeds = negative_prompt_embeds[0]
 
         if do_classifier_free_guidance:
             # duplicate unconditional embeddings for each generation per prompt, using mps friendly method
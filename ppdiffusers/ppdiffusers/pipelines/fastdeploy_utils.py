@@ -19,6 +19,7 @@ import inspect
 import os
 import re
 import shutil
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, List, Optional, Union
 
@@ -53,6 +54,7 @@ from ..utils import (
     PPDIFFUSERS_CACHE,
     _add_variant,
     _get_model_file,
+    get_prompt_embeds_cache,
     is_fastdeploy_available,
     is_paddle_available,
     logging,
@@ -919,14 +921,34 @@ class FastDeployDiffusionPipelineMixin:
                 else:
                     uncond_tokens = negative_prompt
 
-            prompt_embeds, negative_prompt_embeds = get_weighted_text_embeddings(
-                pipe=self,
-                prompt=prompt,
-                uncond_prompt=uncond_tokens,
-                max_embeddings_multiples=max_embeddings_multiples,
-                infer_op="raw",  # NOTE: we can't use zero copy!
-                **kwargs,
-            )
+            # the weighted embeddings of a prompt depend on the length of the whole batch, so the prompt embeddings
+            # cache keeps them per batch of prompts and negative prompts
+            use_cache = getattr(self, "_use_prompt_embeds_cache", False)
+            if use_cache:
+                cache = get_prompt_embeds_cache()
+                key = self._prompt_embeds_cache_key(
+                    self.tokenizer,
+                    self.text_encoder,
+                    "lpw",
+                    max_embeddings_multiples,
+                    repr(sorted(kwargs.items())),
+                    prompt if isinstance(prompt, str) else tuple(prompt),
+                    uncond_tokens if uncond_tokens is None else tuple(uncond_tokens),
+                )
+                cached = cache.get(key)
+            if use_cache and cached is not None:
+                prompt_embeds, negative_prompt_embeds = cached
+            else:
+                prompt_embeds, negative_prompt_embeds = get_weighted_text_embeddings(
+                    pipe=self,
+                    prompt=prompt,
+                    uncond_prompt=uncond_tokens,
+                    max_embeddings_multiples=max_embeddings_multiples,
+                    infer_op="raw",  # NOTE: we can't use zero copy!
+                    **kwargs,
+                )
+                if use_cache:
+                    cache.put(key, (prompt_embeds, negative_prompt_embeds))
 
         bs_embed, seq_len, _ = prompt_embeds.shape
         # duplicate text embeddings for each generation per prompt, using mps friendly method
@@ -984,38 +1006,45 @@ class FastDeployDiffusionPipelineMixin:
             batch_size = prompt_embeds.shape[0]
 
         if prompt_embeds is None:
-            # get prompt text embeddings
-            text_inputs = self.tokenizer(
-                prompt,
-                padding="max_length",
-                max_length=self.tokenizer.model_max_length,
-                truncation=True,
-                return_tensors="pd",
-            )
-
-            text_input_ids = text_inputs.input_ids
-            untruncated_ids = self.tokenizer(prompt, padding="longest", return_tensors="pd").input_ids  # check
 
-            if untruncated_ids.shape[-1] >= text_input_ids.shape[-1] and not paddle.equal_all(
-                text_input_ids, untruncated_ids
-            ):
-                removed_text = self.tokenizer.batch_decode(
-                    untruncated_ids[:, self.tokenizer.model_max_length - 1 : -1]
-                )
-                logger.warning(
-                    "The following part of your input was truncated because CLIP can only handle sequences up to"
-                    f" {self.tokenizer.model_max_length} tokens: {removed_text}"
+            def encode_prompt(prompt):
+                # get prompt text embeddings
+                text_inputs = self.tokenizer(
+                    prompt,
+                    padding="max_length",
+                    max_length=self.tokenizer.model_max_length,
+                    truncation=True,
+                    return_tensors="pd",
                 )
 
-            prompt_embeds = self.text_encoder(
-                input_ids=text_input_ids,
-                infer_op=infer_op,
-                output_shape=[
-                    batch_size,
-                    self.tokenizer.model_max_length,
-                    self.text_encoder_hidden_states_dim,
-                ],
-            )[0]
+                text_input_ids = text_inputs.input_ids
+                untruncated_ids = self.tokenizer(prompt, padding="longest", return_tensors="pd").input_ids  # check
+
+                if untruncated_ids.shape[-1] >= text_input_ids.shape[-1] and not paddle.equal_all(
+                    text_input_ids, untruncated_ids
+                ):
+                    removed_text = self.tokenizer.batch_decode(
+                        untruncated_ids[:, self.tokenizer.model_max_length - 1 : -1]
+                    )
+                    logger.warning(
+                        "The following part of your input was truncated because CLIP can only handle sequences up to"
+                        f" {self.tokenizer.model_max_length} tokens: {removed_text}"
+                    )
+
+                return self.text_encoder(
+                    input_ids=text_input_ids,
+                    infer_op=infer_op,
+                    output_shape=[
+                        len(prompt),
+                        self.tokenizer.model_max_length,
+                        self.text_encoder_hidden_states_dim,
+                    ],
+                )[0]
+
+            # repeated prompts are looked up in the prompt embeddings cache if it is enabled
+            prompt_embeds = self._encode_text_cached(
+                prompt, encode_prompt, self.tokenizer, self.text_encoder, self.tokenizer.model_max_length
+            )
 
         bs_embed, seq_len, _ = prompt_embeds.shape
         # duplicate text embeddings for each generation per prompt, using mps friendly method
@@ -1043,22 +1072,28 @@ class FastDeployDiffusionPipelineMixin:
                 uncond_tokens = negative_prompt
 
             max_length = prompt_embeds.shape[1]
-            uncond_input = self.tokenizer(
-                uncond_tokens,
-                padding="max_length",
-                max_length=max_length,
-                truncation=True,
-                return_tensors="pd",
+
+            def encode_negative_prompt(uncond_tokens):
+                uncond_input = self.tokenizer(
+                    uncond_tokens,
+                    padding="max_length",
+                    max_length=max_length,
+                    truncation=True,
+                    return_tensors="pd",
+                )
+                return self.text_encoder(
+                    input_ids=uncond_input.input_ids,
+                    infer_op=infer_op,
+                    output_shape=[
+                        len(uncond_tokens),
+                        max_length,
+                        self.text_encoder_hidden_states_dim,
+                    ],
+                )[0]
+
+            negative_prompt_embeds = self._encode_text_cached(
+                uncond_tokens, encode_negative_prompt, self.tokenizer, self.text_encoder, max_length
             )
-            negative_prompt_embeds = self.text_encoder(
-                input_ids=uncond_input.input_ids,
-                infer_op=infer_op,
-                output_shape=[
-                    batch_size,
-                    max_length,
-                    self.text_encoder_hidden_states_dim,
-                ],
-            )[0]
 
         if do_classifier_free_guidance:
             # duplicate unconditional embeddings for each generation per prompt, using mps friendly method
@@ -1108,10 +1143,89 @@ class FastDeployDiffusionPipelineMixin:
         return extra_step_kwargs
 
 
+class FastDeployIOBinding:
+    """
+    Zero copy inference session of a `fd.Runtime`. Input and output buffers are allocated and bound to the runtime
+    once per input shapes, later calls with the same shapes only copy their inputs into the bound buffers. Buffers of
+    the `max_cached_shapes` most recently used shape configurations are kept, so alternating resolutions or batch
+    sizes rebinds existing buffers instead of allocating new ones.
+
+    Arguments:
+        runtime (`fd.Runtime`):
+            The runtime to bind to.
+        max_cached_shapes (`int`, *optional*, defaults to 4):
+            The number of shape configurations whose buffers are kept.
+        share_with_raw_ptr (`bool`, *optional*, defaults to `True`):
+            Whether to share the buffers with the runtime by raw pointer or by dlpack.
+    """
+
+    def __init__(self, runtime: "fd.Runtime", max_cached_shapes: int = 4, share_with_raw_ptr: bool = True):
+        self.runtime = runtime
+        self.max_cached_shapes = max_cached_shapes
+        self.share_with_raw_ptr = share_with_raw_ptr
+        self._buffers = OrderedDict()
+        self._bound_key = None
+
+    def _bind(self, key, input_buffers, output_buffers):
+        for name, tensor in input_buffers.items():
+            self.runtime.bind_input_tensor(
+                name, pdtensor2fdtensor(tensor, name, share_with_raw_ptr=self.share_with_raw_ptr)
+            )
+        for name, tensor in output_buffers.items():
+            self.runtime.bind_output_tensor(
+                name, pdtensor2fdtensor(tensor, name, share_with_raw_ptr=self.share_with_raw_ptr)
+            )
+        self._bound_key = key
+
+    def run(self, inputs: dict, output_shape: List[int], output_dtype="float32", copy_outputs: bool = True):
+        """
+        Run the runtime on `inputs` through the bound buffers.
+
+        Arguments:
+            inputs (`dict(name, paddle.Tensor)`):
+                An input map from name to tensor.
+            output_shape (`List[int]`):
+                The shape of the first output of the runtime.
+            copy_outputs (`bool`, *optional*, defaults to `True`):
+                Whether to return copies of the output buffers. Without the copy, the returned tensors are overwritten
+                by the next call with the same shapes, which is only safe when the caller consumes them right away.
+        Return:
+            List of output tensor.
+        """
+        key = tuple((name, tuple(tensor.shape), tensor.dtype) for name, tensor in inputs.items())
+        key += (tuple(output_shape), output_dtype)
+        buffers = self._buffers.get(key, None)
+        if buffers is None:
+            input_buffers = {name: paddle.empty_like(tensor) for name, tensor in inputs.items()}
+            output_buffers = {self.runtime.get_output_info(0).name: paddle.zeros(output_shape, dtype=output_dtype)}
+            buffers = self._buffers[key] = (input_buffers, output_buffers)
+            if len(self._buffers) > self.max_cached_shapes:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(key)
+
+        input_buffers, output_buffers = buffers
+        if self._bound_key != key:
+            self._bind(key, input_buffers, output_buffers)
+        for name, tensor in inputs.items():
+            paddle.assign(tensor, output=input_buffers[name])
+
+        self.runtime.zero_copy_infer()
+        outputs = list(output_buffers.values())
+        if copy_outputs:
+            outputs = [output.clone() for output in outputs]
+        return outputs
+
+    def clear(self):
+        self._buffers.clear()
+        self._bound_key = None
+
+
 class FastDeployRuntimeModel:
     def __init__(self, model=None, **kwargs):
         logger.info("`ppdiffusers.FastDeployRuntimeModel` is experimental and might change in the future.")
         self.model = model
+        self.io_binding = None
         self.model_save_dir = kwargs.get("model_save_dir", None)
         self.model_format = kwargs.get("model_format", None)
         self.latest_model_name = kwargs.get("latest_model_name", None)
@@ -1165,6 +1279,7 @@ class FastDeployRuntimeModel:
         # for zero_copy_infer
         share_with_raw_ptr = kwargs.pop("share_with_raw_ptr", True)
         output_shape = kwargs.pop("output_shape", None)
+        copy_outputs = kwargs.pop("copy_outputs", True)
 
         inputs = {}
         for k, v in kwargs.items():
@@ -1173,15 +1288,10 @@ class FastDeployRuntimeModel:
             inputs[k] = v
 
         if infer_op == "zero_copy_infer":
-            output = paddle.zeros(output_shape, dtype="float32")
-            self.zero_copy_infer(
-                prebinded_inputs=inputs,
-                prebinded_outputs={self.model.get_output_info(0).name: output},
-                share_with_raw_ptr=share_with_raw_ptr,
-            )
-            return [
-                output,
-            ]
+            # buffers are bound once per input shapes and reused by all following steps and requests
+            if self.io_binding is None or self.io_binding.share_with_raw_ptr != share_with_raw_ptr:
+                self.io_binding = FastDeployIOBinding(self.model, share_with_raw_ptr=share_with_raw_ptr)
+            return self.io_binding.run(inputs, output_shape, copy_outputs=copy_outputs)
         elif infer_op == "raw":
             inputs = {}
             for k, v in kwargs.items():
@@ -61,8 +61,11 @@ from ..utils import (
     TORCH_SAFETENSORS_WEIGHTS_NAME,
     TORCH_WEIGHTS_NAME,
     BaseOutput,
+    LatentCheckpointStore,
+    LatentTrajectory,
     deprecate,
     get_class_from_dynamic_module,
+    get_prompt_embeds_cache,
     is_paddle_available,
     is_paddlenlp_available,
     is_safetensors_available,
@@ -70,6 +73,7 @@ from ..utils import (
     numpy_to_pil,
     ppdiffusers_bos_dir_download,
     ppdiffusers_url_download,
+    prompt_embeds_cache_token,
 )
 from ..version import VERSION as __version__
 
@@ -1685,3 +1689,113 @@ class DiffusionPipeline(ConfigMixin):
             self.vae.disable_tiling()
         if hasattr(self, "vqvae"):
             self.vqvae.disable_tiling()
+
+    def enable_prompt_embeds_cache(self, max_entries: Optional[int] = None):
+        r"""
+        Enable the prompt embeddings cache.
+
+        When this option is enabled, the text embeddings of every prompt and negative prompt are kept in a size bounded
+        LRU cache that all pipelines of the process share, so repeated texts skip the tokenizer and the text encoder.
+        Loading LoRA or textual inversion weights invalidates the cached embeddings of the changed models, other
+        changes of the text encoder weights need a `get_prompt_embeds_cache().clear()`.
+
+        Args:
+            max_entries (`int`, *optional*):
+                Resize the shared cache to keep at most this many prompt texts.
+        """
+        self._use_prompt_embeds_cache = True
+        if max_entries is not None:
+            get_prompt_embeds_cache().resize(max_entries)
+
+    def disable_prompt_embeds_cache(self):
+        r"""
+        Disable the prompt embeddings cache. If `enable_prompt_embeds_cache` was previously invoked, this method will go
+        back to encoding every prompt.
+        """
+        self._use_prompt_embeds_cache = False
+
+    def _prompt_embeds_cache_key(self, tokenizer, text_encoder, *args):
+        lora_scale = self._lora_scale if hasattr(self, "_lora_scale") else None
+        return (
+            prompt_embeds_cache_token(tokenizer),
+            prompt_embeds_cache_token(text_encoder),
+            str(getattr(text_encoder, "dtype", None)),
+            lora_scale,
+        ) + args
+
+    def _encode_text_cached(self, texts, encode_fn, tokenizer, text_encoder, *args):
+        """
+        Encode `texts` with `encode_fn`, which takes a list of texts and returns a tensor or a tuple of tensors with a
+        row per text. With the prompt embeddings cache enabled, only the texts that miss the cache are encoded, `args`
+        are the other inputs that change the embeddings of a text, e.g. the padded length.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        if not getattr(self, "_use_prompt_embeds_cache", False):
+            return encode_fn(texts)
+
+        cache = get_prompt_embeds_cache()
+        key = self._prompt_embeds_cache_key(tokenizer, text_encoder, *args)
+        rows = [cache.get(key + (text,)) for text in texts]
+        missing = list(dict.fromkeys(text for text, row in zip(texts, rows) if row is None))
+        if len(missing) > 0:
+            outputs = encode_fn(missing)
+            encoded = {}
+            for i, text in enumerate(missing):
+                # copies, the outputs of a runtime with bound buffers are overwritten by its next call
+                if isinstance(outputs, tuple):
+                    encoded[text] = tuple(output[i : i + 1].detach().clone() for output in outputs)
+                else:
+                    encoded[text] = outputs[i : i + 1].detach().clone()
+                cache.put(key + (text,), encoded[text])
+            rows = [encoded[text] if row is None else row for text, row in zip(texts, rows)]
+
+        if isinstance(rows[0], tuple):
+            return tuple(paddle.concat(list(outputs)) for outputs in zip(*rows))
+        return paddle.concat(rows)
+
+    def enable_latent_checkpoints(self, max_bytes: int = 1 << 30):
+        r"""
+        Enable latent checkpoints of the denoising loop.
+
+        When this option is enabled, the latents after the last step are kept together with the scheduler and
+        generator states, keyed by the UNet, the scheduler config and timesteps, the initial latents, the seeds, the
+        prompt embeddings and the guidance settings. A later call with the same inputs skips the loop, so rerunning a
+        seed to change e.g. the output type only decodes again. Loading or unloading LoRA weights drops the
+        checkpoints, other changes of the UNet weights need a `clear_latent_checkpoints()`.
+
+        Args:
+            max_bytes (`int`, *optional*, defaults to 1 GiB):
+                The byte budget of the checkpoints, the least recently used ones are dropped first.
+        """
+        self._latent_checkpoints = LatentCheckpointStore(max_bytes=max_bytes)
+
+    def disable_latent_checkpoints(self):
+        r"""
+        Disable latent checkpoints. If `enable_latent_checkpoints` was previously invoked, this method drops the
+        checkpoints and goes back to running every step.
+        """
+        self._latent_checkpoints = None
+
+    def clear_latent_checkpoints(self):
+        if getattr(self, "_latent_checkpoints", None) is not None:
+            self._latent_checkpoints.clear()
+
+    def _latent_trajectory(self, timesteps, latents, prompt_embeds, generator=None, **kwargs) -> LatentTrajectory:
+        store = getattr(self, "_latent_checkpoints", None)
+        if store is None:
+            return LatentTrajectory(None, None, len(timesteps), self.scheduler)
+        # the initial latents stand in for the seeds, the generators are restored from the checkpoints
+        key = LatentTrajectory.digest(
+            self.__class__.__name__,
+            # a token that is never reused, unlike the `id` of a freed UNet
+            prompt_embeds_cache_token(self.unet),
+            getattr(self.unet, "_lora_adapter_ids", None),
+            self.scheduler.__class__.__name__,
+            sorted(dict(self.scheduler.config).items()),
+            timesteps,
+            latents,
+            prompt_embeds,
+            sorted(kwargs.items()),
+        )
+        return LatentTrajectory(store, key, len(timesteps), self.scheduler, generator)
@@ -62,6 +62,11 @@ else:
         HFCLIPVisionModel,
         HFCLIPVisionModelWithProjection,
     )
+    from .batching_server import (
+        DiffusionRequest,
+        StableDiffusionBatchingServer,
+        StableDiffusionContinuousBatchingServer,
+    )
     from .pipeline_cycle_diffusion import CycleDiffusionPipeline
     from .pipeline_stable_diffusion import StableDiffusionPipeline
     from .pipeline_stable_diffusion_adapter import StableDiffusionAdapterPipeline
@@ -0,0 +1,490 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+import paddle
+
+from ...utils import logging, randn_tensor
+from . import StableDiffusionPipelineOutput
+
+logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
+
+
+@dataclass
+class DiffusionRequest:
+    """
+    A text-to-image request queued in a [`StableDiffusionBatchingServer`], the arguments mirror
+    [`StableDiffusionPipeline.__call__`] with `seed` in place of `generator`.
+    """
+
+    prompt: Union[str, List[str]]
+    negative_prompt: Optional[Union[str, List[str]]] = None
+    height: Optional[int] = None
+    width: Optional[int] = None
+    num_inference_steps: int = 50
+    guidance_scale: float = 7.5
+    num_images_per_prompt: int = 1
+    eta: float = 0.0
+    seed: Optional[int] = None
+    output_type: str = "pil"
+    future: Future = field(default_factory=Future, repr=False)
+    arrival_time: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def num_images(self):
+        num_prompts = 1 if isinstance(self.prompt, str) else len(self.prompt)
+        return num_prompts * self.num_images_per_prompt
+
+    def batch_key(self):
+        """Requests with the same key can share one denoising loop."""
+        return (self.height, self.width, self.num_inference_steps, self.eta, self.output_type)
+
+
+class StableDiffusionBatchingServer:
+    r"""
+    A front end that serves concurrent text-to-image requests with a single [`StableDiffusionPipeline`] (or any
+    pipeline with the same components and helpers) by running compatible requests through one denoising loop.
+
+    Requests are queued by [`~StableDiffusionBatchingServer.submit`]. Requests with the same resolution, step count,
+    `eta` and output type are grouped, waiting at most `max_wait_time` seconds after the oldest one arrived for the
+    batch to fill up to `max_batch_size` images. Every request keeps its own prompt, negative prompt, guidance scale
+    and seed, so its images match a direct pipeline call as long as the scheduler does not draw noise while stepping.
+
+    Batches are either run by a background worker, see [`~StableDiffusionBatchingServer.start`], or synchronously
+    with [`~StableDiffusionBatchingServer.run_pending`].
+
+    Args:
+        pipeline ([`StableDiffusionPipeline`]):
+            The pipeline whose components run the requests. Its scheduler is used by the server, do not call the
+            pipeline while the worker is running.
+        max_batch_size (`int`, *optional*, defaults to 8):
+            The maximal number of images denoised together. A single request larger than this runs on its own.
+        max_wait_time (`float`, *optional*, defaults to 0.01):
+            How many seconds a request may wait for other requests to batch with.
+    """
+
+    def __init__(self, pipeline, max_batch_size: int = 8, max_wait_time: float = 0.01):
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._worker = None
+        self._running = False
+        self.reset_metrics()
+
+    def submit(self, prompt: Union[str, List[str]], **kwargs) -> Future:
+        """
+        Queue a request, `kwargs` are the fields of [`DiffusionRequest`]. Returns a `Future` that resolves to a
+        [`StableDiffusionPipelineOutput`] holding this request's images only.
+        """
+        request = DiffusionRequest(prompt=prompt, **kwargs)
+        with self._condition:
+            self._queue.append(request)
+            self._metrics["max_queue_depth"] = max(self._metrics["max_queue_depth"], len(self._queue))
+            self._condition.notify_all()
+        return request.future
+
+    def __call__(self, prompt: Union[str, List[str]], **kwargs) -> StableDiffusionPipelineOutput:
+        future = self.submit(prompt, **kwargs)
+        if not self._running:
+            self.run_pending()
+        return future.result()
+
+    def start(self):
+        """Start the background worker that runs the queued batches."""
+        if self._running:
+            return
+        self._running = True
+        self._worker = threading.Thread(target=self._serve, name="StableDiffusionBatchingServer", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """Stop the background worker, the requests left in the queue stay there."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _serve(self):
+        while self._running:
+            self.step(wait=True)
+
+    def _has_work(self):
+        return len(self._queue) > 0
+
+    def run_pending(self) -> int:
+        """Run batches in the calling thread until the queue is empty, returns the number of served requests."""
+        num_requests = 0
+        while self._has_work():
+            num_requests += self.step(wait=False)
+        return num_requests
+
+    def step(self, wait: bool = False) -> int:
+        """
+        Take the next batch from the queue and run it, returns the number of served requests. With `wait`, block until
+        a request arrives and give the batch `max_wait_time` to fill up.
+        """
+        requests = self._next_batch(wait)
+        if len(requests) == 0:
+            return 0
+        try:
+            outputs = self._run_batch(requests)
+        except Exception as e:
+            logger.error(f"Failed to run a batch of {len(requests)} requests: {e}")
+            for request in requests:
+                request.future.set_exception(e)
+        else:
+            for request, output in zip(requests, outputs):
+                request.future.set_result(output)
+        return len(requests)
+
+    def _compatible(self, key):
+        return [request for request in self._queue if request.batch_key() == key]
+
+    def _next_batch(self, wait):
+        with self._condition:
+            if wait:
+                while self._running and len(self._queue) == 0:
+                    self._condition.wait()
+            if len(self._queue) == 0:
+                return []
+
+            key = self._queue[0].batch_key()
+            if wait:
+                deadline = self._queue[0].arrival_time + self.max_wait_time
+                while (
+                    self._running
+                    and sum(request.num_images for request in self._compatible(key)) < self.max_batch_size
+                    and time.perf_counter() < deadline
+                ):
+                    self._condition.wait(deadline - time.perf_counter())
+
+            # first come first served, the oldest request is always taken even if it alone exceeds the batch size
+            requests, num_images = [], 0
+            for request in self._compatible(key):
+                if len(requests) > 0 and num_images + request.num_images > self.max_batch_size:
+                    break
+                requests.append(request)
+                num_images += request.num_images
+            for request in requests:
+                self._queue.remove(request)
+            self._record_admission(requests)
+            self._record_batch(num_images)
+            return requests
+
+    def _record_admission(self, requests):
+        now = time.perf_counter()
+        self._metrics["num_requests"] += len(requests)
+        self._metrics["num_images"] += sum(request.num_images for request in requests)
+        self._metrics["total_wait_time"] += sum(now - request.arrival_time for request in requests)
+
+    def _record_batch(self, num_images):
+        self._metrics["num_batches"] += 1
+        self._metrics["last_batch_size"] = num_images
+        self._metrics["batch_size_histogram"][num_images] = (
+            self._metrics["batch_size_histogram"].get(num_images, 0) + 1
+        )
+
+    def _prepare_request(self, request, do_classifier_free_guidance, scheduler):
+        """Encode the prompts of `request` and draw its initial latents the way [`StableDiffusionPipeline`] does."""
+        pipe = self.pipeline
+        height = request.height or pipe.unet.config.sample_size * pipe.vae_scale_factor
+        width = request.width or pipe.unet.config.sample_size * pipe.vae_scale_factor
+        prompt_embeds = pipe._encode_prompt(
+            request.prompt,
+            request.num_images_per_prompt,
+            do_classifier_free_guidance,
+            negative_prompt=request.negative_prompt,
+        )
+        generator = paddle.Generator().manual_seed(request.seed) if request.seed is not None else None
+        shape = (
+            request.num_images,
+            pipe.unet.config.in_channels,
+            height // pipe.vae_scale_factor,
+            width // pipe.vae_scale_factor,
+        )
+        latents = randn_tensor(shape, generator=generator, dtype=prompt_embeds.dtype)
+        return prompt_embeds, latents * scheduler.init_noise_sigma, generator
+
+    def _run_batch(self, requests: List[DiffusionRequest]) -> List[StableDiffusionPipelineOutput]:
+        pipe = self.pipeline
+        first = requests[0]
+        # the loop runs classifier free guidance for everyone if anyone needs it, a scale of 1 reduces it to the
+        # text prediction the pipeline uses for `guidance_scale <= 1`
+        do_classifier_free_guidance = any(request.guidance_scale > 1.0 for request in requests)
+
+        pipe.scheduler.set_timesteps(first.num_inference_steps)
+        if hasattr(pipe.scheduler, "set_begin_index"):
+            pipe.scheduler.set_begin_index(0)
+        timesteps = pipe.scheduler.timesteps
+
+        negative_embeds, prompt_embeds, latents, guidance_scales, generators = [], [], [], [], []
+        for request in requests:
+            embeds, request_latents, generator = self._prepare_request(
+                request, do_classifier_free_guidance, pipe.scheduler
+            )
+            if do_classifier_free_guidance:
+                negative, embeds = embeds.chunk(2)
+                negative_embeds.append(negative)
+            prompt_embeds.append(embeds)
+            latents.append(request_latents)
+            guidance_scales.extend([max(request.guidance_scale, 1.0)] * request.num_images)
+            generators.extend([generator] * request.num_images)
+        prompt_embeds = paddle.concat(negative_embeds + prompt_embeds)
+        latents = paddle.concat(latents)
+        guidance_scale = paddle.to_tensor(guidance_scales, dtype=latents.dtype).reshape([-1, 1, 1, 1])
+        if all(generator is None for generator in generators):
+            generators = None
+        extra_step_kwargs = pipe.prepare_extra_step_kwargs(generators, first.eta)
+
+        for t in timesteps:
+            latent_model_input = paddle.concat([latents] * 2) if do_classifier_free_guidance else latents
+            latent_model_input = pipe.scheduler.scale_model_input(latent_model_input, t)
+            noise_pred = pipe.unet(latent_model_input, t, encoder_hidden_states=prompt_embeds, return_dict=False)[0]
+            if do_classifier_free_guidance:
+                noise_pred_uncond, noise_pred_text = noise_pred.chunk(2)
+                noise_pred = noise_pred_uncond + guidance_scale * (noise_pred_text - noise_pred_uncond)
+            latents = pipe.scheduler.step(noise_pred, t, latents, **extra_step_kwargs, return_dict=False)[0]
+
+        return self._split_outputs(requests, latents, prompt_embeds.dtype)
+
+    def _split_outputs(self, requests, latents, dtype):
+        pipe = self.pipeline
+        output_type = requests[0].output_type
+        if not output_type == "latent":
+            image = pipe.vae.decode(latents / pipe.vae.config.scaling_factor, return_dict=False)[0]
+            image, has_nsfw_concept = pipe.run_safety_checker(image, dtype)
+        else:
+            image = latents
+            has_nsfw_concept = None
+        if has_nsfw_concept is None:
+            do_denormalize = [True] * image.shape[0]
+        else:
+            do_denormalize = [(not has_nsfw) for has_nsfw in has_nsfw_concept]
+        image = pipe.image_processor.postprocess(image, output_type=output_type, do_denormalize=do_denormalize)
+
+        outputs, start = [], 0
+        for request in requests:
+            end = start + request.num_images
+            outputs.append(
+                StableDiffusionPipelineOutput(
+                    images=image[start:end],
+                    nsfw_content_detected=has_nsfw_concept[start:end] if has_nsfw_concept is not None else None,
+                )
+            )
+            start = end
+        return outputs
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def reset_metrics(self):
+        self._metrics = {
+            "max_queue_depth": 0,
+            "num_batches": 0,
+            "num_requests": 0,
+            "num_images": 0,
+            "last_batch_size": 0,
+            "batch_size_histogram": {},
+            "total_wait_time": 0.0,
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        The current queue depth and the batch statistics since the last `reset_metrics`, batch sizes count images.
+        """
+        with self._condition:
+            metrics = dict(self._metrics, batch_size_histogram=dict(self._metrics["batch_size_histogram"]))
+            metrics["queue_depth"] = len(self._queue)
+        num_batches, num_requests = metrics["num_batches"], metrics["num_requests"]
+        batch_images = sum(size * count for size, count in metrics["batch_size_histogram"].items())
+        metrics["mean_batch_size"] = batch_images / num_batches if num_batches > 0 else 0.0
+        metrics["mean_wait_time"] = metrics.pop("total_wait_time") / num_requests if num_requests > 0 else 0.0
+        return metrics
+
+
+@dataclass
+class _ActiveRequest:
+    request: DiffusionRequest
+    scheduler: Any
+    prompt_embeds: paddle.Tensor
+    latents: paddle.Tensor
+    extra_step_kwargs: Dict[str, Any]
+    do_classifier_free_guidance: bool
+    step_index: int = 0
+
+    @property
+    def timestep(self):
+        return self.scheduler.timesteps[self.step_index]
+
+    @property
+    def finished(self):
+        return self.step_index >= len(self.scheduler.timesteps)
+
+
+class StableDiffusionContinuousBatchingServer(StableDiffusionBatchingServer):
+    r"""
+    A [`StableDiffusionBatchingServer`] that batches at the level of denoising steps instead of whole requests.
+
+    Every in-flight request carries its own copy of the pipeline's scheduler, so its timesteps and multistep history
+    (e.g. `DPMSolverMultistepScheduler.model_outputs`) are its own. Each tick runs one UNet call over the latents of
+    all active requests, each at its own timestep, and steps every request's scheduler. Finished requests are decoded
+    and leave between ticks, queued requests join as long as the active images stay within `max_batch_size`, so a
+    short job does not wait for a long one that started a step earlier.
+
+    Requests only need the same resolution to share a tick, and only the ones with `guidance_scale > 1` pay for
+    classifier free guidance. Requests are admitted in arrival order, an incompatible request at the head of the
+    queue waits until the active requests drain. The metrics count ticks as batches.
+    """
+
+    def __init__(self, pipeline, max_batch_size: int = 8, max_wait_time: float = 0.0):
+        super().__init__(pipeline, max_batch_size=max_batch_size, max_wait_time=max_wait_time)
+        self._active = []
+
+    def _has_work(self):
+        return len(self._queue) > 0 or len(self._active) > 0
+
+    def _resolution(self, request):
+        pipe = self.pipeline
+        default_size = pipe.unet.config.sample_size * pipe.vae_scale_factor
+        return (request.height or default_size, request.width or default_size)
+
+    def _admit(self, wait):
+        with self._condition:
+            if wait:
+                while self._running and len(self._queue) == 0 and len(self._active) == 0:
+                    self._condition.wait()
+            num_images = sum(active.request.num_images for active in self._active)
+            resolution = self._resolution(self._active[0].request) if len(self._active) > 0 else None
+            requests = []
+            while len(self._queue) > 0:
+                request = self._queue[0]
+                if resolution is not None and self._resolution(request) != resolution:
+                    break
+                if num_images > 0 and num_images + request.num_images > self.max_batch_size:
+                    break
+                requests.append(self._queue.popleft())
+                resolution = self._resolution(request)
+                num_images += request.num_images
+            self._record_admission(requests)
+
+        for request in requests:
+            try:
+                self._active.append(self._start_request(request))
+            except Exception as e:
+                logger.error(f"Failed to start a request: {e}")
+                request.future.set_exception(e)
+
+    def _start_request(self, request):
+        pipe = self.pipeline
+        # a scheduler of its own, so that the multistep history of one request does not leak into another
+        scheduler = pipe.scheduler.__class__.from_config(pipe.scheduler.config)
+        scheduler.set_timesteps(request.num_inference_steps)
+        if hasattr(scheduler, "set_begin_index"):
+            scheduler.set_begin_index(0)
+        do_classifier_free_guidance = request.guidance_scale > 1.0
+        prompt_embeds, latents, generator = self._prepare_request(request, do_classifier_free_guidance, scheduler)
+        extra_step_kwargs = self.pipeline.prepare_extra_step_kwargs(generator, request.eta)
+        return _ActiveRequest(
+            request=request,
+            scheduler=scheduler,
+            prompt_embeds=prompt_embeds,
+            latents=latents,
+            extra_step_kwargs=extra_step_kwargs,
+            do_classifier_free_guidance=do_classifier_free_guidance,
+        )
+
+    def _tick(self):
+        model_inputs, timesteps, prompt_embeds = [], [], []
+        for active in self._active:
+            latent_model_input = active.latents
+            if active.do_classifier_free_guidance:
+                latent_model_input = paddle.concat([latent_model_input] * 2)
+            latent_model_input = active.scheduler.scale_model_input(latent_model_input, active.timestep)
+            model_inputs.append(latent_model_input)
+            timesteps.append(active.timestep.reshape([1]).tile([latent_model_input.shape[0]]))
+            prompt_embeds.append(active.prompt_embeds)
+
+        noise_preds = self.pipeline.unet(
+            paddle.concat(model_inputs),
+            paddle.concat(timesteps),
+            encoder_hidden_states=paddle.concat(prompt_embeds),
+            return_dict=False,
+        )[0]
+        noise_preds = noise_preds.split([latent_model_input.shape[0] for latent_model_input in model_inputs])
+        self._record_batch(sum(active.request.num_images for active in self._active))
+
+        for active, noise_pred in zip(self._active, noise_preds):
+            if active.do_classifier_free_guidance:
+                noise_pred_uncond, noise_pred_text = noise_pred.chunk(2)
+                noise_pred = noise_pred_uncond + active.request.guidance_scale * (noise_pred_text - noise_pred_uncond)
+            active.latents = active.scheduler.step(
+                noise_pred, active.timestep, active.latents, **active.extra_step_kwargs, return_dict=False
+            )[0]
+            active.step_index += 1
+
+    def step(self, wait: bool = False) -> int:
+        """
+        Admit queued requests, run one denoising tick over the active ones and finish the requests that are done.
+        Returns the number of finished requests. With `wait`, block until there is something to run.
+        """
+        self._admit(wait)
+        if len(self._active) == 0:
+            return 0
+        try:
+            self._tick()
+        except Exception as e:
+            logger.error(f"Failed to run a tick of {len(self._active)} requests: {e}")
+            for active in self._active:
+                active.request.future.set_exception(e)
+            finished, self._active = self._active, []
+            return len(finished)
+
+        finished = [active for active in self._active if active.finished]
+        self._active = [active for active in self._active if not active.finished]
+        for active in finished:
+            try:
+                (output,) = self._split_outputs([active.request], active.latents, active.prompt_embeds.dtype)
+            except Exception as e:
+                logger.error(f"Failed to decode a request: {e}")
+                active.request.future.set_exception(e)
+            else:
+                active.request.future.set_result(output)
+        return len(finished)
+
+    @property
+    def num_active(self) -> int:
+        return len(self._active)
+
+    def metrics(self) -> Dict[str, Any]:
+        metrics = super().metrics()
+        metrics["num_active"] = len(self._active)
+        return metrics
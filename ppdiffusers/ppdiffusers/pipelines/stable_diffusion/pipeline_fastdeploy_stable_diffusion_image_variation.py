@@ -281,6 +281,7 @@ class FastDeployStableDiffusionImageVariationPipeline(DiffusionPipeline, FastDep
                     encoder_hidden_states=image_embeddings,
                     infer_op=infer_op_dict.get("unet", None),
                     output_shape=latent_model_input.shape,
+                    copy_outputs=not do_classifier_free_guidance,
                 )
                 noise_pred = self.unet(**unet_inputs)[0]
 
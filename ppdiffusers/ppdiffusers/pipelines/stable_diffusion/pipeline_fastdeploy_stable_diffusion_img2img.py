@@ -297,6 +297,7 @@ class FastDeployStableDiffusionImg2ImgPipeline(DiffusionPipeline, FastDeployDiff
                     encoder_hidden_states=prompt_embeds,
                     infer_op=infer_op_dict.get("unet", None),
                     output_shape=latent_model_input.shape,
+                    copy_outputs=not do_classifier_free_guidance,
                 )
                 if do_controlnet:
                     unet_inputs["controlnet_cond"] = control_image
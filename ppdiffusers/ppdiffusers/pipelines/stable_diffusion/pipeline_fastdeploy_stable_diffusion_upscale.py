@@ -268,6 +268,7 @@ class FastDeployStableDiffusionUpscalePipeline(DiffusionPipeline, FastDeployDiff
                     encoder_hidden_states=prompt_embeds,
                     infer_op=infer_op_dict.get("unet", None),
                     output_shape=latent_model_input.shape,
+                    copy_outputs=not do_classifier_free_guidance,
                 )
                 # predict the noise residual
                 noise_pred_unet = self.unet(**unet_inputs)[0]
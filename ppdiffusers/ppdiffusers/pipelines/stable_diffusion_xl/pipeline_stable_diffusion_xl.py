@@ -214,31 +214,35 @@ class StableDiffusionXLPipeline(DiffusionPipeline, FromSingleFileMixin, LoraLoad
             prompt_embeds_list = []
             prompts = [prompt, prompt_2]
             for prompt, tokenizer, text_encoder in zip(prompts, tokenizers, text_encoders):
-                if isinstance(self, TextualInversionLoaderMixin):
-                    prompt = self.maybe_convert_prompt(prompt, tokenizer)
-                text_inputs = tokenizer(
-                    prompt,
-                    padding="max_length",
-                    max_length=tokenizer.model_max_length,
-                    truncation=True,
-                    return_tensors="pd",
-                )
-                text_input_ids = text_inputs.input_ids
-                untruncated_ids = tokenizer(prompt, padding="longest", return_tensors="pd").input_ids
-                untruncated_ids = tokenizer(prompt, padding="longest", return_tensors="pd").input_ids
-                if (
-                    untruncated_ids.shape[-1] >= text_input_ids.shape[-1]
-                    and not paddle.equal_all(x=text_input_ids, y=untruncated_ids).item()
-                ):
-                    removed_text = tokenizer.batch_decode(untruncated_ids[:, tokenizer.model_max_length - 1 : -1])
-                    logger.warning(
-                        f"The following part of your input was truncated because CLIP can only handle sequences up to {tokenizer.model_max_length} tokens: {removed_text}"
-                    )
-                prompt_embeds = text_encoder(text_input_ids, output_hidden_states=True)
 
+                def encode_prompt(prompt):
+                    if isinstance(self, TextualInversionLoaderMixin):
+                        prompt = self.maybe_convert_prompt(prompt, tokenizer)
+                    text_inputs = tokenizer(
+                        prompt,
+                        padding="max_length",
+                        max_length=tokenizer.model_max_length,
+                        truncation=True,
+                        return_tensors="pd",
+                    )
+                    text_input_ids = text_inputs.input_ids
+                    untruncated_ids = tokenizer(prompt, padding="longest", return_tensors="pd").input_ids
+                    if (
+                        untruncated_ids.shape[-1] >= text_input_ids.shape[-1]
+                        and not paddle.equal_all(x=text_input_ids, y=untruncated_ids).item()
+                    ):
+                        removed_text = tokenizer.batch_decode(untruncated_ids[:, tokenizer.model_max_length - 1 : -1])
+                        logger.warning(
+                            f"The following part of your input was truncated because CLIP can only handle sequences up to {tokenizer.model_max_length} tokens: {removed_text}"
+                        )
+                    prompt_embeds = text_encoder(text_input_ids, output_hidden_states=True)
+                    return prompt_embeds.hidden_states[-2], prompt_embeds[0]
+
+                # repeated prompts are looked up in the prompt embeddings cache if it is enabled
+                prompt_embeds, pooled_prompt_embeds = self._encode_text_cached(
+                    prompt, encode_prompt, tokenizer, text_encoder, tokenizer.model_max_length
+                )
                 # We are only ALWAYS interested in the pooled output of the final text encoder
-                pooled_prompt_embeds = prompt_embeds[0]
-                prompt_embeds = prompt_embeds.hidden_states[-2]
                 prompt_embeds_list.append(prompt_embeds)
             prompt_embeds = paddle.concat(x=prompt_embeds_list, axis=-1)
 
@@ -265,17 +269,25 @@ class StableDiffusionXLPipeline(DiffusionPipeline, FromSingleFileMixin, LoraLoad
                 uncond_tokens = [negative_prompt, negative_prompt_2]
             negative_prompt_embeds_list = []
             for negative_prompt, tokenizer, text_encoder in zip(uncond_tokens, tokenizers, text_encoders):
-                if isinstance(self, TextualInversionLoaderMixin):
-                    negative_prompt = self.maybe_convert_prompt(negative_prompt, tokenizer)
                 max_length = prompt_embeds.shape[1]
-                uncond_input = tokenizer(
-                    negative_prompt, padding="max_length", max_length=max_length, truncation=True, return_tensors="pd"
+
+                def encode_negative_prompt(negative_prompt):
+                    if isinstance(self, TextualInversionLoaderMixin):
+                        negative_prompt = self.maybe_convert_prompt(negative_prompt, tokenizer)
+                    uncond_input = tokenizer(
+                        negative_prompt,
+                        padding="max_length",
+                        max_length=max_length,
+                        truncation=True,
+                        return_tensors="pd",
+                    )
+                    negative_prompt_embeds = text_encoder(uncond_input.input_ids, output_hidden_states=True)
+                    return negative_prompt_embeds.hidden_states[-2], negative_prompt_embeds[0]
+
+                negative_prompt_embeds, negative_pooled_prompt_embeds = self._encode_text_cached(
+                    negative_prompt, encode_negative_prompt, tokenizer, text_encoder, max_length
                 )
-                negative_prompt_embeds = text_encoder(uncond_input.input_ids, output_hidden_states=True)
                 # We are only ALWAYS interested in the pooled output of the final text encoder
-
-                negative_pooled_prompt_embeds = negative_prompt_embeds[0]
-                negative_prompt_embeds = negative_prompt_embeds.hidden_states[-2]
                 negative_prompt_embeds_list.append(negative_prompt_embeds)
             negative_prompt_embeds = paddle.concat(x=negative_prompt_embeds_list, axis=-1)
         prompt_embeds = prompt_embeds.cast(dtype=self.text_encoder_2.dtype)
@@ -230,6 +230,56 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
         self.timesteps = paddle.to_tensor(timesteps)
         self.model_outputs = [None] * solver_order
         self.lower_order_nums = 0
+        self._step_index = None
+        self._begin_index = None
+
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.step_index
+    @property
+    def step_index(self):
+        """
+        The index of the current timestep in `self.timesteps`, it increases by 1 after each `step`.
+        """
+        return self._step_index
+
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.begin_index
+    @property
+    def begin_index(self):
+        """
+        The index of the first timestep, set with `set_begin_index`.
+        """
+        return self._begin_index
+
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.set_begin_index
+    def set_begin_index(self, begin_index: int = 0):
+        """
+        Sets the index of the first timestep of the denoising loop. `scale_model_input` and `step` then advance an
+        internal counter from it instead of looking each timestep up in `self.timesteps`, which needs a device to host
+        sync, so the loop runs without synchronisation. It is reset by `set_timesteps`.
+
+        Args:
+            begin_index (`int`): the index of the first timestep, e.g. `t_start * self.order` for image-to-image.
+        """
+        self._begin_index = begin_index
+
+    def index_for_timestep(self, timestep, schedule_timesteps=None):
+        if schedule_timesteps is None:
+            schedule_timesteps = self.timesteps
+
+        indices = (schedule_timesteps == timestep).nonzero()
+
+        # a timestep that is not in the schedule is treated as the last one
+        if len(indices) == 0:
+            return len(schedule_timesteps) - 1
+        pos = 1 if len(indices) > 1 else 0
+
+        return indices[pos].item()
+
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._init_step_index
+    def _init_step_index(self, timestep):
+        if self.begin_index is None:
+            self._step_index = self.index_for_timestep(timestep)
+        else:
+            self._step_index = self._begin_index
 
     def set_timesteps(self, num_inference_steps: int = None):
         """
@@ -283,6 +333,11 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
         timesteps = timesteps[np.sort(unique_indices)]
 
         self.timesteps = paddle.to_tensor(timesteps)
+        # alpha_t, sigma_t and lambda_t of every step plus the final timestep 0, `step` reads them by step index
+        step_timesteps = paddle.to_tensor(np.append(timesteps, 0).astype(np.int64))
+        self.step_alpha_t = paddle.gather(self.alpha_t, step_timesteps)
+        self.step_sigma_t = paddle.gather(self.sigma_t, step_timesteps)
+        self.step_lambda_t = paddle.gather(self.lambda_t, step_timesteps)
 
         self.num_inference_steps = len(timesteps)
 
@@ -291,6 +346,9 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
         ] * self.config.solver_order
         self.lower_order_nums = 0
 
+        self._step_index = None
+        self._begin_index = None
+
     def _threshold_sample(self, sample: paddle.Tensor) -> paddle.Tensor:
         """
         "Dynamic thresholding: At each sampling step we set s to a certain percentile absolute pixel value in xt0 (the
@@ -386,18 +444,27 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
         Returns:
             `paddle.Tensor`: the converted model output.
         """
+        alpha_t, sigma_t, _ = self._coefficients(timestep)
+        return self._convert_model_output(model_output, alpha_t, sigma_t, sample)
+
+    def _coefficients(self, timestep):
+        return self.alpha_t[timestep], self.sigma_t[timestep], self.lambda_t[timestep]
+
+    def _step_coefficients(self, step_index):
+        # `len(self.timesteps)` is the timestep 0 the last step ends at
+        return self.step_alpha_t[step_index], self.step_sigma_t[step_index], self.step_lambda_t[step_index]
+
+    def _convert_model_output(self, model_output, alpha_t, sigma_t, sample):
         # DPM-Solver++ needs to solve an integral of the data prediction model.
         if self.config.algorithm_type in ["dpmsolver++", "sde-dpmsolver++"]:
             if self.config.prediction_type == "epsilon":
                 # DPM-Solver and DPM-Solver++ only need the "mean" output.
                 if self.config.variance_type in ["learned", "learned_range"]:
                     model_output = model_output[:, :3]
-                alpha_t, sigma_t = self.alpha_t[timestep], self.sigma_t[timestep]
                 x0_pred = (sample - sigma_t * model_output) / alpha_t
             elif self.config.prediction_type == "sample":
                 x0_pred = model_output
             elif self.config.prediction_type == "v_prediction":
-                alpha_t, sigma_t = self.alpha_t[timestep], self.sigma_t[timestep]
                 x0_pred = alpha_t * sample - sigma_t * model_output
             else:
                 raise ValueError(
@@ -418,10 +485,8 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
                 else:
                     epsilon = model_output
             elif self.config.prediction_type == "sample":
-                alpha_t, sigma_t = self.alpha_t[timestep], self.sigma_t[timestep]
                 epsilon = (sample - alpha_t * model_output) / sigma_t
             elif self.config.prediction_type == "v_prediction":
-                alpha_t, sigma_t = self.alpha_t[timestep], self.sigma_t[timestep]
                 epsilon = alpha_t * model_output + sigma_t * sample
             else:
                 raise ValueError(
@@ -430,7 +495,6 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
                 )
 
             if self.config.thresholding:
-                alpha_t, sigma_t = self.alpha_t[timestep], self.sigma_t[timestep]
                 x0_pred = (sample - sigma_t * epsilon) / alpha_t
                 x0_pred = self._threshold_sample(x0_pred)
                 epsilon = (sample - alpha_t * x0_pred) / sigma_t
@@ -460,9 +524,12 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
         Returns:
             `paddle.Tensor`: the sample tensor at the previous timestep.
         """
-        lambda_t, lambda_s = self.lambda_t[prev_timestep], self.lambda_t[timestep]
-        alpha_t, alpha_s = self.alpha_t[prev_timestep], self.alpha_t[timestep]
-        sigma_t, sigma_s = self.sigma_t[prev_timestep], self.sigma_t[timestep]
+        return self._first_order_update(
+            model_output, self._coefficients(timestep), self._coefficients(prev_timestep), sample, noise=noise
+        )
+
+    def _first_order_update(self, model_output, coefficients_s, coefficients_t, sample, noise=None):
+        (alpha_s, sigma_s, lambda_s), (alpha_t, sigma_t, lambda_t) = coefficients_s, coefficients_t
         h = lambda_t - lambda_s
         if self.config.algorithm_type == "dpmsolver++":
             x_t = (sigma_t / sigma_s) * sample - (alpha_t * (paddle.exp(-h) - 1.0)) * model_output
@@ -506,11 +573,18 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
         Returns:
             `paddle.Tensor`: the sample tensor at the previous timestep.
         """
-        t, s0, s1 = prev_timestep, timestep_list[-1], timestep_list[-2]
+        return self._second_order_update(
+            model_output_list,
+            [self._coefficients(timestep) for timestep in timestep_list],
+            self._coefficients(prev_timestep),
+            sample,
+            noise=noise,
+        )
+
+    def _second_order_update(self, model_output_list, coefficients_list, coefficients_t, sample, noise=None):
         m0, m1 = model_output_list[-1], model_output_list[-2]
-        lambda_t, lambda_s0, lambda_s1 = self.lambda_t[t], self.lambda_t[s0], self.lambda_t[s1]
-        alpha_t, alpha_s0 = self.alpha_t[t], self.alpha_t[s0]
-        sigma_t, sigma_s0 = self.sigma_t[t], self.sigma_t[s0]
+        (alpha_s0, sigma_s0, lambda_s0), (_, _, lambda_s1) = coefficients_list[-1], coefficients_list[-2]
+        alpha_t, sigma_t, lambda_t = coefficients_t
         h, h_0 = lambda_t - lambda_s0, lambda_s0 - lambda_s1
         r0 = h_0 / h
         D0, D1 = m0, (1.0 / r0) * (m0 - m1)
@@ -597,16 +671,17 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
         Returns:
             `paddle.Tensor`: the sample tensor at the previous timestep.
         """
-        t, s0, s1, s2 = prev_timestep, timestep_list[-1], timestep_list[-2], timestep_list[-3]
-        m0, m1, m2 = model_output_list[-1], model_output_list[-2], model_output_list[-3]
-        lambda_t, lambda_s0, lambda_s1, lambda_s2 = (
-            self.lambda_t[t],
-            self.lambda_t[s0],
-            self.lambda_t[s1],
-            self.lambda_t[s2],
+        return self._third_order_update(
+            model_output_list,
+            [self._coefficients(timestep) for timestep in timestep_list],
+            self._coefficients(prev_timestep),
+            sample,
         )
-        alpha_t, alpha_s0 = self.alpha_t[t], self.alpha_t[s0]
-        sigma_t, sigma_s0 = self.sigma_t[t], self.sigma_t[s0]
+
+    def _third_order_update(self, model_output_list, coefficients_list, coefficients_t, sample):
+        m0, m1, m2 = model_output_list[-1], model_output_list[-2], model_output_list[-3]
+        (alpha_s0, sigma_s0, lambda_s0), (_, _, lambda_s1), (_, _, lambda_s2) = coefficients_list[-3:][::-1]
+        alpha_t, sigma_t, lambda_t = coefficients_t
         h, h_0, h_1 = lambda_t - lambda_s0, lambda_s0 - lambda_s1, lambda_s1 - lambda_s2
         r0, r1 = h_0 / h, h_1 / h
         D0 = m0
@@ -659,12 +734,10 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
                 "Number of inference steps is 'None', you need to run 'set_timesteps' after creating the scheduler"
             )
 
-        step_index = (self.timesteps == timestep).nonzero()
-        if len(step_index) == 0:
-            step_index = len(self.timesteps) - 1
-        else:
-            step_index = step_index.item()
-        prev_timestep = 0 if step_index == len(self.timesteps) - 1 else self.timesteps[step_index + 1]
+        if self.step_index is None or self.begin_index is None:
+            self._init_step_index(timestep)
+        step_index = self.step_index
+
         lower_order_final = (
             (step_index == len(self.timesteps) - 1) and self.config.lower_order_final and len(self.timesteps) < 15
         )
@@ -672,7 +745,9 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
             (step_index == len(self.timesteps) - 2) and self.config.lower_order_final and len(self.timesteps) < 15
         )
 
-        model_output = self.convert_model_output(model_output, timestep, sample)
+        # the coefficients come from the per-step tables, indexing them by timestep would read the timestep tensor
+        coefficients_s0, coefficients_t = self._step_coefficients(step_index), self._step_coefficients(step_index + 1)
+        model_output = self._convert_model_output(model_output, *coefficients_s0[:2], sample)
         for i in range(self.config.solver_order - 1):
             self.model_outputs[i] = self.model_outputs[i + 1]
         self.model_outputs[-1] = model_output
@@ -683,23 +758,26 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
             noise = None
 
         if self.config.solver_order == 1 or self.lower_order_nums < 1 or lower_order_final:
-            prev_sample = self.dpm_solver_first_order_update(
-                model_output, timestep, prev_timestep, sample, noise=noise
-            )
+            prev_sample = self._first_order_update(model_output, coefficients_s0, coefficients_t, sample, noise=noise)
         elif self.config.solver_order == 2 or self.lower_order_nums < 2 or lower_order_second:
-            timestep_list = [self.timesteps[step_index - 1], timestep]
-            prev_sample = self.multistep_dpm_solver_second_order_update(
-                self.model_outputs, timestep_list, prev_timestep, sample, noise=noise
+            coefficients_list = [self._step_coefficients(step_index - 1), coefficients_s0]
+            prev_sample = self._second_order_update(
+                self.model_outputs, coefficients_list, coefficients_t, sample, noise=noise
             )
         else:
-            timestep_list = [self.timesteps[step_index - 2], self.timesteps[step_index - 1], timestep]
-            prev_sample = self.multistep_dpm_solver_third_order_update(
-                self.model_outputs, timestep_list, prev_timestep, sample
-            )
+            coefficients_list = [
+                self._step_coefficients(step_index - 2),
+                self._step_coefficients(step_index - 1),
+                coefficients_s0,
+            ]
+            prev_sample = self._third_order_update(self.model_outputs, coefficients_list, coefficients_t, sample)
 
         if self.lower_order_nums < self.config.solver_order:
             self.lower_order_nums += 1
 
+        # upon completion increase step index by one
+        self._step_index += 1
+
         if not return_dict:
             return (prev_sample,)
 
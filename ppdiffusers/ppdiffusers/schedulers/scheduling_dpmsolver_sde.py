@@ -13,7 +13,6 @@
 # limitations under the License.
 
 import math
-from collections import defaultdict
 from typing import List, Optional, Tuple, Union
 
 import numpy as np
@@ -216,14 +215,45 @@ class DPMSolverSDEScheduler(SchedulerMixin, ConfigMixin):
         # is always the second index (or the last index if there is only 1)
         # This way we can ensure we don't accidentally skip a sigma in
         # case we start in the middle of the denoising schedule (e.g. for image-to-image)
-        if len(self._index_counter) == 0:
-            pos = 1 if len(indices) > 1 else 0
-        else:
-            timestep_int = timestep.item() if paddle.is_tensor(timestep) else timestep
-            pos = self._index_counter[timestep_int]
+        pos = 1 if len(indices) > 1 else 0
 
         return indices[pos].item()
 
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.step_index
+    @property
+    def step_index(self):
+        """
+        The index of the current timestep in `self.timesteps`, it increases by 1 after each `step`.
+        """
+        return self._step_index
+
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.begin_index
+    @property
+    def begin_index(self):
+        """
+        The index of the first timestep, set with `set_begin_index`.
+        """
+        return self._begin_index
+
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.set_begin_index
+    def set_begin_index(self, begin_index: int = 0):
+        """
+        Sets the index of the first timestep of the denoising loop. `scale_model_input` and `step` then advance an
+        internal counter from it instead of looking each timestep up in `self.timesteps`, which needs a device to host
+        sync, so the loop runs without synchronisation. It is reset by `set_timesteps`.
+
+        Args:
+            begin_index (`int`): the index of the first timestep, e.g. `t_start * self.order` for image-to-image.
+        """
+        self._begin_index = begin_index
+
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._init_step_index
+    def _init_step_index(self, timestep):
+        if self.begin_index is None:
+            self._step_index = self.index_for_timestep(timestep)
+        else:
+            self._step_index = self._begin_index
+
     @property
     def init_noise_sigma(self):
         # standard deviation of the initial noise distribution
@@ -245,7 +275,9 @@ class DPMSolverSDEScheduler(SchedulerMixin, ConfigMixin):
         Returns:
             `paddle.Tensor`: scaled input sample
         """
-        step_index = self.index_for_timestep(timestep)
+        if self.step_index is None:
+            self._init_step_index(timestep)
+        step_index = self.step_index
 
         sigma = self.sigmas[step_index]
         sigma_input = sigma if self.state_in_first_order else self.mid_point_sigma
@@ -314,9 +346,8 @@ class DPMSolverSDEScheduler(SchedulerMixin, ConfigMixin):
         self.sample = None
         self.mid_point_sigma = None
 
-        # for exp beta schedules, such as the one for `pipeline_shap_e.py`
-        # we need an index counter
-        self._index_counter = defaultdict(int)
+        self._step_index = None
+        self._begin_index = None
 
     def _second_order_timesteps(self, sigmas, log_sigmas):
         def sigma_fn(_t):
@@ -397,11 +428,12 @@ class DPMSolverSDEScheduler(SchedulerMixin, ConfigMixin):
             [`~schedulers.scheduling_utils.SchedulerOutput`] if `return_dict` is True, otherwise a `tuple`. When
             returning a tuple, the first element is the sample tensor.
         """
-        step_index = self.index_for_timestep(timestep)
+        if self.step_index is None:
+            self._init_step_index(timestep)
+        step_index = self.step_index
 
-        # advance index counter by 1
-        timestep_int = timestep.item() if paddle.is_tensor(timestep) else timestep
-        self._index_counter[timestep_int] += 1
+        # advance the step index by 1
+        self._step_index += 1
 
         # Create a noise sampler if it hasn't been created yet
         if self.noise_sampler is None:
@@ -177,6 +177,9 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
         self.is_scale_input_called = False
         self.use_karras_sigmas = use_karras_sigmas
 
+        self._step_index = None
+        self._begin_index = None
+
     @property
     def init_noise_sigma(self):
         # standard deviation of the initial noise distribution
@@ -185,6 +188,51 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         return (self.sigmas.max() ** 2 + 1) ** 0.5
 
+    @property
+    def step_index(self):
+        """
+        The index of the current timestep in `self.timesteps`, it increases by 1 after each `step`.
+        """
+        return self._step_index
+
+    @property
+    def begin_index(self):
+        """
+        The index of the first timestep, set with `set_begin_index`.
+        """
+        return self._begin_index
+
+    def set_begin_index(self, begin_index: int = 0):
+        """
+        Sets the index of the first timestep of the denoising loop. `scale_model_input` and `step` then advance an
+        internal counter from it instead of looking each timestep up in `self.timesteps`, which needs a device to host
+        sync, so the loop runs without synchronisation. It is reset by `set_timesteps`.
+
+        Args:
+            begin_index (`int`): the index of the first timestep, e.g. `t_start * self.order` for image-to-image.
+        """
+        self._begin_index = begin_index
+
+    def index_for_timestep(self, timestep, schedule_timesteps=None):
+        if schedule_timesteps is None:
+            schedule_timesteps = self.timesteps
+
+        indices = (schedule_timesteps == timestep).nonzero()
+
+        # The sigma index that is taken for the **very** first `step`
+        # is always the second index (or the last index if there is only 1)
+        # This way we can ensure we don't accidentally skip a sigma in
+        # case we start in the middle of the denoising schedule (e.g. for image-to-image)
+        pos = 1 if len(indices) > 1 else 0
+
+        return indices[pos].item()
+
+    def _init_step_index(self, timestep):
+        if self.begin_index is None:
+            self._step_index = self.index_for_timestep(timestep)
+        else:
+            self._step_index = self._begin_index
+
     def scale_model_input(self, sample: paddle.Tensor, timestep: Union[float, paddle.Tensor]) -> paddle.Tensor:
         """
         Scales the denoising model input by `(sigma**2 + 1) ** 0.5` to match the Euler algorithm.
@@ -196,8 +244,9 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
         Returns:
             `paddle.Tensor`: scaled input sample
         """
-        step_index = (self.timesteps == timestep).nonzero().item()
-        sigma = self.sigmas[step_index]
+        if self.step_index is None or self.begin_index is None:
+            self._init_step_index(timestep)
+        sigma = self.sigmas[self.step_index]
 
         sample = sample / ((sigma**2 + 1) ** 0.5)
 
@@ -257,6 +306,9 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
         self.sigmas = paddle.to_tensor(sigmas)
         self.timesteps = paddle.to_tensor(timesteps, dtype=paddle.float32)
 
+        self._step_index = None
+        self._begin_index = None
+
     def _sigma_to_t(self, sigma, log_sigmas):
         # get log sigma
         log_sigma = np.log(sigma)
@@ -343,18 +395,21 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
                 "See `StableDiffusionPipeline` for a usage example."
             )
 
-        step_index = (self.timesteps == timestep).nonzero().item()
-        sigma = self.sigmas[step_index]
-
-        gamma = min(s_churn / (len(self.sigmas) - 1), 2**0.5 - 1) if s_tmin <= sigma <= s_tmax else 0.0
+        if self.step_index is None or self.begin_index is None:
+            self._init_step_index(timestep)
+        sigma = self.sigmas[self.step_index]
 
         noise = randn_tensor(model_output.shape, dtype=model_output.dtype, generator=generator)
 
-        eps = noise * s_noise
-        sigma_hat = sigma * (gamma + 1)
-
-        if gamma > 0:
+        if s_churn > 0:
+            # the sigma range check stays on device, a zero gamma leaves the sample untouched
+            gamma = min(s_churn / (len(self.sigmas) - 1), 2**0.5 - 1)
+            gamma = gamma * paddle.logical_and(sigma >= s_tmin, sigma <= s_tmax).cast(sigma.dtype)
+            sigma_hat = sigma * (gamma + 1)
+            eps = noise * s_noise
             sample = sample + eps * (sigma_hat**2 - sigma**2) ** 0.5
+        else:
+            sigma_hat = sigma
 
         # 1. compute predicted original sample (x_0) from sigma-scaled predicted noise
         # NOTE: "original_sample" should not be an expected prediction_type but is left in for
@@ -374,10 +429,13 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
         # 2. Convert to an ODE derivative
         derivative = (sample - pred_original_sample) / sigma_hat
 
-        dt = self.sigmas[step_index + 1] - sigma_hat
+        dt = self.sigmas[self.step_index + 1] - sigma_hat
 
         prev_sample = sample + derivative * dt
 
+        # upon completion increase step index by one
+        self._step_index += 1
+
         if not return_dict:
             return (prev_sample,)
 
@@ -35,6 +35,7 @@ from .constants import (
     NEG_INF,
     ONNX_EXTERNAL_WEIGHTS_NAME,
     ONNX_WEIGHTS_NAME,
+    PADDLE_WEIGHTS_INDEX_NAME,
     PADDLE_WEIGHTS_NAME,
     PPDIFFUSERS_CACHE,
     PPDIFFUSERS_DYNAMIC_MODULE_NAME,
@@ -43,7 +44,9 @@ from .constants import (
     TEST_DOWNLOAD_SERVER,
     TEXT_ENCODER_ATTN_MODULE,
     TO_DIFFUSERS,
+    TORCH_SAFETENSORS_WEIGHTS_INDEX_NAME,
     TORCH_SAFETENSORS_WEIGHTS_NAME,
+    TORCH_WEIGHTS_INDEX_NAME,
     TORCH_WEIGHTS_NAME,
     WEIGHTS_NAME,
     get_map_location_default,
@@ -93,12 +96,27 @@ from .import_utils import (
     is_wandb_available,
     requires_backends,
 )
+from .latent_checkpoints import LatentCheckpointStore, LatentTrajectory
 
 # custom load_utils
-from .load_utils import is_torch_file, safetensors_load, smart_load, torch_load
+from .load_utils import (
+    LazyTensor,
+    is_lazy_tensor,
+    is_torch_file,
+    materialize_tensor,
+    safetensors_load,
+    smart_load,
+    torch_load,
+)
 from .logging import get_logger
 from .outputs import BaseOutput
 from .pil_utils import PIL_INTERPOLATION, numpy_to_pil, pd_to_pil, pt_to_pil
+from .prompt_embeds_cache import (
+    PromptEmbedsCache,
+    get_prompt_embeds_cache,
+    invalidate_prompt_embeds_cache,
+    prompt_embeds_cache_token,
+)
 
 if is_paddle_available():
     from .paddle_utils import (
@@ -41,6 +41,8 @@ diffusers_default_cache_path = HUGGINGFACE_HUB_CACHE
 CONFIG_NAME = "config.json"
 TORCH_WEIGHTS_NAME = "diffusion_pytorch_model.bin"
 TORCH_SAFETENSORS_WEIGHTS_NAME = "diffusion_pytorch_model.safetensors"
+TORCH_WEIGHTS_INDEX_NAME = "diffusion_pytorch_model.bin.index.json"
+TORCH_SAFETENSORS_WEIGHTS_INDEX_NAME = "diffusion_pytorch_model.safetensors.index.json"
 FLAX_WEIGHTS_NAME = "diffusion_flax_model.msgpack"
 ONNX_WEIGHTS_NAME = "model.onnx"
 ONNX_EXTERNAL_WEIGHTS_NAME = "weights.pb"
@@ -54,6 +56,7 @@ HF_MODULES_CACHE = os.getenv("HF_MODULES_CACHE", os.path.join(hf_cache_home, "mo
 PPDIFFUSERS_MODULES_CACHE = os.getenv("PPDIFFUSERS_MODULES_CACHE", os.path.join(ppnlp_cache_home, "modules"))
 
 PADDLE_WEIGHTS_NAME = "model_state.pdparams"
+PADDLE_WEIGHTS_INDEX_NAME = "model_state.pdparams.index.json"
 FASTDEPLOY_WEIGHTS_NAME = "inference.pdiparams"
 FASTDEPLOY_MODEL_NAME = "inference.pdmodel"
 WEIGHTS_NAME = PADDLE_WEIGHTS_NAME
@@ -0,0 +1,192 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Latent checkpoints: the final latents of denoising loops that later calls with the same inputs skip to.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from .import_utils import is_paddle_available
+
+if is_paddle_available():
+    import paddle
+
+    from .paddle_utils import get_rng_state_tracker
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if hasattr(value, "element_size") and hasattr(value, "numel"):
+        return int(value.numel()) * value.element_size()
+    return 0
+
+
+def _get_generator_state(generator):
+    # the generators of ppdiffusers are names of states in the rng state tracker
+    if isinstance(generator, str):
+        return get_rng_state_tracker().states_[generator]
+    return generator.get_state()
+
+
+def _set_generator_state(generator, state):
+    if isinstance(generator, str):
+        get_rng_state_tracker().states_[generator] = state
+    else:
+        generator.set_state(state)
+
+
+def _copy_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    # schedulers replace their tensors on every step and only grow or overwrite lists in place, e.g. the
+    # `model_outputs` of the multistep solvers, so copying the lists is enough to freeze their state
+    return {k: list(v) if type(v) is list else v for k, v in state.items()}
+
+
+class LatentCheckpointStore:
+    r"""
+    A byte bounded LRU store of denoising checkpoints, the latents after the last step together with the scheduler and
+    generator states the loop leaves behind. Pipelines create one with [`DiffusionPipeline.enable_latent_checkpoints`].
+
+    Args:
+        max_bytes (`int`, *optional*, defaults to 1 GiB):
+            The size of the stored latents and scheduler tensors, the least recently used checkpoints are dropped
+            first.
+    """
+
+    def __init__(self, max_bytes: int = 1 << 30):
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_steps = 0
+
+    def get(self, key: Hashable) -> Optional[Tuple]:
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Tuple, num_bytes: Optional[int] = None):
+        if num_bytes is None:
+            num_bytes = _nbytes(value)
+        if num_bytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.num_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, num_bytes)
+            self.num_bytes += num_bytes
+            while self.num_bytes > self.max_bytes:
+                self.num_bytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.num_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        return key in self._entries
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "saved_steps": self.saved_steps,
+            "entries": len(self._entries),
+            "bytes": self.num_bytes,
+        }
+
+
+class LatentTrajectory:
+    r"""
+    The checkpoint of one denoising loop. `key` identifies everything the final latents depend on, so the loop of a
+    later call with the same key is skipped. Without a store every call is a no-op.
+
+    Only the final latents are kept: a step depends on the guidance settings and the prompt embeddings of all the
+    steps before it, so the intermediate latents of a call could only be shared by calls that end with the same final
+    latents anyway.
+
+    Args:
+        store ([`LatentCheckpointStore`] or `None`): Where the checkpoints are kept.
+        key (`str`): The digest of the inputs of the loop.
+        num_steps (`int`): The number of steps of the loop.
+        scheduler: The scheduler of the loop, its state is saved and restored with the latents.
+        generator (`paddle.Generator` or `List[paddle.Generator]`, *optional*): The generators of the loop.
+    """
+
+    def __init__(self, store, key, num_steps, scheduler, generator=None):
+        self.store = store
+        self.key = key
+        self.num_steps = num_steps
+        self.scheduler = scheduler
+        if generator is None:
+            generator = []
+        self.generators = generator if isinstance(generator, list) else [generator]
+
+    @staticmethod
+    def digest(*inputs) -> str:
+        """Hash tensors, arrays and anything with a stable `repr` into a key."""
+        sha = hashlib.sha1()
+        for value in inputs:
+            if hasattr(value, "numpy"):
+                value = value.numpy()
+            if hasattr(value, "tobytes"):
+                sha.update(str((value.dtype, value.shape)).encode("utf-8"))
+                sha.update(value.tobytes())
+            else:
+                sha.update(repr(value).encode("utf-8"))
+        return sha.hexdigest()
+
+    def resume(self, latents):
+        """
+        Returns the latents and the number of steps to skip, restoring the scheduler and generators of the checkpoint
+        of this trajectory if there is one.
+        """
+        if self.store is None:
+            return latents, 0
+        checkpoint = self.store.get(self.key)
+        if checkpoint is None:
+            self.store.misses += 1
+            return latents, 0
+        checkpoint_latents, scheduler_state, rng_state, generator_states = checkpoint
+        self.scheduler.__dict__.update(_copy_state(scheduler_state))
+        # the global generator too, it is the one the named generators draw from on CPU
+        paddle.set_rng_state(rng_state)
+        for generator, state in zip(self.generators, generator_states):
+            _set_generator_state(generator, state)
+        self.store.hits += 1
+        self.store.saved_steps += self.num_steps
+        return checkpoint_latents.clone(), self.num_steps
+
+    def record(self, step, latents):
+        """Save a checkpoint of the latents after `step` steps if it is the last step."""
+        if self.store is None or step != self.num_steps or self.key in self.store:
+            return
+        scheduler_state = _copy_state(self.scheduler.__dict__)
+        rng_state = paddle.get_rng_state()
+        generator_states = [_get_generator_state(generator) for generator in self.generators]
+        # the other scheduler tensors are shared with the scheduler and not counted
+        num_bytes = _nbytes(latents) + _nbytes([v for v in scheduler_state.values() if type(v) is list])
+        self.store.put(self.key, (latents.clone(), scheduler_state, rng_state, generator_states), num_bytes)
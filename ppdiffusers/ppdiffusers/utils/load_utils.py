@@ -14,12 +14,14 @@
 # limitations under the License.
 
 import io
+import json
 import os
 import pickle
+import struct
 from functools import lru_cache
 from pathlib import Path
 from typing import Union
-from zipfile import ZipFile
+from zipfile import ZIP_STORED, ZipFile
 
 import numpy as np
 
@@ -33,7 +35,7 @@ from .logging import get_logger
 
 logger = get_logger(__name__)
 
-__all__ = ["smart_load", "torch_load", "safetensors_load"]
+__all__ = ["smart_load", "torch_load", "safetensors_load", "LazyTensor"]
 
 paddle_suffix = [".pdparams", ".pd"]
 torch_suffix = [".pt", ".pth", ".bin", ".ckpt"]
@@ -190,8 +192,103 @@ def dumpy(*args, **kwarsg):
     return None
 
 
-def torch_load(path: str, **pickle_load_args):
-    if is_torch_available():
+def _to_paddle_dtype(dtype):
+    if isinstance(dtype, str):
+        return paddle.to_tensor([], dtype=dtype).dtype
+    return dtype
+
+
+class LazyTensor:
+    """
+    A read-only view over a memory-mapped region of a checkpoint file. Shape manipulations (`.T`, `reshape`,
+    `astype`) only update the underlying `np.memmap` view and nothing is read from disk until `numpy()` or
+    `to_tensor()` is called, which `ModelMixin._load_pretrained_model` does when assigning the value to a parameter.
+    bfloat16 data is stored as `np.uint16`, the same way `safetensors_load` patches it.
+    """
+
+    def __init__(self, array: np.ndarray, cast_dtype=None):
+        self.array = array
+        self.cast_dtype = cast_dtype
+
+    @property
+    def shape(self):
+        return list(self.array.shape)
+
+    @property
+    def ndim(self):
+        return self.array.ndim
+
+    @property
+    def dtype(self):
+        if self.cast_dtype is not None:
+            return _to_paddle_dtype(self.cast_dtype)
+        if self.array.dtype == np.uint16:
+            return paddle.bfloat16
+        return _to_paddle_dtype(str(self.array.dtype))
+
+    @property
+    def nbytes(self):
+        return self.array.nbytes
+
+    def is_floating_point(self):
+        if self.cast_dtype is not None:
+            return "float" in str(self.cast_dtype)
+        return self.array.dtype == np.uint16 or np.issubdtype(self.array.dtype, np.floating)
+
+    @property
+    def T(self):
+        return LazyTensor(self.array.T, cast_dtype=self.cast_dtype)
+
+    def reshape(self, shape, order="C"):
+        return LazyTensor(self.array.reshape(shape, order=order), cast_dtype=self.cast_dtype)
+
+    def astype(self, dtype):
+        return LazyTensor(self.array, cast_dtype=dtype)
+
+    def numpy(self):
+        # this copy is where the pages are actually read from disk
+        return np.ascontiguousarray(self.array)
+
+    def to_tensor(self, dtype=None):
+        tensor = paddle.to_tensor(self.numpy())
+        dtype = dtype if dtype is not None else self.cast_dtype
+        if dtype is not None and tensor.dtype != _to_paddle_dtype(dtype):
+            tensor = tensor.cast(dtype)
+        return tensor
+
+    def __repr__(self):
+        return f"LazyTensor(shape={self.shape}, dtype={self.dtype})"
+
+
+def is_lazy_tensor(value):
+    return isinstance(value, LazyTensor)
+
+
+def materialize_tensor(value, dtype=None):
+    """Turn a `LazyTensor`, numpy array or paddle tensor into a paddle tensor, optionally cast to `dtype`."""
+    if isinstance(value, LazyTensor):
+        return value.to_tensor(dtype)
+    if isinstance(value, np.ndarray):
+        value = paddle.to_tensor(value)
+    if dtype is not None and value.dtype != _to_paddle_dtype(dtype):
+        value = value.cast(dtype)
+    return value
+
+
+def _zip_member_data_offset(file_handler, zip_info):
+    # the central directory does not know the length of the local extra field, so read the local header
+    file_handler.seek(zip_info.header_offset)
+    local_header = file_handler.read(MZ_ZIP_LOCAL_DIR_HEADER_SIZE)
+    filename_length, extra_length = struct.unpack("<HH", local_header[26:30])
+    return zip_info.header_offset + MZ_ZIP_LOCAL_DIR_HEADER_SIZE + filename_length + extra_length
+
+
+def torch_load(path: str, lazy: bool = False, **pickle_load_args):
+    """
+    Load a pytorch checkpoint. When `lazy=True` every storage stored uncompressed in the zip archive is returned as
+    an `np.memmap` view (the tensors built on top of it are views as well), so no tensor data is read until it is used.
+    """
+    if is_torch_available() and not lazy:
         import torch
 
         state_dict = torch.load(path, map_location="cpu")
@@ -201,10 +298,19 @@ def torch_load(path: str, **pickle_load_args):
         prefix_key = read_prefix_key(path)
 
         torch_zip = ZipFile(path, "r")
+        raw_file = open(path, "rb") if lazy else None
         loaded_storages = {}
 
         def load_tensor(dtype, numel, key, location):
             name = f"{prefix_key}/data/{key}"
+            if lazy:
+                zip_info = torch_zip.getinfo(name)
+                # torch.save writes storages uncompressed, so they can be mapped in place
+                if zip_info.compress_type == ZIP_STORED:
+                    offset = _zip_member_data_offset(raw_file, zip_info)
+                    return np.memmap(
+                        path, dtype=dtype, mode="r", offset=offset, shape=(numel // np.dtype(dtype).itemsize,)
+                    )
             typed_storage = np.frombuffer(torch_zip.open(name).read()[:numel], dtype=dtype)
             return typed_storage
 
@@ -233,10 +339,12 @@ def torch_load(path: str, **pickle_load_args):
         unpickler_stage.persistent_load = persistent_load
         state_dict = unpickler_stage.load()
         torch_zip.close()
+        if raw_file is not None:
+            raw_file.close()
     return state_dict
 
 
-def convert_to_paddle(state_dict, return_numpy=False, return_global_step=False):
+def convert_to_paddle(state_dict, return_numpy=False, return_global_step=False, lazy=False):
     pd_state_dict = {}
     # maybe we will use global_step
     if return_global_step:
@@ -259,7 +367,9 @@ def convert_to_paddle(state_dict, return_numpy=False, return_global_step=False):
         #     v = v.numpy().astype("int64") if hasattr(v, "numpy") else v.astype("int64")
         if v.ndim == 0:
             v = v.reshape((1,))
-        if not return_numpy:
+        if lazy and isinstance(v, np.ndarray):
+            pd_state_dict[k] = LazyTensor(v)
+        elif not return_numpy:
             # support bfloat16
             if "torch.bfloat16" in str(v.dtype):
                 v = v.float()
@@ -288,7 +398,47 @@ def convert_to_numpy(state_dict):
     return pd_state_dict
 
 
-def safetensors_load(path: str):
+_safetensors_dtype_to_numpy = {
+    "F64": np.float64,
+    "F32": np.float32,
+    "F16": np.float16,
+    "BF16": np.uint16,
+    "I64": np.int64,
+    "I32": np.int32,
+    "I16": np.int16,
+    "I8": np.int8,
+    "U8": np.uint8,
+    "BOOL": np.bool_,
+}
+
+
+def safetensors_lazy_load(path: str):
+    """
+    Parse the safetensors header and return a dict of `np.memmap` views over each tensor's byte range, without
+    reading any tensor data. The `safetensors` library is not required.
+    """
+    with open(path, "rb") as file_handler:
+        (header_size,) = struct.unpack("<Q", file_handler.read(8))
+        header = json.loads(file_handler.read(header_size))
+    data_start = 8 + header_size
+
+    state_dict = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _safetensors_dtype_to_numpy[info["dtype"]]
+        begin, end = info["data_offsets"]
+        shape = tuple(info["shape"])
+        if end == begin:
+            state_dict[name] = np.zeros(shape, dtype=dtype)
+        else:
+            state_dict[name] = np.memmap(path, dtype=dtype, mode="r", offset=data_start + begin, shape=shape)
+    return state_dict
+
+
+def safetensors_load(path: str, lazy: bool = False):
+    if lazy:
+        return safetensors_lazy_load(path)
     if is_safetensors_available():
         try:
             if is_torch_available():
@@ -315,7 +465,13 @@ def smart_load(
     return_numpy: bool = False,
     return_global_step: bool = False,
     return_is_torch_weight: bool = False,
+    lazy: bool = False,
 ):
+    """
+    Load a paddle / torch / safetensors checkpoint. If `lazy=True`, torch and safetensors weights are returned as
+    `LazyTensor` views over the memory-mapped file instead of paddle tensors, so at most one copy of the weights is
+    ever held in host memory. Paddle checkpoints are always loaded eagerly.
+    """
     if map_location is None:
         map_location = get_map_location_default()
 
@@ -328,27 +484,31 @@ def smart_load(
             return state_dict
 
         if suffix in torch_suffix:
-            state_dict = convert_to_paddle(torch_load(path), return_numpy, return_global_step)
+            state_dict = convert_to_paddle(torch_load(path, lazy=lazy), return_numpy, return_global_step, lazy=lazy)
             if return_is_torch_weight:
                 state_dict["is_torch_weight"] = True
             return state_dict
 
         if suffix in safetensors_suffix:
-            state_dict = convert_to_paddle(safetensors_load(path), return_numpy, return_global_step)
+            state_dict = convert_to_paddle(
+                safetensors_load(path, lazy=lazy), return_numpy, return_global_step, lazy=lazy
+            )
             if return_is_torch_weight:
                 state_dict["is_torch_weight"] = True
             return state_dict
 
         # must use safetensors_load first
         try:
-            state_dict = convert_to_paddle(safetensors_load(path), return_numpy, return_global_step)
+            state_dict = convert_to_paddle(
+                safetensors_load(path, lazy=lazy), return_numpy, return_global_step, lazy=lazy
+            )
             if return_is_torch_weight:
                 state_dict["is_torch_weight"] = True
             return state_dict
         except Exception:
             logger.info(f"Cant load file {name} with safetensors!")
         try:
-            state_dict = convert_to_paddle(torch_load(path), return_numpy, return_global_step)
+            state_dict = convert_to_paddle(torch_load(path, lazy=lazy), return_numpy, return_global_step, lazy=lazy)
             if return_is_torch_weight:
                 state_dict["is_torch_weight"] = True
             return state_dict
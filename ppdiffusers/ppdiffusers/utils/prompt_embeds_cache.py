@@ -0,0 +1,112 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Prompt embeddings cache: a process wide LRU of text encoder outputs shared by all pipelines.
+"""
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_cache_tokens = itertools.count()
+_cache_tokens_lock = threading.Lock()
+
+
+def prompt_embeds_cache_token(obj) -> Optional[int]:
+    """
+    The token that identifies the current state of a tokenizer or text encoder in the keys of [`PromptEmbedsCache`].
+    A token is never reused, so a new model that gets the `id` of a freed one does not match its entries.
+    """
+    if obj is None:
+        return None
+    token = getattr(obj, "_prompt_embeds_cache_token", None)
+    if token is None:
+        with _cache_tokens_lock:
+            token = next(_cache_tokens)
+        obj._prompt_embeds_cache_token = token
+    return token
+
+
+def invalidate_prompt_embeds_cache(*objs):
+    """
+    Give the tokenizers and text encoders in `objs` new tokens, e.g. after loading LoRA or textual inversion weights
+    into them. The embeddings computed before can not be hit anymore and age out of the cache.
+    """
+    for obj in objs:
+        if obj is not None and getattr(obj, "_prompt_embeds_cache_token", None) is not None:
+            with _cache_tokens_lock:
+                obj._prompt_embeds_cache_token = next(_cache_tokens)
+
+
+class PromptEmbedsCache:
+    r"""
+    A size bounded LRU cache of text embeddings, one entry per prompt text. Pipelines share the process wide instance
+    returned by [`get_prompt_embeds_cache`] once they call [`DiffusionPipeline.enable_prompt_embeds_cache`].
+
+    Args:
+        max_entries (`int`, *optional*, defaults to 1024):
+            The number of prompt texts kept, the least recently used one is dropped first.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._entries.get(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def resize(self, max_entries: int):
+        with self._lock:
+            self.max_entries = max_entries
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable):
+        return key in self._entries
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+_PROMPT_EMBEDS_CACHE = PromptEmbedsCache()
+
+
+def get_prompt_embeds_cache() -> PromptEmbedsCache:
+    return _PROMPT_EMBEDS_CACHE
@@ -409,6 +409,57 @@ class LoraLoaderMixinTests(unittest.TestCase):
             orig_image_slice, orig_image_slice_two, atol=0.001
         ), "Unloading LoRA parameters should lead to results similar to what was obtained with the pipeline without any LoRA parameters."
 
+    def test_fuse_unfuse_lora_sd(self):
+        pipeline_components, lora_components = self.get_dummy_components()
+        _, _, pipeline_inputs = self.get_dummy_inputs(with_generator=False)
+        sd_pipe = StableDiffusionPipeline(**pipeline_components)
+        original_state_dict = {k: v.clone() for k, v in sd_pipe.unet.state_dict().items()}
+        original_state_dict.update({k: v.clone() for k, v in sd_pipe.text_encoder.state_dict().items()})
+        # Emulate training, with small updates so that the rounding of the fused weights is not amplified.
+        with paddle.no_grad():
+            for parameter in list(lora_components["unet_lora_layers"].parameters()) + list(
+                lora_components["text_encoder_lora_layers"].parameters()
+            ):
+                parameter.set_value(0.1 * paddle.randn(shape=parameter.shape, dtype=parameter.dtype))
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            LoraLoaderMixin.save_lora_weights(
+                save_directory=tmpdirname,
+                unet_lora_layers=lora_components["unet_lora_layers"],
+                text_encoder_lora_layers=lora_components["text_encoder_lora_layers"],
+            )
+            sd_pipe.load_lora_weights(tmpdirname)
+        lora_images = sd_pipe(**pipeline_inputs, generator=paddle.Generator().manual_seed(0)).images
+        lora_image_slice = lora_images[0, -3:, -3:, -1]
+
+        sd_pipe.fuse_lora()
+        for _, module in sd_pipe.unet.named_sublayers():
+            if isinstance(module, Attention):
+                self.assertIsInstance(module.processor, (AttnProcessor, AttnProcessor2_5))
+        fused_images = sd_pipe(**pipeline_inputs, generator=paddle.Generator().manual_seed(0)).images
+        fused_image_slice = fused_images[0, -3:, -3:, -1]
+        assert np.allclose(
+            lora_image_slice, fused_image_slice, atol=0.001
+        ), "Fused LoRA weights should lead to the same results as the LoRA layers."
+
+        # the original weights are restored exactly
+        sd_pipe.unfuse_lora()
+        for _, module in sd_pipe.unet.named_sublayers():
+            if isinstance(module, Attention):
+                self.assertIsInstance(module.processor, (LoRAAttnProcessor, LoRAAttnProcessor2_5))
+        state_dict = {**sd_pipe.unet.state_dict(), **sd_pipe.text_encoder.state_dict()}
+        for k, v in original_state_dict.items():
+            # the patched text encoder projections keep their layers in `regular_linear_layer`
+            key = k if k in state_dict else "{}.regular_linear_layer.{}".format(*k.rsplit(".", 1))
+            assert paddle.equal_all(v, state_dict[key]).item(), k
+        unfused_images = sd_pipe(**pipeline_inputs, generator=paddle.Generator().manual_seed(0)).images
+        assert np.allclose(lora_image_slice, unfused_images[0, -3:, -3:, -1], atol=1e-5)
+
+        # unloading a fused LoRA keeps its weights
+        sd_pipe.fuse_lora()
+        sd_pipe.unload_lora_weights()
+        unloaded_images = sd_pipe(**pipeline_inputs, generator=paddle.Generator().manual_seed(0)).images
+        assert np.allclose(fused_image_slice, unloaded_images[0, -3:, -3:, -1], atol=1e-5)
+
     def test_lora_unet_attn_processors_with_xformers(self):
         with tempfile.TemporaryDirectory() as tmpdirname:
             self.create_lora_weight_file(tmpdirname)
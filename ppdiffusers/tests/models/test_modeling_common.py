@@ -31,6 +31,7 @@ from ppdiffusers.models.attention_processor import (
     AttnProcessor2_5,
     XFormersAttnProcessor,
 )
+from ppdiffusers.models.modeling_utils import dtype_byte_size
 from ppdiffusers.training_utils import EMAModel
 from ppdiffusers.utils import logging
 from ppdiffusers.utils.testing_utils import CaptureLogger, nightly, require_paddle_gpu
@@ -176,6 +177,23 @@ class ModelTesterMixin:
         max_diff = (image - new_image).abs().sum().item()
         self.assertLessEqual(max_diff, 1e-01, "Models give different forward passes")
 
+    def test_sharded_checkpoints(self):
+        init_dict, _ = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**init_dict)
+        model.eval()
+        model_size = sum(int(np.prod(v.shape)) * dtype_byte_size(v.dtype) for v in model.state_dict().values())
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            model.save_pretrained(tmpdirname, max_shard_size=int(model_size // 4))
+            self.assertTrue(os.path.isfile(os.path.join(tmpdirname, "model_state.pdparams.index.json")))
+            self.assertFalse(os.path.isfile(os.path.join(tmpdirname, "model_state.pdparams")))
+            new_model, loading_info = self.model_class.from_pretrained(tmpdirname, output_loading_info=True)
+
+        self.assertEqual(loading_info["missing_keys"], [])
+        self.assertEqual(loading_info["unexpected_keys"], [])
+        new_state_dict = new_model.state_dict()
+        for key, value in model.state_dict().items():
+            self.assertTrue(paddle.allclose(value, new_state_dict[key]), key)
+
     def test_getattr_is_correct(self):
         init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
         model = self.model_class(**init_dict)
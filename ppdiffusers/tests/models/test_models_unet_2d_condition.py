@@ -24,6 +24,7 @@ from parameterized import parameterized
 from pytest import mark
 
 from ppdiffusers import UNet2DConditionModel
+from ppdiffusers.loaders import AttnProcsLayers
 from ppdiffusers.models.attention_processor import (
     CustomDiffusionAttnProcessor,
     LoRAAttnProcessor,
@@ -448,6 +449,85 @@ class UNet2DConditionModelTests(ModelTesterMixin, UNetTesterMixin, unittest.Test
         # LoRA and no LoRA should NOT be the same
         assert (sample - old_sample).abs().max() > 1e-4
 
+    def test_lora_adapters_batched(self):
+        init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
+        init_dict["attention_head_dim"] = 8, 16
+        paddle.seed(0)
+        model = self.model_class(**init_dict)
+        with paddle.no_grad():
+            old_sample = model(**inputs_dict).sample
+
+        adapters = {}
+        for adapter_name, seed in [("a", 1), ("b", 2)]:
+            paddle.seed(seed)
+            adapters[adapter_name] = AttnProcsLayers(create_lora_layers(model)).state_dict()
+        # a conv and a linear LoRA of a lower rank, only in the second adapter
+        adapters["b"]["down_blocks.0.resnets.0.conv1.lora.down.weight"] = paddle.randn([2, 32, 3, 3])
+        adapters["b"]["down_blocks.0.resnets.0.conv1.lora.up.weight"] = paddle.randn([32, 2, 1, 1])
+        adapters["b"]["down_blocks.0.attentions.0.transformer_blocks.0.ff.net.2.lora.down.weight"] = paddle.randn(
+            [128, 2]
+        )
+        adapters["b"]["down_blocks.0.attentions.0.transformer_blocks.0.ff.net.2.lora.up.weight"] = paddle.randn(
+            [2, 32]
+        )
+
+        expected = {None: old_sample}
+        for adapter_name, state_dict in adapters.items():
+            paddle.seed(0)
+            single_model = self.model_class(**init_dict)
+            single_model.load_attn_procs(dict(state_dict))
+            with paddle.no_grad():
+                expected[adapter_name] = single_model(**inputs_dict, cross_attention_kwargs={"scale": 0.5}).sample
+
+        model.load_lora_adapters(adapters)
+        with paddle.no_grad():
+            # no adapter is selected yet
+            sample = model(**inputs_dict).sample
+        assert (sample - old_sample).abs().max() < 1e-4
+
+        rows = ["a", "b", None, 0]
+        model.set_lora_adapters(rows)
+        with paddle.no_grad():
+            sample = model(**inputs_dict, cross_attention_kwargs={"scale": 0.5}).sample
+        for i, adapter_name in enumerate(["a", "b", None, "a"]):
+            assert (sample[i] - expected[adapter_name][i]).abs().max() < 1e-4
+
+        with self.assertRaises(ValueError):
+            model.set_lora_adapters(["c"])
+
+        model.unload_lora_adapters()
+        with paddle.no_grad():
+            sample = model(**inputs_dict).sample
+        assert (sample - old_sample).abs().max() < 1e-4
+
+    def test_lora_fuse_unfuse(self):
+        init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
+        init_dict["attention_head_dim"] = 8, 16
+        paddle.seed(0)
+        model = self.model_class(**init_dict)
+        original_state_dict = {k: v.clone() for k, v in model.state_dict().items()}
+        state_dict = AttnProcsLayers(create_lora_layers(model)).state_dict()
+        state_dict = {k: 0.01 * v for k, v in state_dict.items()}
+        state_dict["down_blocks.0.resnets.0.conv1.lora.down.weight"] = 0.1 * paddle.randn([2, 32, 3, 3])
+        state_dict["down_blocks.0.resnets.0.conv1.lora.up.weight"] = 0.1 * paddle.randn([32, 2, 1, 1])
+        model.load_attn_procs(state_dict)
+        with paddle.no_grad():
+            sample = model(**inputs_dict).sample
+
+        model.fuse_lora()
+        assert model.down_blocks[0].resnets[0].conv1.lora_layer is None
+        with paddle.no_grad():
+            fused_sample = model(**inputs_dict).sample
+        assert (sample - fused_sample).abs().max() < 1e-4
+
+        model.unfuse_lora()
+        for k, v in model.state_dict().items():
+            if k in original_state_dict:
+                assert paddle.equal_all(v, original_state_dict[k]).item(), k
+        with paddle.no_grad():
+            unfused_sample = model(**inputs_dict).sample
+        assert (sample - unfused_sample).abs().max() < 1e-5
+
     def test_lora_save_load_safetensors(self):
         # enable deterministic behavior for gradient checkpointing
         init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
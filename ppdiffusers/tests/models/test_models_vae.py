@@ -16,6 +16,7 @@
 import gc
 import unittest
 
+import numpy as np
 import paddle
 from parameterized import parameterized
 
@@ -115,6 +116,28 @@ class AutoencoderKLTests(ModelTesterMixin, UNetTesterMixin, unittest.TestCase):
             for name, param in named_params.items():
                 self.assertTrue(paddle_all_close(param.grad, named_params_2[name].grad, atol=5e-5))
 
+    def test_tiled_decode_batched_into_output(self):
+        init_dict, _ = self.prepare_init_args_and_inputs_for_common()
+        init_dict["sample_size"] = 32
+        model = self.model_class(**init_dict)
+        model.eval()
+
+        latents = floats_tensor((2, 4, 40, 56))
+        with paddle.no_grad():
+            expected = model.tiled_decode(latents).sample
+            model.enable_tiling(tile_batch_size=3)
+            batched = model.tiled_decode(latents).sample
+            output = np.zeros(expected.shape, dtype="float32")
+            streamed = model.tiled_decode(latents, output=output).sample
+
+        self.assertEqual(expected.shape, [2, 3, 80, 112])
+        self.assertTrue(paddle_all_close(batched, expected, atol=1e-5))
+        self.assertIs(streamed, output)
+        self.assertTrue(np.allclose(output, expected.numpy(), atol=1e-5))
+
+        with self.assertRaises(ValueError):
+            model.tiled_decode(latents, output=np.zeros([2, 3, 64, 112], dtype="float32"))
+
     def test_from_pretrained_hub(self):
         model, loading_info = AutoencoderKL.from_pretrained("fusing/autoencoder-kl-dummy", output_loading_info=True)
         self.assertIsNotNone(model)
@@ -0,0 +1,110 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import paddle
+
+from ppdiffusers.pipelines import fastdeploy_utils
+from ppdiffusers.pipelines.fastdeploy_utils import FastDeployIOBinding
+
+
+class FakeRuntime:
+    """A runtime with one output that writes twice the sum of its bound inputs into its bound output buffer."""
+
+    def __init__(self):
+        self.inputs = {}
+        self.outputs = {}
+        self.num_binds = 0
+
+    def get_output_info(self, index):
+        return SimpleNamespace(name="out")
+
+    def bind_input_tensor(self, name, tensor):
+        self.inputs[name] = tensor
+        self.num_binds += 1
+
+    def bind_output_tensor(self, name, tensor):
+        self.outputs[name] = tensor
+
+    def zero_copy_infer(self):
+        result = 2 * sum(tensor.astype("float32") for tensor in self.inputs.values())
+        paddle.assign(result.astype(self.outputs["out"].dtype), output=self.outputs["out"])
+
+
+class FastDeployIOBindingTest(unittest.TestCase):
+    def setUp(self):
+        # the fake runtime gets the paddle buffers themselves instead of FDTensors sharing their memory
+        patcher = mock.patch.object(
+            fastdeploy_utils,
+            "pdtensor2fdtensor",
+            lambda tensor, name="", share_with_raw_ptr=False: tensor,
+            create=True,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.runtime = FakeRuntime()
+        self.io_binding = FastDeployIOBinding(self.runtime, max_cached_shapes=2)
+
+    def run_binding(self, x, y, **kwargs):
+        return self.io_binding.run({"x": x, "y": y}, output_shape=x.shape, **kwargs)[0]
+
+    def test_reuses_buffers_per_shape_and_dtype(self):
+        x, y = paddle.ones([2, 4]), paddle.full([2, 4], 2.0)
+        np.testing.assert_allclose(self.run_binding(x, y).numpy(), np.full([2, 4], 6.0))
+        input_buffers, output_buffers = self.io_binding._buffers[next(iter(self.io_binding._buffers))]
+        self.assertEqual(self.runtime.num_binds, 2)
+
+        # the same shapes copy into the bound buffers without binding again
+        np.testing.assert_allclose(self.run_binding(y, y).numpy(), np.full([2, 4], 8.0))
+        self.assertEqual(len(self.io_binding._buffers), 1)
+        self.assertEqual(self.runtime.num_binds, 2)
+        self.assertIs(self.runtime.inputs["x"], input_buffers["x"])
+        self.assertIs(self.runtime.outputs["out"], output_buffers["out"])
+
+        # a new shape and a new dtype get their own entries of the pool
+        self.run_binding(paddle.ones([3, 4]), paddle.ones([3, 4]))
+        self.assertEqual(len(self.io_binding._buffers), 2)
+        self.assertEqual(self.runtime.num_binds, 4)
+        outputs = self.run_binding(x.astype("float64"), y.astype("float64"), output_dtype="float64")
+        self.assertEqual(outputs.dtype, paddle.float64)
+        np.testing.assert_allclose(outputs.numpy(), np.full([2, 4], 6.0))
+        self.assertEqual(self.runtime.num_binds, 6)
+
+        # the least recently used shape was evicted, the others rebind their kept buffers
+        self.assertEqual(len(self.io_binding._buffers), 2)
+        self.run_binding(paddle.ones([3, 4]), paddle.ones([3, 4]))
+        self.assertEqual(len(self.io_binding._buffers), 2)
+        self.assertEqual(self.runtime.num_binds, 8)
+        self.run_binding(x, y)
+        self.assertEqual(self.runtime.num_binds, 10)
+        self.assertIsNot(self.runtime.inputs["x"], input_buffers["x"])
+
+    def test_copy_outputs(self):
+        x = paddle.ones([2, 4])
+        outputs = self.run_binding(x, x, copy_outputs=False)
+        copied = self.run_binding(x, x, copy_outputs=True)
+        np.testing.assert_allclose(outputs.numpy(), np.full([2, 4], 4.0))
+
+        # the next call overwrites the bound output buffer but not the copy
+        self.run_binding(x, 2 * x, copy_outputs=False)
+        np.testing.assert_allclose(outputs.numpy(), np.full([2, 4], 6.0))
+        np.testing.assert_allclose(copied.numpy(), np.full([2, 4], 4.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import paddle
+from paddle.io import Dataset
+from paddlenlp.transformers import CLIPTextConfig, CLIPTextModel, CLIPTokenizer
+
+from ppdiffusers import AutoencoderKL, UNet2DConditionModel
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "examples", "stable_diffusion"
+    ),
+)
+# the example replaces paddle.nn.Linear with the fused one on import unless FLAG_FUSED_LINEAR is off
+with mock.patch.dict(os.environ, {"FLAG_FUSED_LINEAR": "0"}):
+    from sd import (
+        LatentCacheDataset,
+        SDModelArguments,
+        StableDiffusionModel,
+        latent_cache_input_spec,
+        precompute_latent_cache,
+    )
+
+RESOLUTION = 32
+MAX_LENGTH = 8
+
+
+def save_tiny_stable_diffusion(model_dir):
+    tokenizer_dir = os.path.join(model_dir, "tokenizer")
+    os.makedirs(tokenizer_dir)
+    vocab = {"<|startoftext|>": 0, "<|endoftext|>": 1, "!": 2}
+    for i, char in enumerate("abcdefghij"):
+        vocab[char] = 3 + 2 * i
+        vocab[char + "</w>"] = 4 + 2 * i
+    with open(os.path.join(tokenizer_dir, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(tokenizer_dir, "merges.txt"), "w") as f:
+        f.write("#version: 0.2\n")
+    CLIPTokenizer(
+        os.path.join(tokenizer_dir, "vocab.json"),
+        os.path.join(tokenizer_dir, "merges.txt"),
+        model_max_length=MAX_LENGTH,
+    ).save_pretrained(tokenizer_dir)
+    paddle.seed(0)
+    CLIPTextModel(
+        CLIPTextConfig(
+            vocab_size=len(vocab),
+            hidden_size=32,
+            intermediate_size=37,
+            num_attention_heads=4,
+            num_hidden_layers=2,
+            max_position_embeddings=MAX_LENGTH,
+            projection_dim=32,
+        )
+    ).save_pretrained(os.path.join(model_dir, "text_encoder"))
+    AutoencoderKL(
+        block_out_channels=[32, 64],
+        down_block_types=["DownEncoderBlock2D"] * 2,
+        up_block_types=["UpDecoderBlock2D"] * 2,
+        latent_channels=4,
+    ).save_pretrained(os.path.join(model_dir, "vae"))
+    UNet2DConditionModel(
+        block_out_channels=(32, 64),
+        layers_per_block=1,
+        sample_size=RESOLUTION // 2,
+        in_channels=4,
+        out_channels=4,
+        down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+        up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+        cross_attention_dim=32,
+    ).save_pretrained(os.path.join(model_dir, "unet"))
+
+
+class RandomTextImageDataset(Dataset):
+    def __init__(self, tokenizer, num_samples=5):
+        rng = np.random.RandomState(0)
+        self.pixel_values = rng.uniform(-1, 1, size=[num_samples, 3, RESOLUTION, RESOLUTION]).astype("float32")
+        captions = ["a b c", "d e", "f g h i", "j", "a c e g i j"][:num_samples]
+        self.input_ids = tokenizer(
+            captions, padding="max_length", truncation=True, max_length=MAX_LENGTH, return_tensors="np"
+        ).input_ids.astype("int64")
+
+    def __getitem__(self, idx):
+        return {"pixel_values": self.pixel_values[idx], "input_ids": self.input_ids[idx]}
+
+    def __len__(self):
+        return len(self.pixel_values)
+
+
+class LatentCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        model_dir = os.path.join(cls.tmpdir.name, "model")
+        save_tiny_stable_diffusion(model_dir)
+        cls.model_args = SDModelArguments(pretrained_model_name_or_path=model_dir, model_max_length=MAX_LENGTH)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def setUp(self):
+        self.model = StableDiffusionModel(self.model_args)
+        self.dataset = RandomTextImageDataset(self.model.tokenizer)
+
+    def precompute(self, dtype):
+        cache_dir = os.path.join(self.tmpdir.name, f"cache_{dtype}")
+        num_samples = precompute_latent_cache(
+            self.model.vae,
+            self.model.text_encoder,
+            self.model.tokenizer,
+            self.dataset,
+            cache_dir,
+            batch_size=2,
+            dtype=dtype,
+        )
+        self.assertEqual(num_samples, len(self.dataset))
+        return cache_dir
+
+    @paddle.no_grad()
+    def test_cache_round_trip(self):
+        cache_dir = self.precompute("float16")
+        self.assertEqual(np.load(os.path.join(cache_dir, "latent_moments.npy"), mmap_mode="r").dtype, np.float16)
+        cache = LatentCacheDataset(cache_dir, drop_caption_prob=0.0)
+        self.assertEqual(len(cache), len(self.dataset))
+
+        for idx in range(len(self.dataset)):
+            item, sample = cache[idx], self.dataset[idx]
+            self.assertEqual(item["latent_moments"].shape, (8, RESOLUTION // 2, RESOLUTION // 2))
+            self.assertEqual(item["encoder_hidden_states"].shape, (MAX_LENGTH, 32))
+            self.assertEqual(item["latent_moments"].dtype, np.float32)
+            self.assertEqual(item["encoder_hidden_states"].dtype, np.float32)
+            np.testing.assert_array_equal(item["input_ids"], sample["input_ids"])
+
+            moments = self.model.vae.encode(paddle.to_tensor(sample["pixel_values"][None])).latent_dist.parameters
+            hidden_states = self.model.text_encoder(paddle.to_tensor(sample["input_ids"][None]))[0]
+            np.testing.assert_allclose(item["latent_moments"], moments[0].numpy(), rtol=1e-2, atol=1e-2)
+            np.testing.assert_allclose(item["encoder_hidden_states"], hidden_states[0].numpy(), rtol=1e-2, atol=1e-2)
+
+        # with caption dropping every sample gets the hidden states of the empty caption
+        uncond_input_ids = self.model.tokenizer(
+            [""], padding="max_length", truncation=True, max_length=MAX_LENGTH, return_tensors="pd"
+        ).input_ids
+        uncond_hidden_states = self.model.text_encoder(uncond_input_ids)[0][0].numpy()
+        dropped = LatentCacheDataset(cache_dir, drop_caption_prob=1.0)[0]
+        np.testing.assert_allclose(dropped["encoder_hidden_states"], uncond_hidden_states, rtol=1e-2, atol=1e-2)
+        np.testing.assert_array_equal(dropped["latent_moments"], cache[0]["latent_moments"])
+
+    def get_cache_batch(self, cache_dir, indices):
+        cache = LatentCacheDataset(cache_dir, drop_caption_prob=0.0)
+        return {key: paddle.to_tensor(np.stack([cache[i][key] for i in indices])) for key in cache[0]}
+
+    def test_forward_with_cache(self):
+        cache_dir = self.precompute("float32")
+        batch = self.get_cache_batch(cache_dir, [0, 3, 4])
+        pixel_batch = {
+            "input_ids": paddle.to_tensor(self.dataset.input_ids[[0, 3, 4]]),
+            "pixel_values": paddle.to_tensor(self.dataset.pixel_values[[0, 3, 4]]),
+        }
+        paddle.seed(1)
+        expected = self.model(**pixel_batch)
+
+        self.model.set_latent_cache(True, release_text_encoder=True)
+        self.assertIsNone(self.model.text_encoder)
+        paddle.seed(1)
+        loss = self.model(**batch)
+        # the latents are sampled from the cached moments with the same random numbers as from the vae encoder
+        np.testing.assert_allclose(float(loss), float(expected), rtol=1e-4)
+        loss.backward()
+        self.assertIsNotNone(self.model.unet.conv_in.weight.grad)
+
+    def test_to_static_input_spec(self):
+        cache_dir = self.precompute("float32")
+        batch = self.get_cache_batch(cache_dir, [1, 2])
+        self.model.set_latent_cache(True, release_text_encoder=True)
+        specs = latent_cache_input_spec(self.model, RESOLUTION, MAX_LENGTH)
+        for spec, name in zip(specs, ["input_ids", None, "latent_moments", "encoder_hidden_states"]):
+            if name is None:
+                self.assertIsNone(spec)
+            else:
+                self.assertEqual(spec.name, name)
+                self.assertEqual(list(spec.shape[1:]), list(batch[name].shape[1:]))
+        static_model = paddle.jit.to_static(self.model, input_spec=specs)
+        self.assertEqual(static_model(**batch).shape, [])
@@ -0,0 +1,74 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import paddle
+
+from ppdiffusers import UNet2DModel
+from ppdiffusers.utils import LazyTensor, is_safetensors_available, smart_load
+
+
+@unittest.skipIf(not is_safetensors_available(), "requires safetensors")
+class LazyLoadTests(unittest.TestCase):
+    def get_dummy_model(self):
+        paddle.seed(0)
+        return UNet2DModel(
+            block_out_channels=(32, 64),
+            layers_per_block=1,
+            sample_size=32,
+            in_channels=3,
+            out_channels=3,
+            down_block_types=("DownBlock2D", "DownBlock2D"),
+            up_block_types=("UpBlock2D", "UpBlock2D"),
+        )
+
+    def test_lazy_safetensors_load(self):
+        from safetensors.numpy import save_file
+
+        state_dict = {
+            "weight": np.random.randn(4, 3).astype("float32"),
+            "bias": np.random.randn(4).astype("float16"),
+            "ids": np.arange(5, dtype="int64"),
+        }
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            path = os.path.join(tmpdirname, "weights.safetensors")
+            save_file(state_dict, path)
+            lazy_state_dict = smart_load(path, lazy=True)
+
+            for key, value in state_dict.items():
+                self.assertIsInstance(lazy_state_dict[key], LazyTensor)
+                self.assertEqual(lazy_state_dict[key].shape, list(value.shape))
+                self.assertTrue(np.array_equal(lazy_state_dict[key].numpy(), value))
+            self.assertTrue(np.array_equal(lazy_state_dict["weight"].T.numpy(), state_dict["weight"].T))
+            self.assertEqual(lazy_state_dict["bias"].dtype, paddle.float16)
+            self.assertEqual(lazy_state_dict["bias"].to_tensor("float32").dtype, paddle.float32)
+
+    def test_from_pretrained_lazy_load(self):
+        model = self.get_dummy_model()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            model.save_pretrained(tmpdirname, safe_serialization=True, to_diffusers=True)
+            eager_model = UNet2DModel.from_pretrained(tmpdirname, from_diffusers=True, lazy_load=False)
+            lazy_model, loading_info = UNet2DModel.from_pretrained(
+                tmpdirname, from_diffusers=True, lazy_load=True, output_loading_info=True
+            )
+
+        self.assertEqual(loading_info["missing_keys"], [])
+        self.assertEqual(loading_info["unexpected_keys"], [])
+        eager_state_dict = eager_model.state_dict()
+        for key, value in lazy_model.state_dict().items():
+            self.assertTrue(np.array_equal(value.numpy(), eager_state_dict[key].numpy()), key)
@@ -0,0 +1,161 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import filecmp
+import importlib.util
+import io
+import itertools
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "examples")
+# the stable diffusion and the laion400m examples each ship a copy of the dataset module
+DATASET_FILES = [
+    os.path.join(EXAMPLES_DIR, "stable_diffusion", "sd", "text_image_pair_dataset.py"),
+    os.path.join(EXAMPLES_DIR, "text_to_image_laion400m", "ldm", "text_image_pair_dataset.py"),
+]
+
+
+def load_dataset_module(path):
+    spec = importlib.util.spec_from_file_location(f"text_image_pair_dataset_{len(path)}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class CharTokenizer:
+    model_max_length = 8
+
+    def __call__(self, captions, padding, truncation, max_length, return_tensors):
+        input_ids = np.zeros([len(captions), max_length], dtype="int64")
+        for i, caption in enumerate(captions):
+            ids = [ord(c) for c in caption][:max_length]
+            input_ids[i, : len(ids)] = ids
+        return SimpleNamespace(input_ids=input_ids)
+
+
+def encode_image(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+class PackedTextImagePairTest(unittest.TestCase):
+    min_size = 16
+    samples_per_shard = 3
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        rng = np.random.RandomState(0)
+        self.samples = []
+        lines = []
+        for i in range(16):
+            # every fourth image is too small and dropped when packing
+            size = (8, 24) if i % 4 == 3 else (16 + i, 20)
+            image = Image.fromarray(rng.randint(0, 256, size=(size[1], size[0], 3), dtype="uint8"))
+            caption = f"{i} is a caption longer than the max length"
+            lines.append(f"{caption}\t{i}\t{encode_image(image)}\n")
+            if min(size) >= self.min_size:
+                self.samples.append((caption, np.asarray(image)))
+        part_file = os.path.join(self.tmpdir.name, "laion400m_part-00000.tsv")
+        with open(part_file, "w") as f:
+            f.writelines(lines)
+        filelist = os.path.join(self.tmpdir.name, "train.filelist")
+        with open(filelist, "w") as f:
+            f.write(part_file + "\n")
+        self.file_list = os.path.join(self.tmpdir.name, "train.filelist.list")
+        with open(self.file_list, "w") as f:
+            f.write(filelist + " 1.0\n")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def pack(self, module):
+        output_dir = os.path.join(self.tmpdir.name, "packed")
+        num_samples = module.pack_text_image_shards(
+            self.file_list, output_dir, CharTokenizer(), self.min_size, samples_per_shard=self.samples_per_shard
+        )
+        dataset = module.PackedTextImagePair(
+            output_dir, size=self.min_size, image_processing=np.asarray, drop_caption_prob=0.0, seed=3
+        )
+        return num_samples, dataset
+
+    def tokenize(self, caption):
+        tokenizer = CharTokenizer()
+        return tokenizer([caption], True, True, tokenizer.model_max_length, "np").input_ids[0]
+
+    def sample_key(self, sample):
+        return tuple(sample["input_ids"].numpy().tolist())
+
+    def test_copies_in_sync(self):
+        self.assertTrue(filecmp.cmp(*DATASET_FILES, shallow=False), "the dataset copies of the examples differ")
+
+    def test_round_trip_and_size_filter(self):
+        for path in DATASET_FILES:
+            num_samples, dataset = self.pack(load_dataset_module(path))
+            self.assertEqual(num_samples, 12)
+            self.assertEqual(len(dataset), 12)
+            self.assertEqual([shard["num_samples"] for shard in dataset.shards], [3, 3, 3, 3])
+            for i, (caption, pixels) in enumerate(self.samples):
+                sample = dataset[i]
+                np.testing.assert_array_equal(sample["pixel_values"], pixels)
+                np.testing.assert_array_equal(sample["input_ids"].numpy(), self.tokenize(caption))
+            np.testing.assert_array_equal(dataset.uncond_input_ids, self.tokenize(""))
+
+    def read_epoch(self, module, dataset, reader_id, num_readers, num_samples):
+        with mock.patch.object(module.PackedTextImagePair, "reader_id", return_value=(reader_id, num_readers)):
+            return [self.sample_key(sample) for sample in itertools.islice(iter(dataset), num_samples)]
+
+    def check_readers(self, module, dataset, num_readers):
+        samples_per_reader = 12 // num_readers
+        epochs = [self.read_epoch(module, dataset, i, num_readers, samples_per_reader) for i in range(num_readers)]
+        # every sample is read by exactly one reader per epoch, the captions differ in their first tokens
+        keys = [key for epoch in epochs for key in epoch]
+        self.assertEqual(sorted(keys), sorted(tuple(self.tokenize(caption).tolist()) for caption, _ in self.samples))
+        # and the assignment and order only depend on the seed
+        self.assertEqual(
+            epochs, [self.read_epoch(module, dataset, i, num_readers, samples_per_reader) for i in range(num_readers)]
+        )
+        return epochs
+
+    def test_reader_assignment(self):
+        for path in DATASET_FILES:
+            module = load_dataset_module(path)
+            _, dataset = self.pack(module)
+            # 2 and 4 readers get whole shards, 6 readers get strided samples of the 4 shards
+            for num_readers in [2, 4, 6]:
+                epochs = self.check_readers(module, dataset, num_readers)
+                if num_readers <= 4:
+                    shard_of = {self.sample_key(dataset[i]): i // self.samples_per_shard for i in range(12)}
+                    for epoch in epochs:
+                        self.assertEqual(len(epoch) // self.samples_per_shard, len({shard_of[key] for key in epoch}))
+
+    def test_reader_id(self):
+        module = load_dataset_module(DATASET_FILES[0])
+        _, dataset = self.pack(module)
+        fake_dist = SimpleNamespace(get_rank=lambda: 1, get_world_size=lambda: 2)
+        worker_info = SimpleNamespace(id=2, num_workers=3)
+        with mock.patch.object(module, "dist", fake_dist), mock.patch.object(
+            module, "get_worker_info", return_value=worker_info
+        ):
+            self.assertEqual(dataset.reader_id(), (5, 6))
+        with mock.patch.object(module, "get_worker_info", return_value=None):
+            self.assertEqual(dataset.reader_id(), (0, 1))
@@ -33,7 +33,14 @@ from ppdiffusers.initializer import normal_, ones_
 from ppdiffusers.pipelines.stable_diffusion.pipeline_stable_diffusion_controlnet import (
     MultiControlNetModel,
 )
-from ppdiffusers.utils import floats_tensor, load_image, load_numpy, randn_tensor, slow
+from ppdiffusers.utils import (
+    floats_tensor,
+    get_prompt_embeds_cache,
+    load_image,
+    load_numpy,
+    randn_tensor,
+    slow,
+)
 from ppdiffusers.utils.testing_utils import enable_full_determinism, require_paddle_gpu
 
 from ..pipeline_params import (
@@ -153,6 +160,23 @@ class ControlNetImg2ImgPipelineFastTests(
     def test_inference_batch_single_identical(self):
         self._test_inference_batch_single_identical(expected_max_diff=0.002)
 
+    def test_prompt_embeds_cache(self):
+        pipe = self.pipeline_class(**self.get_dummy_components())
+        pipe.set_progress_bar_config(disable=None)
+        expected = pipe(**self.get_dummy_inputs()).images
+
+        cache = get_prompt_embeds_cache()
+        cache.clear()
+        pipe.enable_prompt_embeds_cache()
+        for _ in range(2):
+            images = pipe(**self.get_dummy_inputs()).images
+            assert np.abs(images - expected).max() < 1e-5
+        # the prompt and the empty negative prompt, the second call only hits
+        assert len(cache) == 2
+        assert cache.stats()["hits"] == 2
+        pipe.disable_prompt_embeds_cache()
+        cache.clear()
+
 
 class StableDiffusionMultiControlNetPipelineFastTests(
     PipelineTesterMixin, PipelineKarrasSchedulerTesterMixin, unittest.TestCase
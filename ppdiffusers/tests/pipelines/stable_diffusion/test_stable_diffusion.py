@@ -33,7 +33,7 @@ from ppdiffusers import (
     UNet2DConditionModel,
     logging,
 )
-from ppdiffusers.utils import nightly, slow
+from ppdiffusers.utils import get_prompt_embeds_cache, nightly, slow
 from ppdiffusers.utils.testing_utils import CaptureLogger, require_paddle_gpu
 
 from ...models.test_models_unet_2d_condition import create_lora_layers
@@ -208,6 +208,74 @@ class StableDiffusionPipelineFastTests(PipelineTesterMixin, unittest.TestCase):
         image_slice_2 = output.images[0, -3:, -3:, -1]
         assert np.abs(image_slice_1.flatten() - image_slice_2.flatten()).max() < 0.0001
 
+    def test_stable_diffusion_prompt_embeds_cache(self):
+        components = self.get_dummy_components()
+        sd_pipe = StableDiffusionPipeline(**components)
+        prompt = [
+            "A painting of a squirrel eating a burger",
+            "A photo of a cat",
+            "A painting of a squirrel eating a burger",
+        ]
+        expected = sd_pipe._encode_prompt(prompt, 2, True)
+
+        cache = get_prompt_embeds_cache()
+        cache.clear()
+        sd_pipe.enable_prompt_embeds_cache()
+        for _ in range(2):
+            prompt_embeds = sd_pipe._encode_prompt(prompt, 2, True)
+            assert np.abs(prompt_embeds.numpy() - expected.numpy()).max() < 1e-5
+        # the two prompts and the empty negative prompt, the second call only hits
+        assert len(cache) == 3
+        assert cache.stats()["hits"] == 6
+
+        # another pipeline instance with the same models shares the entries
+        other_pipe = StableDiffusionPipeline(**components)
+        other_pipe.enable_prompt_embeds_cache()
+        other_pipe._encode_prompt(prompt[0], 1, False)
+        assert cache.stats()["hits"] == 7
+
+        # changing the text encoder through the loaders drops the cached embeddings
+        with paddle.no_grad():
+            sd_pipe.text_encoder.get_input_embeddings().weight.scale_(2.0)
+        sd_pipe.unload_lora_weights()
+        prompt_embeds = sd_pipe._encode_prompt(prompt, 2, True)
+        assert np.abs(prompt_embeds.numpy() - expected.numpy()).max() > 1e-3
+        sd_pipe.disable_prompt_embeds_cache()
+        cache.clear()
+
+    def test_stable_diffusion_latent_checkpoints(self):
+        components = self.get_dummy_components()
+        components["scheduler"] = DPMSolverMultistepScheduler.from_config(components["scheduler"].config)
+        sd_pipe = StableDiffusionPipeline(**components)
+        sd_pipe.set_progress_bar_config(disable=None)
+
+        def run(**kwargs):
+            inputs = self.get_dummy_inputs()
+            inputs.update(num_inference_steps=4, **kwargs)
+            return sd_pipe(**inputs).images
+
+        expected = run()
+
+        sd_pipe.enable_latent_checkpoints()
+        store = sd_pipe._latent_checkpoints
+        images = run()
+        assert np.abs(images - expected).max() < 1e-4
+        assert store.stats()["misses"] == 1
+        assert len(store) == 1
+
+        # the rerun skips the loop and only decodes again
+        images = run(output_type="latent")
+        assert store.stats()["saved_steps"] == 4
+        images = run()
+        assert np.abs(images - expected).max() < 1e-4
+        assert store.stats()["saved_steps"] == 8
+
+        # another guidance scale starts from scratch and gets its own checkpoint
+        run(guidance_scale=3.0)
+        assert store.stats()["misses"] == 2
+        assert len(store) == 2
+        sd_pipe.disable_latent_checkpoints()
+
     def test_stable_diffusion_ddim_factor_8(self):
         components = self.get_dummy_components()
         sd_pipe = StableDiffusionPipeline(**components)
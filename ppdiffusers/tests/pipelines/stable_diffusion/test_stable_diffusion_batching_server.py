@@ -0,0 +1,229 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import numpy as np
+import paddle
+from paddlenlp.transformers import CLIPTextConfig, CLIPTextModel, CLIPTokenizer
+
+from ppdiffusers import (
+    AutoencoderKL,
+    DDIMScheduler,
+    DPMSolverMultistepScheduler,
+    StableDiffusionBatchingServer,
+    StableDiffusionContinuousBatchingServer,
+    StableDiffusionPipeline,
+    UNet2DConditionModel,
+)
+from ppdiffusers.utils.testing_utils import enable_full_determinism
+
+enable_full_determinism()
+
+
+class StableDiffusionBatchingServerTesterMixin:
+    server_class = None
+
+    def get_dummy_components(self):
+        paddle.seed(0)
+        unet = UNet2DConditionModel(
+            block_out_channels=(32, 64),
+            layers_per_block=2,
+            sample_size=32,
+            in_channels=4,
+            out_channels=4,
+            down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+            up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+            cross_attention_dim=32,
+        )
+        scheduler = DDIMScheduler(
+            beta_start=0.00085,
+            beta_end=0.012,
+            beta_schedule="scaled_linear",
+            clip_sample=False,
+            set_alpha_to_one=False,
+        )
+        paddle.seed(0)
+        vae = AutoencoderKL(
+            block_out_channels=[32, 64],
+            in_channels=3,
+            out_channels=3,
+            down_block_types=["DownEncoderBlock2D", "DownEncoderBlock2D"],
+            up_block_types=["UpDecoderBlock2D", "UpDecoderBlock2D"],
+            latent_channels=4,
+        )
+        paddle.seed(0)
+        text_encoder_config = CLIPTextConfig(
+            bos_token_id=0,
+            eos_token_id=2,
+            hidden_size=32,
+            intermediate_size=37,
+            layer_norm_eps=1e-05,
+            num_attention_heads=4,
+            num_hidden_layers=5,
+            pad_token_id=1,
+            vocab_size=1000,
+        )
+        text_encoder = CLIPTextModel(text_encoder_config).eval()
+        tokenizer = CLIPTokenizer.from_pretrained("hf-internal-testing/tiny-random-clip")
+        components = {
+            "unet": unet,
+            "scheduler": scheduler,
+            "vae": vae,
+            "text_encoder": text_encoder,
+            "tokenizer": tokenizer,
+            "safety_checker": None,
+            "feature_extractor": None,
+        }
+        return components
+
+    def get_pipeline(self):
+        sd_pipe = StableDiffusionPipeline(**self.get_dummy_components())
+        sd_pipe.set_progress_bar_config(disable=None)
+        return sd_pipe
+
+    def get_requests(self):
+        return [
+            dict(prompt="A painting of a squirrel eating a burger", guidance_scale=6.0, seed=0),
+            dict(prompt="A photo of a cat", negative_prompt="blurry", guidance_scale=3.0, seed=1),
+            dict(prompt="A photo of a dog", guidance_scale=1.0, seed=2, num_images_per_prompt=2),
+        ]
+
+    def check_batched_requests_match_pipeline(self):
+        sd_pipe = self.get_pipeline()
+        expected = []
+        for request in self.get_requests():
+            kwargs = dict(request)
+            generator = paddle.Generator().manual_seed(kwargs.pop("seed"))
+            expected.append(sd_pipe(**kwargs, generator=generator, num_inference_steps=2, output_type="np").images)
+
+        server = self.server_class(sd_pipe, max_batch_size=8)
+        futures = [
+            server.submit(**request, num_inference_steps=2, output_type="np") for request in self.get_requests()
+        ]
+        self.assertEqual(server.queue_depth, 3)
+        self.assertEqual(server.run_pending(), 3)
+
+        for future, images in zip(futures, expected):
+            output = future.result()
+            self.assertEqual(output.images.shape, images.shape)
+            self.assertLess(np.abs(output.images - images).max(), 1e-3)
+
+        metrics = server.metrics()
+        self.assertEqual(metrics["num_images"], 4)
+        self.assertEqual(metrics["max_queue_depth"], 3)
+        self.assertEqual(metrics["queue_depth"], 0)
+        return metrics
+
+    def check_incompatible_requests_and_batch_size(self):
+        server = self.server_class(self.get_pipeline(), max_batch_size=2)
+        server.submit("A photo of a cat", num_inference_steps=2, output_type="np")
+        server.submit("A photo of a dog", num_inference_steps=3, output_type="np")
+        server.submit(["A photo of a cat", "A photo of a dog"], num_inference_steps=2, output_type="np")
+        server.submit("A photo of a bird", num_inference_steps=2, height=32, width=32, output_type="np")
+
+        self.assertEqual(server.run_pending(), 4)
+        metrics = server.metrics()
+        self.assertEqual(metrics["num_requests"], 4)
+        self.assertEqual(metrics["num_images"], 5)
+        return metrics
+
+    def check_background_worker(self):
+        with self.server_class(self.get_pipeline(), max_batch_size=4, max_wait_time=1.0) as server:
+            futures = [
+                server.submit(prompt, num_inference_steps=2, output_type="np", seed=0)
+                for prompt in ["A photo of a cat", "A photo of a dog"]
+            ]
+            outputs = [future.result() for future in futures]
+        self.assertEqual([output.images.shape for output in outputs], [(1, 64, 64, 3)] * 2)
+        return server.metrics()
+
+
+class StableDiffusionBatchingServerFastTests(StableDiffusionBatchingServerTesterMixin, unittest.TestCase):
+    server_class = StableDiffusionBatchingServer
+
+    def test_batched_requests_match_pipeline(self):
+        metrics = self.check_batched_requests_match_pipeline()
+        self.assertEqual(metrics["num_batches"], 1)
+        self.assertEqual(metrics["batch_size_histogram"], {4: 1})
+
+    def test_incompatible_requests_and_batch_size(self):
+        metrics = self.check_incompatible_requests_and_batch_size()
+        self.assertEqual(metrics["num_batches"], 4)
+        self.assertEqual(metrics["batch_size_histogram"], {1: 3, 2: 1})
+
+    def test_background_worker(self):
+        metrics = self.check_background_worker()
+        self.assertEqual(metrics["batch_size_histogram"], {2: 1})
+
+
+class StableDiffusionContinuousBatchingServerFastTests(StableDiffusionBatchingServerTesterMixin, unittest.TestCase):
+    server_class = StableDiffusionContinuousBatchingServer
+
+    def get_pipeline(self):
+        sd_pipe = super().get_pipeline()
+        sd_pipe.scheduler = DPMSolverMultistepScheduler.from_config(sd_pipe.scheduler.config)
+        return sd_pipe
+
+    # the continuous server counts every denoising tick as a batch
+
+    def test_batched_requests_match_pipeline(self):
+        metrics = self.check_batched_requests_match_pipeline()
+        self.assertEqual(metrics["num_batches"], 2)
+        self.assertEqual(metrics["batch_size_histogram"], {4: 2})
+        self.assertEqual(metrics["num_active"], 0)
+
+    def test_incompatible_requests_and_batch_size(self):
+        metrics = self.check_incompatible_requests_and_batch_size()
+        # the cat and the dog share two ticks, the dog finishes alone, the prompt pair and then the bird at 32x32 follow
+        self.assertEqual(metrics["num_batches"], 7)
+        self.assertEqual(metrics["batch_size_histogram"], {2: 4, 1: 3})
+
+    def test_background_worker(self):
+        metrics = self.check_background_worker()
+        # the worker may start the first request before the second one arrives, only the image steps are fixed
+        self.assertEqual(metrics["num_requests"], 2)
+        self.assertEqual(sum(size * count for size, count in metrics["batch_size_histogram"].items()), 4)
+
+    def test_staggered_requests_match_pipeline(self):
+        sd_pipe = self.get_pipeline()
+        requests = self.get_requests()
+        for request, num_inference_steps in zip(requests, [2, 4, 3]):
+            request["num_inference_steps"] = num_inference_steps
+        expected = []
+        for request in requests:
+            kwargs = dict(request)
+            generator = paddle.Generator().manual_seed(kwargs.pop("seed"))
+            expected.append(sd_pipe(**kwargs, generator=generator, output_type="np").images)
+
+        server = StableDiffusionContinuousBatchingServer(sd_pipe, max_batch_size=3)
+        futures = [server.submit(**request, output_type="np") for request in requests[:2]]
+        # the first request finishes after two ticks and the third one joins the second for its remaining steps
+        self.assertEqual(server.step(), 0)
+        futures.append(server.submit(**requests[2], output_type="np"))
+        self.assertEqual(server.step(), 1)
+        self.assertTrue(futures[0].done())
+        self.assertEqual(server.num_active, 1)
+        self.assertEqual(server.run_pending(), 2)
+
+        for future, images in zip(futures, expected):
+            output = future.result()
+            self.assertEqual(output.images.shape, images.shape)
+            self.assertLess(np.abs(output.images - images).max(), 1e-3)
+
+        metrics = server.metrics()
+        self.assertEqual(metrics["num_requests"], 3)
+        self.assertEqual(metrics["num_batches"], 5)
+        self.assertEqual(metrics["batch_size_histogram"], {2: 3, 3: 2})
+        self.assertEqual(metrics["num_active"], 0)
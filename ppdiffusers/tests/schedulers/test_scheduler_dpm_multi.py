@@ -126,6 +126,47 @@ class DPMSolverMultistepSchedulerTest(SchedulerCommonTest):
             sample = scheduler.step(residual, t, sample).prev_sample
         return sample
 
+    def timestep_loop(self, **config):
+        # the loop of `step`, written with the public methods that look the coefficients up by timestep
+        scheduler = self.scheduler_classes[0](**self.get_scheduler_config(**config))
+        model = self.dummy_model()
+        sample = self.dummy_sample_deter
+        scheduler.set_timesteps(10)
+        timesteps, model_outputs = scheduler.timesteps, []
+        for i, t in enumerate(timesteps):
+            prev_t = 0 if i == len(timesteps) - 1 else timesteps[i + 1]
+            model_outputs.append(scheduler.convert_model_output(model(sample, t), t, sample))
+            order = min(scheduler.config.solver_order, i + 1)
+            if order == 1:
+                sample = scheduler.dpm_solver_first_order_update(model_outputs[-1], t, prev_t, sample)
+            elif order == 2:
+                sample = scheduler.multistep_dpm_solver_second_order_update(
+                    model_outputs, [timesteps[i - 1], t], prev_t, sample
+                )
+            else:
+                sample = scheduler.multistep_dpm_solver_third_order_update(
+                    model_outputs, [timesteps[i - 2], timesteps[i - 1], t], prev_t, sample
+                )
+        return sample
+
+    def test_step_uses_step_coefficients(self):
+        for algorithm_type in ["dpmsolver", "dpmsolver++"]:
+            for prediction_type in ["epsilon", "v_prediction"]:
+                for order in [1, 2, 3]:
+                    config = dict(algorithm_type=algorithm_type, prediction_type=prediction_type, solver_order=order)
+                    scheduler = self.scheduler_classes[0](**self.get_scheduler_config(**config))
+                    model = self.dummy_model()
+                    sample = self.dummy_sample_deter
+                    scheduler.set_timesteps(10)
+                    scheduler.set_begin_index(0)
+                    # `step` must not index the coefficients by timestep
+                    scheduler.alpha_t = scheduler.sigma_t = scheduler.lambda_t = None
+                    for t in scheduler.timesteps:
+                        sample = scheduler.step(model(sample, t), t, sample).prev_sample
+
+                    expected = self.timestep_loop(**config)
+                    assert paddle.allclose(sample, expected, atol=1e-5), config
+
     def test_step_shape(self):
         kwargs = dict(self.forward_default_kwargs)
 
@@ -285,3 +326,19 @@ class DPMSolverMultistepSchedulerTest(SchedulerCommonTest):
 
             scheduler.set_timesteps(scheduler.config.num_train_timesteps)
             assert len(scheduler.timesteps.unique()) == scheduler.num_inference_steps
+
+    def test_full_loop_with_begin_index(self):
+        sample = self.full_loop()
+
+        scheduler_class = self.scheduler_classes[0]
+        scheduler = scheduler_class(**self.get_scheduler_config())
+        model = self.dummy_model()
+        sample_with_begin_index = self.dummy_sample_deter
+        scheduler.set_timesteps(10)
+        scheduler.set_begin_index(0)
+        for t in scheduler.timesteps:
+            residual = model(sample_with_begin_index, t)
+            sample_with_begin_index = scheduler.step(residual, t, sample_with_begin_index).prev_sample
+
+        assert scheduler.step_index == len(scheduler.timesteps)
+        assert paddle.allclose(sample, sample_with_begin_index)
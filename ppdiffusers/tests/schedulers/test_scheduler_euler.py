@@ -153,3 +153,26 @@ class EulerDiscreteSchedulerTest(SchedulerCommonTest):
 
         assert abs(result_sum.item() - 124.52299499511719) < 1e-2
         assert abs(result_mean.item() - 0.16213932633399963) < 1e-3
+
+    def test_full_loop_with_begin_index(self):
+        scheduler_class = self.scheduler_classes[0]
+        scheduler_config = self.get_scheduler_config()
+        model = self.dummy_model()
+        t_start = 3
+
+        samples = []
+        for begin_index in [None, t_start]:
+            scheduler = scheduler_class(**scheduler_config)
+            scheduler.set_timesteps(self.num_inference_steps)
+            if begin_index is not None:
+                scheduler.set_begin_index(begin_index)
+
+            sample = self.dummy_sample_deter * scheduler.init_noise_sigma
+            for t in scheduler.timesteps[t_start:]:
+                sample = scheduler.scale_model_input(sample, t)
+                model_output = model(sample, t)
+                sample = scheduler.step(model_output, t, sample).prev_sample
+            samples.append(sample)
+
+        assert scheduler.step_index == self.num_inference_steps
+        assert paddle.allclose(samples[0], samples[1])
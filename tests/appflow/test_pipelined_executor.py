@@ -0,0 +1,137 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import queue
+import time
+import unittest
+
+import numpy as np
+import paddle
+
+from paddlemix.appflow import PipelinedExecutor
+from paddlemix.appflow.apptask import AppTask
+from paddlemix.appflow.openset_det_sam import OpenSetSegTask
+from paddlemix.processors.sam_processing import (
+    SamImageProcessor,
+    SamProcessor,
+    SamPromptProcessor,
+)
+
+
+class AddTask(AppTask):
+    def __init__(self, value, delay=0.0):
+        super().__init__(model=f"add{value}", task="test")
+        self.value = value
+        self.delay = delay
+        self.batch_sizes = []
+
+    def _preprocess(self, inputs):
+        time.sleep(self.delay)
+        inputs["x"] = inputs["x"] + 0.5
+        return inputs
+
+    def _run_model(self, inputs):
+        if inputs["x"] < 0:
+            raise ValueError("negative input")
+        inputs["x"] = inputs["x"] + self.value
+        return inputs
+
+    def _run_model_batch(self, batch_inputs):
+        time.sleep(self.delay)
+        self.batch_sizes.append(len(batch_inputs))
+        return super()._run_model_batch(batch_inputs)
+
+    def _postprocess(self, inputs):
+        time.sleep(self.delay)
+        inputs["x"] = inputs["x"] - 0.5
+        return inputs
+
+
+class DummySamModel:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def __call__(self, img, prompt):
+        time.sleep(self.delay)
+        return paddle.ones([prompt.shape[0], 1, 16, 16])
+
+
+class DummySegTask(OpenSetSegTask):
+    """
+    `OpenSetSegTask` with a small real `SamProcessor` and a model that returns low resolution masks of ones.
+    """
+
+    def _construct_processor(self, model):
+        self._processor = SamProcessor(SamImageProcessor(size=64), SamPromptProcessor(size=64))
+
+    def _construct_model(self, model):
+        self._model = DummySamModel(delay=0.05)
+
+
+class PipelinedExecutorTest(unittest.TestCase):
+    def get_tasks(self, delay=0.0):
+        return [AddTask(1, delay), AddTask(10, delay)]
+
+    def test_matches_sequential(self):
+        tasks = self.get_tasks(delay=0.001)
+        inputs = [{"x": i} for i in range(20)]
+        expected = [{"x": i + 11} for i in range(20)]
+
+        executor = PipelinedExecutor(tasks, batch_size=4, num_workers=2, queue_size=4, max_wait_time=0.01)
+        self.assertEqual(list(executor.run(inputs)), expected)
+        # the inputs are not modified
+        self.assertEqual(inputs[3], {"x": 3})
+
+        stats = executor.stats()
+        self.assertEqual(stats["num_results"], 20)
+        self.assertEqual(len(stats["stages"]), 6)
+        for stage_stats in stats["stages"].values():
+            self.assertEqual(stage_stats["num_items"], 20)
+        model_stats = stats["stages"]["0:add1:run_model"]
+        self.assertEqual(sum(model_stats["batch_size_histogram"].values()), model_stats["num_batches"])
+        self.assertTrue(all(1 <= batch_size <= 4 for batch_size in tasks[0].batch_sizes))
+
+    def test_queue_input_and_errors(self):
+        inputs = queue.Queue()
+        for x in [1, -5, 2]:
+            inputs.put({"x": x})
+        inputs.put(None)
+
+        results = PipelinedExecutor(self.get_tasks()).run(inputs)
+        self.assertEqual(next(results), {"x": 12})
+        with self.assertRaises(ValueError):
+            next(results)
+
+    def test_unordered(self):
+        executor = PipelinedExecutor(self.get_tasks(), batch_size=2, num_workers=3, ordered=False)
+        results = list(executor.run({"x": i} for i in range(10)))
+        self.assertEqual(sorted(result["x"] for result in results), list(range(11, 21)))
+
+    def test_sam_sizes_stay_with_inputs(self):
+        task = DummySegTask(task="openset_det_sam", model="dummy", input_type="boxs")
+        sizes = [(40, 64), (64, 48), (32, 32)]
+        inputs = [
+            {"image": np.zeros([height, width, 3], dtype="uint8"), "boxes": np.array([[0, 0, 10, 10]])}
+            for height, width in sizes
+        ]
+        # the slow model lets the preprocessing of the later images run before the first one is postprocessed
+        results = list(PipelinedExecutor([task], num_workers=2).run(inputs))
+        self.assertEqual([tuple(result["seg_masks"].shape[-2:]) for result in results], sizes)
+        for result in results:
+            self.assertTrue(bool(result["seg_masks"].all()))
+            self.assertNotIn("original_size", result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Run with `python -m paddle.distributed.launch --nproc_per_node 2 clip_retrieval_worker.py`, see
+`ClipRetrievalRecallTest`. Every rank adds an uneven shard of the images and captions and the recall must match the
+dense recall over all of them.
+"""
+
+import os
+import sys
+
+import numpy as np
+import paddle
+import paddle.distributed as dist
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from test_clip_metrics import dense_recall, random_retrieval_data  # noqa: E402
+
+from paddlemix.metrics.clip_retrieval import ClipRetrievalRecall  # noqa: E402
+
+
+def main():
+    dist.init_parallel_env()
+    rank, world_size = dist.get_rank(), dist.get_world_size()
+    image_features, image_ids, text_features, text_image_ids = random_retrieval_data()
+
+    # the first rank gets more images and fewer captions than the others
+    image_split = [0, 5] + [5 + (len(image_ids) - 5) * (i + 1) // (world_size - 1) for i in range(world_size - 1)]
+    text_split = [0, 3] + [3 + (len(text_image_ids) - 3) * (i + 1) // (world_size - 1) for i in range(world_size - 1)]
+    images = slice(image_split[rank], image_split[rank + 1])
+    texts = slice(text_split[rank], text_split[rank + 1])
+
+    metric = ClipRetrievalRecall(ks=(1, 2, 5), chunk_size=4)
+    metric.add_images(paddle.to_tensor(image_features[images]), paddle.to_tensor(image_ids[images]))
+    metric.add_texts(paddle.to_tensor(text_features[texts]), paddle.to_tensor(text_image_ids[texts]))
+    results = metric.compute()
+    expected = dense_recall(image_features, image_ids, text_features, text_image_ids, ks=(1, 2, 5))
+    for key, value in expected.items():
+        np.testing.assert_allclose(results[key], value, err_msg=key)
+    print(f"rank {rank} passed", flush=True)
+
+
+if __name__ == "__main__":
+    main()
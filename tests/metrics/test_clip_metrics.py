@@ -0,0 +1,223 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import paddle
+import paddle.nn.functional as F
+
+from paddlemix.metrics.clip_retrieval import ClipRetrievalRecall
+from paddlemix.metrics.clip_zero_shot import (
+    ClipZeroShot,
+    classifier_cache_key,
+    zero_shot_classifier,
+)
+from paddlemix.models.clip.clip_model import CLIP
+from paddlemix.models.clip.coca_model import CoCa
+from paddlemix.processors.tokenizer import tokenize
+from tests.models import test_clip, test_coca
+from tests.testing_utils import run_distributed
+from tests.trainer import test_clip_trainer
+
+
+def random_retrieval_data(num_images=8, captions_per_image=(3, 2, 1, 4, 2, 3, 1, 4), dim=6, seed=0):
+    rng = np.random.RandomState(seed)
+    image_features = rng.randn(num_images, dim).astype("float32")
+    image_ids = np.arange(num_images, dtype="int64")
+    text_image_ids = np.concatenate([[i] * n for i, n in enumerate(captions_per_image)]).astype("int64")
+    rng.shuffle(text_image_ids)
+    # captions are noisy copies of their images, so that the recall is neither zero nor perfect
+    text_features = (image_features[text_image_ids] + 1.5 * rng.randn(len(text_image_ids), dim)).astype("float32")
+    return image_features, image_ids, text_features, text_image_ids
+
+
+def dense_recall(image_features, image_ids, text_features, text_image_ids, ks):
+    image_features = image_features / np.linalg.norm(image_features, axis=-1, keepdims=True)
+    text_features = text_features / np.linalg.norm(text_features, axis=-1, keepdims=True)
+    similarity = text_features @ image_features.T
+    text_ranking = image_ids[np.argsort(-similarity, axis=1)]
+    image_ranking = text_image_ids[np.argsort(-similarity.T, axis=1)]
+    results = {}
+    for k in ks:
+        results[f"image_to_text_R@{k}"] = 100.0 * np.mean((image_ranking[:, :k] == image_ids[:, None]).any(axis=1))
+        results[f"text_to_image_R@{k}"] = 100.0 * np.mean((text_ranking[:, :k] == text_image_ids[:, None]).any(axis=1))
+    results["mean_recall"] = sum(results.values()) / len(results)
+    return results
+
+
+class ClipRetrievalRecallTest(unittest.TestCase):
+    def test_matches_dense_recall(self):
+        image_features, image_ids, text_features, text_image_ids = random_retrieval_data()
+        metric = ClipRetrievalRecall(ks=(1, 2, 5), chunk_size=4)
+        for start, end in [(0, 3), (3, 8)]:
+            metric.add_images(paddle.to_tensor(image_features[start:end]), paddle.to_tensor(image_ids[start:end]))
+        # uneven batches, and batches larger than the chunk size
+        for start, end in [(0, 7), (7, 8), (8, 20)]:
+            metric.add_texts(paddle.to_tensor(text_features[start:end]), paddle.to_tensor(text_image_ids[start:end]))
+        results = metric.compute()
+
+        expected = dense_recall(image_features, image_ids, text_features, text_image_ids, ks=(1, 2, 5))
+        self.assertEqual(results.keys(), expected.keys())
+        for key, value in expected.items():
+            self.assertAlmostEqual(results[key], value, places=4, msg=key)
+        # the data is neither trivial nor hopeless
+        self.assertLess(results["text_to_image_R@1"], 100.0)
+        self.assertGreater(results["text_to_image_R@1"], 0.0)
+
+    def test_images_after_texts(self):
+        image_features, image_ids, text_features, text_image_ids = random_retrieval_data()
+        metric = ClipRetrievalRecall()
+        metric.add_images(paddle.to_tensor(image_features), paddle.to_tensor(image_ids))
+        metric.add_texts(paddle.to_tensor(text_features), paddle.to_tensor(text_image_ids))
+        with self.assertRaises(ValueError):
+            metric.add_images(paddle.to_tensor(image_features), paddle.to_tensor(image_ids))
+
+    def test_distributed_uneven_shards(self):
+        worker = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clip_retrieval_worker.py")
+        returncode, logs = run_distributed(worker, nproc_per_node=2)
+        self.assertEqual(returncode, 0, logs[-5000:])
+        self.assertIn("rank 0 passed", logs)
+        self.assertIn("rank 1 passed", logs)
+
+
+class ClipZeroShotTest(unittest.TestCase):
+    def get_metric(self, classifier):
+        # skip building the classifier from a model, only the accumulation is tested
+        metric = object.__new__(ClipZeroShot)
+        metric.classifier = paddle.to_tensor(classifier)
+        metric.cast_dtype = None
+        metric.data_name = "test"
+        metric.reset()
+        return metric
+
+    def test_update_compute(self):
+        rng = np.random.RandomState(0)
+        classifier = rng.randn(6, 10).astype("float32")
+        image_features = rng.randn(25, 6).astype("float32")
+        labels = rng.randint(0, 10, size=25).astype("int64")
+
+        metric = self.get_metric(classifier)
+        for start, end in [(0, 8), (8, 9), (9, 25)]:
+            metric.update(paddle.to_tensor(image_features[start:end]), paddle.to_tensor(labels[start:end]))
+        results = metric.compute()
+
+        ranking = np.argsort(-(image_features @ classifier), axis=1)
+        top1 = 100.0 * np.mean(ranking[:, 0] == labels)
+        top5 = 100.0 * np.mean((ranking[:, :5] == labels[:, None]).any(axis=1))
+        self.assertAlmostEqual(results["top1"], top1, places=4)
+        self.assertAlmostEqual(results["val/imagenet-zeroshot-val-top1"], top1, places=4)
+        self.assertAlmostEqual(results["val/imagenet-zeroshot-val-top5"], top5, places=4)
+
+        metric.reset()
+        metric.update((paddle.to_tensor(image_features[:4]),), paddle.to_tensor(labels[:4]))
+        self.assertAlmostEqual(metric.compute()["top1"], 100.0 * np.mean(ranking[:4, 0] == labels[:4]), places=4)
+
+    def test_fewer_than_five_classes(self):
+        metric = self.get_metric(np.eye(3, dtype="float32"))
+        metric.update(paddle.to_tensor(np.eye(3, dtype="float32")), paddle.to_tensor([0, 1, 1]))
+        results = metric.compute()
+        self.assertAlmostEqual(results["top1"], 200.0 / 3, places=4)
+        self.assertEqual(results["val/imagenet-zeroshot-val-top5"], -1)
+
+
+class ZeroShotClassifierTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.classnames = ["cat", "dog", "red car", "tree", "boat"]
+        self.templates = ["a photo of a {}.", "a drawing of the {}.", "{}"]
+        self.classnames_filename = self.write("labels.txt", self.classnames)
+        self.templates_filename = self.write("templates.txt", self.templates)
+        tester = test_clip.CLIPModelTester(
+            self, vision_cfg=test_clip.TINY_VISION_CFG, text_cfg=test_clip.TINY_TEXT_CFG, batch_size=6
+        )
+        paddle.seed(0)
+        self.model = CLIP(tester.get_config())
+        self.model.eval()
+        # the default initialization gives nearly the same feature for every text
+        for param in self.model.parameters():
+            if param.ndim >= 2:
+                param.set_value(paddle.randn(param.shape) * 0.1)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, lines):
+        filename = os.path.join(self.tmpdir.name, name)
+        with open(filename, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return filename
+
+    def cache_key(self, model=None):
+        return classifier_cache_key(model or self.model, self.classnames_filename, self.templates_filename)
+
+    def perturb(self, model, name):
+        param = dict(model.named_parameters())[name]
+        param.set_value(param + 0.01)
+
+    def test_batched_classifier_matches_per_class_loop(self):
+        # a batch size that splits the prompts of a class
+        classifier = zero_shot_classifier(
+            self.model, self.classnames_filename, self.templates_filename, None, batch_size=4
+        )
+        expected = []
+        with paddle.no_grad():
+            for classname in self.classnames:
+                texts = tokenize([template.format(classname) for template in self.templates])
+                class_embeddings = F.normalize(self.model.encode_text(texts), axis=-1).mean(0)
+                expected.append(F.normalize(class_embeddings, axis=-1))
+        expected = paddle.stack(expected, axis=1)
+        self.assertEqual(classifier.shape, [test_clip.TINY_TEXT_CFG["embed_dim"], len(self.classnames)])
+        np.testing.assert_allclose(classifier.numpy(), expected.numpy(), rtol=1e-5, atol=1e-6)
+
+    def test_cache_key_follows_text_weights(self):
+        key = self.cache_key()
+        self.assertEqual(self.cache_key(), key)
+        # the image tower and the logit scale do not change the classifier
+        self.perturb(self.model, "visual.conv1.weight")
+        self.perturb(self.model, "logit_scale")
+        self.assertEqual(self.cache_key(), key)
+
+        for name in ["token_embedding.weight", "transformer.resblocks.1.mlp.c_fc.weight", "text_projection"]:
+            self.perturb(self.model, name)
+            new_key = self.cache_key()
+            self.assertNotEqual(new_key, key, name)
+            key = new_key
+
+    def test_cache_key_follows_files(self):
+        key = self.cache_key()
+        self.write("labels.txt", self.classnames + ["bird"])
+        labels_key = self.cache_key()
+        self.assertNotEqual(labels_key, key)
+        self.write("templates.txt", self.templates[:2])
+        self.assertNotEqual(self.cache_key(), labels_key)
+
+    def test_cache_key_ignores_coca_text_decoder(self):
+        tester = test_coca.CoCaModelTester(
+            self,
+            vision_cfg=test_clip_trainer.TINY_COCA_VISION_CFG,
+            text_cfg=test_clip_trainer.TINY_COCA_TEXT_CFG,
+            multimodal_cfg=test_clip_trainer.TINY_COCA_MULTIMODAL_CFG,
+            batch_size=6,
+        )
+        model = CoCa(config=tester.get_config())
+        key = self.cache_key(model)
+        decoder_param = next(name for name, _ in model.named_parameters() if name.startswith("text_decoder."))
+        self.perturb(model, decoder_param)
+        self.assertEqual(self.cache_key(model), key)
+        text_param = next(name for name, _ in model.named_parameters() if name.startswith("text."))
+        self.perturb(model, text_param)
+        self.assertNotEqual(self.cache_key(model), key)
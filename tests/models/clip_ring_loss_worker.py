@@ -0,0 +1,115 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Run with `python -m paddle.distributed.launch --nproc_per_node 2 clip_ring_loss_worker.py`, see `ClipRingLossTest`.
+
+Compares the losses and gradients of the ring exchange with the all-gather path. The reference gathers the features of
+all ranks, computes the local loss of this rank densely and sums the gradients of the gathered features over the ranks,
+so every rank gets the gradients of the losses of all ranks like with the ring.
+"""
+
+import numpy as np
+import paddle
+import paddle.distributed as dist
+import paddle.nn.functional as F
+from paddle.distributed import fleet
+
+from paddlemix.models.clip.loss import ClipLoss, SigLipLoss
+
+
+def all_gather_leaf(tensor):
+    gathered = []
+    dist.all_gather(gathered, tensor.detach())
+    gathered = paddle.concat(gathered, axis=0)
+    gathered.stop_gradient = False
+    return gathered
+
+
+def local_rows_grad(grad, rank, num_rows):
+    grad = grad.clone()
+    dist.all_reduce(grad)
+    return grad[rank * num_rows : (rank + 1) * num_rows]
+
+
+def assert_close(actual, expected, name):
+    np.testing.assert_allclose(actual.numpy(), expected.numpy(), rtol=1e-4, atol=1e-5, err_msg=name)
+
+
+def check_clip_loss(rank, world_size, image_features, text_features, logit_scale):
+    num_rows = image_features.shape[0]
+    inputs = [image_features, text_features, logit_scale]
+
+    ring_loss = ClipLoss(local_loss=True, ring_exchange=True, chunk_size=4, rank=rank, world_size=world_size)
+    loss = ring_loss(inputs)[0]
+    grads = paddle.grad(loss, inputs)
+
+    gather_loss = ClipLoss(local_loss=True, rank=rank, world_size=world_size)
+    assert_close(loss, gather_loss(inputs)[0], "clip loss")
+
+    all_image_features, all_text_features = all_gather_leaf(image_features), all_gather_leaf(text_features)
+    rows = slice(rank * num_rows, (rank + 1) * num_rows)
+    labels = paddle.arange(num_rows) + rank * num_rows
+    expected = (
+        F.cross_entropy(logit_scale * all_image_features[rows] @ all_text_features.T, labels)
+        + F.cross_entropy(logit_scale * all_text_features[rows] @ all_image_features.T, labels)
+    ) / 2
+    expected_grads = paddle.grad(expected, [all_image_features, all_text_features, logit_scale])
+    assert_close(loss, expected, "clip loss")
+    assert_close(grads[0], local_rows_grad(expected_grads[0], rank, num_rows), "clip image grad")
+    assert_close(grads[1], local_rows_grad(expected_grads[1], rank, num_rows), "clip text grad")
+    assert_close(grads[2], expected_grads[2], "clip logit_scale grad")
+
+
+def check_siglip_loss(rank, world_size, image_features, text_features, logit_scale):
+    num_rows = image_features.shape[0]
+    logit_bias = paddle.to_tensor([-2.0])
+    logit_bias.stop_gradient = False
+    inputs = [image_features, text_features, logit_scale, logit_bias]
+
+    loss = SigLipLoss(chunk_size=4, rank=rank, world_size=world_size)(inputs)[0]
+    grads = paddle.grad(loss, inputs)
+
+    all_text_features = all_gather_leaf(text_features)
+    logits = logit_scale * image_features @ all_text_features.T + logit_bias
+    signs = 2 * F.one_hot(paddle.arange(num_rows) + rank * num_rows, logits.shape[1]) - 1
+    expected = -F.log_sigmoid(signs * logits).sum() / num_rows
+    expected_grads = paddle.grad(expected, [image_features, all_text_features, logit_scale, logit_bias])
+    assert_close(loss, expected, "siglip loss")
+    assert_close(grads[0], expected_grads[0], "siglip image grad")
+    assert_close(grads[1], local_rows_grad(expected_grads[1], rank, num_rows), "siglip text grad")
+    assert_close(grads[2], expected_grads[2], "siglip logit_scale grad")
+    assert_close(grads[3], expected_grads[3], "siglip logit_bias grad")
+
+
+def main():
+    world_size = dist.get_world_size()
+    strategy = fleet.DistributedStrategy()
+    strategy.hybrid_configs = {"dp_degree": world_size, "mp_degree": 1, "pp_degree": 1, "sharding_degree": 1}
+    fleet.init(is_collective=True, strategy=strategy)
+    rank = dist.get_rank()
+
+    paddle.seed(rank)
+    image_features = F.normalize(paddle.randn([6, 8]), axis=-1)
+    text_features = F.normalize(paddle.randn([6, 8]), axis=-1)
+    logit_scale = paddle.to_tensor(3.0)
+    for tensor in [image_features, text_features, logit_scale]:
+        tensor.stop_gradient = False
+
+    check_clip_loss(rank, world_size, image_features, text_features, logit_scale)
+    check_siglip_loss(rank, world_size, image_features, text_features, logit_scale)
+    print(f"rank {rank} passed", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,7 @@ import sys
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
 import inspect
+import shutil
 import tempfile
 import unittest
 
@@ -24,6 +25,7 @@ import numpy as np
 import paddle
 import paddle.nn as nn
 from paddlenlp.transformers.opt.configuration import OPTConfig
+from paddlenlp.transformers.opt.modeling import OPTForCausalLM
 
 from paddlemix.models.blip2 import (
     Blip2Config,
@@ -33,6 +35,7 @@ from paddlemix.models.blip2 import (
 )
 from paddlemix.models.blip2.eva_vit import VisionTransformer
 from paddlemix.models.blip2.modeling import BLIP_2_PRETRAINED_MODEL_ARCHIVE_LIST
+from paddlemix.models.blip2.prefix_cache import Blip2PrefixCache
 from paddlemix.models.blip2.Qformer import BertLMHeadModel
 from tests.models.test_configuration_common import ConfigTester
 from tests.models.test_modeling_common import (
@@ -598,5 +601,120 @@ class Blip2ModelTest(ModelTesterMixin, unittest.TestCase):
         pass
 
 
+class Blip2GenerationTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        paddle.seed(0)
+        # the language model is loaded from `text_config`, a path with "opt" in it
+        cls.tmp_dir = tempfile.mkdtemp()
+        text_config = os.path.join(cls.tmp_dir, "tiny-opt")
+        OPTForCausalLM(
+            OPTConfig(
+                # `generate` bans the hard-coded eos token 50118 until the minimum length
+                vocab_size=50272,
+                hidden_size=16,
+                num_hidden_layers=1,
+                num_attention_heads=2,
+                intermediate_size=32,
+                max_position_embeddings=64,
+                word_embed_proj_dim=16,
+                eos_token_id=2,
+                pad_token_id=1,
+                bos_token_id=0,
+            )
+        ).save_pretrained(text_config)
+        config = Blip2Config(
+            vision_config=dict(img_size=16, patch_size=8, embed_dim=16, depth=1, num_heads=2, mlp_ratio=2.0),
+            qformer_config=dict(
+                hidden_size=16,
+                num_hidden_layers=1,
+                num_attention_heads=2,
+                intermediate_size=32,
+                hidden_dropout_prob=0.0,
+                attention_probs_dropout_prob=0.0,
+                cross_attention_freq=1,
+                encoder_width=16,
+                num_query_tokens=4,
+                type_vocab_size=2,
+                vocab_size=32,
+                add_cross_attention=True,
+                fuse=False,
+                hidden_act="gelu",
+                layer_norm_eps=1e-12,
+                initializer_range=0.02,
+            ),
+            text_config=text_config,
+            num_query_tokens=4,
+        )
+        cls.model = Blip2ForConditionalGeneration(config)
+        cls.model.eval()
+        # the default init generates the same token over and over
+        for param in cls.model.parameters():
+            if param.ndim >= 2:
+                param.set_value(paddle.randn(param.shape) * 0.5)
+        cls.pixel_values = floats_tensor([1, 3, 16, 16])
+        cls.input_ids = ids_tensor([3, 5], 50000, dtype="int64").clip(3)
+        cls.expected = cls.model.generate(cls.pixel_values.tile([3, 1, 1, 1]), cls.input_ids)[0].numpy()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_language_model_inputs(self):
+        language_model_inputs = self.model.encode_image(self.pixel_values.tile([3, 1, 1, 1]), cast_to_float16=False)
+        outputs = self.model.generate(input_ids=self.input_ids, language_model_inputs=language_model_inputs)
+        np.testing.assert_array_equal(outputs[0].numpy(), self.expected)
+
+        # the prefix of one image is broadcast to the prompts
+        language_model_inputs = self.model.encode_image(self.pixel_values, cast_to_float16=False)
+        outputs = self.model.generate(input_ids=self.input_ids, language_model_inputs=language_model_inputs)
+        np.testing.assert_array_equal(outputs[0].numpy(), self.expected)
+
+    def test_broadcast_image(self):
+        outputs = self.model.generate(self.pixel_values, self.input_ids)
+        np.testing.assert_array_equal(outputs[0].numpy(), self.expected)
+
+        self.model.enable_prefix_cache()
+        try:
+            outputs = self.model.generate(self.pixel_values, self.input_ids)
+            np.testing.assert_array_equal(outputs[0].numpy(), self.expected)
+            self.assertEqual(self.model.prefix_cache_stats()["misses"], 1)
+        finally:
+            self.model.disable_prefix_cache()
+
+
+class Blip2PrefixCacheTest(unittest.TestCase):
+    def test_get_or_compute(self):
+        encoded = []
+
+        def encode_fn(pixel_values):
+            encoded.append(pixel_values.shape[0])
+            return pixel_values.mean(axis=[2, 3]).unsqueeze(1).tile([1, 4, 1])
+
+        cache = Blip2PrefixCache(max_entries=2)
+        images = floats_tensor([3, 3, 8, 8])
+        expected = encode_fn(images)
+        encoded.clear()
+
+        # the same image twice in one batch is encoded once
+        batch = paddle.concat([images[:2], images[:1]], axis=0)
+        prefix = cache.get_or_compute(batch, encode_fn)
+        self.assertEqual(encoded, [2])
+        np.testing.assert_allclose(prefix.numpy(), paddle.gather(expected, paddle.to_tensor([0, 1, 0])).numpy())
+
+        prefix = cache.get_or_compute(images[1:], encode_fn)
+        self.assertEqual(encoded, [2, 1])
+        np.testing.assert_allclose(prefix.numpy(), expected[1:].numpy())
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 3)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(len(cache), 2)
+
+        # the first image was evicted
+        cache.get_or_compute(images[:1], encode_fn)
+        self.assertEqual(encoded, [2, 1, 1])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -14,12 +14,15 @@
 # limitations under the License.
 
 import inspect
+import os
 import unittest
 
 import paddle
 import paddle.nn as nn
+import paddle.nn.functional as F
 
 from paddlemix.models.clip.clip_model import CLIP, CLIPConfig
+from paddlemix.models.clip.loss import ClipLoss, SigLipLoss
 from paddlemix.models.clip.text_model import TextTransformer, TextTransformerConfig
 from paddlemix.models.clip.vit_model import VisionTransformer, VisionTransformerConfig
 from tests.models.test_configuration_common import ConfigTester
@@ -28,10 +31,52 @@ from tests.models.test_modeling_common import (
     floats_tensor,
     ids_tensor,
 )
-from tests.testing_utils import slow
+from tests.testing_utils import run_distributed, slow
 
 CLIP_PRETRAINED_MODEL_ARCHIVE_LIST = ["paddlemix/CLIP/Vit_L-14"]
 
+# a CLIP small enough to train a step on CPU in the loss and trainer tests
+TINY_VISION_CFG = {
+    "image_size": 32,
+    "patch_size": 8,
+    "width": 32,
+    "layers": 2,
+    "head_width": 16,
+    "mlp_ratio": 2.0,
+    "ls_init_value": None,
+    "patch_dropout": 0.0,
+    "global_average_pool": False,
+    "attentional_pool": False,
+    "n_queries": 4,
+    "attn_pooler_heads": 2,
+    "embed_dim": 16,
+    "xattn": False,
+    "output_tokens": False,
+    "fusedlinear": False,
+    "flash_attn": False,
+    "batchsize": 6,
+}
+TINY_TEXT_CFG = {
+    "context_length": 77,
+    "vocab_size": 49408,
+    "width": 32,
+    "heads": 2,
+    "layers": 2,
+    "ls_init_value": None,
+    "embed_dim": 16,
+    "xattn": False,
+    "attn_mask": True,
+    "pad_id": 0,
+    "embed_cls": False,
+    "output_tokens": False,
+    "quick_gelu": False,
+    "mlp_ratio": 2.0,
+    "fusedLN": False,
+    "fusedlinear": False,
+    "flash_attn": False,
+    "batchsize": 6,
+}
+
 
 class VisionTransformerModelTester:
     def __init__(
@@ -451,3 +496,67 @@ class CLIPModelTest(ModelTesterMixin, unittest.TestCase):
         for model_name in CLIP_PRETRAINED_MODEL_ARCHIVE_LIST:
             model = CLIP.from_pretrained(model_name)
             self.assertIsNotNone(model)
+
+
+class ChunkedLossTest(unittest.TestCase):
+    def get_inputs(self, batch_size=10, dim=8):
+        paddle.seed(42)
+        image_features = F.normalize(paddle.randn([batch_size, dim]), axis=-1)
+        text_features = F.normalize(paddle.randn([batch_size, dim]), axis=-1)
+        logit_scale = paddle.to_tensor(3.0)
+        for tensor in [image_features, text_features, logit_scale]:
+            tensor.stop_gradient = False
+        return image_features, text_features, logit_scale
+
+    def get_grads(self, loss, tensors):
+        return [g.numpy() for g in paddle.grad(loss, tensors)]
+
+    def test_clip_loss(self):
+        inputs = self.get_inputs()
+        loss = ClipLoss()(inputs)[0]
+        chunked_loss, logits_per_image, _, _ = ClipLoss(chunk_size=3)(inputs)
+        self.assertIsNone(logits_per_image)
+        self.assertTrue(paddle.allclose(loss, chunked_loss, atol=1e-5))
+        for grad, chunked_grad in zip(self.get_grads(loss, inputs), self.get_grads(chunked_loss, inputs)):
+            self.assertTrue(paddle.allclose(paddle.to_tensor(grad), paddle.to_tensor(chunked_grad), atol=1e-5))
+
+    def test_siglip_loss(self):
+        image_features, text_features, logit_scale = self.get_inputs()
+        logit_bias = paddle.to_tensor([-2.0])
+        logit_bias.stop_gradient = False
+        inputs = [image_features, text_features, logit_scale, logit_bias]
+
+        logits = logit_scale * image_features.matmul(text_features.t()) + logit_bias
+        signs = 2 * paddle.eye(logits.shape[0]) - 1
+        loss = -F.log_sigmoid(signs * logits).sum() / logits.shape[0]
+        chunked_loss = SigLipLoss(chunk_size=4)(inputs)[0]
+        self.assertTrue(paddle.allclose(loss, chunked_loss, atol=1e-5))
+        for grad, chunked_grad in zip(self.get_grads(loss, inputs), self.get_grads(chunked_loss, inputs)):
+            self.assertTrue(paddle.allclose(paddle.to_tensor(grad), paddle.to_tensor(chunked_grad), atol=1e-5))
+
+    def test_ring_exchange_requires_local_loss(self):
+        with self.assertRaises(ValueError):
+            ClipLoss(ring_exchange=True, world_size=2)
+
+    def test_siglip_model(self):
+        tester = CLIPModelTester(self, vision_cfg=TINY_VISION_CFG, text_cfg=TINY_TEXT_CFG, batch_size=6)
+        config, image, text = tester.prepare_config_and_inputs()
+        model = CLIP(config, loss_type="siglip", loss_chunk_size=4)
+        self.assertIsInstance(model.loss, SigLipLoss)
+        self.assertIn("logit_bias", dict(model.named_parameters()))
+
+        preds = model(image, text, skiploss=True)
+        self.assertEqual(len(preds), 4)
+        loss = model(image, text)[0]
+        self.assertTrue(paddle.allclose(loss, model.loss(preds)[0]))
+        loss.backward()
+        self.assertIsNotNone(model.logit_bias.grad)
+
+
+class ClipRingLossTest(unittest.TestCase):
+    def test_ring_matches_all_gather(self):
+        worker = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clip_ring_loss_worker.py")
+        returncode, logs = run_distributed(worker, nproc_per_node=2)
+        self.assertEqual(returncode, 0, logs[-5000:])
+        self.assertIn("rank 0 passed", logs)
+        self.assertIn("rank 1 passed", logs)
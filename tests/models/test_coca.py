@@ -217,13 +217,16 @@ class CoCaModelTester:
             result = model(image, text, skiploss=True)
 
         self.parent.assertEqual(
-            result[1].shape,
+            result[0].shape,
             [self.batch_size, self.vision_cfg["embed_dim"]],
         )
         self.parent.assertEqual(
-            result[2].shape,
+            result[1].shape,
             [self.batch_size, self.text_cfg["embed_dim"]],
         )
+        # the caption loss and its number of non-pad tokens
+        self.parent.assertEqual(len(result), 5)
+        self.parent.assertLessEqual(int(result[4]), self.batch_size * self.text_cfg["context_length"])
 
     def prepare_config_and_inputs_for_common(self):
         config_and_inputs = self.prepare_config_and_inputs()
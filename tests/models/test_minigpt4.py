@@ -27,6 +27,7 @@ import paddle.nn as nn
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
 from paddlemix.models.blip2.modeling import BLIP_2_PRETRAINED_MODEL_ARCHIVE_LIST
 from paddlemix.models.minigpt4 import (
+    MiniGPT4ChatSession,
     MiniGPT4Config,
     MiniGPT4ForConditionalGeneration,
     MiniGPT4QFormerConfig,
@@ -568,5 +569,62 @@ class MiniGPT4ModelTest(ModelTesterMixin, unittest.TestCase):
         pass
 
 
+class MiniGPT4ChatSessionTest(unittest.TestCase):
+    def setUp(self):
+        from paddlenlp.transformers import LlamaConfig, LlamaForCausalLM
+
+        paddle.seed(0)
+        config = LlamaConfig(
+            vocab_size=64,
+            hidden_size=16,
+            intermediate_size=32,
+            num_hidden_layers=2,
+            num_attention_heads=2,
+            max_position_embeddings=256,
+        )
+        self.language_model = LlamaForCausalLM(config)
+        self.language_model.eval()
+        self.prefix_embeds = floats_tensor([1, 6, 16])
+
+    def full_greedy(self, ids, max_length):
+        # greedy decoding without a cache over the prefix and the whole conversation
+        ids = list(ids)
+        reply_ids = []
+        with paddle.no_grad():
+            for _ in range(max_length):
+                embeds = self.language_model.llama.embed_tokens(paddle.to_tensor([ids], dtype="int64"))
+                embeds = paddle.concat([self.prefix_embeds, embeds], axis=1)
+                position_ids = paddle.arange(embeds.shape[1], dtype="int64").unsqueeze(0)
+                logits = self.language_model(inputs_embeds=embeds, position_ids=position_ids, return_dict=True).logits
+                ids.append(int(paddle.argmax(logits[0, -1])))
+                reply_ids.append(ids[-1])
+        return reply_ids
+
+    def test_matches_full_conversation(self):
+        session = MiniGPT4ChatSession(self.language_model, self.prefix_embeds)
+        history = []
+        for prompt_ids in [[3, 4, 5], [6, 7]]:
+            reply_ids = session.chat(paddle.to_tensor([prompt_ids]), max_length=4).numpy()[0].tolist()
+            self.assertEqual(reply_ids, self.full_greedy(history + prompt_ids, 4))
+            history += prompt_ids + reply_ids
+        # every token is run through the language model once
+        self.assertEqual(session.stats()["prefill_tokens"], len(history))
+        self.assertEqual(session.cache_length, 6 + len(history))
+
+    def test_eviction(self):
+        session = MiniGPT4ChatSession(self.language_model, self.prefix_embeds, max_context_length=20)
+        session.chat([3, 4, 5], max_length=4)
+        turn_ids = [6, 7] + session.chat([6, 7], max_length=4).numpy()[0].tolist()
+        reply_ids = session.chat([8, 9, 10], max_length=4).numpy()[0].tolist()
+
+        # the first turn is evicted, the second one is kept
+        self.assertEqual(session.stats()["evicted_turns"], 1)
+        self.assertEqual(len(session.turns), 2)
+        self.assertEqual(reply_ids, self.full_greedy(turn_ids + [8, 9, 10], 4))
+
+        with self.assertRaises(ValueError):
+            session.chat(list(range(3, 20)), max_length=4)
+
+
 if __name__ == "__main__":
     unittest.main()
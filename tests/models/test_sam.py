@@ -0,0 +1,166 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import paddle
+
+from paddlemix.models.sam.amg import mask_to_rle, rle_to_mask
+from paddlemix.models.sam.automatic_mask_generator import SamAutomaticMaskGenerator
+from paddlemix.models.sam.configuration import SamConfig
+from paddlemix.models.sam.embedding_cache import SamEmbeddingCache
+from paddlemix.models.sam.modeling import SamModel
+from paddlemix.processors.sam_processing import SamImageProcessor, SamProcessor, SamPromptProcessor
+from tests.models.test_modeling_common import floats_tensor
+
+
+class SamModelTester:
+    def __init__(self, parent, image_size=64, input_type="boxs"):
+        self.parent = parent
+        self.image_size = image_size
+        self.input_type = input_type
+
+    def get_config(self):
+        return SamConfig(
+            prompt_embed_dim=32,
+            image_size=self.image_size,
+            vit_patch_size=16,
+            encoder_embed_dim=32,
+            encoder_depth=2,
+            encoder_num_heads=2,
+            encoder_global_attn_indexes=[1],
+            input_type=self.input_type,
+        )
+
+    def prepare_image(self):
+        return floats_tensor([1, 3, self.image_size, self.image_size])
+
+
+class SamEmbeddingCacheTest(unittest.TestCase):
+    def setUp(self):
+        paddle.seed(42)
+        self.model_tester = SamModelTester(self)
+        self.model = SamModel(self.model_tester.get_config())
+        self.model.eval()
+
+    def test_cache_hits_match_uncached(self):
+        image_a = self.model_tester.prepare_image()
+        image_b = self.model_tester.prepare_image()
+        box = paddle.to_tensor([[0, 0, 30, 30]], dtype="float32")
+        expected_a = self.model(img=image_a, prompt=box)
+        expected_b = self.model(img=image_b, prompt=box)
+
+        self.model.enable_embedding_cache()
+        for image, expected in [(image_a, expected_a), (image_b, expected_b), (image_a, expected_a)]:
+            masks = self.model(img=image, prompt=box)
+            self.assertTrue(paddle.allclose(masks, expected, atol=1e-5))
+
+        stats = self.model.embedding_cache_stats()
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["entries"], 2)
+
+    def test_lru_eviction_and_spill(self):
+        features = [paddle.randn([1, 32, 4, 4]) for _ in range(3)]
+        entry_bytes = features[0].numel().item() * features[0].element_size()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            cache = SamEmbeddingCache(max_bytes=2 * entry_bytes, spill_dir=tmpdirname)
+            for i, feature in enumerate(features):
+                cache.put(str(i), feature)
+
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.evictions, 1)
+            self.assertTrue(os.path.isfile(os.path.join(tmpdirname, "0.npy")))
+
+            restored = cache.get("0")
+            self.assertTrue(paddle.allclose(restored, features[0]))
+            self.assertEqual(cache.disk_hits, 1)
+            # restoring "0" pushes out the least recently used "1"
+            self.assertNotIn("1", cache._entries)
+            self.assertIn("1", cache)
+
+
+class SamPredictPromptsTest(unittest.TestCase):
+    def setUp(self):
+        paddle.seed(42)
+        self.model_tester = SamModelTester(self)
+        self.model = SamModel(self.model_tester.get_config())
+        self.model.eval()
+
+    def test_predict_prompts_matches_loop(self):
+        image = self.model_tester.prepare_image()
+        point_coords = paddle.to_tensor([[[10, 12]], [[40, 20]], [[30, 50]]], dtype="float32")
+        boxes = paddle.to_tensor([[0, 0, 30, 30], [20, 10, 60, 40]], dtype="float32")
+
+        self.model.set_image_features(image)
+        expected = [self.model.prompt_forward_point(coords_paddle=point_coords[i : i + 1]) for i in range(3)]
+        expected += [self.model.prompt_forward_box(box_paddle=boxes[i : i + 1]) for i in range(2)]
+        expected = paddle.concat(expected)
+
+        masks, iou_predictions = self.model.predict_prompts(
+            image, point_coords=point_coords, boxes=boxes, max_batch_size=2
+        )
+        self.assertEqual(masks.shape, expected.shape)
+        self.assertEqual(iou_predictions.shape, [5, 1])
+        self.assertTrue(paddle.allclose(masks, expected, atol=1e-5))
+
+
+class SamAutomaticMaskGeneratorTest(unittest.TestCase):
+    def setUp(self):
+        paddle.seed(42)
+        self.model_tester = SamModelTester(self)
+        self.model = SamModel(self.model_tester.get_config())
+        self.processor = SamProcessor(
+            SamImageProcessor(size=self.model_tester.image_size), SamPromptProcessor(size=self.model_tester.image_size)
+        )
+        self.image = (np.random.RandomState(0).rand(48, 80, 3) * 255).astype("uint8")
+
+    def get_generator(self, **kwargs):
+        # the thresholds are relaxed so the randomly initialized model keeps some masks
+        return SamAutomaticMaskGenerator(
+            self.model,
+            self.processor,
+            points_per_side=4,
+            points_per_batch=5,
+            pred_iou_thresh=-10.0,
+            stability_score_thresh=0.0,
+            **kwargs,
+        )
+
+    def test_generate(self):
+        records = self.get_generator().generate(self.image)
+        self.assertGreater(len(records), 0)
+        for record in records:
+            self.assertEqual(record["segmentation"].shape, self.image.shape[:2])
+            self.assertEqual(record["area"], int(record["segmentation"].sum()))
+            self.assertEqual(len(record["bbox"]), 4)
+
+        rle_records = self.get_generator(output_mode="uncompressed_rle").generate(self.image)
+        self.assertEqual(len(rle_records), len(records))
+        for record, rle_record in zip(records, rle_records):
+            self.assertTrue(np.array_equal(rle_to_mask(rle_record["segmentation"]), record["segmentation"]))
+
+    def test_generate_with_crops(self):
+        records = self.get_generator(crop_n_layers=1).generate(self.image)
+        self.assertGreater(len(records), 0)
+        for record in records:
+            self.assertEqual(record["segmentation"].shape, self.image.shape[:2])
+
+    def test_mask_to_rle(self):
+        masks = paddle.rand([3, 7, 9]) > 0.5
+        for mask, rle in zip(masks.numpy(), mask_to_rle(masks)):
+            self.assertTrue(np.array_equal(rle_to_mask(rle), mask))
@@ -0,0 +1,148 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import paddle
+from paddlenlp.transformers import ChatGLMConfig
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
+from paddlemix.models.visualglm.configuration import VisualGLMConfig
+from paddlemix.models.visualglm.modeling import (
+    ChatGLMForConditionalGenerationWithImage,
+    VisualGLMChatSession,
+    VisualGLMForConditionalGeneration,
+)
+from tests.models.test_modeling_common import floats_tensor
+
+
+TINY_TEXT_CFG = dict(
+    vocab_size=64,
+    hidden_size=16,
+    inner_hidden_size=32,
+    num_hidden_layers=2,
+    num_attention_heads=2,
+    max_sequence_length=256,
+    bos_token_id=60,
+    eos_token_id=61,
+    mask_token_id=62,
+    gmask_token_id=63,
+    pad_token_id=0,
+)
+
+
+class VisualGLMChatSessionTest(unittest.TestCase):
+    def setUp(self):
+        paddle.seed(0)
+        self.language_model = ChatGLMForConditionalGenerationWithImage(ChatGLMConfig(**TINY_TEXT_CFG))
+        self.language_model.eval()
+        self.prefix_embeds = floats_tensor([1, 6, 16])
+
+    def test_replay_matches_generation(self):
+        # a reply generated token by token has the same cache as the reply encoded at once
+        session = VisualGLMChatSession(self.language_model, self.prefix_embeds)
+        reply_ids = session.chat([3, 4, 63, 60], max_length=4).numpy()[0].tolist()
+
+        replayed = VisualGLMChatSession(self.language_model, self.prefix_embeds)
+        replayed._append([3, 4, 63, 60])
+        replayed._append(reply_ids, generation=True)
+        for layer_cache, replayed_layer_cache in zip(session.cache, replayed.cache):
+            for x, y in zip(layer_cache, replayed_layer_cache):
+                np.testing.assert_allclose(x.numpy(), y.numpy(), rtol=1e-5, atol=1e-5)
+
+    def test_eviction(self):
+        session = VisualGLMChatSession(self.language_model, self.prefix_embeds, max_context_length=24)
+        session.chat([3, 4, 63, 60], max_length=4)
+        turn = ([5, 6, 63, 60], session.chat([5, 6, 63, 60], max_length=4).numpy()[0].tolist())
+        self.assertEqual(session.cache_length, 6 + 16)
+        reply = session.chat([7, 8, 63, 60], max_length=4)
+
+        # the first turn is evicted and the second one encoded again after the image prefix
+        self.assertEqual(session.stats()["evicted_turns"], 1)
+        self.assertEqual(session.stats()["turns"], 2)
+        expected = VisualGLMChatSession(self.language_model, self.prefix_embeds)
+        expected._append(turn[0])
+        expected._append(turn[1], generation=True)
+        self.assertEqual(reply.numpy().tolist(), expected.chat([7, 8, 63, 60], max_length=4).numpy().tolist())
+
+
+class VisualGLMGenerationTest(unittest.TestCase):
+    def setUp(self):
+        paddle.seed(0)
+        config = VisualGLMConfig(
+            vision_config=dict(
+                hidden_size=16,
+                intermediate_size=32,
+                num_hidden_layers=1,
+                num_attention_heads=2,
+                image_size=16,
+                patch_size=8,
+                dropout=0.0,
+                attention_dropout=0.0,
+            ),
+            qformer_config=dict(
+                hidden_size=16,
+                num_hidden_layers=1,
+                num_attention_heads=2,
+                intermediate_size=32,
+                hidden_dropout_prob=0.0,
+                attention_probs_dropout_prob=0.0,
+                cross_attention_frequency=1,
+            ),
+            text_config=TINY_TEXT_CFG,
+            # the language model splits 32 image tokens off the prompt
+            num_query_tokens=32,
+        )
+        self.model = VisualGLMForConditionalGeneration(config)
+        self.model.eval()
+        # the default init generates the same token over and over
+        for param in self.model.parameters():
+            if param.ndim >= 2:
+                param.set_value(paddle.randn(param.shape) * 0.5)
+        self.pixel_values = floats_tensor([1, 3, 16, 16])
+
+    def generate(self, pre_image_ids, post_image_ids, max_length):
+        # the prompt with the image tokens, attention mask and position ids like the ChatGLM tokenizer builds them
+        input_ids = paddle.to_tensor([pre_image_ids + [1] * 32 + post_image_ids], dtype="int64")
+        length = input_ids.shape[1]
+        context_length = length - 1
+        attention_mask = paddle.tril(paddle.ones([length, length]))
+        attention_mask[:, :context_length] = 1
+        position_ids = self.model.language_model.get_position_ids(
+            input_ids, mask_positions=[context_length - 1], use_gmasks=[True]
+        )
+        reply_ids, _ = self.model.generate(
+            self.pixel_values,
+            input_ids,
+            pre_image_length=len(pre_image_ids),
+            attention_mask=attention_mask.astype("bool")[None, None],
+            position_ids=position_ids,
+            max_length=max_length,
+            decode_strategy="greedy_search",
+            eos_token_id=61,
+        )
+        return reply_ids.numpy()[0].tolist()
+
+    def test_first_turn_matches_generate(self):
+        pre_image_ids, post_image_ids = [5, 6, 7], [8, 9, 10, 63, 60]
+        session = self.model.start_chat(paddle.to_tensor([pre_image_ids]), pixel_values=self.pixel_values)
+        reply_ids = session.chat(post_image_ids, max_length=8, eos_token_id=61).numpy()[0].tolist()
+        self.assertEqual(reply_ids, self.generate(pre_image_ids, post_image_ids, max_length=8)[: len(reply_ids)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
+from paddlemix.processors.tokenizer import SimpleTokenizer, _LRUCache
+
+TEXTS = [
+    "a photo of a cat",
+    "A Photo of a CAT!",
+    "",
+    "an   oddly spaced, punctuated caption -- with 2 numbers and 13 digits",
+    "café crème brûlée &amp; naïve déjà vu",
+    "long caption " + " ".join(f"word{i}" for i in range(40)),
+    "photographers photographing photographs of photographic photos",
+]
+
+
+class SimpleTokenizerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tokenizer = SimpleTokenizer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tokenizer.close()
+
+    def expected_ids(self, max_length):
+        # `__call__` without tensors encodes and truncates every text on its own
+        expected = np.zeros([len(TEXTS), max_length], dtype="int64")
+        for i, text in enumerate(TEXTS):
+            tokens = self.tokenizer(text, max_length=max_length, return_tensors=False)["input_ids"][0]
+            expected[i, : len(tokens)] = tokens
+        return expected
+
+    def test_encode_batch(self):
+        for max_length in [77, 8]:
+            expected = self.expected_ids(max_length)
+            np.testing.assert_array_equal(self.tokenizer.encode_batch(TEXTS, max_length=max_length), expected)
+            np.testing.assert_array_equal(
+                self.tokenizer.encode_batch(TEXTS, max_length=max_length, num_workers=2), expected
+            )
+            np.testing.assert_array_equal(
+                self.tokenizer(TEXTS, max_length=max_length, return_tensors="np")["input_ids"], expected
+            )
+
+    def test_truncation(self):
+        eot_token = self.tokenizer.encoder["<end_of_text>"]
+        input_ids = self.tokenizer.encode_batch(TEXTS, max_length=8)
+        # the long texts end with the end token in the last position
+        self.assertEqual(input_ids[5, -1], eot_token)
+        self.assertEqual(input_ids[3, -1], eot_token)
+        self.assertEqual(input_ids[0].tolist(), self.tokenizer(TEXTS[0], return_tensors=False)["input_ids"][0] + [0])
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_eviction(self):
+        cache = _LRUCache(maxsize=2)
+        cache.put("a", [1])
+        cache.put("b", [2])
+        # reading "a" makes "b" the least recently used entry
+        self.assertEqual(cache.get("a"), [1])
+        cache.put("c", [3])
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn("b", cache)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), [1])
+        self.assertEqual(cache.get("c"), [3])
+
+    def test_tokenizer_cache_size(self):
+        tokenizer = SimpleTokenizer(cache_size=2)
+        expected = SimpleTokenizer().encode("one two three")
+        self.assertEqual(tokenizer.encode("one two three"), expected)
+        self.assertEqual(len(tokenizer.cache), 2)
+        self.assertNotIn("one", tokenizer.cache)
+        self.assertIn("three", tokenizer.cache)
+        # evicted pre-tokens are encoded again to the same ids
+        self.assertEqual(tokenizer.encode("one two three"), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
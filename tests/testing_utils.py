@@ -15,6 +15,9 @@
 from __future__ import annotations
 
 import os
+import subprocess
+import sys
+import tempfile
 import unittest
 from argparse import ArgumentTypeError
 
@@ -55,3 +58,17 @@ def slow(test):
         return unittest.skip("test spends too much time")(test)
     else:
         return test
+
+
+def run_distributed(script, nproc_per_node=2, timeout=600):
+    """
+    Run `script` with `paddle.distributed.launch` on `nproc_per_node` processes, on CPU with gloo if there is no GPU.
+    Returns the exit code and the logs of all workers.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.environ.get("PYTHONPATH", "")]))
+    with tempfile.TemporaryDirectory() as log_dir:
+        cmd = [sys.executable, "-m", "paddle.distributed.launch", "--nproc_per_node", str(nproc_per_node)]
+        result = subprocess.run(cmd + ["--log_dir", log_dir, script], env=env, cwd=log_dir, timeout=timeout)
+        logs = "".join(open(os.path.join(log_dir, name)).read() for name in sorted(os.listdir(log_dir)))
+    return result.returncode, logs
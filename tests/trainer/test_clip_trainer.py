@@ -0,0 +1,189 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tempfile
+import unittest
+
+import numpy as np
+import paddle
+from paddle.io import DataLoader, Dataset, DistributedBatchSampler
+from paddlenlp.trainer import TrainingArguments
+
+from paddlemix.models.clip.clip_model import CLIP
+from paddlemix.models.clip.coca_model import CoCa
+from paddlemix.trainer import CLIPTrainer
+from tests.models import test_clip, test_coca
+
+TINY_COCA_VISION_CFG = {
+    "embed_dim": 32,
+    "image_size": 32,
+    "layers": 2,
+    "width": 32,
+    "head_width": 16,
+    "patch_size": 8,
+    "attentional_pool": True,
+    "attn_pooler_heads": 2,
+    "n_queries": 8,
+    "output_tokens": True,
+    "batchsize": 6,
+}
+TINY_COCA_TEXT_CFG = {
+    "embed_dim": 32,
+    "context_length": 12,
+    "vocab_size": 100,
+    "width": 32,
+    "heads": 2,
+    "layers": 2,
+    "embed_cls": True,
+    "output_tokens": True,
+}
+TINY_COCA_MULTIMODAL_CFG = {
+    "context_length": 12,
+    "vocab_size": 100,
+    "width": 32,
+    "heads": 2,
+    "layers": 2,
+    "attn_pooler_heads": 2,
+}
+
+
+class GradCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def get_trainer(self, model, grad_cache_chunk_size=None):
+        args = TrainingArguments(output_dir=self.output_dir.name, max_grad_norm=0.0)
+        args.tensorboard = False
+        return CLIPTrainer(model=model, args=args, grad_cache_chunk_size=grad_cache_chunk_size)
+
+    def randomize(self, model):
+        # the text tower is not initialized outside `from_pretrained` and gives nearly the same feature for every text
+        paddle.seed(0)
+        for param in model.parameters():
+            if param.ndim >= 2:
+                param.set_value(paddle.randn(param.shape) * 0.1)
+
+    def run_step(self, model, inputs, grad_cache_chunk_size=None):
+        model.clear_gradients()
+        loss = self.get_trainer(model, grad_cache_chunk_size).training_step(model, dict(inputs))
+        grads = {name: p.grad.numpy() for name, p in model.named_parameters() if p.grad is not None}
+        return float(loss), grads
+
+    def check_grad_cache(self, model, inputs):
+        loss, grads = self.run_step(model, inputs)
+        # 6 samples in micro batches of 4 and 2
+        cached_loss, cached_grads = self.run_step(model, inputs, grad_cache_chunk_size=4)
+
+        np.testing.assert_allclose(cached_loss, loss, rtol=1e-5)
+        self.assertEqual(cached_grads.keys(), grads.keys())
+        for name, grad in grads.items():
+            atol = 1e-5 * max(np.abs(grad).max(), 1.0)
+            np.testing.assert_allclose(cached_grads[name], grad, rtol=1e-3, atol=atol, err_msg=name)
+
+    def test_clip(self):
+        tester = test_clip.CLIPModelTester(
+            self, vision_cfg=test_clip.TINY_VISION_CFG, text_cfg=test_clip.TINY_TEXT_CFG, batch_size=6
+        )
+        config, image, text = tester.prepare_config_and_inputs()
+        model = CLIP(config)
+        self.randomize(model)
+        self.check_grad_cache(model, {"image": image, "input_ids": text})
+
+    def test_coca(self):
+        tester = test_coca.CoCaModelTester(
+            self,
+            vision_cfg=TINY_COCA_VISION_CFG,
+            text_cfg=TINY_COCA_TEXT_CFG,
+            multimodal_cfg=TINY_COCA_MULTIMODAL_CFG,
+            batch_size=6,
+        )
+        config, image, text = tester.prepare_config_and_inputs()
+        # captions of unequal lengths, the micro batch of 4 short ones has fewer caption tokens than the one of 2
+        text = text.clip(min=1)
+        text[:4, 5:] = 0
+        model = CoCa(config=config)
+        self.randomize(model)
+        with paddle.no_grad():
+            outputs = model(image, text, skiploss=True)
+        # the caption loss of CoCa is computed per micro batch from the `skiploss` outputs
+        self.assertEqual(len(outputs), 5)
+        self.assertGreater(float(outputs[3]), 0.0)
+        self.assertEqual(int(outputs[4]), 4 * 4 + 2 * 12)
+        self.check_grad_cache(model, {"image": image, "input_ids": text})
+
+
+class LabelDataset(Dataset):
+    def __init__(self, num_samples):
+        self.num_samples = num_samples
+
+    def __getitem__(self, idx):
+        return {"image": np.full([4], idx, dtype="float32"), "labels": np.array(idx, dtype="int64")}
+
+    def __len__(self):
+        return self.num_samples
+
+
+class FeatureModel(paddle.nn.Layer):
+    def __init__(self):
+        super().__init__()
+        self.linear = paddle.nn.Linear(4, 4)
+
+    def forward(self, image, labels=None):
+        return paddle.zeros([1]), image
+
+
+class RecordingMetrics:
+    def reset(self):
+        self.labels = []
+
+    def update(self, logits, labels):
+        self.labels.extend(labels.numpy().tolist())
+
+    def compute(self):
+        return {"count": len(self.labels)}
+
+
+class StreamingEvaluationTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+
+    def evaluate_rank(self, dataset, rank, num_replicas=2, batch_size=2):
+        args = TrainingArguments(output_dir=self.output_dir.name, per_device_eval_batch_size=batch_size)
+        args.tensorboard = False
+        metrics = RecordingMetrics()
+        trainer = CLIPTrainer(model=FeatureModel(), args=args, streaming_metrics=metrics)
+        batch_sampler = DistributedBatchSampler(
+            dataset, batch_size=batch_size, num_replicas=num_replicas, rank=rank, shuffle=False
+        )
+        output = trainer.evaluation_loop(DataLoader(dataset, batch_sampler=batch_sampler), "Evaluation")
+        self.assertEqual(output.metrics["eval_count"], len(metrics.labels))
+        return metrics.labels
+
+    def test_padded_samples_are_dropped(self):
+        # 7 samples over 2 ranks are padded to 8, in batches of 2 the repeated sample falls into the last batch of
+        # the second rank
+        dataset = LabelDataset(7)
+        labels = [self.evaluate_rank(dataset, rank) for rank in range(2)]
+        self.assertEqual(sorted(labels[0] + labels[1]), list(range(7)))
+
+    def test_unpadded_samples_are_kept(self):
+        dataset = LabelDataset(8)
+        labels = [self.evaluate_rank(dataset, rank) for rank in range(2)]
+        self.assertEqual(sorted(labels[0] + labels[1]), list(range(8)))